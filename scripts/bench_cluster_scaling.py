@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+多进程部署扩展性基准：依次以 1/2/4/8 个 worker 启动 joygate.cluster，
+每个压测进程用独立 sandbox + keep-alive 连接循环请求，统计总吞吐与相对 1 worker 的加速比。
+
+近线性扩展需要空闲核数 >= worker 数 + dispatcher + 压测进程；核数不足时加速比会被 CPU 上限压平（输出会打印 cpu_count）。
+
+用法：PYTHONPATH=src python scripts/bench_cluster_scaling.py --workers 1,2,4,8 --clients 16 --seconds 10
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+
+def _wait_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"port {port} not listening")
+
+
+def _client(port: int, path: str, seconds: float, start_at: float, out: multiprocessing.Queue) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/bootstrap")
+    resp = conn.getresponse()
+    sandbox_id = json.loads(resp.read())["sandbox_id"]
+    headers = {"Cookie": f"joygate_sandbox={sandbox_id}"}
+    while time.time() < start_at:
+        time.sleep(0.01)
+    done = errors = 0
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        conn.request("GET", path, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        if resp.status == 200:
+            done += 1
+        else:
+            errors += 1
+    out.put((done, errors))
+
+
+def _run(workers: int, clients: int, seconds: float, port: int, path: str, dispatchers: int) -> tuple[float, int]:
+    """workers=0：单个 uvicorn 进程直连（不经 dispatcher），作为转发开销的对照。"""
+    env = dict(os.environ)
+    env.setdefault("PYTHONPATH", "src")
+    env["JOYGATE_RATE_LIMIT_PER_IP_PER_MIN"] = "100000000"
+    env["JOYGATE_RATE_LIMIT_PER_SANDBOX_PER_MIN"] = "100000000"
+    if workers == 0:
+        env["JOYGATE_DISABLE_SINGLE_WORKER_LOCK"] = "1"
+        cmd = [
+            sys.executable, "-m", "uvicorn", "joygate.main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", "1", "--log-level", "warning",
+        ]
+    else:
+        cmd = [
+            sys.executable, "-m", "joygate.cluster", "--workers", str(workers), "--port", str(port),
+            "--dispatchers", str(dispatchers), "--log-level", "warning",
+        ]
+    proc = subprocess.Popen(cmd, env=env)
+    try:
+        _wait_port(port)
+        out: multiprocessing.Queue = multiprocessing.Queue()
+        start_at = time.time() + 1.0
+        procs = [
+            multiprocessing.Process(target=_client, args=(port, path, seconds, start_at, out)) for _ in range(clients)
+        ]
+        for p in procs:
+            p.start()
+        results = [out.get(timeout=seconds + 60) for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(20)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    done = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    return done / seconds, errors
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="JoyGate cluster throughput scaling benchmark")
+    ap.add_argument("--workers", default="1,2,4,8", help="逗号分隔的 worker 数列表")
+    ap.add_argument("--clients", type=int, default=16, help="压测进程数（每个一个 sandbox + 一条 keep-alive 连接）")
+    ap.add_argument("--seconds", type=float, default=10.0, help="每档压测时长")
+    ap.add_argument("--port", type=int, default=18951, help="cluster 对外端口（worker 用其后连续端口）")
+    ap.add_argument("--path", default="/v1/snapshot", help="压测的 GET 路径")
+    ap.add_argument("--dispatchers", type=int, default=1, help="dispatcher 进程数")
+    ap.add_argument("--direct", action="store_true", help="先测单个 uvicorn 直连（无 dispatcher）作对照")
+    args = ap.parse_args()
+
+    print(f"cpu_count={os.cpu_count()} clients={args.clients} seconds={args.seconds} path={args.path}")
+    if args.direct:
+        rps, errors = _run(0, args.clients, args.seconds, args.port, args.path, args.dispatchers)
+        print(f"direct     rps={rps:9.1f} errors={errors}")
+    base_rps = None
+    for n in [int(x) for x in args.workers.split(",") if x.strip()]:
+        rps, errors = _run(n, args.clients, args.seconds, args.port, args.path, args.dispatchers)
+        base_rps = base_rps or rps
+        speedup = rps / base_rps if base_rps else 0.0
+        print(f"workers={n:<3d} rps={rps:9.1f} speedup={speedup:5.2f}x efficiency={speedup / n * 100:5.1f}% errors={errors}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
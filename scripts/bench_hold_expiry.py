@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# scripts/bench_hold_expiry.py
+"""
+hold 过期小顶堆微基准：直接驱动 JoyGateStore（不走 HTTP），仅用标准库。
+
+对每个规模 N：建 N 个 charger，先占住 N-1 个（活跃 hold），再在剩余 1 个 charger 上循环 reserve + stop_charging，
+测 reserve 延迟。purge_expired 只弹堆顶到期项，reserve 延迟应不随 N（5 → 10k）增长。
+
+用法：PYTHONPATH=src python scripts/bench_hold_expiry.py --sizes 5,100,1000,10000 --n 2000
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from joygate.store import JoyGateStore
+
+
+def _percentile(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    idx = min(len(s) - 1, max(0, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[idx]
+
+
+def _bench_size(size: int, n: int) -> list[float]:
+    charger_ids = [f"charger-{i:05d}" for i in range(size)]
+    store = JoyGateStore(charger_ids=charger_ids)
+    for i, cid in enumerate(charger_ids[:-1]):
+        code, _ = store.reserve("charger", cid, f"bench_fill_{i}")
+        if code != 200:
+            raise SystemExit(f"FAIL: prefill reserve {cid} -> {code}")
+    last = charger_ids[-1]
+    lat: list[float] = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        code, payload = store.reserve("charger", last, "bench_probe")
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        if code != 200:
+            raise SystemExit(f"FAIL: probe reserve -> {code} {payload}")
+        store.stop_charging(payload["hold_id"], last)
+    return lat
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="hold expiry heap micro-benchmark")
+    ap.add_argument("--sizes", default="5,100,1000,10000", help="charger/hold 规模，逗号分隔")
+    ap.add_argument("--n", type=int, default=2000, help="每个规模的 reserve 次数")
+    args = ap.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    for size in sizes:
+        lat = _bench_size(size, args.n)
+        print(
+            f"chargers={size:<6} p50={_percentile(lat, 50):.4f}ms p99={_percentile(lat, 99):.4f}ms "
+            f"mean={statistics.fmean(lat):.4f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
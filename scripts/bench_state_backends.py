@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+状态持久化后端吞吐对比：memory（不持久化） / wal（文件 WAL + 快照） / sqlite（WAL 模式 SQLite）。
+- store：reserve + stop_charging 与 report_blocked + update_status 交替的混合写入，后台线程按调度间隔 flush，统计 ops/s；
+- flush：直接向后端写 N 条行镜像记录（每批 batch 条一次提交），统计 records/s 与恢复 N 行的耗时。
+
+用法：PYTHONPATH=src python scripts/bench_state_backends.py --ops 20000 --records 200000
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+from joygate.config import SCHEDULER_STATE_FLUSH_SECONDS
+from joygate.state_log import StoreStateLog
+from joygate.state_sqlite import SqliteStateLog
+from joygate.store import JoyGateStore
+
+BACKENDS = ("memory", "wal", "sqlite")
+
+
+def _store_ops(backend: str, ops: int) -> float:
+    root = tempfile.mkdtemp(prefix="joygate_backend_bench_")
+    try:
+        store = JoyGateStore(state_dir=None if backend == "memory" else root, state_backend=None if backend == "memory" else backend)
+        stop = threading.Event()
+
+        def _flusher() -> None:
+            while not stop.wait(SCHEDULER_STATE_FLUSH_SECONDS):
+                store.flush_state_log()
+
+        t = threading.Thread(target=_flusher, daemon=True)
+        t.start()
+        chargers = list(store._slots.keys())  # type: ignore[attr-defined]
+        t0 = time.perf_counter()
+        for i in range(ops // 2):
+            cid = chargers[i % len(chargers)]
+            code, payload = store.reserve("charger", cid, f"bench_{i % len(chargers)}")
+            if code == 200:
+                store.stop_charging(payload["hold_id"], cid)
+            incident_id = store.report_blocked_incident(cid, "BLOCKED")
+            store.update_incident_status(incident_id, "RESOLVED")
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        t.join()
+        store.close_state_log()
+        return ops / elapsed
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _open(backend: str, root: str):
+    return StoreStateLog(root) if backend == "wal" else SqliteStateLog(root)
+
+
+def _flush_and_recover(backend: str, records: int, batch: int) -> tuple[float, float]:
+    root = tempfile.mkdtemp(prefix="joygate_backend_bench_")
+    try:
+        log = _open(backend, root)
+        log.recover()
+        t0 = time.perf_counter()
+        for start in range(0, records, batch):
+            for i in range(start, min(records, start + batch)):
+                log.put("incident", f"inc_{i:012x}", {"incident_id": f"inc_{i:012x}", "charger_id": f"charger-{i % 10 + 1:03d}", "incident_status": "OPEN"})
+            log.flush(lambda lookups: {})
+        write_rps = records / (time.perf_counter() - t0)
+        log.close()
+        t0 = time.perf_counter()
+        rows = len(_open(backend, root).recover().get("incident", {}))
+        recover_s = time.perf_counter() - t0
+        if rows != records:
+            raise SystemExit(f"{backend}: recovered {rows} of {records}")
+        return write_rps, recover_s
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="JoyGateStore state backend throughput comparison")
+    ap.add_argument("--ops", type=int, default=20_000, help="store 混合写入次数")
+    ap.add_argument("--records", type=int, default=200_000, help="后端直写 / 恢复的记录数")
+    ap.add_argument("--batch", type=int, default=1_000, help="每次 flush 的记录数")
+    args = ap.parse_args()
+    base = None
+    for backend in BACKENDS:
+        ops_s = _store_ops(backend, args.ops)
+        base = base or ops_s
+        line = f"{backend:<7s} store={ops_s:9.0f} ops/s ({ops_s / base * 100:5.1f}% of memory)"
+        if backend != "memory":
+            write_rps, recover_s = _flush_and_recover(backend, args.records, args.batch)
+            line += f"  flush={write_rps:9.0f} records/s  recover({args.records})={recover_s:.2f}s"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
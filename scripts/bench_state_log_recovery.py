@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+状态持久化基准（WAL + 快照）：
+- recovery：写入 N 条行镜像记录（hold 形状），分别测 纯 WAL 重放 与 快照 + 空 WAL 的恢复耗时。
+- reserve：reserve + stop_charging 循环，纯内存 store 与启用 state_dir（后台线程按调度间隔 flush）交替多轮，对比单次 reserve 延迟的 p50 / p99。
+
+用法：PYTHONPATH=src python scripts/bench_state_log_recovery.py --records 1000000 --n 20000
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from joygate.config import SCHEDULER_STATE_FLUSH_SECONDS
+from joygate.state_log import StoreStateLog
+from joygate.store import JoyGateStore
+
+
+def _bench_recovery(records: int, batch: int) -> None:
+    root = tempfile.mkdtemp(prefix="joygate_state_bench_")
+    try:
+        log = StoreStateLog(root)
+        log.recover()
+        t0 = time.perf_counter()
+        for start in range(0, records, batch):
+            for i in range(start, min(records, start + batch)):
+                log.put("hold", f"hold_{i:012x}", {"charger_id": f"charger-{i % 10 + 1:03d}", "joykey": f"jk_{i}", "expires_at": 1.7e9 + i})
+            log.flush(lambda lookups: {})
+        write_s = time.perf_counter() - t0
+        log.close()
+
+        t0 = time.perf_counter()
+        tables = StoreStateLog(root).recover()
+        wal_s = time.perf_counter() - t0
+        rows = len(tables.get("hold", {}))
+
+        log = StoreStateLog(root)
+        log.recover()
+        t0 = time.perf_counter()
+        log.compact(force=True)
+        compact_s = time.perf_counter() - t0
+        log.close()
+        t0 = time.perf_counter()
+        tables = StoreStateLog(root).recover()
+        snap_s = time.perf_counter() - t0
+        print(
+            f"recovery   records={records} rows={rows}/{len(tables.get('hold', {}))} write={write_s:.2f}s "
+            f"wal_replay={wal_s:.2f}s compact={compact_s:.2f}s snapshot_load={snap_s:.2f}s"
+        )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _reserve_latency(store: JoyGateStore, n: int) -> list[float]:
+    chargers = list(store._slots.keys())  # type: ignore[attr-defined]
+    lat: list[float] = []
+    for i in range(n):
+        cid = chargers[i % len(chargers)]
+        t0 = time.perf_counter()
+        code, payload = store.reserve("charger", cid, f"bench_{i % len(chargers)}")
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        if code == 200:
+            store.stop_charging(payload["hold_id"], cid)
+    return lat
+
+
+def _latency_stats(lat: list[float]) -> tuple[float, float]:
+    lat = sorted(lat)
+    return statistics.median(lat), lat[int(len(lat) * 0.99)]
+
+
+def _durable_latency(n: int) -> tuple[float, float]:
+    root = tempfile.mkdtemp(prefix="joygate_state_bench_")
+    try:
+        store = JoyGateStore(state_dir=root)
+        stop = threading.Event()
+
+        def _flusher() -> None:
+            while not stop.wait(SCHEDULER_STATE_FLUSH_SECONDS):
+                store.flush_state_log()
+
+        t = threading.Thread(target=_flusher, daemon=True)
+        t.start()
+        stats = _latency_stats(_reserve_latency(store, n))
+        stop.set()
+        t.join()
+        store.close_state_log()
+        return stats
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _bench_reserve(n: int, rounds: int) -> None:
+    """内存 / 持久化交替各跑 rounds 轮，每轮取单次 reserve 的 p50 / p99，再取各轮中位数（单轮受机器抖动影响大）。"""
+    base: list[tuple[float, float]] = []
+    durable: list[tuple[float, float]] = []
+    for _ in range(max(1, rounds)):
+        base.append(_latency_stats(_reserve_latency(JoyGateStore(), n)))
+        durable.append(_durable_latency(n))
+    b50, b99 = (statistics.median(r[i] for r in base) for i in (0, 1))
+    d50, d99 = (statistics.median(r[i] for r in durable) for i in (0, 1))
+    print(
+        f"reserve    n={n} rounds={rounds} p50 memory={b50 * 1000:.2f}us durable={d50 * 1000:.2f}us "
+        f"overhead={(d50 / b50 - 1) * 100:.1f}% | p99 memory={b99 * 1000:.2f}us durable={d99 * 1000:.2f}us"
+    )
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="JoyGateStore WAL + snapshot persistence benchmark")
+    ap.add_argument("--records", type=int, default=1_000_000, help="恢复基准的记录数")
+    ap.add_argument("--batch", type=int, default=10_000, help="每次 flush 的记录数")
+    ap.add_argument("--n", type=int, default=20_000, help="reserve 次数")
+    ap.add_argument("--rounds", type=int, default=7, help="reserve 基准交替轮数（取中位数）")
+    args = ap.parse_args()
+    _bench_recovery(args.records, args.batch)
+    _bench_reserve(args.n, args.rounds)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
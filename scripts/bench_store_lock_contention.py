@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# scripts/bench_store_lock_contention.py
+"""
+JoyGateStore 分锁竞争基准：直接驱动 store（不走 HTTP），仅用标准库。
+
+场景：
+- baseline：只有 reserve/stop_charging 循环，测 reserve 延迟 p50/p99。
+- contended：同时开 telemetry（record_segment_passed_telemetry）与 segment witness（record_segment_witness）
+  后台线程满速写入，再测 reserve 延迟。
+分锁后 reserve 只取 _charging_lock，contended 的 p99 应与 baseline 同一量级。
+
+用法：PYTHONPATH=src python scripts/bench_store_lock_contention.py --n 5000 --writers 4
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import threading
+import time
+
+from joygate.config import ALLOWED_WITNESS_JOYKEYS
+from joygate.store import JoyGateStore
+
+
+def _percentile(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    idx = min(len(s) - 1, max(0, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[idx]
+
+
+def _run_reserve_loop(store: JoyGateStore, n: int) -> list[float]:
+    """reserve + stop_charging 循环，返回每次 reserve 的耗时（ms）。"""
+    chargers = list(store._slots.keys())  # type: ignore[attr-defined]
+    lat: list[float] = []
+    for i in range(n):
+        cid = chargers[i % len(chargers)]
+        joykey = f"bench_rsv_{i % len(chargers)}"
+        t0 = time.perf_counter()
+        code, payload = store.reserve("charger", cid, joykey)
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        if code == 200:
+            store.stop_charging(payload["hold_id"], cid)
+    return lat
+
+
+def _telemetry_writer(store: JoyGateStore, stop: threading.Event, idx: int) -> None:
+    i = 0
+    while not stop.is_set():
+        segs = [f"cell_{(i + k) % 40}_{idx}" for k in range(20)]
+        store.record_segment_passed_telemetry(
+            joykey=f"bench_tel_{idx}",
+            fleet_id=None,
+            segment_ids=segs,
+            event_occurred_at=time.time(),
+            truth_input_source="SIMULATOR",
+        )
+        i += 1
+
+
+def _witness_writer(store: JoyGateStore, stop: threading.Event, idx: int, witness_joykey: str) -> None:
+    i = 0
+    while not stop.is_set():
+        store.record_segment_witness(
+            segment_id=f"cell_{i % 40}_{idx}",
+            segment_state="BLOCKED" if i % 2 else "PASSABLE",
+            witness_joykey=witness_joykey,
+            points_event_id=f"pe_{idx}_{i}",
+        )
+        i += 1
+
+
+def _report(name: str, lat: list[float]) -> None:
+    print(
+        f"{name:<11} n={len(lat):<6} p50={_percentile(lat, 50):.4f}ms "
+        f"p99={_percentile(lat, 99):.4f}ms mean={statistics.fmean(lat):.4f}ms max={max(lat):.4f}ms"
+    )
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="JoyGateStore per-domain lock contention benchmark")
+    ap.add_argument("--n", type=int, default=5000, help="reserve 次数")
+    ap.add_argument("--writers", type=int, default=4, help="telemetry / witness 后台线程数（各 N 个）")
+    args = ap.parse_args()
+
+    witness_joykey = sorted(ALLOWED_WITNESS_JOYKEYS)[0] if ALLOWED_WITNESS_JOYKEYS else None
+
+    store = JoyGateStore()
+    _report("baseline", _run_reserve_loop(store, args.n))
+
+    store = JoyGateStore()
+    stop = threading.Event()
+    threads: list[threading.Thread] = []
+    for i in range(max(0, args.writers)):
+        threads.append(threading.Thread(target=_telemetry_writer, args=(store, stop, i), daemon=True))
+        if witness_joykey:
+            threads.append(
+                threading.Thread(target=_witness_writer, args=(store, stop, i, witness_joykey), daemon=True)
+            )
+    for t in threads:
+        t.start()
+    try:
+        time.sleep(0.2)
+        _report("contended", _run_reserve_loop(store, args.n))
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=5)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
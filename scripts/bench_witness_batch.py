@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+witness 投票吞吐：逐条（/v1/witness/respond、/v1/witness/segment_respond）对比批量
+（/v1/witness/respond_batch、/v1/witness/segment_respond_batch），单条 keep-alive 连接，统计 votes/s 与加速比。
+桩占用投票：每个沙盒建 --incidents 个 incident，白名单内各 witness 各投一票（每票都走完整计票路径）；
+segment：每票独立 points_event_id。
+
+用法：PYTHONPATH=src python scripts/bench_witness_batch.py --batch 50 --incidents 150
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from joygate.config import ALLOWED_WITNESS_JOYKEYS
+
+
+def _wait_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"port {port} not listening")
+
+
+class _Client:
+    """单条 keep-alive 连接 + 独立沙盒（bootstrap 返回的 cookie）。"""
+
+    def __init__(self, port: int) -> None:
+        self._conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        self._cookie: str | None = None
+        status, _ = self.call("GET", "/bootstrap", None)
+        if status != 200 or not self._cookie:
+            raise RuntimeError("bootstrap failed")
+
+    def call(self, method: str, path: str, body: dict | None, joykey: str | None = None) -> tuple[int, bytes]:
+        headers = {"Content-Type": "application/json"}
+        if self._cookie:
+            headers["Cookie"] = self._cookie
+        if joykey:
+            headers["X-JoyKey"] = joykey
+        self._conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        resp = self._conn.getresponse()
+        data = resp.read()
+        cookie = resp.getheader("Set-Cookie")
+        if cookie:
+            self._cookie = cookie.split(";", 1)[0]
+        return resp.status, data
+
+
+def _charger_votes(client: _Client, incidents: int) -> dict[str, list[dict]]:
+    votes: dict[str, list[dict]] = {jk: [] for jk in sorted(ALLOWED_WITNESS_JOYKEYS)}
+    for i in range(incidents):
+        cid = f"charger-{i % 10 + 1:03d}"
+        status, data = client.call("POST", "/v1/incidents/report_blocked", {"charger_id": cid, "incident_type": "BLOCKED"})
+        if status != 200:
+            raise RuntimeError(f"report_blocked: {status} {data!r}")
+        incident_id = json.loads(data)["incident_id"]
+        for jk in votes:
+            votes[jk].append({"incident_id": incident_id, "charger_id": cid, "charger_state": "UNKNOWN_OCCUPANCY"})
+    return votes
+
+
+def _segment_votes(tag: str, count: int) -> dict[str, list[dict]]:
+    votes: dict[str, list[dict]] = {}
+    for jk in sorted(ALLOWED_WITNESS_JOYKEYS):
+        votes[jk] = [
+            {"segment_id": f"cell_{i % 40}_{i % 7}", "segment_state": "UNKNOWN", "points_event_id": f"{tag}_{jk}_{i}"}
+            for i in range(count)
+        ]
+    return votes
+
+
+def _run(client: _Client, votes: dict[str, list[dict]], path: str, batch: int) -> float:
+    """batch=0 逐条；否则每请求 batch 条。返回 votes/s。"""
+    total = 0
+    t0 = time.perf_counter()
+    for jk, items in votes.items():
+        if batch == 0:
+            for v in items:
+                status, data = client.call("POST", path, v, jk)
+                if status != 204:
+                    raise RuntimeError(f"{path}: {status} {data!r}")
+        else:
+            for start in range(0, len(items), batch):
+                status, data = client.call("POST", path, {"votes": items[start:start + batch]}, jk)
+                if status != 200 or json.loads(data)["accepted"] != len(items[start:start + batch]):
+                    raise RuntimeError(f"{path}: {status} {data!r}")
+        total += len(items)
+    return total / (time.perf_counter() - t0)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="JoyGate witness single vs batch voting throughput")
+    ap.add_argument("--port", type=int, default=18961, help="自启 uvicorn 的端口")
+    ap.add_argument("--batch", type=int, default=50, help="批量接口每请求条数")
+    ap.add_argument("--incidents", type=int, default=150, help="每个沙盒的 incident 数（桩占用投票）")
+    ap.add_argument("--segment-votes", type=int, default=200, help="每个 witness 的 segment 投票数")
+    args = ap.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("PYTHONPATH", "src")
+    env["JOYGATE_DISABLE_SINGLE_WORKER_LOCK"] = "1"
+    env["JOYGATE_RATE_LIMIT_PER_IP_PER_MIN"] = "100000000"
+    env["JOYGATE_RATE_LIMIT_PER_SANDBOX_PER_MIN"] = "100000000"
+    env["JOYGATE_WITNESS_BATCH_MAX_VOTES"] = str(max(args.batch, 1))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "joygate.main:app", "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        _wait_port(args.port)
+        for name, single_path, batch_path in (
+            ("charger", "/v1/witness/respond", "/v1/witness/respond_batch"),
+            ("segment", "/v1/witness/segment_respond", "/v1/witness/segment_respond_batch"),
+        ):
+            rates = []
+            for mode, batch in (("single", 0), ("batch", args.batch)):
+                client = _Client(args.port)  # 每档一个新沙盒
+                if name == "charger":
+                    votes = _charger_votes(client, args.incidents)
+                else:
+                    votes = _segment_votes(mode, args.segment_votes)
+                rates.append(_run(client, votes, batch_path if batch else single_path, batch))
+            print(f"{name:<8s} single={rates[0]:8.0f} votes/s  batch({args.batch})={rates[1]:8.0f} votes/s  speedup={rates[1] / rates[0]:5.1f}x")
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(20)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
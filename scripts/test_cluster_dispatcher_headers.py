@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+cluster dispatcher 请求头处理验收（进程内起 Dispatcher + 假 worker，不起 uvicorn）：
+- 客户端自带的 X-Forwarded-For 被丢弃，worker 只收到对端地址（不能借 127.0.0.1 伪造 IP 绕过 per-IP 限流）；
+- Expect: 100-continue 的请求由 dispatcher 先答 100 Continue 再收 body，Expect 头不转发给 worker。
+"""
+from __future__ import annotations
+
+import asyncio
+
+from joygate.cluster import Dispatcher
+
+
+async def _fake_worker(seen: list[tuple[bytes, bytes]]) -> asyncio.AbstractServer:
+    """记录收到的 (head, body)，固定回 200 "ok"。"""
+
+    async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                n = 0
+                for line in head.split(b"\r\n")[1:]:
+                    k, _, v = line.partition(b":")
+                    if k.strip().lower() == b"content-length":
+                        n = int(v.strip())
+                body = await reader.readexactly(n) if n else b""
+                seen.append((head, body))
+                writer.write(b"HTTP/1.1 200 OK\r\ncontent-length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(_handle, "127.0.0.1", 0)
+
+
+def _header_values(head: bytes, name: bytes) -> list[bytes]:
+    pairs = (line.partition(b":") for line in head.split(b"\r\n")[1:] if line)
+    return [v.strip() for k, _, v in pairs if k.strip().lower() == name]
+
+
+async def _read_response(reader: asyncio.StreamReader) -> bytes:
+    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+    body = await reader.readexactly(int((_header_values(head, b"content-length") or [b"0"])[0]))
+    return head + body
+
+
+async def _run() -> None:
+    seen: list[tuple[bytes, bytes]] = []
+    worker = await _fake_worker(seen)
+    worker_port = worker.sockets[0].getsockname()[1]
+    dispatcher = Dispatcher([("127.0.0.1", worker_port)])
+    front = await asyncio.start_server(dispatcher.handle, "127.0.0.1", 0)
+    front_port = front.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", front_port)
+
+        # 伪造 X-Forwarded-For：worker 只应看到真实对端地址
+        writer.write(b"GET /v1/snapshot HTTP/1.1\r\nhost: x\r\nX-Forwarded-For: 203.0.113.9\r\n\r\n")
+        await writer.drain()
+        resp = await _read_response(reader)
+        if not resp.startswith(b"HTTP/1.1 200"):
+            raise SystemExit(f"FAIL: GET through dispatcher: {resp!r}")
+        xff = _header_values(seen[-1][0], b"x-forwarded-for")
+        if xff != [b"127.0.0.1"]:
+            raise SystemExit(f"FAIL: client X-Forwarded-For should be replaced by the peer address, worker saw {xff}")
+
+        # Expect: 100-continue：只发 head，应先收到 100 Continue
+        writer.write(b"POST /v1/reserve HTTP/1.1\r\nhost: x\r\ncontent-type: application/json\r\ncontent-length: 7\r\nexpect: 100-continue\r\n\r\n")
+        await writer.drain()
+        try:
+            interim = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 3)
+        except asyncio.TimeoutError:
+            raise SystemExit("FAIL: dispatcher should answer 100 Continue before reading the body") from None
+        if interim != b"HTTP/1.1 100 Continue\r\n\r\n":
+            raise SystemExit(f"FAIL: unexpected interim response {interim!r}")
+        writer.write(b'{"a":1}')
+        await writer.drain()
+        resp = await _read_response(reader)
+        head, body = seen[-1]
+        if not resp.startswith(b"HTTP/1.1 200") or body != b'{"a":1}' or _header_values(head, b"expect"):
+            raise SystemExit(f"FAIL: expect-continue request forwarding: {resp!r} {head!r} {body!r}")
+
+        # 无 body 的 Expect 请求不发 100，连接仍可复用
+        writer.write(b"GET /v1/snapshot HTTP/1.1\r\nhost: x\r\nexpect: 100-continue\r\n\r\n")
+        await writer.drain()
+        resp = await _read_response(reader)
+        if not resp.startswith(b"HTTP/1.1 200") or len(seen) != 3:
+            raise SystemExit(f"FAIL: bodyless Expect request: {resp!r}")
+        writer.close()
+    finally:
+        front.close()
+        worker.close()
+
+
+def main() -> None:
+    asyncio.run(_run())
+    print("PASS: cluster dispatcher headers (client X-Forwarded-For dropped, Expect: 100-continue answered)")
+
+
+if __name__ == "__main__":
+    main()
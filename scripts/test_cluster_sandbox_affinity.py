@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+多进程部署（joygate.cluster）验收：自行启动 2 个 worker + dispatcher，
+新沙盒在各 worker 间分配且归属正确、同一沙盒的读写落在同一进程、直连非归属 worker 返回 421、SSE 透传、停止时不留 worker 进程。
+"""
+from __future__ import annotations
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+from joygate.cluster import sandbox_owner
+
+PORT = 18931
+WORKERS = 2
+
+
+def _wait_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"FAIL: port {port} not listening")
+
+
+def _port_closed(port: int, timeout: float = 15.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            time.sleep(0.2)
+        except OSError:
+            return True
+    return False
+
+
+def main() -> None:
+    env = dict(os.environ)
+    env.setdefault("PYTHONPATH", "src")
+    env["JOYGATE_RATE_LIMIT_PER_IP_PER_MIN"] = "100000"
+    env["JOYGATE_RATE_LIMIT_PER_SANDBOX_PER_MIN"] = "100000"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "joygate.cluster", "--workers", str(WORKERS), "--port", str(PORT), "--log-level", "warning"],
+        env=env,
+    )
+    base = f"http://127.0.0.1:{PORT}"
+    try:
+        _wait_port(PORT)
+
+        # 新沙盒轮询分配到各 worker，且每个 id 都归属生成它的 worker
+        sessions: list[tuple[requests.Session, str]] = []
+        for _ in range(6):
+            s = requests.Session()
+            r = s.get(f"{base}/bootstrap", timeout=5)
+            sid = r.json().get("sandbox_id")
+            if r.status_code != 200 or not sid or s.cookies.get("joygate_sandbox") != sid:
+                raise SystemExit(f"FAIL: bootstrap through dispatcher: {r.status_code} {r.text}")
+            sessions.append((s, sid))
+        owners = {sandbox_owner(sid, WORKERS) for _, sid in sessions}
+        if owners != set(range(WORKERS)):
+            raise SystemExit(f"FAIL: new sandboxes should spread across workers, owners={owners}")
+
+        # 同一沙盒的写后读一致（落在同一进程）；不同沙盒互不影响
+        for i, (s, sid) in enumerate(sessions):
+            r = s.post(
+                f"{base}/v1/reserve",
+                json={"resource_type": "CHARGER", "resource_id": "charger-001", "joykey": f"jk_{i}", "action": "HOLD"},
+                timeout=5,
+            )
+            if r.status_code != 200:
+                raise SystemExit(f"FAIL: reserve in sandbox {sid}: {r.status_code} {r.text}")
+            holds = s.get(f"{base}/v1/snapshot", timeout=5).json().get("holds") or []
+            if [h.get("joykey") for h in holds] != [f"jk_{i}"]:
+                raise SystemExit(f"FAIL: sandbox {sid} should see only its own hold, got {holds}")
+
+        # 直连非归属 worker：421，不另建一份状态
+        s, sid = sessions[0]
+        other_port = PORT + 1 + (sandbox_owner(sid, WORKERS) + 1) % WORKERS
+        r = requests.get(f"http://127.0.0.1:{other_port}/v1/snapshot", cookies={"joygate_sandbox": sid}, timeout=5)
+        if r.status_code != 421:
+            raise SystemExit(f"FAIL: misdirected sandbox should get 421, got {r.status_code}")
+
+        # chunked 响应（SSE）逐块透传：首个 snapshot 事件能及时到达
+        with s.get(f"{base}/v1/stream", stream=True, timeout=5) as r:
+            lines = r.iter_lines(decode_unicode=True)
+            event = next((line for line in lines if line.startswith("event:")), None)
+            if r.status_code != 200 or event != "event: snapshot":
+                raise SystemExit(f"FAIL: SSE through dispatcher: {r.status_code} {event!r}")
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(20)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    if not all(_port_closed(PORT + 1 + i) for i in range(WORKERS)):
+        raise SystemExit("FAIL: workers should exit with the launcher")
+    print("PASS: cluster sandbox affinity (owned ids, per-sandbox routing, 421 on misdirect, SSE relay, clean stop)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import time
+
+from joygate.store import JoyGateStore
+
+
+def main() -> None:
+    store = JoyGateStore(charger_ids=["charger-001", "charger-002"], ttl_seconds=1)
+
+    # stop_charging 释放的 hold 留在堆里（失效项），不应误清理同 charger 上的新 hold
+    code, p1 = store.reserve("charger", "charger-001", "robot_a")
+    if code != 200:
+        raise SystemExit(f"FAIL: reserve #1 expected 200, got={code}")
+    store.stop_charging(p1["hold_id"], "charger-001")
+    time.sleep(0.5)
+    code, p2 = store.reserve("charger", "charger-001", "robot_b")
+    if code != 200:
+        raise SystemExit(f"FAIL: reserve #2 expected 200, got={code}")
+
+    # 越过第一个 hold 的过期时间：失效堆项被弹出，但 robot_b 的 hold 仍有效
+    time.sleep(0.6)
+    snap = store.snapshot()
+    hold_ids = [h["hold_id"] for h in snap["holds"]]
+    if hold_ids != [p2["hold_id"]]:
+        raise SystemExit(f"FAIL: stale heap entry evicted live hold, holds={hold_ids}")
+
+    # 越过 robot_b hold 的过期时间：hold 被清理、charger 回 FREE、quota 释放
+    time.sleep(0.6)
+    snap = store.snapshot()
+    if snap["holds"]:
+        raise SystemExit(f"FAIL: expired hold not purged, holds={snap['holds']}")
+    slot = next(c for c in snap["chargers"] if c["charger_id"] == "charger-001")
+    if slot["slot_state"] != "FREE":
+        raise SystemExit(f"FAIL: charger not FREE after expiry, slot={slot}")
+    code, _ = store.reserve("charger", "charger-002", "robot_b")
+    if code != 200:
+        raise SystemExit(f"FAIL: quota not released after expiry, got={code}")
+
+    # 大量 reserve/stop 后堆不应无限增长
+    for i in range(500):
+        code, p = store.reserve("charger", "charger-001", f"robot_loop_{i}")
+        if code != 200:
+            raise SystemExit(f"FAIL: loop reserve {i} got={code}")
+        store.stop_charging(p["hold_id"], "charger-001")
+    heap_len = len(store._hold_expiry_heap)  # type: ignore[attr-defined]
+    if heap_len > 2 * len(store._holds) + 64 + 1:  # type: ignore[attr-defined]
+        raise SystemExit(f"FAIL: expiry heap not compacted, len={heap_len}")
+
+    print("PASS: hold expiry heap (lazy deletion + purge + compaction)")
+
+
+if __name__ == "__main__":
+    main()
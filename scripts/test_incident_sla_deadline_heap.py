@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import time
+
+from joygate.config import WITNESS_SLA_TIMEOUT_MINUTES, minute_to_seconds
+from joygate.store import JoyGateStore
+
+
+def _status(store: JoyGateStore, incident_id: str) -> str:
+    return store.list_incidents(incident_id=incident_id)[0]["incident_status"]
+
+
+def main() -> None:
+    if WITNESS_SLA_TIMEOUT_MINUTES <= 0:
+        print("SKIP: witness SLA disabled")
+        return
+    sla = minute_to_seconds(WITNESS_SLA_TIMEOUT_MINUTES)
+    store = JoyGateStore(charger_ids=["charger-001", "charger-002"])
+    t0 = time.time()
+    a = store.report_blocked_incident("charger-001", "BLOCKED")
+    b = store.report_blocked_incident("charger-002", "BLOCKED")
+    c = store.report_blocked_incident("charger-001", "BLOCKED")
+    store.update_incident_status(b, "RESOLVED")
+    store.update_incident_status(c, "ESCALATED")
+    store.drain_webhook_outbox()
+
+    # 未到期：tick 不做任何事
+    if store.tick_incident_sla(now=t0 + sla - 5) != 0:
+        raise SystemExit("FAIL: tick before deadline changed incidents")
+    if _status(store, a) != "OPEN":
+        raise SystemExit("FAIL: incident downgraded before deadline")
+
+    # 到期：OPEN -> UNDER_OBSERVATION；ESCALATED 只补 insight；RESOLVED 不动
+    changed = store.tick_incident_sla(now=t0 + sla + 5)
+    if changed != 1:
+        raise SystemExit(f"FAIL: expected 1 status change, got {changed}")
+    if _status(store, a) != "UNDER_OBSERVATION":
+        raise SystemExit("FAIL: OPEN incident not downgraded at deadline")
+    if _status(store, b) != "RESOLVED" or _status(store, c) != "ESCALATED":
+        raise SystemExit("FAIL: terminal / escalated incident status changed")
+    item_c = store.list_incidents(incident_id=c)[0]
+    if not any(x.get("insight_type") == "VISION_AUDIT_REQUESTED" for x in item_c.get("ai_insights") or []):
+        raise SystemExit("FAIL: escalated incident missing VISION_AUDIT_REQUESTED insight")
+    events = store.drain_webhook_outbox()
+    changed_ids = [e["object_id"] for e in events if e.get("event_type") == "INCIDENT_STATUS_CHANGED"]
+    if changed_ids != [a]:
+        raise SystemExit(f"FAIL: expected one INCIDENT_STATUS_CHANGED for {a}, got {changed_ids}")
+
+    # 每条 incident 只处理一次，堆已清空
+    if store.tick_incident_sla(now=t0 + 10 * sla) != 0 or store._incident_sla_heap:  # type: ignore[attr-defined]
+        raise SystemExit("FAIL: deadline processed twice or heap not drained")
+
+    print("PASS: incident SLA deadline heap (due-only pop, single downgrade per incident)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import random
+
+import joygate.incidents_logic as incidents_logic
+from joygate.store import JoyGateStore
+
+
+def _brute(store: JoyGateStore, **flt) -> list[str]:
+    """全表扫描 + 过滤 + 排序，作为索引查询的对照。"""
+    rows = []
+    for rec in store._incidents:  # type: ignore[attr-defined]
+        if any(v is not None and rec.get(k) != v for k, v in flt.items()):
+            continue
+        rows.append(rec)
+    rows.sort(key=lambda r: (r.get("created_at", 0.0), r.get("incident_id", "")), reverse=True)
+    return [r["incident_id"] for r in rows]
+
+
+def main() -> None:
+    chargers = [f"charger-{i:03d}" for i in range(1, 6)]
+    store = JoyGateStore(charger_ids=chargers)
+    rng = random.Random(7)
+    ids: list[str] = []
+    for i in range(60):
+        ids.append(store.report_blocked_incident(chargers[i % len(chargers)], "BLOCKED"))
+    for iid in rng.sample(ids, 20):
+        store.update_incident_status(iid, "RESOLVED")
+    for iid in rng.sample([x for x in ids if store._incidents.get(x)["incident_status"] == "OPEN"], 10):  # type: ignore[attr-defined]
+        store.update_incident_status(iid, "ESCALATED")
+
+    cases = [
+        {},
+        {"incident_status": "OPEN"},
+        {"incident_status": "RESOLVED"},
+        {"incident_status": "ESCALATED", "charger_id": "charger-002"},
+        {"charger_id": "charger-004"},
+        {"incident_id": ids[3]},
+        {"incident_id": ids[3], "charger_id": "charger-005"},
+        {"segment_id": "cell_1_1"},
+    ]
+    for flt in cases:
+        got = [r["incident_id"] for r in store.list_incidents(**flt)]
+        want = _brute(store, **flt)
+        if got != want:
+            raise SystemExit(f"FAIL: list_incidents{flt} mismatch got={got[:5]} want={want[:5]}")
+
+    # 状态索引随 set_status 迁移：RESOLVED 后不再出现在 OPEN 桶
+    open_ids = {r["incident_id"] for r in store.list_incidents(incident_status="OPEN")}
+    target = next(iter(open_ids))
+    store.update_incident_status(target, "RESOLVED")
+    if target in {r["incident_id"] for r in store.list_incidents(incident_status="OPEN")}:
+        raise SystemExit("FAIL: status index not updated on transition")
+
+    # 硬上限：优先淘汰最老 RESOLVED，witness 数据联动清理
+    cap_store = JoyGateStore(charger_ids=chargers)
+    first = cap_store.report_blocked_incident("charger-001", "BLOCKED")
+    second = cap_store.report_blocked_incident("charger-002", "BLOCKED")
+    cap_store.update_incident_status(second, "RESOLVED")
+    cap_store._witness_by_incident[second] = {"total": 1}  # type: ignore[attr-defined]
+    table = cap_store._incidents  # type: ignore[attr-defined]
+    incidents_logic.cleanup_incidents_locked(
+        table, cap_store._witness_by_incident, 0.0, 2, 10**9, 10**9, set()  # type: ignore[attr-defined]
+    )
+    if second in table or first not in table or second in cap_store._witness_by_incident:  # type: ignore[attr-defined]
+        raise SystemExit("FAIL: cap eviction should drop oldest RESOLVED and its witness data")
+    incidents_logic.cleanup_incidents_locked(table, {}, 0.0, 1, 10**9, 10**9, set())
+    if len(table) != 0:
+        raise SystemExit("FAIL: cap eviction should fall back to oldest incident")
+
+    print("PASS: incident table indexes (filters match full scan, status index, cap eviction)")
+
+
+if __name__ == "__main__":
+    main()
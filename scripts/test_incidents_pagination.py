@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""/v1/incidents 分页验收：limit/cursor 逐页拼接 == 全量列表（同序）；fields 投影；非法 cursor/fields 400；无分页参数时响应不变。"""
+from __future__ import annotations
+
+import argparse
+import sys
+
+from _sandbox_client import get_bootstrapped_session
+
+
+def _fail(msg: str) -> int:
+    print(f"FAIL: {msg}", file=sys.stderr)
+    return 1
+
+
+def _collect(session, url: str, params: dict, timeout: float) -> tuple[list[dict], int] | str:
+    items: list[dict] = []
+    pages = 0
+    cursor = None
+    while True:
+        q = dict(params)
+        if cursor:
+            q["cursor"] = cursor
+        r = session.get(url, params=q, timeout=timeout)
+        if r.status_code != 200:
+            return f"page status={r.status_code} body={r.text}"
+        body = r.json()
+        if "next_cursor" not in body:
+            return f"paged response missing next_cursor: {body}"
+        items.extend(body.get("incidents") or [])
+        pages += 1
+        cursor = body.get("next_cursor")
+        if not cursor:
+            return items, pages
+        if pages > 100:
+            return "pagination did not terminate"
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="/v1/incidents limit/cursor/fields acceptance")
+    p.add_argument("--base_url", default="http://127.0.0.1:8000")
+    p.add_argument("--timeout", type=float, default=10.0)
+    args = p.parse_args()
+
+    base = args.base_url.rstrip("/")
+    session = get_bootstrapped_session(base, args.timeout)
+    url = f"{base}/v1/incidents"
+
+    snap = session.get(f"{base}/v1/snapshot", timeout=args.timeout).json()
+    chargers = [c["charger_id"] for c in snap["chargers"]]
+    created: list[str] = []
+    for i in range(25):
+        r = session.post(
+            f"{base}/v1/incidents/report_blocked",
+            json={"charger_id": chargers[i % len(chargers)], "incident_type": "BLOCKED", "evidence_refs": [f"ev_{i}"]},
+            timeout=args.timeout,
+        )
+        if r.status_code != 200:
+            return _fail(f"report_blocked status={r.status_code} body={r.text}")
+        created.append(r.json()["incident_id"])
+
+    full = session.get(url, timeout=args.timeout)
+    if full.status_code != 200:
+        return _fail(f"full list status={full.status_code}")
+    full_body = full.json()
+    if set(full_body.keys()) != {"incidents"}:
+        return _fail(f"unpaged response shape changed: keys={list(full_body.keys())}")
+    full_items = full_body["incidents"]
+
+    got = _collect(session, url, {"limit": 7}, args.timeout)
+    if isinstance(got, str):
+        return _fail(got)
+    paged, pages = got
+    if paged != full_items:
+        return _fail("paged concatenation != full list")
+    if pages != (len(full_items) + 6) // 7:
+        return _fail(f"unexpected page count {pages} for {len(full_items)} items")
+
+    got = _collect(session, url, {"limit": 4, "charger_id": chargers[0]}, args.timeout)
+    if isinstance(got, str):
+        return _fail(got)
+    want = [x for x in full_items if x["charger_id"] == chargers[0]]
+    if got[0] != want:
+        return _fail("filtered pagination mismatch")
+
+    r = session.get(url, params={"limit": 3, "fields": "incident_status"}, timeout=args.timeout)
+    if r.status_code != 200:
+        return _fail(f"fields status={r.status_code} body={r.text}")
+    items = r.json()["incidents"]
+    if len(items) != 3 or any(set(x.keys()) != {"incident_id", "incident_status"} for x in items):
+        return _fail(f"projection wrong: {items}")
+
+    for bad in ({"cursor": "!!!"}, {"cursor": "bm90LWEtY3Vyc29y"}, {"fields": "incident_status,created_at"}):
+        r = session.get(url, params=bad, timeout=args.timeout)
+        if r.status_code != 400:
+            return _fail(f"{bad} expected 400, got {r.status_code}")
+
+    print(f"PASS /v1/incidents pagination ({len(full_items)} items, {pages} pages) / fields / invalid cursor")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        raise SystemExit(main())
+    except Exception as e:
+        print(f"FAIL: {e}", file=sys.stderr)
+        raise
@@ -41,12 +41,13 @@ def main() -> int:
         "work_order_id": None,
         "hazard_id": "haz_test",
     }
+    store._rebuild_soft_recheck_heap_locked()  # 直接写入的 hazard 需登记到 SOFT 复核到期堆
     store._segment_witness_events.extend([
         {"segment_id": seg, "segment_state": "BLOCKED", "ts": now},
         {"segment_id": seg, "segment_state": "BLOCKED", "ts": now},
     ])
 
-    with store._lock:
+    with store._hazards_lock:
         store._process_due_soft_rechecks_locked(now)
     rec = store._hazards_by_segment.get(seg) or {}
     if rec.get("soft_recheck_consecutive_blocked") != 1 or rec.get("hazard_status") != "SOFT_BLOCKED":
@@ -55,12 +56,12 @@ def main() -> int:
     print("PASS: 第一轮 BLOCKED -> consecutive=1, 仍 SOFT_BLOCKED")
 
     # 2) 再排 due 已过期，再判 BLOCKED -> consecutive=2 -> 升级 HARD
-    rec["recheck_due_at"] = _iso_utc(now - 30)
+    store._set_soft_recheck_due_locked(seg, rec, now - 30)  # 同时登记到期堆
     store._segment_witness_events.extend([
         {"segment_id": seg, "segment_state": "BLOCKED", "ts": now + 1},
         {"segment_id": seg, "segment_state": "BLOCKED", "ts": now + 1},
     ])
-    with store._lock:
+    with store._hazards_lock:
         store._process_due_soft_rechecks_locked(now + 2)
     rec = store._hazards_by_segment.get(seg) or {}
     if rec.get("hazard_status") != "HARD_BLOCKED":
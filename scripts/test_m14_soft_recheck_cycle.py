@@ -25,7 +25,7 @@ os.environ.setdefault("JOYGATE_SEGMENT_WITNESS_VOTES_REQUIRED", "2")
 os.environ.setdefault("JOYGATE_SEGMENT_WITNESS_SLA_TIMEOUT_MINUTES", "5")
 os.environ.setdefault("JOYGATE_SEGMENT_FRESHNESS_WINDOW_MINUTES", "10")
 
-from joygate.store import JoyGateStore, _iso_utc  # noqa: E402
+from joygate.store import JoyGateStore  # noqa: E402
 
 
 def main() -> int:
@@ -54,7 +54,7 @@ def main() -> int:
         truth_input_source="SIMULATOR",
     )
     rec_a = store_a._hazards_by_segment.get(seg_a) or {}
-    rec_a["recheck_due_at"] = _iso_utc(now - 60)
+    store_a._set_soft_recheck_due_locked(seg_a, rec_a, now - 60)  # 同时登记到期堆
     store_a._hazards_by_segment[seg_a] = rec_a
     snap_a = store_a.snapshot()
     hazards_a = snap_a.get("hazards") or []
@@ -76,7 +76,7 @@ def main() -> int:
         points_event_id="pe_b1",
     )
     rec_b = store_b._hazards_by_segment.get(seg_b) or {}
-    rec_b["recheck_due_at"] = _iso_utc(now - 60)
+    store_b._set_soft_recheck_due_locked(seg_b, rec_b, now - 60)  # 同时登记到期堆
     store_b._hazards_by_segment[seg_b] = rec_b
     snap_b = store_b.snapshot()
     hazards_b = snap_b.get("hazards") or []
@@ -105,24 +105,24 @@ def main() -> int:
         points_event_id="pe_c1",
     )
     rec_c = store_c._hazards_by_segment.get(seg_c) or {}
-    rec_c["recheck_due_at"] = _iso_utc(now - 60)
+    store_c._set_soft_recheck_due_locked(seg_c, rec_c, now - 60)  # 同时登记到期堆
     store_c._segment_witness_events.extend([
         {"segment_id": seg_c, "segment_state": "BLOCKED", "ts": now},
         {"segment_id": seg_c, "segment_state": "BLOCKED", "ts": now},
     ])
     store_c._hazards_by_segment[seg_c] = rec_c
-    with store_c._lock:
+    with store_c._hazards_lock:
         store_c._process_due_soft_rechecks_locked(now)
     rec_c = store_c._hazards_by_segment.get(seg_c) or {}
     if rec_c.get("soft_recheck_consecutive_blocked") != 1 or rec_c.get("hazard_status") != "SOFT_BLOCKED":
         print(f"FAIL Case C 第一轮: 应为 consecutive=1 仍 SOFT，实际 {rec_c.get('soft_recheck_consecutive_blocked')} / {rec_c.get('hazard_status')}")
         return 1
-    rec_c["recheck_due_at"] = _iso_utc(now - 30)
+    store_c._set_soft_recheck_due_locked(seg_c, rec_c, now - 30)  # 同时登记到期堆
     store_c._segment_witness_events.extend([
         {"segment_id": seg_c, "segment_state": "BLOCKED", "ts": now + 1},
         {"segment_id": seg_c, "segment_state": "BLOCKED", "ts": now + 1},
     ])
-    with store_c._lock:
+    with store_c._hazards_lock:
         store_c._process_due_soft_rechecks_locked(now + 2)
     rec_c = store_c._hazards_by_segment.get(seg_c) or {}
     if rec_c.get("hazard_status") != "HARD_BLOCKED":
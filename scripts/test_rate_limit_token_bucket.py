@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import threading
+
+from joygate.rate_limit import TokenBucketLimiter
+
+
+def main() -> None:
+    # 满桶可一次用完配额，之后按 配额/60 每秒回填
+    rl = TokenBucketLimiter(60, shards=4)
+    if sum(rl.acquire("1.2.3.4", now=100.0) for _ in range(70)) != 60:
+        raise SystemExit("FAIL: full bucket should allow exactly the per-minute quota")
+    if rl.acquire("1.2.3.4", now=100.5):
+        raise SystemExit("FAIL: half a second should not refill a token at 1/s")
+    if not rl.acquire("1.2.3.4", now=101.0) or rl.acquire("1.2.3.4", now=101.0):
+        raise SystemExit("FAIL: one second should refill exactly one token")
+
+    # 无固定分钟边界：跨"分钟"边界不能瞬间打出 2 倍配额
+    rl = TokenBucketLimiter(60)
+    first = sum(rl.acquire("ip", now=59.9) for _ in range(60))
+    second = sum(rl.acquire("ip", now=60.1) for _ in range(60))
+    if first != 60 or second > 1:
+        raise SystemExit(f"FAIL: boundary burst allowed {first}+{second}")
+
+    # key 之间互不影响；配额 0 全部拒绝
+    if not rl.acquire("other", now=60.1):
+        raise SystemExit("FAIL: separate keys should have separate buckets")
+    if TokenBucketLimiter(0).acquire("x", now=0.0):
+        raise SystemExit("FAIL: zero quota should always reject")
+
+    # 空闲 key 过期：顺手清理 + sweep 全量清理，清掉后重新出现的 key 是满桶
+    rl = TokenBucketLimiter(10, shards=1)
+    for i in range(100):
+        rl.acquire(f"c{i}", now=0.0)
+    rl.acquire("fresh", now=61.0)
+    if len(rl) != 99:
+        raise SystemExit(f"FAIL: lazy expiry should drop a few idle keys per call, left {len(rl)}")
+    if rl.sweep(now=61.0) != 98 or len(rl) != 1:
+        raise SystemExit(f"FAIL: sweep should drop all idle keys, left {len(rl)}")
+    if sum(rl.acquire("c0", now=61.0) for _ in range(20)) != 10:
+        raise SystemExit("FAIL: re-appearing key should start with a full bucket")
+
+    # 并发：多线程打同一 key，总放行数不超过容量
+    rl = TokenBucketLimiter(1000)
+    allowed: list[int] = []
+    lock = threading.Lock()
+
+    def _worker() -> None:
+        n = sum(rl.acquire("hot", now=5.0) for _ in range(500))
+        with lock:
+            allowed.append(n)
+
+    threads = [threading.Thread(target=_worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if sum(allowed) != 1000:
+        raise SystemExit(f"FAIL: concurrent acquires allowed {sum(allowed)} of capacity 1000")
+
+    print("PASS: token bucket rate limiter (smooth refill, no boundary burst, idle expiry, thread safety)")
+
+
+if __name__ == "__main__":
+    main()
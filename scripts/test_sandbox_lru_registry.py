@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+# 小容量 / 短 TTL（须在 import joygate 之前设置）
+os.environ["JOYGATE_MAX_SANDBOXES"] = "5"
+os.environ["JOYGATE_SANDBOX_IDLE_TTL_SECONDS"] = "60"
+
+import joygate.sandbox as sb  # noqa: E402
+from joygate.scheduler import build_default_scheduler  # noqa: E402
+
+
+def _age(sid: str, seconds: float) -> None:
+    sb._SANDBOX_LAST_SEEN[sid] = time.time() - seconds
+
+
+def main() -> None:
+    # 新建与访问：访问过的沙盒移到队尾，队头始终是最久未访问的
+    sids = [sb._get_or_create_store(None, False)[1] for _ in range(3)]
+    store0, sid0, need_cookie = sb._get_or_create_store(sids[0], True)
+    if sid0 != sids[0] or need_cookie:
+        raise SystemExit("FAIL: existing cookie sandbox should be reused without new cookie")
+    if list(sb._SANDBOX_STORES) != [sids[1], sids[2], sids[0]]:
+        raise SystemExit(f"FAIL: access should move sandbox to MRU end: {list(sb._SANDBOX_STORES)}")
+
+    # 容量满：拒绝新建，已有沙盒不被挤掉
+    sids += [sb._get_or_create_store(None, False)[1] for _ in range(2)]
+    try:
+        sb._get_or_create_store(None, False)
+    except RuntimeError:
+        pass
+    else:
+        raise SystemExit("FAIL: capacity reached should reject new sandbox")
+    if set(sb._SANDBOX_STORES) != set(sids):
+        raise SystemExit("FAIL: existing sandboxes evicted at capacity")
+
+    # 已过 TTL 的 cookie 沙盒：不再复用，换一个新沙盒并下发新 cookie
+    _age(sids[1], 120)
+    _, sid, need_cookie = sb._get_or_create_store(sids[1], True)
+    if sid == sids[1] or not need_cookie or sids[1] in sb._SANDBOX_STORES:
+        raise SystemExit("FAIL: expired cookie sandbox should be replaced")
+
+    # reaper：从队头回收所有过期的，遇到未过期即停
+    for s in (sids[2], sids[0]):
+        _age(s, 120)
+    if sb.reap_idle_sandboxes() != 2 or sids[2] in sb._SANDBOX_STORES or sids[0] in sb._SANDBOX_STORES:
+        raise SystemExit(f"FAIL: reaper did not remove expired sandboxes: {list(sb._SANDBOX_STORES)}")
+    if len(sb._SANDBOX_STORES) != 3 or sb.reap_idle_sandboxes() != 0:
+        raise SystemExit("FAIL: reaper removed an active sandbox")
+
+    # 请求路径每次最多顺手回收 REQUEST_REAP_LIMIT 个
+    sb._SANDBOX_STORES.clear()
+    sb._SANDBOX_LAST_SEEN.clear()
+    stale = [sb._get_or_create_store(None, False)[1] for _ in range(5)]
+    for s in stale:
+        _age(s, 120)
+    sb.MAX_SANDBOXES = 10
+    sb._get_or_create_store(None, False)
+    if len(sb._SANDBOX_STORES) != 5 - sb.REQUEST_REAP_LIMIT + 1:
+        raise SystemExit(f"FAIL: request path should reap at most {sb.REQUEST_REAP_LIMIT}: {len(sb._SANDBOX_STORES)}")
+
+    # 新建 store 在 _SANDBOX_LOCK 外构造：构造期间其他请求不被阻塞；同 id 并发创建只构造一次
+    existing = next(reversed(sb._SANDBOX_STORES))
+    built: list[str] = []
+    real_new_store = sb._new_store
+
+    def _slow_new_store(sandbox_id: str):
+        built.append(sandbox_id)
+        time.sleep(0.3)
+        return real_new_store(sandbox_id)
+
+    sb._new_store = _slow_new_store
+    try:
+        results: list[tuple] = []
+        workers = [threading.Thread(target=lambda: results.append(sb._get_or_create_store("abc123", False))) for _ in range(2)]
+        for w in workers:
+            w.start()
+        time.sleep(0.05)
+        t0 = time.perf_counter()
+        sb._get_or_create_store(existing, True)
+        sb.list_sandbox_stores()
+        blocked = time.perf_counter() - t0
+        for w in workers:
+            w.join()
+    finally:
+        sb._new_store = real_new_store
+    if blocked > 0.1:
+        raise SystemExit(f"FAIL: store construction should not hold _SANDBOX_LOCK (blocked {blocked * 1000:.0f}ms)")
+    if built != ["abc123"] or len(results) != 2 or results[0][0] is not results[1][0] or sb._SANDBOX_CREATING:
+        raise SystemExit(f"FAIL: concurrent creation of one sandbox should build once: built={built}")
+
+    # 调度器：reaper 作为进程级任务只调用一次，不遍历 store
+    calls: list[int] = []
+    scheduler = build_default_scheduler(lambda: [object(), object()], lambda: calls.append(1))
+    scheduler.run_once("sandbox_reaper")
+    task = next(t for t in scheduler.stats()["tasks"] if t["name"] == "sandbox_reaper")
+    if calls != [1] or task["runs"] != 1 or task["errors"] != 0:
+        raise SystemExit(f"FAIL: sandbox_reaper task unexpected: calls={calls} stats={task}")
+    if "sandbox_reaper" in [t["name"] for t in build_default_scheduler(lambda: []).stats()["tasks"]]:
+        raise SystemExit("FAIL: sandbox_reaper should only be registered when a reaper is given")
+
+    print("PASS: sandbox LRU registry (move-to-end, capacity reject, expired cookie, build outside lock, reaper task)")
+
+
+if __name__ == "__main__":
+    main()
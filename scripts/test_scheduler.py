@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+
+from joygate.scheduler import Scheduler, build_default_scheduler
+from joygate.store import JoyGateStore
+
+
+def _boom(store: JoyGateStore) -> None:
+    if store.__dict__.get("_scheduler_test_fail"):
+        raise RuntimeError("boom")
+
+
+async def _run_for(scheduler: Scheduler, seconds: float) -> None:
+    scheduler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        await scheduler.stop()
+
+
+def main() -> None:
+    good = JoyGateStore(charger_ids=["charger-001"], ttl_seconds=1)
+    bad = JoyGateStore(charger_ids=["charger-001"], ttl_seconds=1)
+    bad._scheduler_test_fail = True  # type: ignore[attr-defined]
+    code, hold = good.reserve("charger", "charger-001", "robot_a")
+    if code != 200:
+        raise SystemExit(f"FAIL: reserve expected 200, got={code}")
+
+    # 过期 hold 由调度器回收，不需要任何读请求触发
+    scheduler = Scheduler(lambda: [good, bad])
+    scheduler.add_task("hold_expiry", 0.2, lambda store: store.expire_holds())
+    scheduler.add_task("flaky", 0.2, _boom)
+    scheduler.add_task("disabled", 0, lambda store: store.expire_holds())
+    asyncio.run(_run_for(scheduler, 1.6))
+    if hold["hold_id"] in good._holds:  # type: ignore[attr-defined]
+        raise SystemExit("FAIL: expired hold not purged by scheduler")
+
+    stats = {t["name"]: t for t in scheduler.stats()["tasks"]}
+    if stats["hold_expiry"]["runs"] < 3 or stats["hold_expiry"]["errors"] != 0:
+        raise SystemExit(f"FAIL: hold_expiry stats unexpected: {stats['hold_expiry']}")
+    if stats["hold_expiry"]["last_duration_ms"] is None or stats["hold_expiry"]["avg_duration_ms"] is None:
+        raise SystemExit(f"FAIL: timing stats missing: {stats['hold_expiry']}")
+    # 单个 sandbox 出错只计数，不中断该任务
+    flaky = stats["flaky"]
+    if flaky["errors"] != flaky["runs"] or flaky["runs"] < 3 or "boom" not in (flaky["last_error"] or ""):
+        raise SystemExit(f"FAIL: flaky task stats unexpected: {flaky}")
+    if stats["disabled"]["enabled"] or stats["disabled"]["runs"] != 0:
+        raise SystemExit(f"FAIL: interval=0 task should not run: {stats['disabled']}")
+    if scheduler.stats()["running"]:
+        raise SystemExit("FAIL: scheduler still running after stop")
+
+    # webhook outbox 由调度器派发：每个订阅建一条 delivery 并提交投递，outbox 清空
+    store = JoyGateStore(charger_ids=["charger-001"])
+    store.create_webhook_subscription("https://8.8.8.8/hook", ["INCIDENT_CREATED"], None, True)
+    store.report_blocked_incident("charger-001", "BLOCKED")
+    calls: list[tuple] = []
+    # 只记录交给投递引擎的 delivery，不发网络请求
+    store.process_webhook_delivery = lambda *args: calls.append(args)  # type: ignore[method-assign]
+    default = build_default_scheduler(lambda: [store])
+    default.run_once("webhook_outbox")
+    if len(calls) != 1 or calls[0][3].get("event_type") != "INCIDENT_CREATED":
+        raise SystemExit(f"FAIL: expected one INCIDENT_CREATED delivery, got {calls}")
+    if store.drain_webhook_outbox():
+        raise SystemExit("FAIL: outbox not drained by scheduler")
+    default.run_once("retention")
+    default.run_once("soft_recheck")
+    names = [t["name"] for t in default.stats()["tasks"]]
+    if names != ["incident_sla", "soft_recheck", "hold_expiry", "retention", "ai_jobs_tick", "webhook_outbox"]:
+        raise SystemExit(f"FAIL: unexpected default tasks {names}")
+
+    print("PASS: scheduler (hold expiry without reads, per-sandbox error isolation, timing stats, outbox dispatch)")
+
+
+if __name__ == "__main__":
+    main()
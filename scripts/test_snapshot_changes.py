@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""/v1/snapshot/changes 验收：无 since 全量；reserve 后增量只含变更的 charger/hold；stop 后 removed_hold_ids；异 epoch 全量；非法 since 400。"""
+from __future__ import annotations
+
+import argparse
+import sys
+
+from _sandbox_client import get_bootstrapped_session
+
+
+def _fail(msg: str) -> int:
+    print(f"FAIL: {msg}", file=sys.stderr)
+    return 1
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="/v1/snapshot/changes acceptance")
+    p.add_argument("--base_url", default="http://127.0.0.1:8000")
+    p.add_argument("--timeout", type=float, default=10.0)
+    args = p.parse_args()
+
+    base = args.base_url.rstrip("/")
+    session = get_bootstrapped_session(base, args.timeout)
+    url = f"{base}/v1/snapshot/changes"
+
+    r0 = session.get(url, timeout=args.timeout)
+    if r0.status_code != 200:
+        return _fail(f"GET changes status={r0.status_code} body={r0.text}")
+    full = r0.json()
+    if full.get("is_full_snapshot") is not True or not full.get("chargers"):
+        return _fail(f"no since should return full snapshot: {full}")
+    token0 = full.get("state_version")
+    if not isinstance(token0, str) or "." not in token0:
+        return _fail(f"invalid state_version {token0!r}")
+
+    r1 = session.get(url, params={"since": token0}, timeout=args.timeout)
+    d1 = r1.json()
+    if r1.status_code != 200 or d1.get("is_full_snapshot") is not False:
+        return _fail(f"unchanged delta should be incremental: {r1.status_code} {d1}")
+    if d1.get("chargers") or d1.get("holds") or d1.get("hazards") or d1.get("segment_passed_signals"):
+        return _fail(f"unchanged delta should be empty: {d1}")
+
+    charger_id = full["chargers"][0]["charger_id"]
+    rr = session.post(
+        f"{base}/v1/reserve",
+        json={"resource_type": "charger", "resource_id": charger_id, "joykey": "delta_probe", "action": "HOLD"},
+        timeout=args.timeout,
+    )
+    if rr.status_code != 200:
+        return _fail(f"reserve status={rr.status_code} body={rr.text}")
+    hold_id = rr.json()["hold_id"]
+
+    d2 = session.get(url, params={"since": d1["state_version"]}, timeout=args.timeout).json()
+    if d2.get("is_full_snapshot") is not False:
+        return _fail(f"delta after reserve should be incremental: {d2}")
+    if [c.get("charger_id") for c in d2.get("chargers") or []] != [charger_id]:
+        return _fail(f"delta chargers should be only {charger_id}: {d2.get('chargers')}")
+    if [h.get("hold_id") for h in d2.get("holds") or []] != [hold_id]:
+        return _fail(f"delta holds should be only {hold_id}: {d2.get('holds')}")
+    if d2["chargers"][0].get("slot_state") != "HELD":
+        return _fail(f"delta charger should be HELD: {d2['chargers'][0]}")
+
+    rs = session.post(
+        f"{base}/v1/oracle/stop_charging",
+        json={"hold_id": hold_id, "charger_id": charger_id, "meter_session_id": "m1", "event_occurred_at": "2026-01-01T00:00:00Z"},
+        timeout=args.timeout,
+    )
+    if rs.status_code != 200:
+        return _fail(f"stop_charging status={rs.status_code} body={rs.text}")
+    d3 = session.get(url, params={"since": d2["state_version"]}, timeout=args.timeout).json()
+    if d3.get("removed_hold_ids") != [hold_id] or d3.get("holds"):
+        return _fail(f"delta after stop should remove {hold_id}: {d3}")
+    if [c.get("slot_state") for c in d3.get("chargers") or []] != ["FREE"]:
+        return _fail(f"delta charger should be FREE after stop: {d3.get('chargers')}")
+
+    d4 = session.get(url, params={"since": "otherepoch.1"}, timeout=args.timeout).json()
+    if d4.get("is_full_snapshot") is not True:
+        return _fail(f"foreign epoch token should fall back to full: {d4}")
+
+    r5 = session.get(url, params={"since": "garbage"}, timeout=args.timeout)
+    if r5.status_code != 400:
+        return _fail(f"malformed since should be 400, got {r5.status_code}")
+
+    print("PASS snapshot changes: full / empty delta / upsert / removed / epoch fallback / 400")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        raise SystemExit(main())
+    except Exception as e:
+        print(f"FAIL: {e}", file=sys.stderr)
+        raise
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from collections import deque
+
+from joygate.store import JoyGateStore
+
+
+def main() -> None:
+    store = JoyGateStore(charger_ids=["charger-001", "charger-002"])
+    # 缩小 change log 窗口，模拟 token 过旧
+    store._snapshot_changes = deque(maxlen=4)  # type: ignore[attr-defined]
+
+    token = store.snapshot_changes(None)["state_version"]
+    code, p = store.reserve("charger", "charger-001", "robot_w")
+    if code != 200:
+        raise SystemExit(f"FAIL: reserve got={code}")
+    d = store.snapshot_changes(token)
+    if d["is_full_snapshot"] or [h["hold_id"] for h in d["holds"]] != [p["hold_id"]]:
+        raise SystemExit(f"FAIL: in-window delta expected incremental hold, got={d}")
+
+    for i in range(3):
+        code, p = store.reserve("charger", "charger-002", f"robot_loop_{i}")
+        store.stop_charging(p["hold_id"], "charger-002")
+    d = store.snapshot_changes(token)
+    if not d["is_full_snapshot"] or len(d["chargers"]) != 2:
+        raise SystemExit(f"FAIL: token older than change window should fall back to full, got={d}")
+
+    latest = d["state_version"]
+    d = store.snapshot_changes(latest)
+    if d["is_full_snapshot"] or d["chargers"] or d["holds"]:
+        raise SystemExit(f"FAIL: fresh token should give empty delta, got={d}")
+
+    print("PASS: snapshot changes window fallback")
+
+
+if __name__ == "__main__":
+    main()
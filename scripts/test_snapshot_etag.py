@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""/v1/snapshot ETag 验收：ETag 存在；If-None-Match 命中 304；reserve 后 ETag 变化并返回 200 新快照。"""
+from __future__ import annotations
+
+import argparse
+import sys
+
+from _sandbox_client import get_bootstrapped_session
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="/v1/snapshot ETag / If-None-Match acceptance")
+    p.add_argument("--base_url", default="http://127.0.0.1:8000")
+    p.add_argument("--timeout", type=float, default=10.0)
+    args = p.parse_args()
+
+    base = args.base_url.rstrip("/")
+    session = get_bootstrapped_session(base, args.timeout)
+    url = f"{base}/v1/snapshot"
+
+    r1 = session.get(url, timeout=args.timeout)
+    if r1.status_code != 200:
+        print(f"FAIL: GET /v1/snapshot status={r1.status_code} body={r1.text}", file=sys.stderr)
+        return 1
+    etag1 = r1.headers.get("ETag")
+    if not etag1:
+        print("FAIL: missing ETag header", file=sys.stderr)
+        return 1
+    body1 = r1.json()
+    for k in ("snapshot_at", "chargers", "holds", "hazards", "segment_passed_signals"):
+        if k not in body1:
+            print(f"FAIL: snapshot missing key {k}", file=sys.stderr)
+            return 1
+
+    r2 = session.get(url, headers={"If-None-Match": etag1}, timeout=args.timeout)
+    if r2.status_code != 304 or r2.content:
+        print(f"FAIL: unchanged state expected 304 empty body, got {r2.status_code} len={len(r2.content)}", file=sys.stderr)
+        return 1
+    if r2.headers.get("ETag") != etag1:
+        print(f"FAIL: 304 ETag mismatch {r2.headers.get('ETag')} != {etag1}", file=sys.stderr)
+        return 1
+
+    r3 = session.get(url, headers={"If-None-Match": f'"other", W/{etag1}'}, timeout=args.timeout)
+    if r3.status_code != 304:
+        print(f"FAIL: weak/list If-None-Match expected 304, got {r3.status_code}", file=sys.stderr)
+        return 1
+
+    charger_id = body1["chargers"][0]["charger_id"]
+    rr = session.post(
+        f"{base}/v1/reserve",
+        json={"resource_type": "charger", "resource_id": charger_id, "joykey": "etag_probe", "action": "HOLD"},
+        timeout=args.timeout,
+    )
+    if rr.status_code != 200:
+        print(f"FAIL: reserve status={rr.status_code} body={rr.text}", file=sys.stderr)
+        return 1
+    hold_id = rr.json().get("hold_id")
+
+    r4 = session.get(url, headers={"If-None-Match": etag1}, timeout=args.timeout)
+    if r4.status_code != 200:
+        print(f"FAIL: changed state expected 200, got {r4.status_code}", file=sys.stderr)
+        return 1
+    etag2 = r4.headers.get("ETag")
+    if not etag2 or etag2 == etag1:
+        print(f"FAIL: ETag not changed after reserve ({etag1} -> {etag2})", file=sys.stderr)
+        return 1
+    holds = r4.json().get("holds") or []
+    if not any(h.get("hold_id") == hold_id for h in holds):
+        print(f"FAIL: new hold {hold_id} not in snapshot holds={holds}", file=sys.stderr)
+        return 1
+
+    print("PASS snapshot ETag / If-None-Match 304 / change invalidates")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        raise SystemExit(main())
+    except Exception as e:
+        print(f"FAIL: {e}", file=sys.stderr)
+        raise
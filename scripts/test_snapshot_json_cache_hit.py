@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+/v1/snapshot 缓存命中路径验收（直接驱动 JoyGateStore，不起服务）：
+- 304 判定（snapshot_tag）代价与 hazard 数无关（10k SOFT hazard，宽松比例断言），且与 snapshot_json 的 tag 一致；
+- 状态未变时 snapshot_json 的 state_tag 不变、body（除 snapshot_at）相同，且不重建分段；
+- 有到期项时读路径仍做维护：到期 SOFT 复核后 state_tag 变化。
+"""
+from __future__ import annotations
+
+import json
+import time
+
+from joygate.store import JoyGateStore
+
+HAZARDS = 10_000
+ROUNDS = 200
+
+
+def _soft(store: JoyGateStore, count: int) -> None:
+    for i in range(count):
+        store.record_segment_witness(f"cell_{i // 100}_{i % 100}", "BLOCKED", "w1", f"pe_{i}")
+
+
+def _hit_cost(store: JoyGateStore) -> float:
+    store.snapshot_json()
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        store.snapshot_tag()
+    return (time.perf_counter() - t0) / ROUNDS
+
+
+def _tail(body: bytes) -> dict:
+    out = json.loads(body)
+    out.pop("snapshot_at", None)
+    return out
+
+
+def main() -> None:
+    small = JoyGateStore()
+    _soft(small, 1)
+    big = JoyGateStore()
+    _soft(big, HAZARDS)
+    small_cost, big_cost = _hit_cost(small), _hit_cost(big)
+    if big_cost > small_cost * 5 + 100e-6:
+        raise SystemExit(f"FAIL: 304 check should not scale with hazards: {small_cost * 1e6:.1f}us -> {big_cost * 1e6:.1f}us")
+
+    tag1, body1 = big.snapshot_json()
+    if big.snapshot_tag() != tag1:
+        raise SystemExit("FAIL: snapshot_tag should match the snapshot_json tag")
+    rebuilt = []
+    sections = big._snapshot_sections  # type: ignore[attr-defined]
+    big._snapshot_sections = lambda *a, **kw: rebuilt.append(1) or sections(*a, **kw)  # type: ignore[method-assign]
+    tag2, body2 = big.snapshot_json()
+    if tag2 != tag1 or _tail(body2) != _tail(body1) or rebuilt:
+        raise SystemExit(f"FAIL: unchanged state should reuse cached bytes without rebuilding sections (rebuilt={len(rebuilt)})")
+
+    # 到期 SOFT 复核：命中路径发现堆顶到期，先维护，state_tag 随之变化
+    target = "cell_0_3"
+    with big._hazards_lock:  # type: ignore[attr-defined]
+        big._set_soft_recheck_due_locked(target, big._hazards_by_segment[target], time.time() - 60)  # type: ignore[attr-defined]
+    tag3, body3 = big.snapshot_json()
+    hazard = next(h for h in json.loads(body3)["hazards"] if h["segment_id"] == target)
+    if tag3 == tag1 or big.snapshot_tag() != tag3 or not rebuilt or hazard["recheck_due_at"] <= time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()):
+        raise SystemExit(f"FAIL: due recheck should run on the read path and change the tag: {tag1} -> {tag3}, {hazard}")
+
+    print(
+        f"PASS: snapshot cache hit (304 reads versions only, body reused, due maintenance kept; "
+        f"{small_cost * 1e6:.1f}us @1 vs {big_cost * 1e6:.1f}us @{HAZARDS} soft hazards)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+SOFT 复核到期堆验收（直接驱动 JoyGateStore，不起服务）：
+- 只处理到期的 SOFT_BLOCKED；due 被改写后的旧堆项惰性丢弃，不重复复核；
+- 无到期项时 run_due_soft_rechecks / snapshot 读路径代价与 SOFT hazard 数无关（宽松比例断言）；
+- 反复重排 due 堆不膨胀；重启恢复后到期堆重建。
+"""
+from __future__ import annotations
+
+import shutil
+import tempfile
+import time
+
+from joygate.store import JoyGateStore
+
+HAZARDS = 5_000
+ROUNDS = 200
+
+
+def _soft(store: JoyGateStore, count: int) -> None:
+    for i in range(count):
+        store.record_segment_witness(f"cell_{i // 100}_{i % 100}", "BLOCKED", "w1", f"pe_{i}")
+
+
+def _idle_cost(store: JoyGateStore) -> float:
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        store.run_due_soft_rechecks()
+    return (time.perf_counter() - t0) / ROUNDS
+
+
+def main() -> None:
+    small = JoyGateStore()
+    _soft(small, 1)
+    big = JoyGateStore()
+    _soft(big, HAZARDS)
+    small_cost, big_cost = _idle_cost(small), _idle_cost(big)
+    if big_cost > small_cost * 5 + 50e-6:
+        raise SystemExit(f"FAIL: idle soft recheck should not scan hazards: {small_cost * 1e6:.1f}us -> {big_cost * 1e6:.1f}us")
+
+    # 只有到期的一条被复核（票数不足 -> INCONCLUSIVE，due 后移）；其余 due 不变
+    now = time.time()
+    before = {seg: h["recheck_due_at"] for seg, h in big._hazards_by_segment.items()}  # type: ignore[attr-defined]
+    target = "cell_0_7"
+    with big._hazards_lock:  # type: ignore[attr-defined]
+        rec = big._hazards_by_segment[target]  # type: ignore[attr-defined]
+        big._set_soft_recheck_due_locked(target, rec, now - 120)  # type: ignore[attr-defined]
+        big._set_soft_recheck_due_locked(target, rec, now - 60)  # type: ignore[attr-defined]
+    big.run_due_soft_rechecks(now)
+    after = {seg: h["recheck_due_at"] for seg, h in big._hazards_by_segment.items()}  # type: ignore[attr-defined]
+    changed = sorted(seg for seg in after if after[seg] != before[seg])
+    if changed != [target] or big._hazards_by_segment[target]["hazard_status"] != "SOFT_BLOCKED":  # type: ignore[attr-defined]
+        raise SystemExit(f"FAIL: only the due hazard should be rechecked, changed={changed[:5]}")
+    if big._hazards_by_segment[target]["recheck_due_at"] <= before[target]:  # type: ignore[attr-defined]
+        raise SystemExit("FAIL: INCONCLUSIVE recheck should push recheck_due_at forward")
+    if any(due <= now for due, _ in big._soft_recheck_heap):  # type: ignore[attr-defined]
+        raise SystemExit("FAIL: stale heap entries for the rewritten due should have been dropped")
+
+    # 反复重排 due：堆大小受 2×hazard 数约束
+    with small._hazards_lock:  # type: ignore[attr-defined]
+        rec = small._hazards_by_segment["cell_0_0"]  # type: ignore[attr-defined]
+        for i in range(1_000):
+            small._set_soft_recheck_due_locked("cell_0_0", rec, now + 600 + i)  # type: ignore[attr-defined]
+    if len(small._soft_recheck_heap) > 2 * len(small._hazards_by_segment) + 64:  # type: ignore[attr-defined]
+        raise SystemExit(f"FAIL: soft recheck heap should be rebuilt when stale, size={len(small._soft_recheck_heap)}")  # type: ignore[attr-defined]
+
+    root = tempfile.mkdtemp(prefix="joygate_soft_recheck_heap_")
+    try:
+        a = JoyGateStore(state_dir=root)
+        _soft(a, 3)
+        a.close_state_log()
+        b = JoyGateStore(state_dir=root)
+        if sorted(seg for _, seg in b._soft_recheck_heap) != sorted(a._hazards_by_segment):  # type: ignore[attr-defined]
+            raise SystemExit("FAIL: soft recheck heap should be rebuilt on restore")
+        b.close_state_log()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(
+        f"PASS: soft recheck heap (due-only, stale entries dropped, bounded, restored; "
+        f"idle {small_cost * 1e6:.1f}us @1 vs {big_cost * 1e6:.1f}us @{HAZARDS} soft hazards)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import time
+
+from joygate.config import ALLOWED_WITNESS_JOYKEYS
+from joygate.state_log import StateLogBase
+from joygate.store import JoyGateStore
+
+
+def _wal_files(path: str) -> list[str]:
+    return sorted(n for n in os.listdir(path) if n.endswith(".wal"))
+
+
+def _state(store: JoyGateStore) -> dict:
+    """可比较的业务状态视图（去掉 snapshot_at 等随时间变化的字段）。"""
+    snap = store.snapshot()
+    ledger = store.get_audit_ledger()
+    return {
+        "chargers": snap["chargers"],
+        "holds": snap["holds"],
+        "hazards": snap["hazards"],
+        "signals": store.list_segment_passed_signals(),
+        "incidents": store.list_incidents(),
+        "decisions": ledger["decisions"],
+        "score_events": store.get_score_events(),
+        "vendor_scores": store.get_vendor_scores(),
+    }
+
+
+def _mutate(store: JoyGateStore, tag: str, base: int) -> str:
+    """base 起连续用 3 个 charger：占位并开始充电 / 占位后释放 / incident 投票。"""
+    witnesses = sorted(ALLOWED_WITNESS_JOYKEYS)
+    c1, c2, c3 = (f"charger-{base + i:03d}" for i in range(3))
+    code, payload = store.reserve("charger", c1, f"jk_{tag}")
+    if code != 200:
+        raise SystemExit(f"FAIL: reserve {code} {payload}")
+    store.start_charging(payload["hold_id"], c1)
+    code, payload2 = store.reserve("charger", c2, f"jk2_{tag}")
+    store.stop_charging(payload2["hold_id"], c2)
+    incident_id = store.report_blocked_incident(c3, "BLOCKED", None, [f"ev:{tag}"])
+    for i, w in enumerate(witnesses[:2]):
+        store.witness_respond(w, incident_id, c3, "OCCUPIED", "CAR", [f"ev:{w}"], f"pe_{tag}_{i}")
+    other = store.report_blocked_incident(c3, "BLOCKED")
+    store.update_incident_status(other, "UNDER_OBSERVATION")
+    store.record_segment_witness(f"cell_1_{tag}", "BLOCKED", witnesses[0], f"seg_{tag}", [f"ev:seg_{tag}"], "CONE")
+    store.record_segment_passed_telemetry(f"jk_{tag}", None, [f"cell_2_{tag}"], time.time(), "SIMULATOR")
+    store.apply_policy_suggestion_ledger_only(f"air_{tag}")
+    return incident_id
+
+
+def main() -> None:
+    root = tempfile.mkdtemp(prefix="joygate_state_")
+    try:
+        a = JoyGateStore(state_dir=root)
+        incident_id = _mutate(a, "a", 1)
+        if a.state_log_stats()["pending"] == 0:
+            raise SystemExit("FAIL: mutations should register dirty keys")
+        if a.flush_state_log() == 0 or a.state_log_stats()["pending"] != 0:
+            raise SystemExit("FAIL: flush should write pending records")
+        expected = _state(a)
+        if not expected["score_events"] or not expected["decisions"] or not expected["hazards"]:
+            raise SystemExit(f"FAIL: scenario did not touch every table: {expected}")
+        # 模拟崩溃：不 close，尾部留半行
+        with open(os.path.join(root, _wal_files(root)[-1]), "ab") as f:
+            f.write(b'{"lsn":999999,"t":"hold","k":"hold_torn","v":{"charg')
+
+        # 重启：截掉半行，所有表与派生索引恢复
+        b = JoyGateStore(state_dir=root)
+        if _state(b) != expected:
+            raise SystemExit("FAIL: state after restart differs")
+        inc = next(i for i in b.list_incidents() if i["incident_id"] == incident_id)
+        if inc["incident_status"] != "EVIDENCE_CONFIRMED" or not inc.get("ai_insights"):
+            raise SystemExit(f"FAIL: incident in-place updates not persisted: {inc}")
+        code, _ = b.reserve("charger", "charger-001", "someone_else")
+        if code != 409:
+            raise SystemExit(f"FAIL: restored HELD/CHARGING slot should stay busy, got {code}")
+        code, _ = b.reserve("charger", "charger-009", "jk_a")
+        if code != 429:
+            raise SystemExit(f"FAIL: restored hold should keep joykey quota, got {code}")
+
+        # 修改后折叠快照：segment 被删除，快照 + 新 WAL 尾部一起恢复
+        _mutate(b, "b", 4)
+        b.flush_state_log()
+        if not b.compact_state_log(force=True) or _wal_files(root):
+            raise SystemExit(f"FAIL: compaction should fold WAL into snapshot: {_wal_files(root)}")
+        b.update_incident_status(incident_id, "RESOLVED")
+        b.close_state_log()
+        expected = _state(b)
+        c = JoyGateStore(state_dir=root)
+        if _state(c) != expected:
+            raise SystemExit("FAIL: state after snapshot + WAL tail differs")
+        stats = c.state_log_stats()
+        if stats["snapshot_lsn"] == 0 or stats["next_lsn"] <= stats["snapshot_lsn"]:
+            raise SystemExit(f"FAIL: lsn not continued after recovery: {stats}")
+
+        # 同一 flush 间隔内建了又删的 hold 不落盘，只写 charger 行
+        code, payload = c.reserve("charger", "charger-009", "jk_tmp")
+        c.stop_charging(payload["hold_id"], "charger-009")
+        written = c.flush_state_log()
+        if code != 200 or written != 1:
+            raise SystemExit(f"FAIL: short-lived hold should not be written, code={code} records={written}")
+
+        # 后端接口是抽象类：漏实现的后端在构造时就报错
+        class _Partial(StateLogBase):
+            def recover(self) -> dict:
+                return {}
+
+        try:
+            _Partial()
+        except TypeError:
+            pass
+        else:
+            raise SystemExit("FAIL: StateLogBase subclasses must implement every backend method")
+
+        # 未启用时为纯内存：flush / compact 为空操作
+        plain = JoyGateStore()
+        _mutate(plain, "p", 1)
+        if plain.flush_state_log() != 0 or plain.compact_state_log(force=True) or plain.state_log_stats() is not None:
+            raise SystemExit("FAIL: in-memory store should not persist")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("PASS: store state log (group commit, torn tail, snapshot + WAL recovery, derived indexes)")
+
+
+if __name__ == "__main__":
+    main()
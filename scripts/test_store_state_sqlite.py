@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import shutil
+import tempfile
+import time
+
+from joygate.state_sqlite import (
+    SqliteStateLog,
+    connect_readonly,
+    holds_expiring_before,
+    query_incidents,
+    read_history,
+)
+import joygate.store as store_mod
+from joygate.store import JoyGateStore
+from test_store_state_log import _mutate, _state
+
+
+def _incident_ids(store: JoyGateStore, limit: int, **filters) -> list[str]:
+    """按游标翻完所有页，返回 incident_id 序列。"""
+    out: list[str] = []
+    cursor = None
+    while True:
+        page = store.list_incidents_page(limit=limit, cursor=cursor, **filters)
+        out += [i["incident_id"] for i in page["incidents"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return out
+
+
+def _score_event_ids(store: JoyGateStore, limit: int) -> list[str]:
+    """按 before 翻完 /v1/score_events 的所有页。"""
+    out: list[str] = []
+    while True:
+        page = store.get_score_events(limit=limit, before=out[-1] if out else None)
+        out += [e["score_event_id"] for e in page]
+        if len(page) < limit:
+            return out
+
+
+def _plan(conn, sql: str, params: tuple) -> str:
+    return " ".join(str(row[-1]) for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def main() -> None:
+    root = tempfile.mkdtemp(prefix="joygate_state_sqlite_")
+    try:
+        # 与文件后端同一场景：flush 后"崩溃"（不 close）重启，所有表与派生索引恢复
+        a = JoyGateStore(state_dir=root, state_backend="sqlite")
+        incident_id = _mutate(a, "a", 1)
+        if a.flush_state_log() == 0 or a.state_log_stats()["pending"] != 0:
+            raise SystemExit("FAIL: flush should write pending records")
+        expected = _state(a)
+        b = JoyGateStore(state_dir=root, state_backend="sqlite")
+        if _state(b) != expected:
+            raise SystemExit("FAIL: state after restart differs")
+        code, _ = b.reserve("charger", "charger-001", "someone_else")
+        if code != 409:
+            raise SystemExit(f"FAIL: restored HELD/CHARGING slot should stay busy, got {code}")
+
+        # 其它连接（可为其它进程）只读查询已提交状态，走各自索引
+        b.update_incident_status(incident_id, "RESOLVED")
+        b.flush_state_log()
+        ro = connect_readonly(root)
+        resolved = query_incidents(ro, status="RESOLVED")
+        if [i["incident_id"] for i in resolved] != [incident_id]:
+            raise SystemExit(f"FAIL: query by status: {resolved}")
+        if len(query_incidents(ro, charger_id="charger-003")) != 2:
+            raise SystemExit("FAIL: query by charger")
+        held = holds_expiring_before(ro, time.time() + 3600)
+        if [h["joykey"] for h in held] != ["jk_a"]:
+            raise SystemExit(f"FAIL: holds by expires_at: {held}")
+        for sql, params, index in (
+            ("SELECT v FROM incidents WHERE incident_status = ?", ("OPEN",), "incidents_by_status"),
+            ("SELECT v FROM incidents WHERE charger_id = ?", ("charger-003",), "incidents_by_charger"),
+            ("SELECT v FROM holds WHERE expires_at < ? ORDER BY expires_at", (0.0,), "holds_by_expires_at"),
+        ):
+            if index not in _plan(ro, sql, params):
+                raise SystemExit(f"FAIL: {sql!r} should use {index}: {_plan(ro, sql, params)}")
+        ro.close()
+        b.close_state_log()
+
+        # 历史表：内存只保留最近 N 条，淘汰出内存的仍在库里；compact 按上限清理最旧并截断 WAL
+        hist_dir = tempfile.mkdtemp(dir=root)
+        log = SqliteStateLog(hist_dir, history_limits={"decision": 3}, history_max_rows=5)
+        log.recover()
+        for i in range(10):
+            log.put("decision", f"d{i}", {"decision_id": f"d{i}"})
+            if i >= 3:
+                log.put("decision", f"d{i - 3}", None)  # store 淘汰出内存
+            log.flush(lambda lookups: {})
+        recovered = SqliteStateLog(hist_dir, history_limits={"decision": 3}).recover()["decision"]
+        if list(recovered) != ["d7", "d8", "d9"]:
+            raise SystemExit(f"FAIL: recover should load only the newest history rows: {list(recovered)}")
+        ro = connect_readonly(hist_dir)
+        if [r["decision_id"] for _, r in read_history(ro, "decision", limit=20)] != [f"d{i}" for i in range(9, -1, -1)]:
+            raise SystemExit("FAIL: history evicted from memory should stay on disk")
+        if not log.compact(force=True) or log.stats()["wal_bytes"] != 0:
+            raise SystemExit(f"FAIL: compact should checkpoint and truncate the WAL: {log.stats()}")
+        page = read_history(ro, "decision", limit=2)
+        rest = read_history(ro, "decision", limit=20, before_seq=page[-1][0])
+        if [r["decision_id"] for _, r in page + rest] != ["d9", "d8", "d7", "d6", "d5"]:
+            raise SystemExit("FAIL: compact should keep only history_max_rows newest rows")
+        ro.close()
+        log.close()
+
+        # 归档读取：淘汰出内存的 incident / score event / 过了保留期的 delivery，store 的读接口从库里续读
+        arch_dir = tempfile.mkdtemp(dir=root)
+        saved = (store_mod.MAX_INCIDENTS, store_mod.MAX_SCORE_EVENTS, store_mod.WEBHOOK_DELIVERY_RETENTION_SECONDS)
+        store_mod.MAX_INCIDENTS, store_mod.MAX_SCORE_EVENTS = 4, 3
+        try:
+            s = JoyGateStore(state_dir=arch_dir, state_backend="sqlite")
+            created = [s.report_blocked_incident(f"charger-{i:03d}", "BLOCKED") for i in range(1, 10)]
+            for i in range(8):  # 每条后 flush：同一间隔内追加又淘汰的不会落盘
+                with s._reputation_lock:  # type: ignore[attr-defined]
+                    s._apply_score_event_locked(f"se_{i}", "TEST", "jk_score", 1, None, None, None, time.time())  # type: ignore[attr-defined]
+                s.flush_state_log()
+            if len(s.list_incidents()) != 4:
+                raise SystemExit("FAIL: memory should keep only MAX_INCIDENTS incidents")
+            for store in (s, JoyGateStore(state_dir=arch_dir, state_backend="sqlite")):
+                paged = _incident_ids(store, 3)
+                if sorted(paged) != sorted(created) or len(paged) != len(set(paged)):
+                    raise SystemExit(f"FAIL: paging should continue into archived incidents: {paged}")
+                if _incident_ids(store, 2, charger_id="charger-001") != [created[0]]:
+                    raise SystemExit("FAIL: filtered paging should find the archived incident")
+                if _score_event_ids(store, 2) != [f"se_{i}" for i in range(7, -1, -1)]:
+                    raise SystemExit(f"FAIL: score events should page past memory: {_score_event_ids(store, 2)}")
+            if [e["score_event_id"] for e in s.get_score_events(limit=2, before="se_2")] != ["se_1", "se_0"]:
+                raise SystemExit("FAIL: before= an archived score event should read from the archive")
+
+            store_mod.WEBHOOK_DELIVERY_RETENTION_SECONDS = 0.01
+            for event_id, sub in (("ev_1", "sub_1"), ("ev_1", "sub_2"), ("ev_2", "sub_1")):
+                s.create_webhook_delivery_if_absent({"event_id": event_id, "event_type": "TEST"}, sub, "http://127.0.0.1:9/")
+            s.flush_state_log()
+            time.sleep(0.05)
+            if s.list_webhook_deliveries():
+                raise SystemExit("FAIL: deliveries past retention should leave memory")
+            s.flush_state_log()
+            if len(s.list_webhook_deliveries("ev_1")) != 2 or [
+                d["subscription_id"] for d in s.list_webhook_deliveries("ev_1", "sub_2")
+            ] != ["sub_2"]:
+                raise SystemExit("FAIL: deliveries should be found by event + subscription after retention")
+            if s.create_webhook_delivery_if_absent({"event_id": "ev_1"}, "sub_1", "http://127.0.0.1:9/") is None:
+                raise SystemExit("FAIL: archived deliveries must not suppress dispatch dedup in memory")
+            ro = connect_readonly(arch_dir)
+            for sql, params, index in (
+                ("SELECT v FROM deliveries WHERE event_id = ? AND subscription_id = ?", ("ev_1", "sub_1"), "deliveries_by_event_subscription"),
+                ("SELECT v FROM incidents WHERE archived = 1 ORDER BY created_at DESC", (), "incidents_by_archived"),
+            ):
+                if index not in _plan(ro, sql, params):
+                    raise SystemExit(f"FAIL: {sql!r} should use {index}: {_plan(ro, sql, params)}")
+            ro.close()
+            s.close_state_log()
+        finally:
+            store_mod.MAX_INCIDENTS, store_mod.MAX_SCORE_EVENTS, store_mod.WEBHOOK_DELIVERY_RETENTION_SECONDS = saved
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("PASS: sqlite state backend (crash recovery, indexed read-only queries, on-disk history, checkpoint, archive paging)")
+
+
+if __name__ == "__main__":
+    main()
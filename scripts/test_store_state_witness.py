@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import shutil
+import tempfile
+
+from joygate.store import JoyGateStore
+
+
+def _tally(store: JoyGateStore, incident_id: str) -> dict:
+    return store._witness_by_incident[incident_id]  # type: ignore[attr-defined]
+
+
+def _check_backend(backend: str) -> None:
+    root = tempfile.mkdtemp(prefix=f"joygate_state_witness_{backend}_")
+    try:
+        # 重启前：w1 投一票（第二次重放被去重），segment 证据一条；正常关闭
+        a = JoyGateStore(state_dir=root, state_backend=backend)
+        incident_id = a.report_blocked_incident("charger-001", "BLOCKED")
+        for _ in range(2):
+            a.witness_respond("w1", incident_id, "charger-001", "OCCUPIED", None, None, "pe_w1")
+        a.record_segment_witness("cell_1_1", "BLOCKED", "w1", "sp_w1", ["ev:1"], "CONE")
+        if _tally(a, incident_id)["total"] != 1:
+            raise SystemExit(f"FAIL[{backend}]: duplicate vote counted before restart")
+        a.close_state_log()
+
+        # 重启后：计票与去重集合恢复，重放 w1（同 points_event_id / 新 points_event_id）都不再计票
+        b = JoyGateStore(state_dir=root, state_backend=backend)
+        tally = _tally(b, incident_id)
+        if tally["total"] != 1 or tally["seen_witness_joykeys"] != {"w1"} or tally["seen_points_event_ids"] != {"pe_w1"}:
+            raise SystemExit(f"FAIL[{backend}]: witness tally not restored: {tally}")
+        if not isinstance(tally["vendors_by_state"]["OCCUPIED"], set):
+            raise SystemExit(f"FAIL[{backend}]: per-state vendor sets should be restored as sets")
+        b.witness_respond("w1", incident_id, "charger-001", "OCCUPIED", None, None, "pe_w1")
+        b.witness_respond("w1", incident_id, "charger-001", "OCCUPIED", None, None, "pe_w1_retry")
+        if _tally(b, incident_id)["total"] != 1:
+            raise SystemExit(f"FAIL[{backend}]: replayed vote counted again after restart")
+        events_before = len(b._segment_witness_events)  # type: ignore[attr-defined]
+        if events_before != 1:
+            raise SystemExit(f"FAIL[{backend}]: segment witness events not restored: {events_before}")
+        b.record_segment_witness("cell_1_1", "BLOCKED", "w1", "sp_w1", ["ev:1"], "CONE")
+        if len(b._segment_witness_events) != events_before:  # type: ignore[attr-defined]
+            raise SystemExit(f"FAIL[{backend}]: replayed segment points_event_id recorded again after restart")
+
+        # 进行中的 quorum 保留：另一家厂商的 w2 一票即可确认（w1 的票仍在）
+        b.witness_respond("w2", incident_id, "charger-001", "OCCUPIED", None, None, "pe_w2")
+        status = b._incidents.get(incident_id)["incident_status"]  # type: ignore[attr-defined,index]
+        if status != "EVIDENCE_CONFIRMED":
+            raise SystemExit(f"FAIL[{backend}]: in-flight quorum lost across restart, status={status}")
+        b.close_state_log()
+        c = JoyGateStore(state_dir=root, state_backend=backend)
+        if _tally(c, incident_id)["seen_witness_joykeys"] != {"w1", "w2"}:
+            raise SystemExit(f"FAIL[{backend}]: tally after second restart: {_tally(c, incident_id)}")
+        c.close_state_log()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    for backend in ("wal", "sqlite"):
+        _check_backend(backend)
+    print("PASS: store state witness (tallies, dedup sets and segment events survive restart on wal / sqlite)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""/v1/stream SSE 验收：连接后先收到 snapshot(state_version)；reserve 后收到新 state_version；report_blocked 后收到 INCIDENT_CREATED。"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+from _sandbox_client import get_bootstrapped_session
+
+
+def _reader(resp, events: list[tuple[str, dict]], stop: threading.Event) -> None:
+    """按 SSE 帧解析（空行分帧），把 (event, data) 追加到 events。"""
+    event_name = "message"
+    data_lines: list[str] = []
+    try:
+        for raw in resp.iter_lines(decode_unicode=True):
+            if stop.is_set():
+                break
+            line = raw if raw is not None else ""
+            if line == "":
+                if data_lines:
+                    try:
+                        data = json.loads("\n".join(data_lines))
+                    except ValueError:
+                        data = {}
+                    events.append((event_name, data))
+                event_name = "message"
+                data_lines = []
+                continue
+            if line.startswith(":"):
+                continue
+            if line.startswith("event:"):
+                event_name = line[6:].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[5:].strip())
+    except Exception:
+        pass
+
+
+def _wait_for(events: list[tuple[str, dict]], pred, timeout: float) -> tuple[str, dict] | None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for ev in list(events):
+            if pred(ev):
+                return ev
+        time.sleep(0.05)
+    return None
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="/v1/stream SSE acceptance")
+    p.add_argument("--base_url", default="http://127.0.0.1:8000")
+    p.add_argument("--timeout", type=float, default=10.0)
+    args = p.parse_args()
+
+    base = args.base_url.rstrip("/")
+    session = get_bootstrapped_session(base, args.timeout)
+
+    resp = session.get(f"{base}/v1/stream", stream=True, timeout=args.timeout)
+    if resp.status_code != 200:
+        print(f"FAIL: GET /v1/stream status={resp.status_code} body={resp.text}", file=sys.stderr)
+        return 1
+    ctype = resp.headers.get("Content-Type") or ""
+    if not ctype.startswith("text/event-stream"):
+        print(f"FAIL: unexpected Content-Type {ctype}", file=sys.stderr)
+        return 1
+
+    events: list[tuple[str, dict]] = []
+    stop = threading.Event()
+    t = threading.Thread(target=_reader, args=(resp, events, stop), daemon=True)
+    t.start()
+    try:
+        first = _wait_for(events, lambda ev: ev[0] == "snapshot", args.timeout)
+        if first is None or not first[1].get("state_version"):
+            print(f"FAIL: no initial snapshot event, events={events}", file=sys.stderr)
+            return 1
+        v0 = first[1]["state_version"]
+
+        snap = session.get(f"{base}/v1/snapshot", timeout=args.timeout).json()
+        charger_id = snap["chargers"][0]["charger_id"]
+        rr = session.post(
+            f"{base}/v1/reserve",
+            json={"resource_type": "charger", "resource_id": charger_id, "joykey": "stream_probe", "action": "HOLD"},
+            timeout=args.timeout,
+        )
+        if rr.status_code != 200:
+            print(f"FAIL: reserve status={rr.status_code} body={rr.text}", file=sys.stderr)
+            return 1
+        bumped = _wait_for(
+            events, lambda ev: ev[0] == "snapshot" and ev[1].get("state_version") not in (None, v0), args.timeout
+        )
+        if bumped is None:
+            print(f"FAIL: no snapshot event after reserve, events={events}", file=sys.stderr)
+            return 1
+        ch = session.get(f"{base}/v1/snapshot/changes", params={"since": v0}, timeout=args.timeout)
+        holds = (ch.json() or {}).get("holds") or [] if ch.status_code == 200 else []
+        if not any(h.get("charger_id") == charger_id for h in holds):
+            print(f"FAIL: snapshot/changes since {v0} missing new hold: {ch.status_code} {ch.text}", file=sys.stderr)
+            return 1
+
+        ri = session.post(
+            f"{base}/v1/incidents/report_blocked",
+            json={"charger_id": charger_id, "incident_type": "BLOCKED", "snapshot_ref": "snap_stream_probe"},
+            timeout=args.timeout,
+        )
+        if ri.status_code != 200:
+            print(f"FAIL: report_blocked status={ri.status_code} body={ri.text}", file=sys.stderr)
+            return 1
+        incident_id = ri.json().get("incident_id")
+        created = _wait_for(
+            events,
+            lambda ev: ev[0] == "INCIDENT_CREATED" and ev[1].get("object_id") == incident_id,
+            args.timeout,
+        )
+        if created is None:
+            print(f"FAIL: no INCIDENT_CREATED event for {incident_id}, events={events}", file=sys.stderr)
+            return 1
+    finally:
+        stop.set()
+        resp.close()
+
+    print("PASS /v1/stream initial snapshot / state_version push / INCIDENT_CREATED push")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        raise SystemExit(main())
+    except Exception as e:
+        print(f"FAIL: {e}", file=sys.stderr)
+        raise
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from joygate.store import JoyGateStore
+from joygate.vision_audit_report_logic import run_vision_audit_tasks
+
+
+def _render(snapshot: dict) -> bytes:
+    if snapshot.get("bad"):
+        raise RuntimeError("no pillow")
+    return b"png"
+
+
+def _audit(rec: dict, png: bytes) -> dict:
+    time.sleep(rec.get("sleep", 0.3))
+    if rec.get("raise"):
+        raise RuntimeError("relay down")
+    return {"summary": f"ok {rec['incident_id']}", "confidence": 50, "obstacle_type": "UNKNOWN", "sample_index": 0}
+
+
+def _task(job_id: str, use_budget: bool = True, **rec) -> dict:
+    return {
+        "job_id": job_id,
+        "render_snapshot": {"bad": rec.pop("bad", False)},
+        "incident_rec": {"incident_id": f"inc_{job_id}", **rec},
+        "use_budget": use_budget,
+    }
+
+
+def main() -> None:
+    executor = ThreadPoolExecutor(max_workers=4)
+
+    # 8 个 0.3s 的 provider 调用，4 并发：约 0.6s 完成，而不是串行 2.4s
+    tasks = [_task(f"j{i}") for i in range(8)]
+    t0 = time.monotonic()
+    results = run_vision_audit_tasks(tasks, _render, _audit, executor, timeout_seconds=5)
+    elapsed = time.monotonic() - t0
+    if sorted(results) != sorted(t["job_id"] for t in tasks):
+        raise SystemExit(f"FAIL: missing results {sorted(results)}")
+    if any(r.get("_job_failed") for r in results.values()):
+        raise SystemExit(f"FAIL: unexpected failure {results}")
+    if elapsed > 1.5:
+        raise SystemExit(f"FAIL: provider calls not concurrent, elapsed={elapsed:.2f}s")
+
+    # 超时 / 渲染异常 / provider 异常 / 超 budget 各自落到对应结果，互不影响
+    tasks = [
+        _task("slow", sleep=3.0),
+        _task("bad_render", bad=True),
+        _task("boom", sleep=0.0, **{"raise": True}),
+        _task("no_budget", use_budget=False),
+        _task("fine", sleep=0.1),
+    ]
+    t0 = time.monotonic()
+    results = run_vision_audit_tasks(tasks, _render, _audit, executor, timeout_seconds=0.5)
+    elapsed = time.monotonic() - t0
+    if elapsed > 2.0:
+        raise SystemExit(f"FAIL: per-job timeout not enforced, elapsed={elapsed:.2f}s")
+    expect = {
+        "slow": "provider timeout",
+        "bad_render": "render error: no pillow",
+        "boom": "provider error: relay down",
+        "no_budget": "skipped due to budget",
+        "fine": "ok inc_fine",
+    }
+    for job_id, summary in expect.items():
+        if results.get(job_id, {}).get("summary") != summary:
+            raise SystemExit(f"FAIL: {job_id} expected {summary!r}, got {results.get(job_id)}")
+    if results["no_budget"].get("_job_failed") or not results["slow"].get("_job_failed"):
+        raise SystemExit(f"FAIL: _job_failed flags wrong {results}")
+
+    # store 端到端：tick 经线程池完成 vision audit，回写 COMPLETED（lease_until 校验不变）
+    store = JoyGateStore(charger_ids=["charger-001"])
+    ids = [store.report_blocked_incident("charger-001", "BLOCKED") for _ in range(3)]
+    for iid in ids:
+        store.create_vision_audit_job(iid)
+    out = store.tick_ai_jobs(10)
+    if out.get("completed") != 3:
+        raise SystemExit(f"FAIL: tick expected 3 completed, got {out}")
+    statuses = {j.get("ai_job_status") for j in store.list_ai_jobs()}
+    if statuses != {"COMPLETED"}:
+        raise SystemExit(f"FAIL: jobs not completed after tick: {statuses}")
+
+    executor.shutdown(wait=False)
+    print("PASS: vision audit pool (concurrent provider calls, per-job timeout, failure isolation, tick write-back)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# 本地接收端走 http://127.0.0.1（须在 import joygate 之前设置）
+os.environ["JOYGATE_WEBHOOK_ALLOW_HTTP"] = "1"
+os.environ["JOYGATE_WEBHOOK_ALLOW_LOCALHOST"] = "1"
+
+from joygate.store import JoyGateStore  # noqa: E402
+from joygate.webhook_delivery import WebhookDeliveryEngine, shutdown_webhook_delivery_engine  # noqa: E402
+from joygate.webhooks_logic import dispatch_webhook_outbox  # noqa: E402
+
+
+class _RecordingSend:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.payloads: list = []
+
+    def __call__(self, session, target_url, secret, payload, timeout, allow_http=False, allow_localhost=False) -> dict:
+        with self.lock:
+            self.payloads.append(payload)
+        return {"delivered": True, "last_status_code": 200, "last_error": None}
+
+
+class _Receiver(BaseHTTPRequestHandler):
+    posts: list[tuple[dict, bytes]] = []
+
+    def do_POST(self):  # noqa: N802
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        _Receiver.posts.append(({k: v for k, v in self.headers.items()}, body))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _wait(pred, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if pred():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def main() -> None:
+    # 引擎：攒满即发，余下的等 linger 到期；非批量仍逐个发；每个 event 各自收到回调
+    send = _RecordingSend()
+    engine = WebhookDeliveryEngine(workers=2, per_target_limit=2, max_retry_delay=10, send=send)
+    finals: list[int] = []
+    for i in range(7):
+        engine.submit(
+            "https://8.8.8.8/hook", None, {"event_id": f"evt_{i}"}, 5, 1, 0,
+            lambda r, final, i=i: finals.append(i) if final else None,
+            batch_key="sub_a", batch_max_size=3, batch_linger=0.3,
+        )
+    engine.submit("https://8.8.8.8/hook", None, {"event_id": "single"}, 5, 1, 0, lambda r, final: None)
+    if not _wait(lambda: len(send.payloads) == 3, 1) or engine.stats()["batching"] != 1:
+        raise SystemExit(f"FAIL: full batches not sent immediately: {send.payloads} {engine.stats()}")
+    if not _wait(lambda: len(send.payloads) == 4, 2):
+        raise SystemExit("FAIL: linger did not flush the partial batch")
+    sizes = sorted(len(p) if isinstance(p, list) else 0 for p in send.payloads)
+    if sizes != [0, 1, 3, 3] or sorted(finals) != list(range(7)):
+        raise SystemExit(f"FAIL: unexpected batches {sizes} finals={finals}")
+    engine.shutdown()
+
+    # 参数校验
+    store = JoyGateStore(charger_ids=["charger-001"])
+    for kwargs in ({"batch_max_size": 101}, {"batch_max_size": 0}, {"batch_linger_ms": 100}, {"batch_max_size": 5, "batch_linger_ms": -1}):
+        try:
+            store.create_webhook_subscription("https://8.8.8.8/hook", ["INCIDENT_STATUS_CHANGED"], None, True, **kwargs)
+        except ValueError:
+            continue
+        raise SystemExit(f"FAIL: invalid batch config accepted: {kwargs}")
+
+    # 端到端：12 个 event -> 3 个数组 POST（5/5/2），签名覆盖整个 body，各 event 保留 event_id
+    server = HTTPServer(("127.0.0.1", 0), _Receiver)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/hook"
+    sub = store.create_webhook_subscription(url, ["INCIDENT_STATUS_CHANGED"], "s3cret", True, batch_max_size=5, batch_linger_ms=200)
+    if sub.get("batch_max_size") != 5 or sub.get("batch_linger_ms") != 200 or "secret" in sub:
+        raise SystemExit(f"FAIL: subscription view unexpected: {sub}")
+    plain = store.create_webhook_subscription(url, ["HOLD_CREATED"], None, True)
+    if plain.get("batch_max_size") is not None:
+        raise SystemExit(f"FAIL: batch mode should be off by default: {plain}")
+    for i in range(12):
+        store._enqueue_webhook_event_locked("INCIDENT_STATUS_CHANGED", "incident", f"inc_{i}", {"i": i})  # type: ignore[attr-defined]
+    dispatch_webhook_outbox(store, lambda fn, *args: fn(*args), 5, 1, 0)
+    if not _wait(lambda: all(d["delivery_status"] == "DELIVERED" for d in store.list_webhook_deliveries()), 3):
+        raise SystemExit(f"FAIL: deliveries not delivered: {store.list_webhook_deliveries()}")
+    if sorted(len(json.loads(body)) for _, body in _Receiver.posts) != [2, 5, 5]:
+        raise SystemExit(f"FAIL: expected batches of 5/5/2, got {len(_Receiver.posts)} posts")
+    event_ids: list[str] = []
+    for headers, body in _Receiver.posts:
+        ts = headers.get("X-JoyGate-Timestamp") or ""
+        expected = "sha256=" + hmac.new(b"s3cret", ts.encode() + b"." + body, hashlib.sha256).hexdigest()
+        if headers.get("X-JoyGate-Signature") != expected:
+            raise SystemExit("FAIL: batch signature does not cover the body")
+        events = json.loads(body)
+        if headers.get("X-JoyGate-Batch-Size") != str(len(events)):
+            raise SystemExit(f"FAIL: batch size header mismatch: {headers.get('X-JoyGate-Batch-Size')}")
+        event_ids.extend(e["event_id"] for e in events)
+    if len(set(event_ids)) != 12:
+        raise SystemExit(f"FAIL: event_ids not preserved per event: {event_ids}")
+    server.shutdown()
+    shutdown_webhook_delivery_engine()
+
+    print("PASS: webhook batch delivery (size/linger flush, per-event callbacks, signed array body, opt-in)")
+
+
+if __name__ == "__main__":
+    main()
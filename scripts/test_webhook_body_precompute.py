@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+import joygate.store as store_mod
+import joygate.webhooks_logic as wl
+from joygate.store import JoyGateStore
+from joygate.webhook_delivery import WebhookDeliveryEngine
+
+
+class _CountingJson:
+    """替代 webhooks_logic 里的 json 模块：统计 dumps 调用次数。"""
+
+    def __init__(self) -> None:
+        self.dumps_calls = 0
+
+    def dumps(self, *args, **kwargs):
+        self.dumps_calls += 1
+        return json.dumps(*args, **kwargs)
+
+
+class _FlakySend:
+    """每个 target 前两次返回 500；记录收到的 body 对象。"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.bodies: list[bytes] = []
+        self.per_target: dict[str, int] = {}
+
+    def __call__(self, session, target_url, secret, payload, timeout, allow_http=False, allow_localhost=False) -> dict:
+        with self.lock:
+            self.bodies.append(payload)
+            n = self.per_target[target_url] = self.per_target.get(target_url, 0) + 1
+        if n <= 2:
+            return {"delivered": False, "last_status_code": 500, "last_error": "non_2xx_status"}
+        return {"delivered": True, "last_status_code": 200, "last_error": None}
+
+
+def main() -> None:
+    # 批量 body 由已序列化的单个 event 拼接，与整体序列化逐字节一致
+    events = [{"event_id": f"evt_{i}", "data": {"b": i, "a": [1, "中"]}} for i in range(3)]
+    joined = wl.serialize_webhook_body([wl.serialize_webhook_body(e) for e in events])
+    if joined != json.dumps(events, separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode("utf-8"):
+        raise SystemExit("FAIL: joined batch body differs from canonical serialization")
+
+    # 缓存的 HMAC key 对象：签名与直接计算一致，不同 secret / 时间戳互不影响
+    body = wl.serialize_webhook_body(events[0])
+    for secret, ts in (("s1", "100"), ("s2", "100"), ("s1", "101")):
+        expected = "sha256=" + hmac.new(secret.encode(), ts.encode() + b"." + body, hashlib.sha256).hexdigest()
+        if wl.build_signature(secret, ts, body) != expected:
+            raise SystemExit(f"FAIL: signature mismatch for secret={secret} ts={ts}")
+
+    # 一个 event、5 个订阅、每个订阅重试 3 次：只序列化一次，所有尝试共用同一个 bytes
+    counting = _CountingJson()
+    wl.json = counting  # type: ignore[assignment]
+    send = _FlakySend()
+    engine = WebhookDeliveryEngine(workers=4, per_target_limit=2, max_retry_delay=1, send=send)
+    store_mod.get_webhook_delivery_engine = lambda: engine  # type: ignore[assignment]
+    store = JoyGateStore(charger_ids=["charger-001"])
+    for i in range(5):
+        store.create_webhook_subscription(f"https://8.8.8.{i + 1}/hook", ["INCIDENT_CREATED"], f"secret{i}", True)
+    store._enqueue_webhook_event_locked("INCIDENT_CREATED", "incident", "inc_1", {"x": 1})  # type: ignore[attr-defined]
+    wl.dispatch_webhook_outbox(store, lambda fn, *args: fn(*args), 5, 3, 0)
+    deadline = time.time() + 5
+    while time.time() < deadline and len(send.bodies) < 15:
+        time.sleep(0.02)
+    engine.shutdown()
+    if len(send.bodies) != 15:
+        raise SystemExit(f"FAIL: expected 15 attempts, got {len(send.bodies)}")
+    if counting.dumps_calls != 1:
+        raise SystemExit(f"FAIL: event serialized {counting.dumps_calls} times, expected once")
+    if len({id(b) for b in send.bodies}) != 1 or not isinstance(send.bodies[0], bytes):
+        raise SystemExit("FAIL: attempts did not share the precomputed body")
+    wl.json = json  # type: ignore[assignment]
+
+    print("PASS: webhook body precompute (serialize once per event, shared across subscribers/retries, cached HMAC)")
+
+
+if __name__ == "__main__":
+    main()
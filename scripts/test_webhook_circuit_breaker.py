@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# 本地接收端 + 小阈值 / 短冷却（须在 import joygate 之前设置）
+os.environ["JOYGATE_WEBHOOK_ALLOW_HTTP"] = "1"
+os.environ["JOYGATE_WEBHOOK_ALLOW_LOCALHOST"] = "1"
+os.environ["JOYGATE_WEBHOOK_BREAKER_FAILURE_THRESHOLD"] = "2"
+os.environ["JOYGATE_WEBHOOK_BREAKER_OPEN_SECONDS"] = "0.5"
+
+from joygate.store import JoyGateStore  # noqa: E402
+from joygate.webhook_delivery import WebhookDeliveryEngine, shutdown_webhook_delivery_engine  # noqa: E402
+from joygate.webhooks_logic import WebhookCircuitBreaker, dispatch_webhook_outbox  # noqa: E402
+
+
+def _server(status: dict) -> tuple[HTTPServer, list[int]]:
+    hits: list[int] = []
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_POST(self):  # noqa: N802
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            hits.append(status["code"])
+            self.send_response(status["code"])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hits
+
+
+def _wait(pred, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if pred():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _emit(store: JoyGateStore, n: int) -> None:
+    for i in range(n):
+        store._enqueue_webhook_event_locked("INCIDENT_STATUS_CHANGED", "incident", f"inc_{i}", {"i": i})  # type: ignore[attr-defined]
+    dispatch_webhook_outbox(store, lambda fn, *args: fn(*args), 2, 1, 0)
+
+
+def _sub_stats(store: JoyGateStore, sub_id: str) -> dict:
+    return next(s for s in store.webhook_stats()["subscriptions"] if s["subscription_id"] == sub_id)
+
+
+def main() -> None:
+    # 状态机：连续失败到阈值打开；冷却到期放一个探测；探测失败冷却翻倍，成功关闭并复位
+    br = WebhookCircuitBreaker(3, 1.0, 4.0)
+    for _ in range(3):
+        br.record(False, 10.0, 100.0, "timeout")
+    if br.state != "OPEN" or br.allow(100.5):
+        raise SystemExit(f"FAIL: breaker should be open and reject: {br.state}")
+    if not br.allow(101.0) or br.state != "HALF_OPEN" or br.allow(101.0):
+        raise SystemExit("FAIL: exactly one probe should pass after cooldown")
+    br.record(False, 10.0, 101.0, "timeout")
+    if br.state != "OPEN" or br.open_until != 103.0:
+        raise SystemExit(f"FAIL: failed probe should double cooldown: {br.state} {br.open_until}")
+    br.allow(103.0)
+    br.record(True, 10.0, 103.0)
+    if br.state != "CLOSED" or br.open_seconds != 1.0 or br.consecutive_failures != 0:
+        raise SystemExit("FAIL: successful probe should close and reset")
+
+    # 自适应并发：慢响应使在途上限下降，快速成功后恢复
+    calls = {"delay": 0.1}
+
+    def _send(session, target_url, secret, payload, timeout, allow_http=False, allow_localhost=False):
+        time.sleep(calls["delay"])
+        return {"delivered": True, "last_status_code": 200, "last_error": None}
+
+    engine = WebhookDeliveryEngine(workers=4, per_target_limit=4, max_retry_delay=10, send=_send, slow_latency=0.05)
+    done: list[int] = []
+    for i in range(4):
+        engine.submit("https://8.8.8.8/h", None, {"i": i}, 5, 1, 0, lambda r, final: done.append(1))
+    if not _wait(lambda: len(done) == 4, 3) or engine.stats()["throttled_targets"] != 1:
+        raise SystemExit(f"FAIL: slow target not throttled: {engine.stats()}")
+    calls["delay"] = 0.0
+    for i in range(40):
+        engine.submit("https://8.8.8.8/h", None, {"i": i}, 5, 1, 0, lambda r, final: done.append(1))
+    if not _wait(lambda: len(done) == 44, 3) or engine.stats()["throttled_targets"] != 0:
+        raise SystemExit(f"FAIL: limit not restored after fast successes: {engine.stats()}")
+    engine.shutdown()
+
+    # 端到端：坏订阅熔断后 event 停放、不再打到接收方；好订阅不受影响；恢复后停放的全部投出
+    bad_status = {"code": 500}
+    bad_server, bad_hits = _server(bad_status)
+    good_server, good_hits = _server({"code": 200})
+    store = JoyGateStore(charger_ids=["charger-001"])
+    bad = store.create_webhook_subscription(
+        f"http://127.0.0.1:{bad_server.server_address[1]}/h", ["INCIDENT_STATUS_CHANGED"], None, True
+    )["subscription_id"]
+    good = store.create_webhook_subscription(
+        f"http://127.0.0.1:{good_server.server_address[1]}/h", ["INCIDENT_STATUS_CHANGED"], None, True
+    )["subscription_id"]
+    _emit(store, 2)
+    if not _wait(lambda: _sub_stats(store, bad)["breaker_state"] == "OPEN", 3):
+        raise SystemExit(f"FAIL: breaker did not open: {_sub_stats(store, bad)}")
+    _emit(store, 10)
+    if not _wait(lambda: len(good_hits) == 12, 3):
+        raise SystemExit(f"FAIL: healthy subscriber delayed: {len(good_hits)} hits")
+    stats = _sub_stats(store, bad)
+    if len(bad_hits) != 2 or stats["parked"] != 10 or store.webhook_stats()["parked_total"] != 10:
+        raise SystemExit(f"FAIL: open breaker should park, hits={len(bad_hits)} stats={stats}")
+    parked_errors = {d["last_error"] for d in store.list_webhook_deliveries() if d["subscription_id"] == bad and d["delivery_status"] == "PENDING"}
+    if parked_errors != {"circuit_open"}:
+        raise SystemExit(f"FAIL: parked deliveries should show circuit_open: {parked_errors}")
+    if _sub_stats(store, good)["breaker_state"] != "CLOSED" or _sub_stats(store, good)["avg_latency_ms"] is None:
+        raise SystemExit(f"FAIL: good subscription stats unexpected: {_sub_stats(store, good)}")
+
+    bad_status["code"] = 200
+    time.sleep(0.6)
+    if store.release_parked_webhook_deliveries() != 1:
+        raise SystemExit("FAIL: exactly one parked delivery should be released as probe")
+    if not _wait(lambda: _sub_stats(store, bad)["breaker_state"] == "CLOSED" and _sub_stats(store, bad)["parked"] == 0, 3):
+        raise SystemExit(f"FAIL: breaker did not recover: {_sub_stats(store, bad)}")
+    delivered = lambda: sum(  # noqa: E731
+        1 for d in store.list_webhook_deliveries() if d["subscription_id"] == bad and d["delivery_status"] == "DELIVERED"
+    )
+    if not _wait(lambda: delivered() == 10, 3) or len(bad_hits) != 12:
+        raise SystemExit(f"FAIL: parked deliveries not flushed after recovery: delivered={delivered()} hits={len(bad_hits)}")
+    bad_server.shutdown()
+    good_server.shutdown()
+    shutdown_webhook_delivery_engine()
+
+    print("PASS: webhook circuit breaker (open/half-open/closed, parking, isolation, adaptive concurrency, stats)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+
+from joygate.webhook_delivery import WebhookDeliveryEngine
+from joygate.webhooks_logic import webhook_retry_delay
+
+
+class _FakeSend:
+    """替代 HTTP：按 target 记录并发度；fail_first 个请求返回 500；每次耗时 delay 秒。"""
+
+    def __init__(self, delay: float, fail_first: int = 0) -> None:
+        self.delay = delay
+        self.fail_first = fail_first
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.inflight: dict[str, int] = {}
+        self.max_inflight: dict[str, int] = {}
+        self.call_times: list[float] = []
+        self.sessions: set[int] = set()
+
+    def __call__(self, session, target_url, secret, payload, timeout, allow_http=False, allow_localhost=False) -> dict:
+        host = target_url.split("/")[2]
+        with self.lock:
+            self.calls += 1
+            n = self.calls
+            self.call_times.append(time.monotonic())
+            self.sessions.add(id(session))
+            self.inflight[host] = self.inflight.get(host, 0) + 1
+            self.max_inflight[host] = max(self.max_inflight.get(host, 0), self.inflight[host])
+        time.sleep(self.delay)
+        with self.lock:
+            self.inflight[host] -= 1
+        if n <= self.fail_first:
+            return {"delivered": False, "last_status_code": 500, "last_error": "non_2xx_status"}
+        return {"delivered": True, "last_status_code": 200, "last_error": None}
+
+
+def _wait(pred, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if pred():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def main() -> None:
+    # 退避：指数增长、封顶、±20% 抖动；backoff=0 立即重试
+    rng = random.Random(1)
+    for attempt, base in ((1, 2.0), (2, 4.0), (3, 8.0), (6, 10.0)):
+        d = webhook_retry_delay(2, attempt, 10, rng)
+        if not (base * 0.8 <= d <= base * 1.2):
+            raise SystemExit(f"FAIL: retry delay attempt={attempt} got {d}, base {base}")
+    if webhook_retry_delay(0, 3, 10) != 0.0:
+        raise SystemExit("FAIL: backoff=0 should retry immediately")
+
+    # submit 不阻塞；同一 target 在途数 <= 上限，不同 target 并行；worker 复用长连接 session
+    send = _FakeSend(delay=0.2)
+    engine = WebhookDeliveryEngine(workers=6, per_target_limit=2, max_retry_delay=10, send=send)
+    finals: list[dict] = []
+    lock = threading.Lock()
+
+    def on_attempt(result: dict, final: bool) -> None:
+        if final:
+            with lock:
+                finals.append(result)
+
+    t0 = time.monotonic()
+    for i in range(8):
+        host = "slow.example" if i < 6 else "other.example"
+        engine.submit(f"https://{host}/hook", None, {"i": i}, 5, 1, 0, on_attempt)
+    if time.monotonic() - t0 > 0.1:
+        raise SystemExit("FAIL: submit blocked the caller")
+    if not _wait(lambda: len(finals) == 8, 5):
+        raise SystemExit(f"FAIL: deliveries not finished, finals={len(finals)}")
+    if send.max_inflight.get("slow.example") != 2:
+        raise SystemExit(f"FAIL: per-target limit not enforced: {send.max_inflight}")
+    if len(send.sessions) > 6:
+        raise SystemExit(f"FAIL: sessions not reused per worker: {len(send.sessions)}")
+    engine.shutdown()
+
+    # 失败重试走延迟队列：间隔遵守 backoff（±抖动），worker 不 sleep；attempts 逐次回写、顺序递增
+    send = _FakeSend(delay=0.0, fail_first=2)
+    engine = WebhookDeliveryEngine(workers=2, per_target_limit=1, max_retry_delay=10, send=send)
+    attempts: list[tuple[int, bool, bool]] = []
+    engine.submit(
+        "https://retry.example/hook", "s3cret", {"x": 1}, 5, 3, 1,
+        lambda r, final: attempts.append((r["attempts"], bool(r["delivered"]), final)),
+    )
+    if not _wait(lambda: any(f for _, _, f in attempts), 8):
+        raise SystemExit(f"FAIL: retry did not finish: {attempts}")
+    if attempts != [(1, False, False), (2, False, False), (3, True, True)]:
+        raise SystemExit(f"FAIL: unexpected attempt sequence {attempts}")
+    gaps = [b - a for a, b in zip(send.call_times, send.call_times[1:])]
+    if not (0.75 <= gaps[0] <= 1.4 and 1.55 <= gaps[1] <= 2.6):
+        raise SystemExit(f"FAIL: retry gaps do not follow backoff: {gaps}")
+    engine.shutdown()
+
+    print("PASS: webhook delivery engine (non-blocking submit, per-target limit, session reuse, delayed retries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import time
+
+from joygate.store import JoyGateStore
+from joygate.webhooks_logic import WebhookDeliveryTable
+
+
+def _rec(i: int, event_id: str | None = None, subscription_id: str = "sub_a") -> dict:
+    return {"delivery_id": f"del_{i}", "event_id": event_id or f"evt_{i}", "subscription_id": subscription_id}
+
+
+def main() -> None:
+    table = WebhookDeliveryTable()
+    for i in range(10):
+        table.add(_rec(i), now=100.0 + i)
+
+    # 唯一索引去重
+    if table.find("evt_3", "sub_a") is None or table.find("evt_3", "sub_b") is not None:
+        raise SystemExit("FAIL: (event_id, subscription_id) index lookup wrong")
+
+    # 保留期按最后更新计：touch 过的老记录保留，其余按时间出队
+    table.touch("del_0", now=200.0)
+    removed = table.expire(now=215.0, retention_seconds=20.0)
+    remaining = sorted(r["delivery_id"] for r in table)
+    if removed != 9 or remaining != ["del_0"]:
+        raise SystemExit(f"FAIL: expire removed={removed} remaining={remaining}")
+    if table.find("evt_5", "sub_a") is not None:
+        raise SystemExit("FAIL: expired delivery still in unique index")
+    if table.expire(now=215.0, retention_seconds=0) != 0:
+        raise SystemExit("FAIL: retention<=0 should disable cleanup")
+
+    # 最近 N 条按创建倒序
+    for i in range(10, 20):
+        table.add(_rec(i), now=300.0)
+    latest = [r["delivery_id"] for r in table.latest(3)]
+    if latest != ["del_19", "del_18", "del_17"]:
+        raise SystemExit(f"FAIL: latest order {latest}")
+
+    # 频繁 touch 不让保留队列无限增长
+    for k in range(5000):
+        table.touch("del_19", now=300.0 + k * 0.001)
+        table.expire(now=300.0 + k * 0.001, retention_seconds=3600)
+    if len(table._retention) > 2 * len(table) + 64 + 1:  # type: ignore[attr-defined]
+        raise SystemExit(f"FAIL: retention queue not compacted: {len(table._retention)}")  # type: ignore[attr-defined]
+
+    # store 端到端：同 event+subscription 只建一条；大量 delivery 下去重/状态回写不退化为线性扫描
+    store = JoyGateStore(charger_ids=["charger-001"])
+    event = {"event_id": "evt_x", "event_type": "INCIDENT_CREATED"}
+    first = store.create_webhook_delivery_if_absent(event, "sub_1", "https://8.8.8.8/h")
+    if first is None or store.create_webhook_delivery_if_absent(event, "sub_1", "https://8.8.8.8/h") is not None:
+        raise SystemExit("FAIL: store dedup broken")
+    t0 = time.perf_counter()
+    for i in range(20000):
+        store.create_webhook_delivery_if_absent({"event_id": f"evt_{i}", "event_type": "X"}, "sub_1", "https://8.8.8.8/h")
+    store._record_webhook_attempt(first, {"delivered": True, "attempts": 1, "last_status_code": 200}, True)  # type: ignore[attr-defined]
+    elapsed = time.perf_counter() - t0
+    if elapsed > 5.0:
+        raise SystemExit(f"FAIL: 20k deliveries took {elapsed:.2f}s")
+    items = store.list_webhook_deliveries()
+    if len(items) != 50 or items[0]["event_id"] != "evt_19999":
+        raise SystemExit(f"FAIL: list_webhook_deliveries wrong head {items[:1]}")
+    rec = store._webhook_deliveries.get(first)  # type: ignore[attr-defined]
+    if rec is None or rec["delivery_status"] != "DELIVERED":
+        raise SystemExit(f"FAIL: status not written back: {rec}")
+
+    print(f"PASS: webhook delivery table (unique index, retention deque, latest, 20k deliveries in {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
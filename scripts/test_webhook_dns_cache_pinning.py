@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import socket
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import joygate.webhook_target_url as wtu
+from joygate.webhooks_logic import new_webhook_session, send_webhook_once
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.t = 1000.0
+
+    def monotonic(self) -> float:
+        return self.t
+
+
+class _Resolver:
+    """替代 socket.getaddrinfo：按 answers[host] 返回地址，None 表示 NXDOMAIN；记录调用次数。"""
+
+    def __init__(self) -> None:
+        self.answers: dict[str, str | None] = {}
+        self.calls = 0
+
+    def __call__(self, host, port, family=0, type=0, proto=0, flags=0):
+        self.calls += 1
+        ip = self.answers.get(host)
+        if ip is None:
+            raise socket.gaierror("no such host")
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (ip, port))]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hosts: list[str] = []
+
+    def do_POST(self):  # noqa: N802
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        _Handler.hosts.append(self.headers.get("Host") or "")
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def main() -> None:
+    clock = _Clock()
+    resolver = _Resolver()
+    wtu.time = clock  # type: ignore[assignment]
+    # 只替换 webhook_target_url 看到的 socket；真实连接仍走系统 socket
+    wtu.socket = types.SimpleNamespace(  # type: ignore[assignment]
+        getaddrinfo=resolver, gaierror=socket.gaierror, AF_UNSPEC=socket.AF_UNSPEC, SOCK_STREAM=socket.SOCK_STREAM
+    )
+    wtu.clear_dns_cache()
+
+    # 正缓存：TTL 内重复校验只解析一次；过期后重新解析
+    resolver.answers["hooks.example"] = "93.184.216.34"
+    for _ in range(4):
+        ok, _err = wtu.validate_webhook_target_url("https://hooks.example/a")
+        if not ok:
+            raise SystemExit("FAIL: public target rejected")
+    if resolver.calls != 1:
+        raise SystemExit(f"FAIL: expected 1 DNS lookup within TTL, got {resolver.calls}")
+    clock.t += wtu.DNS_CACHE_TTL_SECONDS + 1
+    wtu.validate_webhook_target_url("https://hooks.example/a")
+    if resolver.calls != 2:
+        raise SystemExit(f"FAIL: expired entry not re-resolved, calls={resolver.calls}")
+
+    # 负缓存：NXDOMAIN 在负 TTL 内不重复解析
+    calls = resolver.calls
+    for _ in range(3):
+        if wtu.validate_webhook_target_url("https://missing.example/a")[0]:
+            raise SystemExit("FAIL: unresolvable host accepted")
+    if resolver.calls != calls + 1:
+        raise SystemExit(f"FAIL: negative result not cached, calls={resolver.calls - calls}")
+
+    # SSRF 判定对缓存地址每次重跑：同一缓存条目，allow_localhost 不同结果不同
+    resolver.answers["loop.example"] = "127.0.0.1"
+    if wtu.validate_webhook_target_url("https://loop.example/a")[0]:
+        raise SystemExit("FAIL: loopback accepted without allow_localhost")
+    if not wtu.validate_webhook_target_url("https://loop.example/a", allow_localhost=True)[0]:
+        raise SystemExit("FAIL: loopback rejected with allow_localhost")
+
+    # 缓存有界
+    for i in range(wtu.DNS_CACHE_MAX_ENTRIES + 50):
+        wtu.validate_webhook_target_url(f"https://h{i}.example/a")
+    if len(wtu._DNS_CACHE) > wtu.DNS_CACHE_MAX_ENTRIES:  # type: ignore[attr-defined]
+        raise SystemExit(f"FAIL: cache exceeded bound: {len(wtu._DNS_CACHE)}")  # type: ignore[attr-defined]
+
+    # IP 固定：主机名只存在于缓存（系统 DNS 无法解析），连接仍打到校验过的 IP，Host 头保持原主机名
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    resolver.answers["pinned.invalid"] = "127.0.0.1"
+    url = f"http://pinned.invalid:{port}/hook"
+    with new_webhook_session() as session:
+        res = send_webhook_once(session, url, None, {"a": 1}, 5, allow_http=True, allow_localhost=True)
+        if not res.get("delivered"):
+            raise SystemExit(f"FAIL: pinned delivery failed: {res}")
+        if _Handler.hosts != [f"pinned.invalid:{port}"]:
+            raise SystemExit(f"FAIL: Host header not preserved: {_Handler.hosts}")
+        # rebinding 到内网地址：缓存过期后重新解析被 SSRF 检查拦下，不发请求
+        resolver.answers["pinned.invalid"] = "10.0.0.5"
+        clock.t += wtu.DNS_CACHE_TTL_SECONDS + 1
+        res = send_webhook_once(session, url, None, {"a": 2}, 5, allow_http=True, allow_localhost=True)
+        if res.get("last_error") != "invalid_target_url" or len(_Handler.hosts) != 1:
+            raise SystemExit(f"FAIL: rebinding to private IP not blocked: {res}")
+    server.shutdown()
+
+    print("PASS: webhook DNS cache (TTL, negative caching, bounded, SSRF on cached IPs, pinned connection)")
+
+
+if __name__ == "__main__":
+    main()
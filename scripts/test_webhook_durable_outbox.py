@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+
+# 小 segment，便于覆盖滚动与回收（须在 import joygate 之前设置）
+os.environ["JOYGATE_WEBHOOK_OUTBOX_SEGMENT_BYTES"] = "4096"
+
+from joygate.store import MAX_WEBHOOK_OUTBOX, JoyGateStore  # noqa: E402
+from joygate.webhooks_logic import dispatch_webhook_outbox  # noqa: E402
+
+
+def _enqueue(store: JoyGateStore, n: int) -> None:
+    for i in range(n):
+        store._enqueue_webhook_event_locked("INCIDENT_CREATED", "incident", f"inc_{i}", {"i": i})  # type: ignore[attr-defined]
+
+
+def _segments(path: str) -> list[str]:
+    return sorted(n for n in os.listdir(path) if n.endswith(".seg"))
+
+
+def _dispatch_all(store: JoyGateStore, finish) -> list[str]:
+    """反复派发直到 outbox 读空；finish(event_id) 决定该 delivery 是否立即到终态。返回派发到的 event_id 顺序。"""
+    seen: list[str] = []
+
+    def _process(delivery_id, target_url, secret, event, timeout, max_attempts, backoff, body=None):
+        seen.append(event["event_id"])
+        if finish(event["event_id"]):
+            store._record_webhook_attempt(  # type: ignore[attr-defined]
+                delivery_id, {"delivered": True, "attempts": 1, "last_status_code": 200}, True, event["event_id"]
+            )
+
+    store.process_webhook_delivery = _process  # type: ignore[method-assign]
+    for _ in range(1000):
+        if dispatch_webhook_outbox(store, lambda fn, *args: fn(*args), 5, 1, 0) == 0:
+            break
+    return seen
+
+
+def main() -> None:
+    root = tempfile.mkdtemp(prefix="joygate_outbox_")
+    try:
+        total = MAX_WEBHOOK_OUTBOX + 500
+        a = JoyGateStore(charger_ids=["charger-001"], webhook_outbox_dir=root)
+        sub = a.create_webhook_subscription("https://8.8.8.8/hook", ["INCIDENT_CREATED"], "s3cret", True)
+        _enqueue(a, total)
+        # 超过内存上限也不丢，且不占内存 list
+        if a.webhook_outbox_backlog() != total or a._webhook_outbox:  # type: ignore[attr-defined]
+            raise SystemExit(f"FAIL: backlog={a.webhook_outbox_backlog()} expected {total}")
+        if len(_segments(root)) < 2:
+            raise SystemExit("FAIL: segments did not roll")
+        a.sync_webhook_outbox()
+        # 模拟崩溃：不 close，尾部留半行
+        with open(os.path.join(root, _segments(root)[-1]), "ab") as f:
+            f.write(b'{"seq":99999,"event":{"event_id":"evt_tor')
+
+        # 重启：截掉半行，订阅与积压恢复，全部投完后已提交的 segment 被删除
+        b = JoyGateStore(charger_ids=["charger-001"], webhook_outbox_dir=root)
+        subs = b.list_webhook_subscriptions()
+        if [s["subscription_id"] for s in subs] != [sub["subscription_id"]]:
+            raise SystemExit(f"FAIL: subscription not restored: {subs}")
+        if b.webhook_outbox_backlog() != total:
+            raise SystemExit(f"FAIL: backlog after restart={b.webhook_outbox_backlog()} expected {total}")
+        order = _dispatch_all(b, lambda _eid: True)
+        if len(order) != total or len(set(order)) != total:
+            raise SystemExit(f"FAIL: expected {total} unique events, got {len(order)}/{len(set(order))}")
+        b.sync_webhook_outbox()
+        if b.webhook_outbox_backlog() != 0:
+            raise SystemExit(f"FAIL: backlog not drained: {b.webhook_outbox_backlog()}")
+        if len(_segments(root)) != 1:
+            raise SystemExit(f"FAIL: committed segments not removed: {_segments(root)}")
+
+        # 第 100 个 event 的 delivery 未到终态：位点停在它之前，重启后从它开始重放（at-least-once）
+        _enqueue(b, 400)
+        calls = [0]
+
+        def _finish_all_but_100th(_eid: str) -> bool:
+            calls[0] += 1
+            return calls[0] != 100
+
+        order = _dispatch_all(b, _finish_all_but_100th)
+        b.sync_webhook_outbox()
+        b.close_webhook_outbox()
+        c = JoyGateStore(charger_ids=["charger-001"], webhook_outbox_dir=root)
+        replay = _dispatch_all(c, lambda _eid: True)
+        if replay != order[99:]:
+            raise SystemExit(f"FAIL: replay should start at the unfinished event, got {len(replay)} events")
+        c.sync_webhook_outbox()
+        if c.webhook_outbox_backlog() != 0:
+            raise SystemExit(f"FAIL: backlog after replay={c.webhook_outbox_backlog()}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("PASS: durable webhook outbox (no drops past cap, crash recovery, segment GC, at-least-once replay)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from joygate.store import JoyGateStore
+from joygate.webhooks_logic import dispatch_webhook_outbox
+
+
+class _CountingLock:
+    """包住 store._webhooks_lock，统计 acquire 次数。"""
+
+    def __init__(self, inner) -> None:
+        self.inner = inner
+        self.acquires = 0
+
+    def __enter__(self):
+        self.acquires += 1
+        return self.inner.__enter__()
+
+    def __exit__(self, *exc):
+        return self.inner.__exit__(*exc)
+
+
+def main() -> None:
+    store = JoyGateStore(charger_ids=["charger-001"])
+    a = store.create_webhook_subscription("https://8.8.8.8/a", ["INCIDENT_CREATED"], None, True)
+    b = store.create_webhook_subscription("https://8.8.4.4/b", ["INCIDENT_CREATED", "INCIDENT_STATUS_CHANGED"], "s", True)
+    store.create_webhook_subscription("https://1.1.1.1/c", ["INCIDENT_CREATED"], None, False)
+
+    # 倒排索引：只含 enabled 订阅，按创建序
+    ids = [t["subscription_id"] for t in store.list_enabled_webhook_targets_for_event("INCIDENT_CREATED")]
+    if ids != [a["subscription_id"], b["subscription_id"]]:
+        raise SystemExit(f"FAIL: INCIDENT_CREATED targets unexpected: {ids}")
+    resolved = store.resolve_webhook_targets_for_events(["INCIDENT_STATUS_CHANGED", "HOLD_EXPIRED", "INCIDENT_CREATED"])
+    if set(resolved) != {"INCIDENT_STATUS_CHANGED", "INCIDENT_CREATED"}:
+        raise SystemExit(f"FAIL: batch resolve keys unexpected: {sorted(resolved)}")
+    if resolved["INCIDENT_STATUS_CHANGED"][0].get("secret") != "s":
+        raise SystemExit(f"FAIL: target secret missing: {resolved['INCIDENT_STATUS_CHANGED']}")
+    # 返回副本：调用方修改不影响索引
+    resolved["INCIDENT_CREATED"][0]["target_url"] = "https://evil.example/"
+    if store.list_enabled_webhook_targets_for_event("INCIDENT_CREATED")[0]["target_url"] != "https://8.8.8.8/a":
+        raise SystemExit("FAIL: index mutated through returned target")
+
+    # 启用状态变化后重建索引项
+    with store._webhooks_lock:  # type: ignore[attr-defined]
+        rec = store._webhook_subscriptions[a["subscription_id"]]  # type: ignore[attr-defined]
+        rec["is_enabled"] = False
+        store._index_webhook_subscription_locked(rec)  # type: ignore[attr-defined]
+    ids = [t["subscription_id"] for t in store.list_enabled_webhook_targets_for_event("INCIDENT_CREATED")]
+    if ids != [b["subscription_id"]]:
+        raise SystemExit(f"FAIL: disabled subscription still indexed: {ids}")
+
+    # 一批 200 个 event 的派发只为解析订阅取一次锁
+    store.put_back_webhook_outbox(
+        [{"event_id": f"evt_{i}", "event_type": "HOLD_EXPIRED", "object_id": "x"} for i in range(200)]
+    )
+    counting = _CountingLock(store._webhooks_lock)  # type: ignore[attr-defined]
+    original = store.resolve_webhook_targets_for_events
+    resolve_calls = []
+
+    def _resolve(event_types):
+        resolve_calls.append(1)
+        store._webhooks_lock = counting  # type: ignore[attr-defined]
+        try:
+            return original(event_types)
+        finally:
+            store._webhooks_lock = counting.inner  # type: ignore[attr-defined]
+
+    store.resolve_webhook_targets_for_events = _resolve  # type: ignore[method-assign]
+    store.list_enabled_webhook_targets_for_event = lambda _t: (_ for _ in ()).throw(  # type: ignore[method-assign]
+        SystemExit("FAIL: per-event target lookup used during dispatch")
+    )
+    added = dispatch_webhook_outbox(store, lambda *args: None, 5, 1, 0)
+    if added != 0 or resolve_calls != [1] or counting.acquires != 1:
+        raise SystemExit(f"FAIL: expected one batched resolve, calls={resolve_calls} acquires={counting.acquires}")
+
+    print("PASS: webhook subscription index (enabled-only, ordered, copies, reindex, one lock per drained batch)")
+
+
+if __name__ == "__main__":
+    main()
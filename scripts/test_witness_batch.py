@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+批量 witness 投票验收：
+- store 层：witness_respond_batch / record_segment_witness_batch 与逐条调用结果一致（incident 状态、记分、hazard、去重），
+  批内 HAZARD_STATUS_CHANGED 按 segment 合并；
+- HTTP 层（自启 uvicorn）：/v1/witness/respond_batch、/v1/witness/segment_respond_batch 逐条结果（204/400/404）、整批 403、条数上限。
+"""
+from __future__ import annotations
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+from joygate.config import WITNESS_BATCH_MAX_VOTES
+from joygate.store import JoyGateStore
+
+PORT = 18941
+
+
+def _hazard_events(store: JoyGateStore) -> list[str]:
+    return [e["object_id"] for e in store.drain_webhook_outbox() if e.get("event_type") == "HAZARD_STATUS_CHANGED"]
+
+
+def _charger_state(store: JoyGateStore) -> tuple[dict, dict]:
+    incidents = {r["incident_id"]: (r["incident_status"], r.get("evidence_refs")) for r in store.list_incidents()}
+    scores = {jk: rep["robot_score"] for jk, rep in store._reputation_by_joykey.items()}  # type: ignore[attr-defined]
+    return incidents, scores
+
+
+def _check_store() -> None:
+    # 同一组投票：single 逐条 witness_respond，batch 每个 witness 一次 witness_respond_batch，结果应一致
+    plan = {"w1": [1, 2], "w2": [1, 3]}
+    single, batch = JoyGateStore(), JoyGateStore()
+    single_ids = [single.report_blocked_incident(f"charger-00{n}", "BLOCKED") for n in (1, 2, 3)]
+    batch_ids = [batch.report_blocked_incident(f"charger-00{n}", "BLOCKED") for n in (1, 2, 3)]
+    for jk, chargers in plan.items():
+        for n in chargers:
+            single.witness_respond(jk, single_ids[n - 1], f"charger-00{n}", "OCCUPIED", None, [f"ref_{jk}"], None)
+        mine = [
+            {"incident_id": batch_ids[n - 1], "charger_id": f"charger-00{n}", "charger_state": "OCCUPIED", "evidence_refs": [f"ref_{jk}"]}
+            for n in chargers
+        ]
+        bad = {"incident_id": "inc_missing", "charger_id": "charger-001", "charger_state": "OCCUPIED"}
+        wrong = {"incident_id": batch_ids[0], "charger_id": "charger-009", "charger_state": "OCCUPIED"}
+        results = batch.witness_respond_batch(jk, mine + [bad, wrong, mine[0]])
+        if results[:2] != [None, None] or results[4] is not None:
+            raise SystemExit(f"FAIL: valid votes (and a duplicate) should succeed: {results}")
+        if not isinstance(results[2], KeyError) or not isinstance(results[3], ValueError):
+            raise SystemExit(f"FAIL: per-item errors: {results}")
+    s_inc, s_scores = _charger_state(single)
+    b_inc, b_scores = _charger_state(batch)
+    if [s_inc[i] for i in single_ids] != [b_inc[i] for i in batch_ids] or s_scores != b_scores:
+        raise SystemExit(f"FAIL: batch should match one-by-one votes: {s_inc} / {b_inc}, {s_scores} / {b_scores}")
+    if b_inc[batch_ids[0]][0] != "EVIDENCE_CONFIRMED" or not b_scores:
+        raise SystemExit("FAIL: w1 + w2 on charger-001 should confirm and score")
+    try:
+        batch.witness_respond_batch("intruder", [{"incident_id": batch_ids[0], "charger_id": "charger-001", "charger_state": "FREE"}])
+        raise SystemExit("FAIL: non-whitelisted witness should be rejected")
+    except PermissionError:
+        pass
+
+    seg = JoyGateStore()
+    seg.drain_webhook_outbox()
+    results = seg.record_segment_witness_batch(
+        "w1",
+        [
+            {"segment_id": "cell_1_1", "segment_state": "BLOCKED", "points_event_id": "p1"},
+            {"segment_id": "cell_1_1", "segment_state": "BLOCKED", "points_event_id": "p2", "evidence_refs": ["img_2"]},
+            {"segment_id": "cell_2_2", "hazard_status": "BLOCKED", "points_event_id": "p3"},
+            {"segment_id": "cell_2_2", "hazard_status": "BLOCKED", "points_event_id": "p3"},
+            {"segment_id": "cell_3_3", "segment_state": "UNKNOWN", "points_event_id": "p4"},
+            {"segment_id": "cell_4_4", "segment_state": "MAYBE", "points_event_id": "p5"},
+        ],
+    )
+    if results[:5] != [None] * 5 or not isinstance(results[5], ValueError):
+        raise SystemExit(f"FAIL: segment batch results: {results}")
+    if sorted(_hazard_events(seg)) != ["cell_1_1", "cell_2_2"]:
+        raise SystemExit("FAIL: HAZARD_STATUS_CHANGED should be coalesced to one per segment")
+    hazards = {h["segment_id"]: h for h in seg.list_hazards()}
+    if set(hazards) != {"cell_1_1", "cell_2_2"} or hazards["cell_1_1"].get("evidence_refs") != ["img_2"]:
+        raise SystemExit(f"FAIL: hazards after segment batch: {hazards}")
+    if len(seg._segment_witness_events) != 4:  # type: ignore[attr-defined]
+        raise SystemExit("FAIL: duplicate points_event_id should not add a witness event")
+    seg.record_segment_witness_batch("w1", [{"segment_id": "cell_1_1", "segment_state": "BLOCKED", "points_event_id": "p6"}])
+    if _hazard_events(seg):
+        raise SystemExit("FAIL: unchanged hazard_status should not emit HAZARD_STATUS_CHANGED")
+
+
+def _wait_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"FAIL: port {port} not listening")
+
+
+def _check_http() -> None:
+    env = dict(os.environ)
+    env.setdefault("PYTHONPATH", "src")
+    env["JOYGATE_DISABLE_SINGLE_WORKER_LOCK"] = "1"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "joygate.main:app", "--host", "127.0.0.1", "--port", str(PORT), "--log-level", "warning"],
+        env=env,
+    )
+    base = f"http://127.0.0.1:{PORT}"
+    try:
+        _wait_port(PORT)
+        s = requests.Session()
+        s.get(f"{base}/bootstrap", timeout=5)
+        ids = []
+        for cid in ("charger-001", "charger-002"):
+            r = s.post(f"{base}/v1/incidents/report_blocked", json={"charger_id": cid, "incident_type": "BLOCKED"}, timeout=5)
+            ids.append(r.json()["incident_id"])
+        votes = [
+            {"incident_id": ids[0], "charger_id": "charger-001", "charger_state": "OCCUPIED"},
+            {"incident_id": ids[1], "charger_id": "charger-002", "charger_state": "FREE", "evidence_refs": ["img_1"]},
+            {"incident_id": "inc_missing", "charger_id": "charger-001", "charger_state": "OCCUPIED"},
+            {"incident_id": ids[0], "charger_id": "charger-001", "charger_state": "MAYBE"},
+        ]
+        for jk in ("w1", "w2"):
+            r = s.post(f"{base}/v1/witness/respond_batch", json={"votes": votes}, headers={"X-JoyKey": jk}, timeout=5)
+            body = r.json()
+            codes = [x["status_code"] for x in body.get("results", [])]
+            if r.status_code != 200 or codes != [204, 204, 404, 400] or body.get("accepted") != 2:
+                raise SystemExit(f"FAIL: respond_batch per-item results: {r.status_code} {body}")
+        incidents = {i["incident_id"]: i for i in s.get(f"{base}/v1/incidents", timeout=5).json()["incidents"]}
+        if incidents[ids[0]]["incident_status"] != "EVIDENCE_CONFIRMED" or incidents[ids[1]]["evidence_refs"] != ["img_1"]:
+            raise SystemExit(f"FAIL: batch votes not applied: {incidents}")
+
+        r = s.post(f"{base}/v1/witness/respond_batch", json={"votes": votes[:1]}, headers={"X-JoyKey": "intruder"}, timeout=5)
+        if r.status_code != 403:
+            raise SystemExit(f"FAIL: non-whitelisted witness batch should be 403, got {r.status_code}")
+        too_many = {"votes": votes[:1] * (WITNESS_BATCH_MAX_VOTES + 1)}
+        for payload in ({"votes": []}, too_many):
+            r = s.post(f"{base}/v1/witness/respond_batch", json=payload, headers={"X-JoyKey": "w1"}, timeout=5)
+            if r.status_code != 400:
+                raise SystemExit(f"FAIL: empty / oversized batch should be 400, got {r.status_code}")
+
+        seg_votes = [
+            {"segment_id": "cell_5_5", "segment_state": "BLOCKED", "points_event_id": "sp1"},
+            {"segment_id": "cell_6_6", "hazard_status": "BLOCKED", "points_event_id": "sp2"},
+            {"segment_id": "cell_7_7", "segment_state": "BLOCKED"},
+        ]
+        r = s.post(f"{base}/v1/witness/segment_respond_batch", json={"votes": seg_votes}, headers={"X-JoyKey": "w1"}, timeout=5)
+        codes = [x["status_code"] for x in r.json().get("results", [])]
+        if r.status_code != 200 or codes != [204, 204, 400]:
+            raise SystemExit(f"FAIL: segment_respond_batch per-item results: {r.status_code} {r.text}")
+        segments = {h["segment_id"] for h in s.get(f"{base}/v1/hazards", timeout=5).json()["hazards"]}
+        if not {"cell_5_5", "cell_6_6"} <= segments or "cell_7_7" in segments:
+            raise SystemExit(f"FAIL: segment batch hazards: {segments}")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(20)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main() -> None:
+    _check_store()
+    _check_http()
+    print("PASS: witness batch voting (matches one-by-one, per-item results, coalesced hazard webhooks, 403 / size limits)")
+
+
+if __name__ == "__main__":
+    main()
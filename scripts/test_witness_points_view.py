@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+M16 票权视图 / 厂商聚合增量维护验收（直接驱动 JoyGateStore，不起服务）：
+- _witness_points 与"配置 points + reputation robot_score 覆盖"的全量重算一致（新建 reputation、计分、重启恢复后）；
+- _vendor_scores 的 vendor_score_robot_mapped 与按全部 reputation 重算的均值一致；
+- 单次投票耗时与车队规模 / incident 数无关（宽松比例断言）。
+"""
+from __future__ import annotations
+
+import shutil
+import tempfile
+import time
+
+from joygate.config import JOYKEY_TO_POINTS, JOYKEY_TO_VENDOR
+from joygate.store import JoyGateStore
+
+FLEET = 20_000
+VOTES = 150
+
+
+def _expected_points(store: JoyGateStore) -> dict[str, int]:
+    expected = dict(JOYKEY_TO_POINTS)
+    for jk, rep in store._reputation_by_joykey.items():  # type: ignore[attr-defined]
+        if jk in expected:
+            expected[jk] = int(rep.get("robot_score"))
+    return expected
+
+
+def _expected_vendor_mapped(store: JoyGateStore) -> dict[str, int]:
+    scores: dict[str, list[int]] = {}
+    for jk, rep in store._reputation_by_joykey.items():  # type: ignore[attr-defined]
+        v = rep.get("vendor") or JOYKEY_TO_VENDOR.get(jk) or "unknown"
+        scores.setdefault(v, []).append(int(rep.get("robot_score")))
+    return {v: round(sum(s) / len(s)) for v, s in scores.items()}
+
+
+def _check(store: JoyGateStore, label: str) -> None:
+    points = store._witness_points  # type: ignore[attr-defined]
+    if points != _expected_points(store):
+        raise SystemExit(f"FAIL: {label}: witness points view {points} != {_expected_points(store)}")
+    mapped = {r["fleet_id"]: r["vendor_score_robot_mapped"] for r in store.get_vendor_scores()}
+    expected = _expected_vendor_mapped(store)
+    if any(mapped.get(v) != avg for v, avg in expected.items()):
+        raise SystemExit(f"FAIL: {label}: vendor robot scores {mapped} != {expected}")
+
+
+def _confirm(store: JoyGateStore, charger_id: str) -> str:
+    incident_id = store.report_blocked_incident(charger_id, "BLOCKED")
+    for jk in ("w1", "w2"):
+        store.witness_respond(jk, incident_id, charger_id, "OCCUPIED", None, None, None)
+    if store._incidents.get(incident_id)["incident_status"] != "EVIDENCE_CONFIRMED":  # type: ignore[attr-defined,index]
+        raise SystemExit("FAIL: w1 + w2 (two vendors) should confirm the incident")
+    return incident_id
+
+
+def _score(store: JoyGateStore, joykey: str, i: int, delta: int) -> None:
+    with store._reputation_lock:  # type: ignore[attr-defined]
+        store._apply_score_event_locked(f"se_test_{joykey}_{i}", "TEST", joykey, delta, None, None, None, time.time())  # type: ignore[attr-defined]
+
+
+def _vote_cost(store: JoyGateStore) -> float:
+    charger_id = "charger-002"
+    incident_ids = [store.report_blocked_incident(charger_id, "BLOCKED") for _ in range(VOTES)]
+    t0 = time.perf_counter()
+    for incident_id in incident_ids:
+        store.witness_respond("charlie_02", incident_id, charger_id, "FREE", None, None, None)
+    return (time.perf_counter() - t0) / VOTES
+
+
+def main() -> None:
+    store = JoyGateStore()
+    _check(store, "fresh store")
+    _confirm(store, "charger-001")
+    _check(store, "after witness verified score events")
+    # 白名单外 joykey（所属厂商未知）与白名单内 joykey 交替计分
+    for i in range(50):
+        _score(store, f"robot_{i % 7}", i, -3 if i % 2 else 4)
+        _score(store, "alpha_02", i, -2)
+    _check(store, "after mixed score events")
+    if store._witness_points["alpha_02"] == JOYKEY_TO_POINTS["alpha_02"] == store._reputation_by_joykey["alpha_02"]["robot_score"]:  # type: ignore[attr-defined]
+        raise SystemExit("FAIL: alpha_02 score should have moved away from configured points")
+
+    root = tempfile.mkdtemp(prefix="joygate_witness_points_")
+    try:
+        a = JoyGateStore(state_dir=root)
+        _confirm(a, "charger-001")
+        _score(a, "robot_x", 0, -10)
+        a.flush_state_log()
+        b = JoyGateStore(state_dir=root)
+        _check(b, "after restart")
+        if b._witness_points != a._witness_points or b._vendor_robot_totals != a._vendor_robot_totals:  # type: ignore[attr-defined]
+            raise SystemExit("FAIL: restored views should match the pre-restart store")
+        a.close_state_log()
+        b.close_state_log()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    small = JoyGateStore()
+    small_cost = _vote_cost(small)
+    big = JoyGateStore()
+    for i in range(FLEET):
+        _score(big, f"fleet_{i}", i, 1)
+    for _ in range(40):
+        big.report_blocked_incident("charger-003", "BLOCKED")
+    big_cost = _vote_cost(big)
+    _check(big, "large fleet")
+    if big_cost > small_cost * 5 + 50e-6:
+        raise SystemExit(f"FAIL: vote cost should not grow with fleet size: {small_cost * 1e6:.1f}us -> {big_cost * 1e6:.1f}us")
+
+    print(
+        f"PASS: witness points view (incremental, restored, vote {small_cost * 1e6:.1f}us @0 vs {big_cost * 1e6:.1f}us @{FLEET} reps)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ import os
 import uuid
 from typing import Any
 
+from joygate.incidents_logic import IncidentTable
+
 AI_JOB_TYPE_VISION_AUDIT = "VISION_AUDIT"
 AI_JOB_TYPE_DISPATCH_EXPLAIN = "DISPATCH_EXPLAIN"
 AI_JOB_TYPE_POLICY_SUGGEST = "POLICY_SUGGEST"
@@ -75,7 +77,7 @@ def cleanup_ai_jobs_locked(
 
 
 def create_vision_audit_job_locked(
-    incidents: list[dict],
+    incidents: IncidentTable,
     ai_jobs: dict,
     ai_job_queue: list,
     active_index: dict,
@@ -96,11 +98,7 @@ def create_vision_audit_job_locked(
             "ai_report_id": job.get("ai_report_id"),
         }
 
-    rec = None
-    for r in incidents:
-        if r.get("incident_id") == incident_id:
-            rec = r
-            break
+    rec = incidents.get(incident_id)
     if rec is None:
         raise KeyError(f"incident not found: {incident_id}")
 
@@ -229,7 +227,7 @@ def create_policy_suggest_job_locked(
 
 
 def tick_ai_jobs_locked(
-    incidents: list[dict],
+    incidents: IncidentTable,
     ai_jobs: dict,
     ai_job_queue: list,
     active_index: dict,
@@ -302,11 +300,7 @@ def tick_ai_jobs_locked(
             continue
 
         incident_id = job.get("incident_id")
-        rec = None
-        for r in incidents:
-            if r.get("incident_id") == incident_id:
-                rec = r
-                break
+        rec = incidents.get(incident_id)
         if rec is None:
             job["ai_job_status"] = "FAILED"
             job.pop("lease_until", None)
@@ -0,0 +1,494 @@
+# src/joygate/cluster.py
+"""
+多进程部署（可选）：每个 sandbox_id 固定归属一个 worker 进程，单沙盒仍在单进程内存里保持事务一致，总吞吐随核数扩展。
+
+用法：PYTHONPATH=src python -m joygate.cluster --workers 4 --port 8000
+
+- worker：N 个独立的 uvicorn 进程（--workers 1，只监听 127.0.0.1 的内部端口）。环境变量 JOYGATE_WORKER_INDEX /
+  JOYGATE_WORKER_COUNT 告知自身序号：只生成归属自己的新 sandbox_id，收到不归属自己的 sandbox 返回 421。
+- dispatcher：对外端口上的 HTTP/1.1 转发器（纯 asyncio，逐请求路由，不解析 body）。按 cookie joygate_sandbox
+  （无则 header X-JoyGate-Sandbox，与 sandbox._get_sandbox_id 同序）计算 sandbox_owner 转发给归属 worker；
+  不带 sandbox 的请求（如首次 /bootstrap）轮询分配，由接手的 worker 生成归属自己的新 id。
+  到 worker 的连接保持复用；chunked 响应（SSE /v1/stream）按块透传。客户端 IP 经 X-Forwarded-For 传给 worker
+  （丢弃客户端自带的 X-Forwarded-For，只写对端地址，worker 仅信任 127.0.0.1，避免伪造 IP 绕过 per-IP 限流）。
+- dispatcher 无状态：--dispatchers >1 时多个进程以 SO_REUSEPORT 共享对外端口（仅 Linux / BSD）。
+- launcher 监督 worker，异常退出自动重启（启用 JOYGATE_STATE_DIR 时其沙盒从快照 + WAL 恢复）。
+
+限制：per-IP 限流与 JOYGATE_MAX_SANDBOXES 在每个 worker 内各自计算；per-sandbox 限流不受影响。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import zlib
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKER_HOST = "127.0.0.1"
+MAX_HEAD_BYTES = 64 * 1024
+MAX_REQUEST_BODY_BYTES = 8 * 1024 * 1024
+RELAY_CHUNK_BYTES = 64 * 1024
+WORKER_KEEP_ALIVE_SECONDS = 30
+# 复用空闲连接的上限时长：须小于 worker 的 keep-alive 超时，避免写到 worker 刚关闭的连接
+UPSTREAM_IDLE_SECONDS = 20.0
+WORKER_START_TIMEOUT_SECONDS = 30.0
+SUPERVISE_INTERVAL_SECONDS = 1.0
+
+_SANDBOX_COOKIE = b"joygate_sandbox"
+_SANDBOX_HEADER = b"x-joygate-sandbox"
+# 逐跳头：不转发给 worker（dispatcher 与 worker 之间始终 keep-alive；body 已整体缓冲，Expect 由 dispatcher 自己应答）
+_HOP_BY_HOP = frozenset((b"connection", b"keep-alive", b"proxy-connection", b"x-forwarded-for", b"expect"))
+
+
+def sandbox_owner(sandbox_id: str, worker_count: int) -> int:
+    """sandbox_id -> 归属 worker 序号。crc32 取模，跨进程稳定（内置 hash() 按进程随机化，不能用）。"""
+    if worker_count <= 1:
+        return 0
+    return zlib.crc32(sandbox_id.encode("utf-8")) % worker_count
+
+
+class _ProtocolError(Exception):
+    pass
+
+
+def _parse_head(head: bytes) -> tuple[bytes, list[tuple[bytes, bytes]]]:
+    """head 含结尾空行；返回 (起始行, [(小写头名, 值)])。"""
+    lines = head[:-4].split(b"\r\n")
+    headers: list[tuple[bytes, bytes]] = []
+    for line in lines[1:]:
+        name, sep, value = line.partition(b":")
+        if not sep or not name:
+            raise _ProtocolError("malformed header line")
+        headers.append((name.strip().lower(), value.strip()))
+    return lines[0], headers
+
+
+def _header(headers: list[tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for k, v in headers:
+        if k == name:
+            return v
+    return None
+
+
+def _has_token(headers: list[tuple[bytes, bytes]], name: bytes, token: bytes) -> bool:
+    value = _header(headers, name)
+    return value is not None and token in (t.strip().lower() for t in value.split(b","))
+
+
+def _route_sandbox_id(headers: list[tuple[bytes, bytes]]) -> Optional[str]:
+    """与 sandbox._get_sandbox_id 同序取 sandbox_id：cookie 优先，其次 header（签名由 worker 校验）。"""
+    for k, v in headers:
+        if k != b"cookie":
+            continue
+        for part in v.split(b";"):
+            name, _, value = part.strip().partition(b"=")
+            if name == _SANDBOX_COOKIE and value:
+                return value.decode("latin-1")
+    value = (_header(headers, _SANDBOX_HEADER) or b"").strip()
+    return value.decode("latin-1") if value else None
+
+
+def _content_length(headers: list[tuple[bytes, bytes]]) -> Optional[int]:
+    raw = _header(headers, b"content-length")
+    if raw is None:
+        return None
+    try:
+        n = int(raw)
+    except ValueError:
+        raise _ProtocolError("invalid content-length") from None
+    if n < 0:
+        raise _ProtocolError("invalid content-length")
+    return n
+
+
+def _is_chunked(headers: list[tuple[bytes, bytes]]) -> bool:
+    return _has_token(headers, b"transfer-encoding", b"chunked")
+
+
+async def _relay_chunked(reader: asyncio.StreamReader, write: Callable[[bytes], Awaitable[None]]) -> None:
+    """原样转发一个 chunked body（含结尾 0 块与 trailer），每块写出后即 drain，SSE 不被缓冲。"""
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        try:
+            size = int(line.split(b";", 1)[0], 16)
+        except ValueError:
+            raise _ProtocolError("invalid chunk size") from None
+        if size == 0:
+            while line != b"\r\n":
+                await write(line)
+                line = await reader.readuntil(b"\r\n")
+            await write(line)
+            return
+        await write(line + await reader.readexactly(size + 2))
+
+
+async def _relay_exact(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, n: int) -> None:
+    while n > 0:
+        data = await reader.read(min(n, RELAY_CHUNK_BYTES))
+        if not data:
+            raise asyncio.IncompleteReadError(b"", n)
+        writer.write(data)
+        n -= len(data)
+        await writer.drain()
+
+
+async def _read_request_body(reader: asyncio.StreamReader, headers: list[tuple[bytes, bytes]]) -> bytes:
+    """读完整请求 body（原始字节，chunked 保持 chunked）；请求体小，整体缓冲便于失败重试。"""
+    if _is_chunked(headers):
+        buf = bytearray()
+
+        async def _append(data: bytes) -> None:
+            buf.extend(data)
+            if len(buf) > MAX_REQUEST_BODY_BYTES:
+                raise _ProtocolError("request body too large")
+
+        await _relay_chunked(reader, _append)
+        return bytes(buf)
+    n = _content_length(headers) or 0
+    if n > MAX_REQUEST_BODY_BYTES:
+        raise _ProtocolError("request body too large")
+    return await reader.readexactly(n) if n else b""
+
+
+def _expects_continue(request_line: bytes, headers: list[tuple[bytes, bytes]]) -> bool:
+    """客户端带 Expect: 100-continue 且确有待发送的 body（HTTP/1.0 不发 100）。"""
+    if request_line.endswith(b"HTTP/1.0") or not _has_token(headers, b"expect", b"100-continue"):
+        return False
+    if _is_chunked(headers):
+        return True
+    n = _content_length(headers) or 0
+    return 0 < n <= MAX_REQUEST_BODY_BYTES
+
+
+def _simple_response(status: int, reason: str, text: str, close: bool) -> bytes:
+    body = text.encode("utf-8")
+    conn = b"connection: close\r\n" if close else b""
+    return (
+        f"HTTP/1.1 {status} {reason}\r\ncontent-type: text/plain; charset=utf-8\r\ncontent-length: {len(body)}\r\n".encode("latin-1")
+        + conn
+        + b"\r\n"
+        + body
+    )
+
+
+class _UpstreamUnavailable(Exception):
+    pass
+
+
+class _Upstream:
+    """到单个 worker 的 keep-alive 连接池（只在 dispatcher 的事件循环内使用，无需加锁）。"""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self._idle: list[tuple[float, asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def acquire(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        """返回 (reader, writer, 是否复用的连接)。"""
+        now = time.monotonic()
+        while self._idle:
+            ts, reader, writer = self._idle.pop()
+            if now - ts < UPSTREAM_IDLE_SECONDS and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=MAX_HEAD_BYTES)
+        return reader, writer, False
+
+    def release(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._idle.append((time.monotonic(), reader, writer))
+
+
+class Dispatcher:
+    def __init__(self, worker_addrs: list[tuple[str, int]]) -> None:
+        if not worker_addrs:
+            raise ValueError("dispatcher needs at least one worker")
+        self._upstreams = [_Upstream(host, port) for host, port in worker_addrs]
+        self._round_robin = itertools.cycle(range(len(self._upstreams)))
+        self.forwarded = 0
+
+    def pick_worker(self, sandbox_id: Optional[str]) -> int:
+        if sandbox_id:
+            return sandbox_owner(sandbox_id, len(self._upstreams))
+        return next(self._round_robin)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """一个客户端连接：逐请求读 head + body，按 sandbox 路由转发，直到任一方要求关闭。"""
+        peer = writer.get_extra_info("peername")
+        client_ip = (peer[0] if isinstance(peer, tuple) and peer else "unknown").encode("latin-1")
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    writer.write(_simple_response(431, "Request Header Fields Too Large", "request head too large", True))
+                    await writer.drain()
+                    return
+                try:
+                    request_line, headers = _parse_head(head)
+                    if _expects_continue(request_line, headers):
+                        # 先读完 body 再转发：由 dispatcher 答 100 Continue，否则客户端要等到自身超时才发 body
+                        writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                        await writer.drain()
+                    body = await _read_request_body(reader, headers)
+                except _ProtocolError as e:
+                    writer.write(_simple_response(400, "Bad Request", str(e), True))
+                    await writer.drain()
+                    return
+                keep_alive = not request_line.endswith(b"HTTP/1.0") and not _has_token(headers, b"connection", b"close")
+                worker = self.pick_worker(_route_sandbox_id(headers))
+                if not await self._forward(worker, request_line, headers, body, client_ip, writer) or not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, _ProtocolError):
+            return
+        except asyncio.CancelledError:
+            # dispatcher 停止时取消的连接：正常结束（3.11 的 start_server 回调对已取消任务会打印异常）
+            return
+        finally:
+            writer.close()
+
+    async def _forward(
+        self,
+        worker: int,
+        request_line: bytes,
+        headers: list[tuple[bytes, bytes]],
+        body: bytes,
+        client_ip: bytes,
+        client: asyncio.StreamWriter,
+    ) -> bool:
+        """转发一个请求并把响应透传给客户端；返回客户端连接能否继续复用。"""
+        parts = [request_line]
+        parts.extend(k + b": " + v for k, v in headers if k not in _HOP_BY_HOP)
+        # 只传对端地址：客户端自带的值不可信（worker 信任 127.0.0.1，会取链上最后一个非 127.0.0.1 的地址）
+        parts.append(b"x-forwarded-for: " + client_ip)
+        request = b"\r\n".join(parts) + b"\r\n\r\n" + body
+        method = request_line.split(b" ", 1)[0]
+        upstream = self._upstreams[worker]
+        try:
+            reader, writer, head = await self._send(upstream, request)
+        except _UpstreamUnavailable:
+            client.write(_simple_response(502, "Bad Gateway", "worker unavailable", False))
+            await client.drain()
+            return True
+        try:
+            status_line, resp_headers = _parse_head(head)
+            status = int(status_line.split(b" ", 2)[1])
+            # worker 的 1xx（如 103 Early Hints）原样转发，继续读最终响应
+            while 100 <= status < 200 and status != 101:
+                client.write(head)
+                head = await reader.readuntil(b"\r\n\r\n")
+                status_line, resp_headers = _parse_head(head)
+                status = int(status_line.split(b" ", 2)[1])
+            client.write(head)
+            reusable = not _has_token(resp_headers, b"connection", b"close")
+            if method == b"HEAD" or status in (204, 304):
+                pass
+            elif _is_chunked(resp_headers):
+
+                async def _write(data: bytes) -> None:
+                    client.write(data)
+                    await client.drain()
+
+                await _relay_chunked(reader, _write)
+            else:
+                n = _content_length(resp_headers)
+                if n is None:  # 以关闭连接结束的 body
+                    while data := await reader.read(RELAY_CHUNK_BYTES):
+                        client.write(data)
+                        await client.drain()
+                    reusable = False
+                else:
+                    await _relay_exact(reader, client, n)
+            await client.drain()
+        except BaseException:
+            # 客户端断开（如关闭 SSE）或 worker 出错：关掉到 worker 的连接，worker 侧随之结束该响应
+            writer.close()
+            raise
+        self.forwarded += 1
+        if reusable:
+            upstream.release(reader, writer)
+            return True
+        writer.close()
+        return False
+
+    async def _send(
+        self, upstream: _Upstream, request: bytes
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, bytes]:
+        """发出请求并读到响应 head。复用的连接若在响应前就被 worker 关闭（空闲超时竞争），换新连接重试一次。"""
+        for attempt in range(2):
+            try:
+                reader, writer, reused = await upstream.acquire()
+            except OSError:
+                raise _UpstreamUnavailable() from None
+            try:
+                writer.write(request)
+                await writer.drain()
+                return reader, writer, await reader.readuntil(b"\r\n\r\n")
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                writer.close()
+                if not (reused and attempt == 0):
+                    raise _UpstreamUnavailable() from None
+        raise _UpstreamUnavailable()
+
+
+async def serve_dispatcher(
+    host: str,
+    port: int,
+    worker_ports: list[int],
+    reuse_port: bool = False,
+    on_tick: Optional[Callable[[], None]] = None,
+) -> None:
+    """在 host:port 上运行 dispatcher 直到收到 SIGTERM / SIGINT；on_tick 每 SUPERVISE_INTERVAL_SECONDS 调用一次（launcher 监督 worker）。"""
+    dispatcher = Dispatcher([(WORKER_HOST, p) for p in worker_ports])
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):  # Windows：保持默认处理（Ctrl+C 抛 KeyboardInterrupt）
+            pass
+    server = await asyncio.start_server(
+        dispatcher.handle, host, port, limit=MAX_HEAD_BYTES, reuse_port=reuse_port, backlog=1024
+    )
+    async with server:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), SUPERVISE_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            if on_tick is not None:
+                on_tick()
+
+
+def _dispatcher_process(host: str, port: int, worker_ports: list[int]) -> None:
+    try:
+        asyncio.run(serve_dispatcher(host, port, worker_ports, reuse_port=True))
+    except KeyboardInterrupt:
+        pass
+
+
+class WorkerPool:
+    """launcher 侧：启动 N 个 worker 进程，异常退出时重启。"""
+
+    def __init__(self, count: int, base_port: int, log_level: str = "info") -> None:
+        self.count = max(1, int(count))
+        self.ports = [base_port + i for i in range(self.count)]
+        self._log_level = log_level
+        self._procs: list[Optional[subprocess.Popen]] = [None] * self.count
+        self.restarts = 0
+
+    def _spawn(self, index: int) -> subprocess.Popen:
+        env = dict(os.environ)
+        env["JOYGATE_WORKER_INDEX"] = str(index)
+        env["JOYGATE_WORKER_COUNT"] = str(self.count)
+        # 每个 worker 自身是单进程 uvicorn；不让外层的多 worker 变量触发 sandbox 的单 worker 护栏
+        env.pop("WEB_CONCURRENCY", None)
+        env.pop("UVICORN_WORKERS", None)
+        cmd = [
+            sys.executable, "-m", "uvicorn", "joygate.main:app",
+            "--host", WORKER_HOST, "--port", str(self.ports[index]), "--workers", "1",
+            "--forwarded-allow-ips", WORKER_HOST,
+            "--log-level", self._log_level, "--timeout-keep-alive", str(WORKER_KEEP_ALIVE_SECONDS),
+        ]
+        proc = subprocess.Popen(cmd, env=env)
+        self._procs[index] = proc
+        return proc
+
+    def start(self, timeout: float = WORKER_START_TIMEOUT_SECONDS) -> None:
+        """启动全部 worker 并等待内部端口可连接；任一 worker 启动失败则抛 RuntimeError。"""
+        for i in range(self.count):
+            self._spawn(i)
+        deadline = time.monotonic() + timeout
+        for i, port in enumerate(self.ports):
+            while True:
+                proc = self._procs[i]
+                if proc is not None and proc.poll() is not None:
+                    raise RuntimeError(f"worker {i} exited during startup (code {proc.returncode})")
+                try:
+                    socket.create_connection((WORKER_HOST, port), timeout=0.2).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"worker {i} did not listen on {WORKER_HOST}:{port} within {timeout}s") from None
+                    time.sleep(0.1)
+
+    def supervise(self) -> None:
+        """重启已退出的 worker（不等待就绪；期间发往它的请求得到 502）。"""
+        for i, proc in enumerate(self._procs):
+            if proc is not None and proc.poll() is not None:
+                logger.warning("worker %s exited with code %s; restarting", i, proc.returncode)
+                self._spawn(i)
+                self.restarts += 1
+
+    def stop(self, timeout: float = 10.0) -> None:
+        procs = [p for p in self._procs if p is not None and p.poll() is None]
+        for p in procs:
+            p.terminate()
+        deadline = time.monotonic() + timeout
+        for p in procs:
+            try:
+                p.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+def _on_sigterm(signum, frame) -> None:
+    raise KeyboardInterrupt()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="JoyGate multi-worker mode with sandbox-affinity routing")
+    ap.add_argument("--host", default="127.0.0.1", help="对外监听地址")
+    ap.add_argument("--port", type=int, default=8000, help="对外监听端口")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker 进程数（默认 CPU 核数）")
+    ap.add_argument("--worker-base-port", type=int, default=0, help="worker 内部端口起点（默认 port+1 起连续 N 个）")
+    ap.add_argument("--dispatchers", type=int, default=1, help="dispatcher 进程数（>1 需要 SO_REUSEPORT）")
+    ap.add_argument("--log-level", default="info", help="worker 的 uvicorn 日志级别")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    signal.signal(signal.SIGTERM, _on_sigterm)  # 停止时一并结束 worker，不留孤儿进程
+
+    pool = WorkerPool(args.workers, args.worker_base_port or args.port + 1, args.log_level)
+    dispatchers: list[multiprocessing.Process] = []
+    try:
+        pool.start()
+        logger.info("JoyGate cluster: %s worker(s) on %s:%s, dispatching on %s:%s",
+                    pool.count, WORKER_HOST, pool.ports, args.host, args.port)
+        if args.dispatchers <= 1:
+            asyncio.run(serve_dispatcher(args.host, args.port, pool.ports, on_tick=pool.supervise))
+            return 0
+        for _ in range(args.dispatchers):
+            p = multiprocessing.Process(target=_dispatcher_process, args=(args.host, args.port, pool.ports), daemon=True)
+            p.start()
+            dispatchers.append(p)
+        while True:
+            time.sleep(SUPERVISE_INTERVAL_SECONDS)
+            pool.supervise()
+            for i, p in enumerate(dispatchers):
+                if not p.is_alive():
+                    logger.warning("dispatcher %s exited with code %s; restarting", i, p.exitcode)
+                    dispatchers[i] = multiprocessing.Process(
+                        target=_dispatcher_process, args=(args.host, args.port, pool.ports), daemon=True
+                    )
+                    dispatchers[i].start()
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        for p in dispatchers:
+            p.terminate()
+        pool.stop()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -83,6 +83,50 @@ RATE_LIMIT_PER_SANDBOX_PER_MIN = _env_int("JOYGATE_RATE_LIMIT_PER_SANDBOX_PER_MI
 RATE_LIMIT_PER_IP_PER_MIN = _env_int("JOYGATE_RATE_LIMIT_PER_IP_PER_MIN", 300)
 ALLOW_SANDBOX_HEADER = _env_bool("JOYGATE_ALLOW_SANDBOX_HEADER", False)
 REQUIRE_SINGLE_WORKER = _env_bool("JOYGATE_REQUIRE_SINGLE_WORKER", True)
+# 多进程部署（python -m joygate.cluster 启动时设置）：worker 总数与本进程序号；单进程部署为 1 / 0
+WORKER_COUNT = max(1, _env_int("JOYGATE_WORKER_COUNT", 1))
+WORKER_INDEX = min(max(0, _env_int("JOYGATE_WORKER_INDEX", 0)), WORKER_COUNT - 1)
+
+
+# --- /v1/snapshot 增量同步 change log 保留条数（内部 env，不进 FIELD_REGISTRY）---
+_SNAPSHOT_CHANGE_LOG_RAW = _env_int("JOYGATE_SNAPSHOT_CHANGE_LOG_MAX", 5000)
+SNAPSHOT_CHANGE_LOG_MAX = _SNAPSHOT_CHANGE_LOG_RAW if _SNAPSHOT_CHANGE_LOG_RAW > 0 else 5000
+
+# --- /v1/stream 推送（内部 env，不进 FIELD_REGISTRY）---
+# 每个 sandbox 最多同时打开的 SSE 连接数；心跳间隔；单连接最长存活秒数（到期断开，由 EventSource 自动重连）
+_STREAM_MAX_SUBSCRIBERS_RAW = _env_int("JOYGATE_STREAM_MAX_SUBSCRIBERS", 100)
+STREAM_MAX_SUBSCRIBERS = _STREAM_MAX_SUBSCRIBERS_RAW if _STREAM_MAX_SUBSCRIBERS_RAW > 0 else 100
+_STREAM_HEARTBEAT_RAW = _env_int("JOYGATE_STREAM_HEARTBEAT_SECONDS", 15)
+STREAM_HEARTBEAT_SECONDS = _STREAM_HEARTBEAT_RAW if _STREAM_HEARTBEAT_RAW > 0 else 15
+_STREAM_MAX_CONN_RAW = _env_int("JOYGATE_STREAM_MAX_CONNECTION_SECONDS", 300)
+STREAM_MAX_CONNECTION_SECONDS = _STREAM_MAX_CONN_RAW if _STREAM_MAX_CONN_RAW > 0 else 300
+
+
+# --- 后台调度器各周期任务间隔（秒；0 关闭，负数回落默认；内部 env，不进 FIELD_REGISTRY）---
+def _scheduler_interval(name: str, default: float) -> float:
+    raw = _env_float(name, default)
+    return raw if raw >= 0 else default
+
+
+# witness SLA 截止调度
+INCIDENT_SLA_TICK_SECONDS = _scheduler_interval("JOYGATE_INCIDENT_SLA_TICK_SECONDS", 1.0)
+# 到期 SOFT_BLOCKED 复核
+SCHEDULER_SOFT_RECHECK_SECONDS = _scheduler_interval("JOYGATE_SCHEDULER_SOFT_RECHECK_SECONDS", 1.0)
+# 过期 hold 回收
+SCHEDULER_HOLD_EXPIRY_SECONDS = _scheduler_interval("JOYGATE_SCHEDULER_HOLD_EXPIRY_SECONDS", 1.0)
+# AI jobs / webhook deliveries / RESOLVED incidents 保留期清理
+SCHEDULER_RETENTION_SECONDS = _scheduler_interval("JOYGATE_SCHEDULER_RETENTION_SECONDS", 30.0)
+# webhook outbox 派发（写接口之外产生的事件也能及时投递）
+SCHEDULER_WEBHOOK_OUTBOX_SECONDS = _scheduler_interval("JOYGATE_SCHEDULER_WEBHOOK_OUTBOX_SECONDS", 1.0)
+# 空闲超过 TTL 的沙盒回收（请求路径只顺手回收少量，主要靠这里）
+SCHEDULER_SANDBOX_REAPER_SECONDS = _scheduler_interval("JOYGATE_SCHEDULER_SANDBOX_REAPER_SECONDS", 10.0)
+# 状态持久化（JOYGATE_STATE_DIR 启用时才注册）：WAL group commit 间隔 = 崩溃时最多丢失的修改窗口；快照折叠检查
+SCHEDULER_STATE_FLUSH_SECONDS = _scheduler_interval("JOYGATE_SCHEDULER_STATE_FLUSH_SECONDS", 0.1)
+SCHEDULER_STATE_SNAPSHOT_SECONDS = _scheduler_interval("JOYGATE_SCHEDULER_STATE_SNAPSHOT_SECONDS", 30.0)
+# AI jobs 自动 tick：默认关闭，保持 /v1/ai_jobs/tick 显式推进与 AI 预算可控
+SCHEDULER_AI_JOBS_TICK_SECONDS = _scheduler_interval("JOYGATE_SCHEDULER_AI_JOBS_TICK_SECONDS", 0.0)
+_SCHEDULER_AI_JOBS_MAX_RAW = _env_int("JOYGATE_SCHEDULER_AI_JOBS_MAX_JOBS", 1)
+SCHEDULER_AI_JOBS_MAX_JOBS = _SCHEDULER_AI_JOBS_MAX_RAW if _SCHEDULER_AI_JOBS_MAX_RAW > 0 else 1
 
 
 # --- incidents 写时清理与硬上限（demo 默认，环境变量可覆盖，不对外公开）---
@@ -108,6 +152,8 @@ WITNESS_SCORE_REQUIRED_RISKY = _env_float("JOYGATE_WITNESS_SCORE_REQUIRED_RISKY"
 WITNESS_MIN_MARGIN_RISKY = max(_env_float("JOYGATE_WITNESS_MIN_MARGIN_RISKY", 1.0), 0.0)
 WITNESS_CERTIFIED_POINTS_THRESHOLD = _env_int("JOYGATE_WITNESS_CERTIFIED_POINTS_THRESHOLD", 80)
 WITNESS_MIN_CERTIFIED_SUPPORT_RISKY = max(_env_int("JOYGATE_WITNESS_MIN_CERTIFIED_SUPPORT_RISKY", 1), 1)
+# 批量投票（/v1/witness/respond_batch、/v1/witness/segment_respond_batch）单请求最多条数；防呆：最小为 1
+WITNESS_BATCH_MAX_VOTES = max(_env_int("JOYGATE_WITNESS_BATCH_MAX_VOTES", 100), 1)
 
 # Witness SLA 超时（分钟，内部 env，不进 FIELD_REGISTRY）
 WITNESS_SLA_TIMEOUT_MINUTES = _env_float("JOYGATE_WITNESS_SLA_TIMEOUT_MINUTES", 3.0)
@@ -219,6 +265,11 @@ AI_BUDGET_DAY_SECONDS = _env_int("JOYGATE_AI_BUDGET_DAY_SECONDS", 300)
 # M12A-1：mock | gemini（默认 mock）
 JOYGATE_AI_PROVIDER = (os.getenv("JOYGATE_AI_PROVIDER") or "mock").strip().lower() or "mock"
 JOYGATE_GEMINI_MODEL = os.getenv("JOYGATE_GEMINI_MODEL", "gemini-3.0-flash")
+# 视觉审计并发：渲染 + provider 调用的线程数与单 job 超时（秒，自 job 开始执行计，宜短于 JOYGATE_AI_JOB_LEASE_SECONDS；内部 env，不进 FIELD_REGISTRY）
+_AI_JOB_WORKERS_RAW = _env_int("JOYGATE_AI_JOB_WORKERS", 4)
+AI_JOB_WORKERS = _AI_JOB_WORKERS_RAW if _AI_JOB_WORKERS_RAW > 0 else 4
+_AI_JOB_TIMEOUT_RAW = _env_float("JOYGATE_AI_JOB_TIMEOUT_SECONDS", 25.0)
+AI_JOB_TIMEOUT_SECONDS = _AI_JOB_TIMEOUT_RAW if _AI_JOB_TIMEOUT_RAW > 0 else 25.0
 
 
 # --- Outbound Webhooks（内部 env，不进 FIELD_REGISTRY；对应 webhook_* policy config）---
@@ -228,6 +279,48 @@ _WEBHOOK_RETRY_RAW = _env_int("JOYGATE_WEBHOOK_RETRY_MAX_ATTEMPTS", 3)
 WEBHOOK_RETRY_MAX_ATTEMPTS = _WEBHOOK_RETRY_RAW if _WEBHOOK_RETRY_RAW >= 0 else 3
 _WEBHOOK_BACKOFF_RAW = _env_int("JOYGATE_WEBHOOK_RETRY_BACKOFF_SECONDS", 5)
 WEBHOOK_RETRY_BACKOFF_SECONDS = _WEBHOOK_BACKOFF_RAW if _WEBHOOK_BACKOFF_RAW >= 0 else 5
+# 投递引擎：worker 线程数、单 target 在途上限（亦为该 host 的 keep-alive 连接池大小）、重试间隔封顶（秒）
+_WEBHOOK_WORKERS_RAW = _env_int("JOYGATE_WEBHOOK_WORKERS", 8)
+WEBHOOK_WORKERS = _WEBHOOK_WORKERS_RAW if _WEBHOOK_WORKERS_RAW > 0 else 8
+_WEBHOOK_PER_TARGET_RAW = _env_int("JOYGATE_WEBHOOK_PER_TARGET_CONCURRENCY", 2)
+WEBHOOK_PER_TARGET_CONCURRENCY = _WEBHOOK_PER_TARGET_RAW if _WEBHOOK_PER_TARGET_RAW > 0 else 2
+_WEBHOOK_RETRY_MAX_DELAY_RAW = _env_int("JOYGATE_WEBHOOK_RETRY_MAX_DELAY_SECONDS", 300)
+WEBHOOK_RETRY_MAX_DELAY_SECONDS = _WEBHOOK_RETRY_MAX_DELAY_RAW if _WEBHOOK_RETRY_MAX_DELAY_RAW > 0 else 300
+# 每订阅熔断：连续失败 N 次后打开，冷却期内新 event 停放不发；冷却到期放一个探测请求（半开），失败则冷却翻倍至上限
+_WEBHOOK_BREAKER_THRESHOLD_RAW = _env_int("JOYGATE_WEBHOOK_BREAKER_FAILURE_THRESHOLD", 5)
+WEBHOOK_BREAKER_FAILURE_THRESHOLD = _WEBHOOK_BREAKER_THRESHOLD_RAW if _WEBHOOK_BREAKER_THRESHOLD_RAW > 0 else 5
+_WEBHOOK_BREAKER_OPEN_RAW = _env_float("JOYGATE_WEBHOOK_BREAKER_OPEN_SECONDS", 30.0)
+WEBHOOK_BREAKER_OPEN_SECONDS = _WEBHOOK_BREAKER_OPEN_RAW if _WEBHOOK_BREAKER_OPEN_RAW > 0 else 30.0
+_WEBHOOK_BREAKER_MAX_OPEN_RAW = _env_float("JOYGATE_WEBHOOK_BREAKER_MAX_OPEN_SECONDS", 300.0)
+WEBHOOK_BREAKER_MAX_OPEN_SECONDS = max(WEBHOOK_BREAKER_OPEN_SECONDS, _WEBHOOK_BREAKER_MAX_OPEN_RAW)
+# 自适应并发：单次投递耗时超过该值（或失败）时该 target 在途上限减半，快速成功时逐步加回 WEBHOOK_PER_TARGET_CONCURRENCY
+_WEBHOOK_SLOW_LATENCY_RAW = _env_float("JOYGATE_WEBHOOK_SLOW_LATENCY_SECONDS", 2.0)
+WEBHOOK_SLOW_LATENCY_SECONDS = _WEBHOOK_SLOW_LATENCY_RAW if _WEBHOOK_SLOW_LATENCY_RAW > 0 else 2.0
+# 可选磁盘 outbox：设目录后每个 sandbox 一个子目录（segment 追加写 + checkpoint），重启后重放未投递完的 event；空=内存 list
+JOYGATE_WEBHOOK_OUTBOX_DIR = (os.getenv("JOYGATE_WEBHOOK_OUTBOX_DIR") or "").strip()
+_WEBHOOK_OUTBOX_SEGMENT_RAW = _env_int("JOYGATE_WEBHOOK_OUTBOX_SEGMENT_BYTES", 4 * 1024 * 1024)
+WEBHOOK_OUTBOX_SEGMENT_BYTES = _WEBHOOK_OUTBOX_SEGMENT_RAW if _WEBHOOK_OUTBOX_SEGMENT_RAW > 0 else 4 * 1024 * 1024
+_WEBHOOK_OUTBOX_FSYNC_INTERVAL_RAW = _env_float("JOYGATE_WEBHOOK_OUTBOX_FSYNC_INTERVAL_SECONDS", 0.2)
+WEBHOOK_OUTBOX_FSYNC_INTERVAL_SECONDS = _WEBHOOK_OUTBOX_FSYNC_INTERVAL_RAW if _WEBHOOK_OUTBOX_FSYNC_INTERVAL_RAW >= 0 else 0.2
+_WEBHOOK_OUTBOX_FSYNC_BATCH_RAW = _env_int("JOYGATE_WEBHOOK_OUTBOX_FSYNC_BATCH", 64)
+WEBHOOK_OUTBOX_FSYNC_BATCH = _WEBHOOK_OUTBOX_FSYNC_BATCH_RAW if _WEBHOOK_OUTBOX_FSYNC_BATCH_RAW > 0 else 64
+# 可选状态持久化：设目录后每个 sandbox 一个子目录（WAL segment + 快照），重启后恢复槽位/占位/incident/hazard/witness 计票与去重/信誉/ledger；空=纯内存
+JOYGATE_STATE_DIR = (os.getenv("JOYGATE_STATE_DIR") or "").strip()
+_STATE_LOG_SEGMENT_RAW = _env_int("JOYGATE_STATE_LOG_SEGMENT_BYTES", 16 * 1024 * 1024)
+STATE_LOG_SEGMENT_BYTES = _STATE_LOG_SEGMENT_RAW if _STATE_LOG_SEGMENT_RAW > 0 else 16 * 1024 * 1024
+# 自上次快照 WAL 累计超过该字节数才折叠新快照
+_STATE_SNAPSHOT_MIN_RAW = _env_int("JOYGATE_STATE_SNAPSHOT_MIN_BYTES", 32 * 1024 * 1024)
+STATE_SNAPSHOT_MIN_BYTES = _STATE_SNAPSHOT_MIN_RAW if _STATE_SNAPSHOT_MIN_RAW >= 0 else 32 * 1024 * 1024
+# 状态持久化后端（只决定崩溃后从哪里恢复，运行时状态始终在进程内存，不跨进程共享）：
+# wal（WAL segment + 快照文件，默认）| sqlite（WAL 模式 SQLite：带索引便于运维脚本只读查询，历史表完整保留在库里）
+STATE_BACKENDS = ("wal", "sqlite")
+_STATE_BACKEND_RAW = (os.getenv("JOYGATE_STATE_BACKEND") or "wal").strip().lower()
+if _STATE_BACKEND_RAW not in STATE_BACKENDS:
+    _STARTUP_WARNINGS.append(f"JOYGATE_STATE_BACKEND={_STATE_BACKEND_RAW!r} 无效（可选 wal / sqlite），已回退 wal。")
+STATE_BACKEND = _STATE_BACKEND_RAW if _STATE_BACKEND_RAW in STATE_BACKENDS else "wal"
+# sqlite 后端：score_event / decision 历史每表在库内最多保留的行数（快照任务 compact 时清理最旧）
+_STATE_SQLITE_HISTORY_RAW = _env_int("JOYGATE_STATE_SQLITE_HISTORY_MAX_ROWS", 1_000_000)
+STATE_SQLITE_HISTORY_MAX_ROWS = _STATE_SQLITE_HISTORY_RAW if _STATE_SQLITE_HISTORY_RAW > 0 else 1_000_000
 # Webhook deliveries（内存态留存；不进 FIELD_REGISTRY）
 WEBHOOK_DELIVERY_RETENTION_SECONDS = _env_int("WEBHOOK_DELIVERY_RETENTION_SECONDS", 3600)
 # target_url 校验：仅 https 默认；http 与 localhost 需显式开启（本地 demo 用）
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import base64
+import binascii
+import bisect
+import heapq
 import time
 import uuid
-from typing import Any
+from typing import Any, Callable, Iterable
 
 from joygate.config import minute_to_seconds
 
@@ -27,78 +31,330 @@ def _normalize_evidence_refs(refs: list[str] | None) -> list[str]:
     return out
 
 
-def cleanup_incidents_locked(
-    incidents: list[dict[str, Any]],
+def incident_order_key(rec: dict[str, Any]) -> tuple[float, str]:
+    return (float(rec.get("created_at") or 0.0), rec.get("incident_id") or "")
+
+
+class IncidentTable:
+    """
+    incident 内存表：incident_id -> rec（dict 插入序即创建序），并维护二级索引。
+    - 索引：incident_status / charger_id / segment_id -> id 集合（dict[str, None]）。
+    - _order：按 (created_at, incident_id) 升序的有序 key 列表，供最老淘汰与 /v1/incidents 分页。
+    - charger_id / segment_id 在 add 后不变；incident_status 只能经 set_status 修改，否则索引失效。
+    - 迭代按创建序产出 rec（与原 list 语义一致）；调用方须持有 _incidents_lock。
+    - on_change(incident_id)：add / remove / set_status 后回调（store 状态持久化登记脏 key）；
+      其他原地修改 rec 字段的地方须调用 touch(incident_id)。
+    - on_remove(rec)：remove（淘汰）时带着被移除的 rec 回调（store 交给归档后端）；add 覆盖同 id 不算移除。
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[str], None] | None = None,
+        on_remove: Callable[[dict[str, Any]], None] | None = None,
+    ) -> None:
+        self.on_change = on_change
+        self.on_remove = on_remove
+        self._by_id: dict[str, dict[str, Any]] = {}
+        self._order: list[tuple[float, str]] = []
+        self._by_status: dict[str, dict[str, None]] = {}
+        self._by_charger: dict[str, dict[str, None]] = {}
+        self._by_segment: dict[str, dict[str, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def __contains__(self, incident_id: object) -> bool:
+        return incident_id in self._by_id
+
+    @staticmethod
+    def _index_add(index: dict[str, dict[str, None]], key: Any, incident_id: str) -> None:
+        if key is None:
+            return
+        index.setdefault(key, {})[incident_id] = None
+
+    @staticmethod
+    def _index_remove(index: dict[str, dict[str, None]], key: Any, incident_id: str) -> None:
+        if key is None:
+            return
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        bucket.pop(incident_id, None)
+        if not bucket:
+            del index[key]
+
+    def get(self, incident_id: str | None) -> dict[str, Any] | None:
+        if not incident_id:
+            return None
+        return self._by_id.get(incident_id)
+
+    def add(self, rec: dict[str, Any]) -> None:
+        incident_id = rec["incident_id"]
+        if incident_id in self._by_id:
+            self._detach(incident_id)
+        self._by_id[incident_id] = rec
+        # 新记录 created_at 通常最大：insort 落在末尾，摊还 O(log n)
+        bisect.insort(self._order, incident_order_key(rec))
+        self._index_add(self._by_status, rec.get("incident_status"), incident_id)
+        self._index_add(self._by_charger, rec.get("charger_id"), incident_id)
+        self._index_add(self._by_segment, rec.get("segment_id"), incident_id)
+        self.touch(incident_id)
+
+    def remove(self, incident_id: str) -> dict[str, Any] | None:
+        rec = self._detach(incident_id)
+        if rec is None:
+            return None
+        self.touch(incident_id)
+        if self.on_remove is not None:
+            self.on_remove(rec)
+        return rec
+
+    def _detach(self, incident_id: str) -> dict[str, Any] | None:
+        """从主表与索引摘除，不回调。"""
+        rec = self._by_id.pop(incident_id, None)
+        if rec is None:
+            return None
+        key = incident_order_key(rec)
+        i = bisect.bisect_left(self._order, key)
+        if i < len(self._order) and self._order[i] == key:
+            del self._order[i]
+        self._index_remove(self._by_status, rec.get("incident_status"), incident_id)
+        self._index_remove(self._by_charger, rec.get("charger_id"), incident_id)
+        self._index_remove(self._by_segment, rec.get("segment_id"), incident_id)
+        return rec
+
+    def set_status(self, rec: dict[str, Any], new_status: str, now: float) -> None:
+        """原地改 incident_status + status_updated_at，并同步状态索引。"""
+        incident_id = rec["incident_id"]
+        old_status = rec.get("incident_status")
+        if old_status != new_status and incident_id in self._by_id:
+            self._index_remove(self._by_status, old_status, incident_id)
+            self._index_add(self._by_status, new_status, incident_id)
+        rec["incident_status"] = new_status
+        rec["status_updated_at"] = now
+        self.touch(incident_id)
+
+    def touch(self, incident_id: str) -> None:
+        """标记 incident 已修改（原地改 rec 字段后调用）。"""
+        if self.on_change is not None:
+            self.on_change(incident_id)
+
+    def _key_of(self, incident_id: str) -> tuple[float, str]:
+        return incident_order_key(self._by_id[incident_id])
+
+    def oldest(self) -> dict[str, Any] | None:
+        if not self._order:
+            return None
+        return self._by_id[self._order[0][1]]
+
+    def ids_with_status(self, incident_status: str) -> list[str]:
+        bucket = self._by_status.get(incident_status)
+        if not bucket:
+            return []
+        return list(bucket)
+
+    def oldest_with_status(self, incident_status: str) -> dict[str, Any] | None:
+        bucket = self._by_status.get(incident_status)
+        if not bucket:
+            return None
+        return self._by_id[min(bucket, key=self._key_of)]
+
+    def first_with(self, charger_id: str, incident_status: str) -> dict[str, Any] | None:
+        """按创建序返回 charger 上第一条指定状态的 incident。"""
+        by_charger = self._by_charger.get(charger_id)
+        by_status = self._by_status.get(incident_status)
+        if not by_charger or not by_status:
+            return None
+        small, other = (by_charger, by_status) if len(by_charger) <= len(by_status) else (by_status, by_charger)
+        hits = [iid for iid in small if iid in other]
+        if not hits:
+            return None
+        return self._by_id[min(hits, key=self._key_of)]
+
+    def select(
+        self,
+        incident_id: str | None = None,
+        incident_status: str | None = None,
+        charger_id: str | None = None,
+        segment_id: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        按索引取候选（从最小的索引桶开始求交），代价 O(k)；未给任何条件时返回全部（创建序）。
+        incident_type 等非索引字段由调用方再过滤。
+        """
+        buckets: list[dict[str, None]] = []
+        for index, key in (
+            (self._by_status, incident_status),
+            (self._by_charger, charger_id),
+            (self._by_segment, segment_id),
+        ):
+            if key is None:
+                continue
+            bucket = index.get(key)
+            if not bucket:
+                return []
+            buckets.append(bucket)
+        if incident_id is not None:
+            rec = self._by_id.get(incident_id)
+            if rec is None or not all(incident_id in b for b in buckets):
+                return []
+            return [rec]
+        if not buckets:
+            return list(self._by_id.values())
+        buckets.sort(key=len)
+        first, rest = buckets[0], buckets[1:]
+        return [self._by_id[iid] for iid in first if all(iid in b for b in rest)]
+
+    def page(
+        self,
+        limit: int,
+        before: tuple[float, str] | None = None,
+        incident_id: str | None = None,
+        incident_type: str | None = None,
+        incident_status: str | None = None,
+        charger_id: str | None = None,
+        segment_id: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        按 (created_at, incident_id) 降序返回严格小于 before 的前 limit 条 rec（不拷贝）。
+        无索引条件：沿 _order 从 before 处倒序走，代价 O(log n + limit)（incident_type 过滤时为跳过的条数）；
+        有索引条件：在命中桶内 nlargest，代价 O(k log limit)，内存 O(limit)。
+        """
+        if limit <= 0:
+            return []
+        out: list[dict[str, Any]] = []
+        if incident_id is None and incident_status is None and charger_id is None and segment_id is None:
+            order = self._order
+            i = len(order) if before is None else bisect.bisect_left(order, before)
+            while i > 0 and len(out) < limit:
+                i -= 1
+                rec = self._by_id[order[i][1]]
+                if incident_type is not None and rec.get("incident_type") != incident_type:
+                    continue
+                out.append(rec)
+            return out
+        candidates = (
+            rec
+            for rec in self.select(
+                incident_id=incident_id,
+                incident_status=incident_status,
+                charger_id=charger_id,
+                segment_id=segment_id,
+            )
+            if (incident_type is None or rec.get("incident_type") == incident_type)
+            and (before is None or incident_order_key(rec) < before)
+        )
+        return heapq.nlargest(limit, candidates, key=incident_order_key)
+
+
+def expire_resolved_incidents_locked(
+    incidents: IncidentTable,
     witness_by_incident: dict[str, dict[str, Any]],
     now: float,
-    max_incidents: int,
     ttl_resolved_low_seconds: int,
     ttl_resolved_high_seconds: int,
     low_retention_incident_types: set[str],
-) -> None:
-    # 阶段1：TTL 清理
-    def should_delete(rec: dict[str, Any]) -> bool:
-        if rec.get("incident_status") != "RESOLVED":
-            return False
+) -> int:
+    """TTL 清理（只看 RESOLVED 索引桶），联动删除 witness 数据；返回移除条数。写时清理与后台保留期清理共用。"""
+    removed: list[str] = []
+    for iid in incidents.ids_with_status("RESOLVED"):
+        rec = incidents.get(iid)
+        if rec is None:
+            continue
         base_ts = rec.get("status_updated_at") or rec.get("created_at", 0.0)
         ttl = (
             ttl_resolved_low_seconds
             if rec.get("incident_type") in low_retention_incident_types
             else ttl_resolved_high_seconds
         )
-        return (now - base_ts) > ttl
+        if (now - base_ts) > ttl:
+            incidents.remove(iid)
+            removed.append(iid)
+    for iid in removed:
+        witness_by_incident.pop(iid, None)
+    return len(removed)
+
 
-    new_list = [rec for rec in incidents if not should_delete(rec)]
-    incidents[:] = new_list
+def cleanup_incidents_locked(
+    incidents: IncidentTable,
+    witness_by_incident: dict[str, dict[str, Any]],
+    now: float,
+    max_incidents: int,
+    ttl_resolved_low_seconds: int,
+    ttl_resolved_high_seconds: int,
+    low_retention_incident_types: set[str],
+) -> None:
+    # 阶段1：TTL 清理
+    expire_resolved_incidents_locked(
+        incidents,
+        witness_by_incident,
+        now,
+        ttl_resolved_low_seconds,
+        ttl_resolved_high_seconds,
+        low_retention_incident_types,
+    )
 
-    # 阶段2：硬上限（写入前腾出空间，保证 append 后不超过 MAX_INCIDENTS）
+    # 阶段2：硬上限（写入前腾出空间，保证 add 后不超过 MAX_INCIDENTS）：先淘汰最老 RESOLVED，否则最老一条
+    removed: list[str] = []
     while len(incidents) >= max_incidents:
-        idx = None
-        for i, rec in enumerate(incidents):
-            if rec.get("incident_status") == "RESOLVED":
-                idx = i
-                break
-        if idx is not None:
-            incidents.pop(idx)
-        else:
-            incidents.pop(0)
+        victim = incidents.oldest_with_status("RESOLVED") or incidents.oldest()
+        if victim is None:
+            break
+        incidents.remove(victim["incident_id"])
+        removed.append(victim["incident_id"])
 
     # 联动清理：删除已移除 incident 的 witness 数据，防内存泄露
-    remaining_ids = {r.get("incident_id") for r in incidents}
-    for iid in list(witness_by_incident.keys()):
-        if iid not in remaining_ids:
-            del witness_by_incident[iid]
+    for iid in removed:
+        witness_by_incident.pop(iid, None)
 
 
-def apply_witness_sla_downgrade_locked(
-    incidents: list[dict[str, Any]],
-    witness_by_incident: dict[str, dict[str, Any]],
-    now: float,
+def push_witness_sla_deadline(
+    sla_heap: list[tuple[float, str]],
+    rec: dict[str, Any],
     witness_sla_timeout_minutes: float,
 ) -> None:
+    """新建 incident 后调用：把 (created_at + SLA, incident_id) 压入截止时间小顶堆；SLA<=0 表示关闭。"""
     if witness_sla_timeout_minutes <= 0:
         return
-    sla_seconds = minute_to_seconds(witness_sla_timeout_minutes)
-    for rec in incidents:
+    created_at = rec.get("created_at")
+    if not created_at:
+        return
+    heapq.heappush(sla_heap, (float(created_at) + minute_to_seconds(witness_sla_timeout_minutes), rec["incident_id"]))
+
+
+def apply_witness_sla_downgrade_locked(
+    incidents: IncidentTable,
+    witness_by_incident: dict[str, dict[str, Any]],
+    sla_heap: list[tuple[float, str]],
+    now: float,
+    witness_sla_timeout_minutes: float,
+) -> list[dict[str, Any]]:
+    """
+    只弹出已到期的 SLA 截止项，代价 O(due·log n)；每条 incident 到期时处理一次：
+    OPEN -> UNDER_OBSERVATION，非终态 upsert VISION_AUDIT_REQUESTED；已删除 / 已终态的堆项直接丢弃。
+    返回本次 incident_status 发生变化的 rec 列表（供调用方发 INCIDENT_STATUS_CHANGED）。
+    """
+    changed: list[dict[str, Any]] = []
+    while sla_heap and sla_heap[0][0] <= now:
+        _, incident_id = heapq.heappop(sla_heap)
+        rec = incidents.get(incident_id)
+        if rec is None:
+            continue
         status = rec.get("incident_status")
         if status in ("RESOLVED", "EVIDENCE_CONFIRMED"):
             continue
-        created_at = rec.get("created_at")
-        if not created_at:
-            continue
-        if (now - created_at) < sla_seconds:
-            continue
 
         if status == "OPEN":
-            rec["incident_status"] = "UNDER_OBSERVATION"
-            rec["status_updated_at"] = now
+            incidents.set_status(rec, "UNDER_OBSERVATION", now)
+            changed.append(rec)
 
-        incident_id = rec.get("incident_id")
         votes_seen = 0
-        if incident_id:
-            w = witness_by_incident.get(incident_id)
-            if w:
-                votes_seen = int(w.get("total") or 0)
+        w = witness_by_incident.get(incident_id)
+        if w:
+            votes_seen = int(w.get("total") or 0)
 
         summary = (
             f"witness SLA timeout: {witness_sla_timeout_minutes}m, "
@@ -122,9 +378,11 @@ def apply_witness_sla_downgrade_locked(
         if not replaced:
             ai_insights.append(insight)
         rec["ai_insights"] = ai_insights
+        incidents.touch(incident_id)
+    return changed
 
 
-def build_incidents_snapshot(incidents: list[dict[str, Any]]) -> list[dict[str, Any]]:
+def build_incidents_snapshot(incidents: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
     snapshot_records: list[dict[str, Any]] = []
     for rec in incidents:
         snapshot_records.append(
@@ -145,17 +403,80 @@ def build_incidents_snapshot(incidents: list[dict[str, Any]]) -> list[dict[str,
     return snapshot_records
 
 
-def find_incident_by_id(incidents: list[dict[str, Any]], incident_id: str) -> dict[str, Any] | None:
-    rec = None
-    for r in incidents:
-        if r.get("incident_id") == incident_id:
-            rec = r
-            break
-    return rec
+# /v1/incidents 对外 8 字段（fields= 投影只能从中选；incident_id 总是返回）
+INCIDENT_PUBLIC_FIELDS = (
+    "incident_id",
+    "incident_type",
+    "incident_status",
+    "charger_id",
+    "segment_id",
+    "snapshot_ref",
+    "evidence_refs",
+    "ai_insights",
+)
+
+
+def parse_incident_fields(raw: str | None) -> tuple[str, ...] | None:
+    """fields=a,b,c -> 按 INCIDENT_PUBLIC_FIELDS 顺序的元组（含 incident_id）；None/空 -> None（全字段）；未知字段 raise ValueError。"""
+    if raw is None:
+        return None
+    wanted = {x.strip() for x in raw.split(",") if x.strip()}
+    if not wanted:
+        return None
+    if not wanted.issubset(INCIDENT_PUBLIC_FIELDS):
+        raise ValueError("invalid fields")
+    wanted.add("incident_id")
+    return tuple(f for f in INCIDENT_PUBLIC_FIELDS if f in wanted)
+
+
+def build_incident_items(
+    incidents: Iterable[dict[str, Any]], fields: tuple[str, ...] | None = None
+) -> list[dict[str, Any]]:
+    """对外 IncidentItem（可投影）；只有被选中的 evidence_refs / ai_insights 才拷贝。"""
+    if fields is None:
+        fields = INCIDENT_PUBLIC_FIELDS
+    items: list[dict[str, Any]] = []
+    for rec in incidents:
+        item: dict[str, Any] = {}
+        for f in fields:
+            if f == "evidence_refs":
+                ev = rec.get("evidence_refs")
+                item[f] = list(ev) if ev else None
+            elif f == "ai_insights":
+                ai = rec.get("ai_insights")
+                item[f] = [dict(x) for x in ai] if ai else None
+            else:
+                item[f] = rec.get(f)
+        items.append(item)
+    return items
+
+
+def encode_incident_cursor(rec: dict[str, Any]) -> str:
+    """不透明游标：base64url("<created_at repr>|<incident_id>")；float repr 可无损往返。"""
+    raw = f"{float(rec.get('created_at') or 0.0)!r}|{rec.get('incident_id') or ''}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_incident_cursor(cursor: str) -> tuple[float, str]:
+    """解析 encode_incident_cursor 产出的游标；格式不对 raise ValueError("invalid cursor")。"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        ts_s, sep, incident_id = raw.partition("|")
+        ts = float(ts_s)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise ValueError("invalid cursor")
+    if not sep or not incident_id or ts != ts or ts in (float("inf"), float("-inf")):
+        raise ValueError("invalid cursor")
+    return (ts, incident_id)
+
+
+def find_incident_by_id(incidents: IncidentTable, incident_id: str) -> dict[str, Any] | None:
+    return incidents.get(incident_id)
 
 
 def report_blocked_incident_locked(
-    incidents: list[dict[str, Any]],
+    incidents: IncidentTable,
     witness_by_incident: dict[str, dict[str, Any]],
     slots: dict[str, dict[str, Any]],
     charger_id: str,
@@ -195,5 +516,5 @@ def report_blocked_incident_locked(
         "created_at": created_at,
         "status_updated_at": created_at,
     }
-    incidents.append(rec)
+    incidents.add(rec)
     return incident_id
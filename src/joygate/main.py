@@ -9,7 +9,13 @@ from typing import Optional
 
 from fastapi import FastAPI
 
-from joygate.sandbox import sandbox_middleware
+from joygate.sandbox import (
+    close_sandbox_persistence,
+    list_sandbox_stores,
+    reap_idle_sandboxes,
+    restore_persisted_sandboxes,
+    sandbox_middleware,
+)
 from joygate.routes.incidents import router as incidents_router
 from joygate.routes.charging import router as charging_router
 from joygate.routes.witness import router as witness_router
@@ -23,17 +29,25 @@ from joygate.routes.audit import router as audit_router
 from joygate.routes.admin import router as admin_router
 from joygate.routes.work_orders import router as work_orders_router
 from joygate.routes.reputation import router as reputation_router
+from joygate.routes.stream import router as stream_router
 from joygate.routes.ui import router as ui_router
-from joygate.config import POLICY_CONFIG
+from joygate.routes.scheduler import router as scheduler_router
+from joygate.config import POLICY_CONFIG, WORKER_COUNT, WORKER_INDEX
+from joygate.scheduler import start_scheduler, stop_scheduler
+from joygate.webhook_delivery import shutdown_webhook_delivery_engine
 
 # M7.7a：进程持有 OS 文件锁（非阻塞独占），无 mtime/无 unlink/无 stale_seconds；进程退出锁自动释放。
-_SINGLE_WORKER_LOCK_FILENAME = "joygate_single_worker.lock"
+# 多进程部署（joygate.cluster）每个 worker 序号一把锁：同一序号仍只能有一个进程。
+_SINGLE_WORKER_LOCK_FILENAME = (
+    f"joygate_worker_{WORKER_INDEX}_of_{WORKER_COUNT}.lock" if WORKER_COUNT > 1 else "joygate_single_worker.lock"
+)
 _SINGLE_WORKER_LOCK_FD: Optional[int] = None
 
 _SINGLE_WORKER_ERROR_MSG = (
     "JoyGate requires --workers 1. Do not use --workers >1. Multiple workers use separate process memory, "
     "so sandbox/store state would be inconsistent. (--reload may spawn an extra process; avoid for production.) "
-    "Start with: python -m uvicorn joygate.main:app --host 127.0.0.1 --port 8000 --workers 1"
+    "Start with: python -m uvicorn joygate.main:app --host 127.0.0.1 --port 8000 --workers 1 "
+    "(multi-core: python -m joygate.cluster --workers N --port 8000)"
 )
 
 
@@ -132,11 +146,20 @@ def _release_single_worker_lock() -> None:
 
 @asynccontextmanager
 async def _lifespan(app: FastAPI):
+    scheduler_started = False
     try:
         _acquire_single_worker_lock()
         _run_startup_warnings()
+        restore_persisted_sandboxes()
+        start_scheduler(list_sandbox_stores, reap_idle_sandboxes)
+        scheduler_started = True
         yield
     finally:
+        if scheduler_started:
+            await stop_scheduler()
+        # 未执行的投递丢弃（delivery 保持 PENDING），不阻塞进程退出
+        shutdown_webhook_delivery_engine()
+        close_sandbox_persistence()
         _release_single_worker_lock()
 
 
@@ -155,4 +178,6 @@ app.include_router(audit_router)
 app.include_router(admin_router)
 app.include_router(work_orders_router)
 app.include_router(reputation_router)
+app.include_router(stream_router)
+app.include_router(scheduler_router)
 app.include_router(ui_router)
\ No newline at end of file
@@ -0,0 +1,84 @@
+# src/joygate/rate_limit.py
+"""
+分片令牌桶限流（sandbox 中间件的 per-IP / per-sandbox 限流）。
+
+- 每个 key 一个令牌桶：容量 = 每分钟配额，按 配额/60 每秒平滑回填；没有固定分钟边界，跨边界也无法瞬间打出 2 倍配额。
+- key 按 hash 分到 shards 个分片，每片一把锁 + 一个按最近访问排序的 OrderedDict；不同客户端基本不争同一把锁。
+- 空闲超过回填满一桶所需时间的 key 与"不存在"等价，直接丢弃：每次 acquire 顺手从本分片队头弹出少量，
+  sweep() 供后台全量清理。单次 acquire 为 O(1)，与客户端总数无关。
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Optional
+
+DEFAULT_SHARDS = 16
+LAZY_EXPIRE_PER_CALL = 2  # 每次 acquire 顺手清理本分片队头过期 key 的上限
+
+
+class _Shard:
+    __slots__ = ("lock", "buckets")
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        # key -> [tokens, last_ts]；队头最久未访问
+        self.buckets: OrderedDict[Hashable, list[float]] = OrderedDict()
+
+
+class TokenBucketLimiter:
+    def __init__(self, per_minute: int, shards: int = DEFAULT_SHARDS) -> None:
+        self.capacity = float(max(0, per_minute))
+        self.refill_per_second = self.capacity / 60.0
+        # 空桶回填满所需时间；空闲更久的 key 桶已满，丢弃不影响结果
+        self.idle_seconds = 60.0
+        self._shards = [_Shard() for _ in range(max(1, int(shards)))]
+
+    def _shard(self, key: Hashable) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def acquire(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """取一个令牌：成功返回 True，桶空返回 False（不扣减）。"""
+        if self.capacity <= 0:
+            return False
+        now_ts = time.monotonic() if now is None else now
+        shard = self._shard(key)
+        with shard.lock:
+            buckets = shard.buckets
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [self.capacity, now_ts]
+            else:
+                elapsed = now_ts - bucket[1]
+                if elapsed > 0:
+                    bucket[0] = min(self.capacity, bucket[0] + elapsed * self.refill_per_second)
+                    bucket[1] = now_ts
+                buckets.move_to_end(key)
+            allowed = bucket[0] >= 1.0
+            if allowed:
+                bucket[0] -= 1.0
+            self._expire_locked(buckets, now_ts, LAZY_EXPIRE_PER_CALL)
+        return allowed
+
+    def _expire_locked(self, buckets: OrderedDict, now_ts: float, limit: Optional[int]) -> int:
+        removed = 0
+        while buckets and (limit is None or removed < limit):
+            key, bucket = next(iter(buckets.items()))
+            if now_ts - bucket[1] <= self.idle_seconds:
+                break
+            del buckets[key]
+            removed += 1
+        return removed
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """清理所有分片中空闲过期的 key，返回清理数。"""
+        now_ts = time.monotonic() if now is None else now
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                removed += self._expire_locked(shard.buckets, now_ts, None)
+        return removed
+
+    def __len__(self) -> int:
+        return sum(len(s.buckets) for s in self._shards)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -13,6 +13,7 @@ MAX_HOLD_ID_LEN = 64
 MAX_CHARGER_ID_LEN = 64
 MAX_METER_SESSION_ID_LEN = 64
 MAX_EVENT_OCCURRED_AT_LEN = 64
+MAX_SNAPSHOT_SINCE_LEN = 64
 
 
 class ReserveRequestIn(BaseModel):
@@ -116,11 +117,53 @@ def oracle_stop(req: OracleEventIn, request: Request):
     return {"ok": True, "truth_event": "STOP_CHARGING"}
 
 
+def _if_none_match_hit(header_value: str | None, etag: str) -> bool:
+    """If-None-Match 是否命中 etag；支持逗号分隔多个值、W/ 弱校验前缀与 *。"""
+    if not header_value:
+        return False
+    for part in header_value.split(","):
+        tag = part.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
 @router.get("/v1/snapshot")
 def v1_snapshot(request: Request):
-    """返回当前 chargers / holds 快照，字段严格符合 FIELD_REGISTRY SnapshotOK。"""
+    """
+    返回当前 chargers / holds 快照，字段严格符合 FIELD_REGISTRY SnapshotOK。
+    响应带 ETag（store epoch + 分段 state version）；If-None-Match 命中时返回 304 空体。
+    """
+    store = request.state.store
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # 304 路径只比对分段版本号，不取缓存 body
+        etag = f'"{store.snapshot_tag()}"'
+        if _if_none_match_hit(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    state_tag, body = store.snapshot_json()
+    etag = f'"{state_tag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/v1/snapshot/changes")
+def v1_snapshot_changes(request: Request, since: str | None = None):
+    """
+    增量快照：返回 since（上次响应的 state_version）之后变更的 chargers / holds / hazards / segment_passed_signals
+    及被移除对象的 key；since 缺省、过旧或来自重启前的 store -> is_full_snapshot=true 全量。
+    """
+    if since is not None and (since != since.strip() or len(since) > MAX_SNAPSHOT_SINCE_LEN):
+        raise HTTPException(status_code=400, detail="invalid since")
     store = request.state.store
-    return store.snapshot()
+    try:
+        return JSONResponse(content=store.snapshot_changes(since))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/v1/policy")
@@ -3,7 +3,7 @@ from __future__ import annotations
 from typing import Optional, Any
 
 from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 
 from joygate.store import ALLOWED_INCIDENT_STATUSES, ALLOWED_INCIDENT_TYPES
@@ -12,6 +12,7 @@ from joygate.routes._input_norm import (
     norm_optional_str,
     norm_required_str,
 )
+from joygate.webhooks_logic import dispatch_webhook_outbox
 from joygate.config import (
     WEBHOOK_TIMEOUT_SECONDS,
     WEBHOOK_RETRY_MAX_ATTEMPTS,
@@ -52,14 +53,17 @@ class IncidentsReportBlockedOut(BaseModel):
     incident_id: str
 
 
-MAX_DELIVERIES_PER_DISPATCH = 50  # 单次派发 delivery 上限，内部常量
-MAX_EVENTS_SCAN_PER_DISPATCH = 200  # 单次扫描事件数上限，超出部分 put_back 下一轮
 MAX_INCIDENT_ID_LEN = 64
 MAX_SNAPSHOT_REF_LEN = 64
 MAX_CHARGER_ID_LEN = 64
 MAX_INCIDENT_TYPE_LEN = 32
 MAX_EVIDENCE_REFS = 20
 MAX_EVIDENCE_REF_LEN = 256
+# /v1/incidents 分页（limit 越界夹到 [1, MAX]，同 /v1/score_events）
+DEFAULT_INCIDENTS_PAGE_LIMIT = 100
+MAX_INCIDENTS_PAGE_LIMIT = 500
+MAX_INCIDENTS_CURSOR_LEN = 256
+MAX_INCIDENTS_FIELDS_LEN = 256
 
 # 路由层统一限长（report_blocked 已有校验不动；witness/webhook 入口用）
 MAX_ROUTE_STR_LEN = 64
@@ -109,55 +113,13 @@ def _validate_evidence_refs_route(refs: Any, field_name: str = "evidence_refs")
 
 
 def _dispatch_webhook_outbox(store, background_tasks: BackgroundTasks) -> None:
-    events = store.drain_webhook_outbox()
-    if not events:
-        return
-    to_scan = events[:MAX_EVENTS_SCAN_PER_DISPATCH]
-    rest = events[MAX_EVENTS_SCAN_PER_DISPATCH:]
-    added_deliveries = 0
-    for i, event in enumerate(to_scan):
-        try:
-            event_type = event.get("event_type")
-            if not isinstance(event_type, str) or not event_type.strip():
-                continue
-            targets = store.list_enabled_webhook_targets_for_event(event_type)
-            valid_targets = [
-                t
-                for t in targets
-                if t.get("subscription_id")
-                and isinstance(t.get("target_url"), str)
-                and (t.get("target_url") or "").strip()
-            ]
-            if not valid_targets:
-                continue
-            remaining_budget = MAX_DELIVERIES_PER_DISPATCH - added_deliveries
-            # 一个 event 要么全派发要么不派发；budget 不足则整包延后，此分支不创建任何 delivery（避免重复派发）
-            if remaining_budget <= 0 or added_deliveries + len(valid_targets) > MAX_DELIVERIES_PER_DISPATCH:
-                store.put_back_webhook_outbox([event] + to_scan[i + 1 :] + rest)
-                return
-            for target in valid_targets:
-                subscription_id = target.get("subscription_id")
-                target_url = (target.get("target_url") or "").strip()
-                secret = target.get("secret")
-                delivery_id = store.create_webhook_delivery_if_absent(event, subscription_id, target_url)
-                if delivery_id is None:
-                    continue  # 已存在相同 event_id+subscription_id，不重复发送
-                background_tasks.add_task(
-                    store.process_webhook_delivery,
-                    delivery_id,
-                    target_url,
-                    secret,
-                    event,
-                    WEBHOOK_TIMEOUT_SECONDS,
-                    WEBHOOK_RETRY_MAX_ATTEMPTS,
-                    WEBHOOK_RETRY_BACKOFF_SECONDS,
-                )
-                added_deliveries += 1
-        except Exception:
-            store.put_back_webhook_outbox([event] + to_scan[i + 1 :] + rest)
-            return
-    if rest:
-        store.put_back_webhook_outbox(rest)
+    dispatch_webhook_outbox(
+        store,
+        background_tasks.add_task,
+        WEBHOOK_TIMEOUT_SECONDS,
+        WEBHOOK_RETRY_MAX_ATTEMPTS,
+        WEBHOOK_RETRY_BACKOFF_SECONDS,
+    )
 
 
 @router.get("/v1/incidents", response_model=IncidentListOut)
@@ -168,8 +130,15 @@ def v1_incidents(
     incident_status: Optional[str] = None,
     charger_id: Optional[str] = None,
     segment_id: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
 ):
-    """返回事件列表，严格符合 FIELD_REGISTRY IncidentList：{ incidents: [...] }。"""
+    """
+    返回事件列表，严格符合 FIELD_REGISTRY IncidentList：{ incidents: [...] }。
+    分页：带 limit / cursor / fields 任一参数时走分页版，返回 { incidents: [...], next_cursor }；
+    next_cursor 为 null 表示没有下一页；fields=逗号分隔的 IncidentItem 字段（incident_id 总是返回）。
+    """
     incident_type_for_list: Optional[str] = None
     if incident_type is not None:
         if not isinstance(incident_type, str):
@@ -209,6 +178,27 @@ def v1_incidents(
     segment_id_for_list = norm_optional_str("segment_id", segment_id, MAX_INCIDENT_ID_LEN) if segment_id is not None else None
 
     store = request.state.store
+    if limit is not None or cursor is not None or fields is not None:
+        page_limit = DEFAULT_INCIDENTS_PAGE_LIMIT if limit is None else min(MAX_INCIDENTS_PAGE_LIMIT, max(1, limit))
+        if cursor is not None and (not cursor or len(cursor) > MAX_INCIDENTS_CURSOR_LEN):
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        if fields is not None and len(fields) > MAX_INCIDENTS_FIELDS_LEN:
+            raise HTTPException(status_code=400, detail="invalid fields")
+        try:
+            page = store.list_incidents_page(
+                page_limit,
+                cursor=cursor,
+                fields=fields,
+                incident_id=incident_id_for_list,
+                incident_type=incident_type_for_list,
+                incident_status=incident_status_for_list,
+                charger_id=charger_id_for_list,
+                segment_id=segment_id_for_list,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # 投影后字段不全，绕过 IncidentListOut 校验直接返回
+        return JSONResponse(content=page)
     results = store.list_incidents(
         incident_id=incident_id_for_list,
         incident_type=incident_type_for_list,
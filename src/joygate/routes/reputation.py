@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException, Request
 
 router = APIRouter()
 MAX_JOYKEY_LEN = 64
+MAX_EVENT_ID_LEN = 64
 MAX_LIMIT = 500
 DEFAULT_LIMIT = 100
 
@@ -32,8 +33,10 @@ def v1_reputation_get(request: Request, joykey: str | None = None):
 
 
 @router.get("/v1/score_events")
-def v1_score_events_list(request: Request, limit: int | None = None):
-    """GET /v1/score_events?limit=100；计分事件列表，按时间倒序。"""
+def v1_score_events_list(request: Request, limit: int | None = None, before: str | None = None):
+    """GET /v1/score_events?limit=100&before=<event_id>；计分事件列表，按时间倒序；before 翻到该事件之前（更早）的一页。"""
+    if before is not None and (not before.strip() or before != before.strip() or len(before) > MAX_EVENT_ID_LEN):
+        raise HTTPException(status_code=400, detail="invalid before")
     if limit is None:
         limit = DEFAULT_LIMIT
     try:
@@ -43,7 +46,7 @@ def v1_score_events_list(request: Request, limit: int | None = None):
     if limit < 0 or limit > MAX_LIMIT:
         limit = min(MAX_LIMIT, max(0, limit))
     store = request.state.store
-    events = store.get_score_events(limit=limit)
+    events = store.get_score_events(limit=limit, before=before)
     return {"score_events": events}
 
 
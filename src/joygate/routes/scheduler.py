@@ -0,0 +1,17 @@
+# /v1/scheduler/stats：后台调度器各周期任务的运行次数与耗时（进程级，不区分 sandbox）
+from __future__ import annotations
+
+from fastapi import APIRouter
+
+from joygate.scheduler import get_scheduler_stats
+
+router = APIRouter()
+
+
+@router.get("/v1/scheduler/stats")
+def v1_scheduler_stats():
+    """
+    返回 {running, started_at, tasks:[...]}；每个 task：name, interval_seconds, enabled, runs, errors,
+    last_started_at, last_duration_ms, max_duration_ms, avg_duration_ms, last_error。
+    """
+    return get_scheduler_stats()
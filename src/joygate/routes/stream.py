@@ -0,0 +1,79 @@
+# /v1/stream：SSE 推送（state version 变化 + webhook 同源事件），替代 UI 高频轮询
+from __future__ import annotations
+
+import asyncio
+import time
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from joygate.config import STREAM_HEARTBEAT_SECONDS, STREAM_MAX_CONNECTION_SECONDS
+
+router = APIRouter()
+# 唤醒后短暂等待，把同一波写入合并成一次发送
+STREAM_COALESCE_SECONDS = 0.1
+STREAM_RETRY_MS = 3000
+
+
+def _sse(event: str, data: str, event_id: str | None = None) -> bytes:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+def _state_data(tag: str) -> str:
+    return '{"state_version":"' + tag + '"}'
+
+
+async def _event_stream(request: Request, store, sub):
+    deadline = time.monotonic() + STREAM_MAX_CONNECTION_SECONDS
+    try:
+        last_tag = store.state_version_tag()
+        yield f"retry: {STREAM_RETRY_MS}\n\n".encode("utf-8")
+        yield _sse("snapshot", _state_data(last_tag))
+        while time.monotonic() < deadline:
+            if await request.is_disconnected():
+                break
+            woke = await sub.wait(STREAM_HEARTBEAT_SECONDS)
+            if not woke:
+                yield b": keepalive\n\n"
+                continue
+            await asyncio.sleep(STREAM_COALESCE_SECONDS)
+            overflowed, state_pending, items = sub.drain()
+            if overflowed:
+                # 积压被丢弃：客户端应全量刷新
+                last_tag = store.state_version_tag()
+                yield _sse("resync", _state_data(last_tag))
+                continue
+            for event_type, event_id, data in items:
+                yield _sse(event_type, data, event_id or None)
+            if state_pending:
+                tag = store.state_version_tag()
+                if tag != last_tag:
+                    last_tag = tag
+                    yield _sse("snapshot", _state_data(tag))
+    finally:
+        store.close_stream(sub)
+
+
+@router.get("/v1/stream")
+async def v1_stream(request: Request):
+    """
+    GET /v1/stream（text/event-stream）。事件：
+    - snapshot：state version 变化（data.state_version，可直接作 /v1/snapshot/changes 的 since），连接建立时先发一次；
+    - <event_type>：与 outbound webhook 同源的事件（id 为 event_id，data 为完整事件 JSON）；
+    - resync：推送积压溢出，客户端应全量刷新。
+    本 sandbox 连接数已满返回 503；单连接最长存活 STREAM_MAX_CONNECTION_SECONDS，到期断开由客户端重连。
+    """
+    store = request.state.store
+    sub = store.open_stream(asyncio.get_running_loop())
+    if sub is None:
+        raise HTTPException(status_code=503, detail="too many streams")
+    return StreamingResponse(
+        _event_stream(request, store, sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -186,6 +186,8 @@ var capacityReached = false;
 var chargerOverrides = {};
 var intervals = { snapshot: 2000, incidents: 6000, audit: 10000, policy: 30000 };
 var baseIntervals = { snapshot: 2000, incidents: 6000, audit: 10000, policy: 30000 };
+var POLL_INTERVALS = { snapshot: 2000, incidents: 6000, audit: 10000, policy: 30000 };
+var STREAM_POLL_INTERVALS = { snapshot: 20000, incidents: 30000, audit: 30000, policy: 30000 };
 var telemetrySyncOn = false;
 var telemetryBotIndex = 0;
 var reduceMotion = window.matchMedia && window.matchMedia("(prefers-reduced-motion: reduce)").matches;
@@ -744,10 +746,38 @@ function recomputeAllPaths(){
     b.moveStartMs = Date.now();
   });
 }
+function setPollIntervals(src){
+  Object.keys(src).forEach(function(k){ baseIntervals[k] = src[k]; intervals[k] = src[k]; });
+}
+function startStream(pollNow){
+  // /v1/stream 推送：连上后轮询退为低频兜底，事件到达时立即拉取对应面板；连续失败则关闭，回到常规轮询
+  if (!window.EventSource) return;
+  var es = new EventSource("/v1/stream", { withCredentials: true });
+  var failures = 0;
+  var pending = {};
+  var lastRun = {};
+  function kick(name){
+    // 合并突发事件：每个面板至少间隔 1s 才再拉一次
+    if (pending[name] || !pollNow[name]) return;
+    var wait = Math.max(150, 1000 - (Date.now() - (lastRun[name] || 0)));
+    pending[name] = setTimeout(function(){ pending[name] = 0; lastRun[name] = Date.now(); if (!demoStrictMode) pollNow[name](); }, wait);
+  }
+  es.onopen = function(){ failures = 0; setPollIntervals(STREAM_POLL_INTERVALS); };
+  es.onerror = function(){
+    setPollIntervals(POLL_INTERVALS);
+    failures++;
+    if (failures >= 5) { es.close(); log("WARN", "push stream unavailable, polling"); }
+  };
+  es.addEventListener("snapshot", function(){ kick("snapshot"); });
+  es.addEventListener("resync", function(){ kick("snapshot"); kick("incidents"); kick("audit"); });
+  ["INCIDENT_CREATED", "INCIDENT_STATUS_CHANGED", "AI_JOB_STATUS_CHANGED"].forEach(function(t){
+    es.addEventListener(t, function(){ kick("incidents"); kick("audit"); });
+  });
+  es.addEventListener("HAZARD_STATUS_CHANGED", function(){ kick("snapshot"); kick("audit"); });
+}
 function runPolling(){
   if (capacityReached) { setTimeout(runPolling, 60000); return; }
-  function doSnapshot(){
-    if (demoStrictMode) { setTimeout(doSnapshot, intervals.snapshot); return; }
+  function fetchSnapshot(){
     poll("/v1/snapshot","snapshot",function(d){
       var currH = ((d&&d.hazards)||[]).filter(function(z){ return !isHazardSuppressed((z && z.segment_id) || ""); });
       var prevMap = {}; (prevHazards||[]).forEach(function(z){ var s = (z.segment_id||""); if (s) prevMap[s] = (z.hazard_status||"").toUpperCase(); });
@@ -769,12 +799,15 @@ function runPolling(){
       if (hazardChanged) recomputeAllPaths();
       redraw();
     });
-    setTimeout(doSnapshot, intervals.snapshot);
   }
-  function doIncidents(){ if (demoStrictMode) { setTimeout(doIncidents, intervals.incidents); return; } poll("/v1/incidents","incidents",function(d){ incidents = (d&&d.incidents)||[]; updateCards(); }); setTimeout(doIncidents, intervals.incidents); }
-  function doAudit(){ if (demoStrictMode) { setTimeout(doAudit, intervals.audit); return; } poll("/v1/audit/ledger","audit",function(d){ audit = d || audit; updateCards(); }); setTimeout(doAudit, intervals.audit); }
+  function fetchIncidents(){ poll("/v1/incidents?limit=10&fields=incident_type,incident_status","incidents",function(d){ incidents = (d&&d.incidents)||[]; updateCards(); }); }
+  function fetchAudit(){ poll("/v1/audit/ledger","audit",function(d){ audit = d || audit; updateCards(); }); }
+  function doSnapshot(){ if (!demoStrictMode) fetchSnapshot(); setTimeout(doSnapshot, intervals.snapshot); }
+  function doIncidents(){ if (!demoStrictMode) fetchIncidents(); setTimeout(doIncidents, intervals.incidents); }
+  function doAudit(){ if (!demoStrictMode) fetchAudit(); setTimeout(doAudit, intervals.audit); }
   function doPolicy(){ if (demoStrictMode) { setTimeout(doPolicy, intervals.policy); return; } poll("/v1/policy","policy",function(d){ policy = d || policy; updateCards(); }); setTimeout(doPolicy, intervals.policy); }
   doSnapshot(); doIncidents(); doAudit(); doPolicy();
+  startStream({ snapshot: fetchSnapshot, incidents: fetchIncidents, audit: fetchAudit });
 }
 
 function setText(el, text){ el.textContent = text || ""; }
@@ -6,6 +6,7 @@ from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 
 from joygate.routes.incidents import _validate_optional_str, _validate_required_str
+from joygate.webhook_delivery import get_webhook_delivery_stats
 
 router = APIRouter()
 
@@ -17,6 +18,8 @@ class WebhookSubscriptionCreateIn(BaseModel):
     event_types: list[str]
     secret: Optional[str] = None
     is_enabled: Optional[bool] = None
+    batch_max_size: Optional[int] = None
+    batch_linger_ms: Optional[int] = None
 
 
 class WebhookSubscriptionOut(BaseModel):
@@ -25,6 +28,8 @@ class WebhookSubscriptionOut(BaseModel):
     event_types: list[str]
     is_enabled: bool
     created_at: str
+    batch_max_size: int | None = None
+    batch_linger_ms: int | None = None
 
 
 class WebhookSubscriptionListOut(BaseModel):
@@ -67,6 +72,8 @@ def v1_webhooks_subscriptions_create(req: WebhookSubscriptionCreateIn, request:
             event_types=event_types_clean,
             secret=secret,
             is_enabled=req.is_enabled,
+            batch_max_size=req.batch_max_size,
+            batch_linger_ms=req.batch_linger_ms,
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -80,8 +87,22 @@ def v1_webhooks_subscriptions_list(request: Request):
     return {"subscriptions": store.list_webhook_subscriptions()}
 
 
+@router.get("/v1/webhooks/stats")
+def v1_webhooks_stats(request: Request):
+    """
+    投递健康度：subscriptions（每订阅 breaker_state/consecutive_failures/open_seconds_remaining/successes/failures/
+    avg_latency_ms/last_error/parked）、parked_total、outbox_backlog；engine 为进程级投递引擎计数（不区分 sandbox）。
+    """
+    store = request.state.store
+    return {**store.webhook_stats(), "engine": get_webhook_delivery_stats()}
+
+
 @router.get("/v1/webhooks/deliveries", response_model=WebhookDeliveryListOut)
-def v1_webhooks_deliveries_list(request: Request):
-    """查询 webhook deliveries；严格符合 FIELD_REGISTRY WebhookDeliveriesListOK。"""
+def v1_webhooks_deliveries_list(request: Request, event_id: str | None = None, subscription_id: str | None = None):
+    """查询 webhook deliveries；可按 event_id（再加 subscription_id）过滤；严格符合 FIELD_REGISTRY WebhookDeliveriesListOK。"""
+    event_id = _validate_optional_str(event_id, "event_id")
+    subscription_id = _validate_optional_str(subscription_id, "subscription_id")
+    if subscription_id is not None and event_id is None:
+        raise HTTPException(status_code=400, detail="event_id required")
     store = request.state.store
-    return {"deliveries": store.list_webhook_deliveries()}
+    return {"deliveries": store.list_webhook_deliveries(event_id, subscription_id)}
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Any, Optional
 
 from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
 from fastapi.responses import Response
 from pydantic import BaseModel
 
+from joygate.config import WITNESS_BATCH_MAX_VOTES
 from joygate.routes.incidents import (
     _dispatch_webhook_outbox,
     _validate_evidence_refs_route,
@@ -30,42 +31,110 @@ class WitnessResponseIn(BaseModel):
     points_event_id: Optional[str] = None
 
 
-@router.post("/v1/witness/respond")
-def v1_witness_respond(req: WitnessResponseIn, request: Request, background_tasks: BackgroundTasks):
-    """M8 witness 桩占用投票；witness 身份来自 X-JoyKey；成功 204 No Content。"""
+def _witness_joykey(request: Request) -> str:
+    """witness 身份来自 X-JoyKey；缺失/空 -> 400。"""
     joykey_raw = request.headers.get("X-JoyKey")
     if joykey_raw is None or (isinstance(joykey_raw, str) and not joykey_raw.strip()):
         raise HTTPException(status_code=400, detail="missing X-JoyKey")
-    witness_joykey = _validate_required_str(joykey_raw, "witness_joykey")
-    incident_id = _validate_required_str(req.incident_id, "incident_id")
-    charger_id = _validate_required_str(req.charger_id, "charger_id")
-    charger_state = _validate_required_str(req.charger_state, "charger_state")
-    if charger_state not in ALLOWED_CHARGER_STATES:
+    return _validate_required_str(joykey_raw, "witness_joykey")
+
+
+def _witness_vote(req: WitnessResponseIn) -> dict[str, Any]:
+    """单条桩占用投票的路由层校验（单条与批量共用）；非法 -> HTTPException 400。"""
+    vote: dict[str, Any] = {
+        "incident_id": _validate_required_str(req.incident_id, "incident_id"),
+        "charger_id": _validate_required_str(req.charger_id, "charger_id"),
+        "charger_state": _validate_required_str(req.charger_state, "charger_state"),
+    }
+    if vote["charger_state"] not in ALLOWED_CHARGER_STATES:
         raise HTTPException(status_code=400, detail="invalid charger_state")
-    obstacle_type = _validate_optional_str(req.obstacle_type, "obstacle_type")
-    evidence_refs = _validate_evidence_refs_route(req.evidence_refs, "evidence_refs")
-    points_event_id = _validate_optional_str(req.points_event_id, "points_event_id")
+    vote["obstacle_type"] = _validate_optional_str(req.obstacle_type, "obstacle_type")
+    vote["evidence_refs"] = _validate_evidence_refs_route(req.evidence_refs, "evidence_refs")
+    vote["points_event_id"] = _validate_optional_str(req.points_event_id, "points_event_id")
+    return vote
+
+
+@router.post("/v1/witness/respond")
+def v1_witness_respond(req: WitnessResponseIn, request: Request, background_tasks: BackgroundTasks):
+    """M8 witness 桩占用投票；witness 身份来自 X-JoyKey；成功 204 No Content。"""
+    witness_joykey = _witness_joykey(request)
+    vote = _witness_vote(req)
     store = request.state.store
     try:
-        store.witness_respond(
-            witness_joykey=witness_joykey,
-            incident_id=incident_id,
-            charger_id=charger_id,
-            charger_state=charger_state,
-            obstacle_type=obstacle_type,
-            evidence_refs=evidence_refs,
-            points_event_id=points_event_id,
-        )
+        store.witness_respond(witness_joykey=witness_joykey, **vote)
     except PermissionError:
         raise HTTPException(status_code=403, detail="witness not allowed")
     except KeyError:
-        raise HTTPException(status_code=404, detail=f"unknown incident_id: {incident_id}")
+        raise HTTPException(status_code=404, detail=f"unknown incident_id: {vote['incident_id']}")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     _dispatch_webhook_outbox(store, background_tasks)
     return Response(status_code=204)
 
 
+class WitnessBatchResultOut(BaseModel):
+    """批量投票逐条结果：status_code 与单条接口一致（204 成功 / 400 / 404），detail 为失败原因。"""
+    index: int
+    status_code: int
+    detail: Optional[str] = None
+
+
+class WitnessBatchOut(BaseModel):
+    """批量投票响应：results 与请求 votes 一一对应（同序）；accepted 为成功条数。"""
+    accepted: int
+    results: list[WitnessBatchResultOut]
+
+
+class WitnessResponseBatchIn(BaseModel):
+    """POST /v1/witness/respond_batch 请求体：votes 每项同 WitnessResponseIn。"""
+    votes: list[WitnessResponseIn]
+
+
+def _check_batch_size(votes: list[Any]) -> None:
+    if not votes:
+        raise HTTPException(status_code=400, detail="invalid votes")
+    if len(votes) > WITNESS_BATCH_MAX_VOTES:
+        raise HTTPException(status_code=400, detail=f"too many votes (max {WITNESS_BATCH_MAX_VOTES})")
+
+
+def _batch_out(statuses: list[tuple[int, Optional[str]]]) -> WitnessBatchOut:
+    return WitnessBatchOut(
+        accepted=sum(1 for code, _ in statuses if code == 204),
+        results=[WitnessBatchResultOut(index=i, status_code=code, detail=detail) for i, (code, detail) in enumerate(statuses)],
+    )
+
+
+@router.post("/v1/witness/respond_batch", response_model=WitnessBatchOut)
+def v1_witness_respond_batch(req: WitnessResponseBatchIn, request: Request, background_tasks: BackgroundTasks):
+    """
+    批量桩占用投票（同一 X-JoyKey 一次上报多条观察）：逐条校验与语义同 /v1/witness/respond，按顺序应用，
+    store 整批只取一次锁，webhook 派发整批一次。单条失败不影响其余；非白名单机器人整批 403。成功 200 + 逐条结果。
+    """
+    witness_joykey = _witness_joykey(request)
+    _check_batch_size(req.votes)
+    statuses: list[tuple[int, Optional[str]]] = [(204, None)] * len(req.votes)
+    votes: list[dict[str, Any]] = []
+    positions: list[int] = []
+    for i, item in enumerate(req.votes):
+        try:
+            votes.append(_witness_vote(item))
+            positions.append(i)
+        except HTTPException as e:
+            statuses[i] = (e.status_code, e.detail)
+    store = request.state.store
+    try:
+        results = store.witness_respond_batch(witness_joykey, votes)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="witness not allowed")
+    for i, vote, err in zip(positions, votes, results):
+        if isinstance(err, KeyError):
+            statuses[i] = (404, f"unknown incident_id: {vote['incident_id']}")
+        elif err is not None:
+            statuses[i] = (400, str(err))
+    _dispatch_webhook_outbox(store, background_tasks)
+    return _batch_out(statuses)
+
+
 class SegmentWitnessResponseIn(BaseModel):
     """POST /v1/witness/segment_respond 请求体，对齐 FIELD_REGISTRY；segment_state 与 hazard_status 二选一；points_event_id 必填（幂等去重）。"""
     segment_id: str
@@ -76,58 +145,87 @@ class SegmentWitnessResponseIn(BaseModel):
     points_event_id: Optional[str] = None  # 路由层强制必填，缺失/空→400
 
 
-@router.post("/v1/witness/segment_respond")
-def v1_witness_segment_respond(req: SegmentWitnessResponseIn, request: Request, background_tasks: BackgroundTasks):
-    """M9/M14.3 Segment witness；witness 身份来自 X-JoyKey；segment_state 或 hazard_status；成功 204。"""
-    joykey_raw = request.headers.get("X-JoyKey")
-    if joykey_raw is None or (isinstance(joykey_raw, str) and not joykey_raw.strip()):
-        raise HTTPException(status_code=400, detail="missing X-JoyKey")
-    witness_joykey = _validate_required_str(joykey_raw, "witness_joykey")
-    segment_id = _validate_required_str(req.segment_id, "segment_id")
-    obstacle_type = _validate_optional_str(req.obstacle_type, "obstacle_type")
-    evidence_refs = _validate_evidence_refs_route(req.evidence_refs, "evidence_refs")
+def _segment_vote(req: SegmentWitnessResponseIn) -> dict[str, Any]:
+    """
+    单条 segment witness 的路由层校验（单条与批量共用）；非法 -> HTTPException 400。
+    返回含 segment_state（M14.3）或 hazard_status（M9 兼容）之一的 dict。
+    """
+    vote: dict[str, Any] = {
+        "segment_id": _validate_required_str(req.segment_id, "segment_id"),
+        "obstacle_type": _validate_optional_str(req.obstacle_type, "obstacle_type"),
+        "evidence_refs": _validate_evidence_refs_route(req.evidence_refs, "evidence_refs"),
+    }
     if req.points_event_id is None or not isinstance(req.points_event_id, str):
         raise HTTPException(status_code=400, detail="invalid points_event_id")
-    points_event_id = _validate_required_str(req.points_event_id, "points_event_id")
+    vote["points_event_id"] = _validate_required_str(req.points_event_id, "points_event_id")
 
     use_segment_state = req.segment_state is not None and (req.segment_state or "").strip()
     if use_segment_state:
         segment_state = _validate_required_str(req.segment_state, "segment_state")
         if segment_state not in ALLOWED_SEGMENT_STATES:
             raise HTTPException(status_code=400, detail="invalid segment_state")
-        store = request.state.store
-        try:
-            store.record_segment_witness(
-                segment_id=segment_id,
-                segment_state=segment_state,
-                witness_joykey=witness_joykey,
-                points_event_id=points_event_id,
-                evidence_refs=evidence_refs,
-                obstacle_type=obstacle_type,
-            )
-        except PermissionError:
-            raise HTTPException(status_code=403, detail="witness not allowed")
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
+        vote["segment_state"] = segment_state
     else:
         if req.hazard_status is None or not isinstance(req.hazard_status, str) or not (req.hazard_status or "").strip():
             raise HTTPException(status_code=400, detail="invalid hazard_status")
         hazard_status = _validate_required_str(req.hazard_status, "hazard_status")
         if hazard_status not in ALLOWED_HAZARD_STATUSES:
             raise HTTPException(status_code=400, detail="invalid hazard_status")
-        store = request.state.store
-        try:
-            store.segment_witness_respond(
-                witness_joykey=witness_joykey,
-                segment_id=segment_id,
-                hazard_status=hazard_status,
-                obstacle_type=obstacle_type,
-                evidence_refs=evidence_refs,
-                points_event_id=points_event_id,
-            )
-        except PermissionError:
-            raise HTTPException(status_code=403, detail="witness not allowed")
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
+        vote["hazard_status"] = hazard_status
+    return vote
+
+
+@router.post("/v1/witness/segment_respond")
+def v1_witness_segment_respond(req: SegmentWitnessResponseIn, request: Request, background_tasks: BackgroundTasks):
+    """M9/M14.3 Segment witness；witness 身份来自 X-JoyKey；segment_state 或 hazard_status；成功 204。"""
+    witness_joykey = _witness_joykey(request)
+    vote = _segment_vote(req)
+    store = request.state.store
+    try:
+        if "segment_state" in vote:
+            store.record_segment_witness(witness_joykey=witness_joykey, **vote)
+        else:
+            store.segment_witness_respond(witness_joykey=witness_joykey, **vote)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="witness not allowed")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     _dispatch_webhook_outbox(store, background_tasks)
     return Response(status_code=204)
+
+
+class SegmentWitnessResponseBatchIn(BaseModel):
+    """POST /v1/witness/segment_respond_batch 请求体：votes 每项同 SegmentWitnessResponseIn（points_event_id 逐条必填）。"""
+    votes: list[SegmentWitnessResponseIn]
+
+
+@router.post("/v1/witness/segment_respond_batch", response_model=WitnessBatchOut)
+def v1_witness_segment_respond_batch(
+    req: SegmentWitnessResponseBatchIn, request: Request, background_tasks: BackgroundTasks
+):
+    """
+    批量 segment witness（同一 X-JoyKey 一次上报多条路段观察）：逐条校验与语义同 /v1/witness/segment_respond，按顺序应用，
+    store 整批只取一次锁；HAZARD_STATUS_CHANGED 按 segment 合并（每 segment 至多一条），webhook 派发整批一次。
+    单条失败不影响其余；非白名单机器人整批 403。成功 200 + 逐条结果。
+    """
+    witness_joykey = _witness_joykey(request)
+    _check_batch_size(req.votes)
+    statuses: list[tuple[int, Optional[str]]] = [(204, None)] * len(req.votes)
+    votes: list[dict[str, Any]] = []
+    positions: list[int] = []
+    for i, item in enumerate(req.votes):
+        try:
+            votes.append(_segment_vote(item))
+            positions.append(i)
+        except HTTPException as e:
+            statuses[i] = (e.status_code, e.detail)
+    store = request.state.store
+    try:
+        results = store.record_segment_witness_batch(witness_joykey, votes)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="witness not allowed")
+    for i, err in zip(positions, results):
+        if err is not None:
+            statuses[i] = (400, str(err))
+    _dispatch_webhook_outbox(store, background_tasks)
+    return _batch_out(statuses)
@@ -5,9 +5,11 @@ import hmac
 import logging
 import os
 import re
+import shutil
 import time
 import uuid
-from threading import Lock
+from collections import OrderedDict
+from threading import Event, Lock
 from typing import Optional, Tuple
 
 logger = logging.getLogger(__name__)
@@ -18,12 +20,18 @@ from fastapi.responses import JSONResponse, Response
 from joygate.config import (
     _env_int,
     ALLOW_SANDBOX_HEADER,
+    JOYGATE_STATE_DIR,
+    JOYGATE_WEBHOOK_OUTBOX_DIR,
     MAX_SANDBOXES,
     RATE_LIMIT_PER_IP_PER_MIN,
     RATE_LIMIT_PER_SANDBOX_PER_MIN,
     REQUIRE_SINGLE_WORKER,
     SANDBOX_IDLE_TTL_SECONDS,
+    WORKER_COUNT,
+    WORKER_INDEX,
 )
+from joygate.cluster import sandbox_owner
+from joygate.rate_limit import TokenBucketLimiter
 from joygate.store import JoyGateStore
 
 SANDBOX_ID_RE = re.compile(r"^[a-f0-9]{1,32}$")
@@ -33,15 +41,17 @@ SIG_RE = re.compile(r"^sha256=[0-9a-f]{64}$")
 SANDBOX_HEADER_SECRET = (os.getenv("JOYGATE_SANDBOX_HEADER_SECRET") or "").strip()
 SANDBOX_HEADER_TTL_SECONDS = _env_int("JOYGATE_SANDBOX_HEADER_TTL_SECONDS", 300)
 
-# 沙盒管理
-_SANDBOX_STORES: dict[str, JoyGateStore] = {}
+# 沙盒管理：_SANDBOX_STORES 按最近访问排序（队头最久未访问，访问时 move_to_end），空闲回收只看队头
+_SANDBOX_STORES: OrderedDict[str, JoyGateStore] = OrderedDict()
 _SANDBOX_LAST_SEEN: dict[str, float] = {}
 _SANDBOX_LOCK = Lock()
+# 正在锁外构造 store 的 sandbox_id -> 完成事件（同 id 的并发请求等待它，不重复打开磁盘状态；计入容量）
+_SANDBOX_CREATING: dict[str, Event] = {}
+REQUEST_REAP_LIMIT = 4  # 每个请求顺手回收的过期沙盒数上限，其余交给后台 reaper
 
-# 限流计数
-_RL_SANDBOX: dict[tuple[str, int], int] = {}
-_RL_IP: dict[tuple[str, int], int] = {}
-_RL_LOCK = Lock()
+# 限流：分片令牌桶（配额按每分钟计，平滑回填）
+_RL_SANDBOX = TokenBucketLimiter(RATE_LIMIT_PER_SANDBOX_PER_MIN)
+_RL_IP = TokenBucketLimiter(RATE_LIMIT_PER_IP_PER_MIN)
 
 
 # 单 worker 护栏（在 import 期检查）
@@ -84,9 +94,17 @@ def _verify_sandbox_header(sandbox_id: str, ts_raw: str | None, sig_raw: str | N
     return hmac.compare_digest(expected, sig)
 
 
+def _owns_sandbox(sandbox_id: str) -> bool:
+    """多进程部署时 sandbox 是否归属本 worker（单进程部署恒为 True）。"""
+    return WORKER_COUNT <= 1 or sandbox_owner(sandbox_id, WORKER_COUNT) == WORKER_INDEX
+
+
 def _new_sandbox_id() -> str:
-    """生成新的沙盒 ID（短 token）"""
-    return uuid.uuid4().hex[:16]
+    """生成新的沙盒 ID（短 token）；多进程部署时只取归属本 worker 的 id（期望重试 WORKER_COUNT 次）"""
+    while True:
+        sandbox_id = uuid.uuid4().hex[:16]
+        if _owns_sandbox(sandbox_id):
+            return sandbox_id
 
 
 def _get_sandbox_id(request: Request) -> Tuple[Optional[str], bool]:
@@ -112,94 +130,218 @@ def _get_sandbox_id(request: Request) -> Tuple[Optional[str], bool]:
 def _get_or_create_store(sandbox_id: Optional[str], from_cookie: bool) -> Tuple[JoyGateStore, str, bool]:
     """
     获取或创建 store，返回 (store, sandbox_id, need_set_cookie)
-    在锁内进行沙盒回收和创建
-    
+    锁内只做 O(1) 的查找 / move_to_end；空闲回收主要由后台 reaper（reap_idle_sandboxes）完成，
+    这里只顺手弹出队头少量过期项。被回收 store 的清理（关闭磁盘 outbox）在锁外进行。
+    新沙盒的 store 在锁外构造（启用持久化时要打开 / 恢复磁盘状态），构造期间 id 记在 _SANDBOX_CREATING，
+    同 id 的并发请求等待其完成；构造完回到锁内双重检查后登记（期间已被登记则沿用已有的，丢弃新建的）。
+
     Args:
         sandbox_id: 从 header 或 cookie 获取的 sandbox_id（可能为 None）
         from_cookie: 是否来自 cookie
     """
     need_set_cookie = False
-    
+    evicted: list[tuple[str, JoyGateStore]] = []
+    built: Optional[JoyGateStore] = None
+    creating: Optional[Event] = None
+
+    try:
+        while True:
+            with _SANDBOX_LOCK:
+                now_ts = time.time()
+                evicted.extend(_pop_idle_locked(now_ts, REQUEST_REAP_LIMIT))
+                pending = _SANDBOX_CREATING.get(sandbox_id) if sandbox_id else None
+                if pending is None:
+                    # 请求的沙盒本身已空闲超时（reaper 还没轮到）：按已回收处理
+                    if sandbox_id and sandbox_id in _SANDBOX_STORES:
+                        if (now_ts - _SANDBOX_LAST_SEEN[sandbox_id]) > SANDBOX_IDLE_TTL_SECONDS:
+                            evicted.append((sandbox_id, _pop_sandbox_locked(sandbox_id)))
+
+                    # 无效 cookie 防护：cookie 里来的未知 sandbox_id 不能被信任
+                    if sandbox_id and from_cookie and sandbox_id not in _SANDBOX_STORES:
+                        sandbox_id = None
+                        from_cookie = False
+
+                    if sandbox_id and sandbox_id in _SANDBOX_STORES:
+                        _SANDBOX_STORES.move_to_end(sandbox_id)
+                        _SANDBOX_LAST_SEEN[sandbox_id] = now_ts
+                        return _SANDBOX_STORES[sandbox_id], sandbox_id, need_set_cookie
+
+                    # 容量满时拒绝创建新沙盒（已有沙盒不会被新访客挤掉，只按空闲 TTL 回收；构造中的也占名额）
+                    if len(_SANDBOX_STORES) + len(_SANDBOX_CREATING) >= MAX_SANDBOXES:
+                        raise RuntimeError("sandbox capacity reached")
+                    if not sandbox_id:
+                        # 只有当 sandbox_id 为空时才生成新 id
+                        sandbox_id = _new_sandbox_id()
+                        need_set_cookie = True
+                    elif not from_cookie:
+                        # sandbox_id 存在但不在 _SANDBOX_STORES 中（仅可能来自 header 且允许 header 时）：用该 id 建 store
+                        need_set_cookie = True
+                    creating = _SANDBOX_CREATING[sandbox_id] = Event()
+                    break
+            # 同 id 正在被另一个请求构造：等它登记完再重新查找
+            pending.wait()
+
+        # 被回收沙盒的持久化目录须先删掉，新 store 才不会从中恢复
+        for sid, old in evicted:
+            _dispose_sandbox(sid, old)
+        evicted.clear()
+        built = _new_store(sandbox_id)
+
+        with _SANDBOX_LOCK:
+            now_ts = time.time()
+            store = _SANDBOX_STORES.get(sandbox_id)
+            if store is not None:
+                _SANDBOX_STORES.move_to_end(sandbox_id)
+            else:
+                store = _SANDBOX_STORES[sandbox_id] = built
+                built = None
+            _SANDBOX_LAST_SEEN[sandbox_id] = now_ts
+    finally:
+        if creating is not None:
+            with _SANDBOX_LOCK:
+                _SANDBOX_CREATING.pop(sandbox_id, None)
+            creating.set()
+        for sid, old in evicted:
+            _dispose_sandbox(sid, old)
+        if built is not None:
+            _discard_store(built)
+    return store, sandbox_id, need_set_cookie
+
+
+def _pop_sandbox_locked(sandbox_id: str) -> JoyGateStore:
+    _SANDBOX_LAST_SEEN.pop(sandbox_id, None)
+    return _SANDBOX_STORES.pop(sandbox_id)
+
+
+def _pop_idle_locked(now_ts: float, limit: Optional[int] = None) -> list[tuple[str, JoyGateStore]]:
+    """须在 _SANDBOX_LOCK 内调用：从 LRU 队头弹出空闲超过 TTL 的沙盒（队头最老，遇到未过期即停）。"""
+    popped: list[tuple[str, JoyGateStore]] = []
+    while _SANDBOX_STORES and (limit is None or len(popped) < limit):
+        oldest_sid = next(iter(_SANDBOX_STORES))
+        if (now_ts - _SANDBOX_LAST_SEEN.get(oldest_sid, 0.0)) <= SANDBOX_IDLE_TTL_SECONDS:
+            break
+        popped.append((oldest_sid, _pop_sandbox_locked(oldest_sid)))
+    return popped
+
+
+def reap_idle_sandboxes(now: Optional[float] = None) -> int:
+    """后台调度器周期调用：回收所有空闲超过 TTL 的沙盒（顺带清理空闲的限流桶），返回回收的沙盒数。"""
+    with _SANDBOX_LOCK:
+        evicted = _pop_idle_locked(time.time() if now is None else now)
+        remaining = len(_SANDBOX_STORES)
+    _RL_IP.sweep()
+    _RL_SANDBOX.sweep()
+    for sid, old in evicted:
+        _dispose_sandbox(sid, old)
+    if evicted:
+        logger.info("reaped %s idle sandbox(es); sandbox count=%s max=%s", len(evicted), remaining, MAX_SANDBOXES)
+    return len(evicted)
+
+
+def _outbox_dir(sandbox_id: str) -> Optional[str]:
+    return os.path.join(JOYGATE_WEBHOOK_OUTBOX_DIR, sandbox_id) if JOYGATE_WEBHOOK_OUTBOX_DIR else None
+
+
+def _state_dir(sandbox_id: str) -> Optional[str]:
+    return os.path.join(JOYGATE_STATE_DIR, sandbox_id) if JOYGATE_STATE_DIR else None
+
+
+def _new_store(sandbox_id: str) -> JoyGateStore:
+    return JoyGateStore(webhook_outbox_dir=_outbox_dir(sandbox_id), state_dir=_state_dir(sandbox_id))
+
+
+def _discard_store(store: JoyGateStore) -> None:
+    """并发创建中落败、从未登记的 store：只关闭文件句柄，不删目录（目录归胜出的 store 使用）。"""
+    try:
+        store.close_state_log()
+        store.close_webhook_outbox()
+    except OSError as e:
+        logger.warning("close discarded sandbox store failed: %s", e)
+
+
+def _dispose_sandbox(sandbox_id: str, store: JoyGateStore) -> None:
+    """
+    已从注册表移除的沙盒（锁外调用）：状态持久化目录随沙盒一起删除（与内存态回收语义一致）；
+    磁盘 outbox 已全部投递完才删目录，否则保留，下次启动恢复后继续投递。
+    """
+    state_dir = _state_dir(sandbox_id)
+    if state_dir is not None:
+        try:
+            store.close_state_log()
+        except OSError as e:
+            logger.warning("close state log for sandbox %s failed: %s", sandbox_id, e)
+        shutil.rmtree(state_dir, ignore_errors=True)
+    outbox_dir = _outbox_dir(sandbox_id)
+    if outbox_dir is None:
+        return
+    try:
+        store.close_webhook_outbox()
+        if store.webhook_outbox_backlog() == 0:
+            shutil.rmtree(outbox_dir, ignore_errors=True)
+    except OSError as e:
+        logger.warning("close webhook outbox for sandbox %s failed: %s", sandbox_id, e)
+
+
+def _persisted_sandbox_ids() -> list[str]:
+    names: set[str] = set()
+    for root in (JOYGATE_WEBHOOK_OUTBOX_DIR, JOYGATE_STATE_DIR):
+        if not root or not os.path.isdir(root):
+            continue
+        for name in os.listdir(root):
+            if SANDBOX_ID_RE.fullmatch(name) and os.path.isdir(os.path.join(root, name)):
+                names.add(name)
+    return sorted(names)
+
+
+def restore_persisted_sandboxes() -> int:
+    """
+    启动时调用：为 JOYGATE_STATE_DIR / JOYGATE_WEBHOOK_OUTBOX_DIR 下每个 sandbox 子目录重建 store
+    （状态表从快照 + WAL 恢复；订阅 + 未投递完的 event 由后台调度器继续派发）。都未启用时返回 0。返回恢复的 sandbox 数。
+    """
+    restored = 0
     with _SANDBOX_LOCK:
         now_ts = time.time()
-        
-        # 回收超过 TTL 的沙盒
-        to_delete = []
-        for sid, last_seen in _SANDBOX_LAST_SEEN.items():
-            if (now_ts - last_seen) > SANDBOX_IDLE_TTL_SECONDS:
-                to_delete.append(sid)
-        for sid in to_delete:
-            _SANDBOX_STORES.pop(sid, None)
-            _SANDBOX_LAST_SEEN.pop(sid, None)
-        # 若仍超过 MAX_SANDBOXES：按 LRU（最近访问时间）淘汰最老的直到满足上限
-        while len(_SANDBOX_STORES) > MAX_SANDBOXES:
-            oldest_sid = min(_SANDBOX_LAST_SEEN.keys(), key=lambda s: _SANDBOX_LAST_SEEN[s])
-            _SANDBOX_STORES.pop(oldest_sid, None)
-            _SANDBOX_LAST_SEEN.pop(oldest_sid, None)
-        logger.info("sandbox count=%s max=%s", len(_SANDBOX_STORES), MAX_SANDBOXES)
-        
-        # 无效 cookie 防护：cookie 里来的未知 sandbox_id 不能被信任
-        if sandbox_id and from_cookie and sandbox_id not in _SANDBOX_STORES:
-            sandbox_id = None
-            from_cookie = False
-        
-        # 容量满且无法再淘汰时拒绝创建新沙盒（理论上 LRU 后 len<=MAX，此处为兜底）
-        if len(_SANDBOX_STORES) >= MAX_SANDBOXES:
-            if not (sandbox_id and sandbox_id in _SANDBOX_STORES):
-                raise RuntimeError("sandbox capacity reached")
-        
-        # 创建新沙盒或获取现有
-        if not sandbox_id:
-            # 只有当 sandbox_id 为空时才生成新 id
-            sandbox_id = _new_sandbox_id()
-            _SANDBOX_STORES[sandbox_id] = JoyGateStore()
-            need_set_cookie = True
-        elif sandbox_id not in _SANDBOX_STORES:
-            # sandbox_id 存在但不在 _SANDBOX_STORES 中（仅可能来自 header 且允许 header 时）：用该 id 建 store
-            _SANDBOX_STORES[sandbox_id] = JoyGateStore()
-            if not from_cookie:
-                need_set_cookie = True
-        
-        # 更新 last_seen
-        _SANDBOX_LAST_SEEN[sandbox_id] = now_ts
-        store = _SANDBOX_STORES[sandbox_id]
-    
-    return store, sandbox_id, need_set_cookie
+        for name in _persisted_sandbox_ids():
+            if not _owns_sandbox(name):  # 多进程部署：只恢复归属本 worker 的 sandbox
+                continue
+            if len(_SANDBOX_STORES) >= MAX_SANDBOXES:
+                logger.warning("sandbox capacity reached; sandbox restore stopped at %s", name)
+                break
+            if name in _SANDBOX_STORES:
+                continue
+            _SANDBOX_STORES[name] = _new_store(name)
+            _SANDBOX_LAST_SEEN[name] = now_ts
+            restored += 1
+    return restored
+
+
+def close_sandbox_persistence() -> None:
+    """进程退出时调用：所有 sandbox 的状态 WAL 与磁盘 outbox 落盘并关闭。"""
+    for store in list_sandbox_stores():
+        try:
+            store.close_state_log()
+            store.close_webhook_outbox()
+        except OSError as e:
+            logger.warning("close sandbox persistence failed: %s", e)
+
+
+def list_sandbox_stores() -> list[JoyGateStore]:
+    """当前所有沙盒 store 的快照（供后台 ticker 遍历；锁内只拷贝引用）。"""
+    with _SANDBOX_LOCK:
+        return list(_SANDBOX_STORES.values())
 
 
 def _check_rate_limit(request: Request, sandbox_id: Optional[str]) -> Optional[Response]:
     """
     检查限流，返回 None 表示通过，返回 Response 表示被限流
     """
-    now_ts = time.time()
-    minute_bucket = int(now_ts // 60)
     client_ip = request.client.host if request.client else "unknown"
-
-    with _RL_LOCK:
-        # IP 级别限流
-        ip_key = (client_ip, minute_bucket)
-        ip_count = _RL_IP.get(ip_key, 0)
-        if ip_count >= RATE_LIMIT_PER_IP_PER_MIN:
-            return Response(status_code=429, content="rate limited", media_type="text/plain")
-        _RL_IP[ip_key] = ip_count + 1
-
-        # Sandbox 级别限流（如果有 sandbox_id）
-        if sandbox_id:
-            sandbox_key = (sandbox_id, minute_bucket)
-            sandbox_count = _RL_SANDBOX.get(sandbox_key, 0)
-            if sandbox_count >= RATE_LIMIT_PER_SANDBOX_PER_MIN:
-                return Response(status_code=429, content="rate limited", media_type="text/plain")
-            _RL_SANDBOX[sandbox_key] = sandbox_count + 1
-
-        # 清理旧 bucket（删除所有 bucket < minute_bucket-1 的 key）
-        cutoff_bucket = minute_bucket - 1
-        keys_to_delete_ip = [k for k in _RL_IP.keys() if k[1] < cutoff_bucket]
-        for k in keys_to_delete_ip:
-            _RL_IP.pop(k, None)
-        keys_to_delete_sandbox = [k for k in _RL_SANDBOX.keys() if k[1] < cutoff_bucket]
-        for k in keys_to_delete_sandbox:
-            _RL_SANDBOX.pop(k, None)
-
+    # IP 级别限流
+    if not _RL_IP.acquire(client_ip):
+        return Response(status_code=429, content="rate limited", media_type="text/plain")
+    # Sandbox 级别限流（如果有 sandbox_id）
+    if sandbox_id and not _RL_SANDBOX.acquire(sandbox_id):
+        return Response(status_code=429, content="rate limited", media_type="text/plain")
     return None
 
 
@@ -209,6 +351,10 @@ async def sandbox_middleware(request: Request, call_next):
         sandbox_id, from_cookie = _get_sandbox_id(request)
     except ValueError:
         return Response(status_code=400, content="invalid sandbox header", media_type="text/plain")
+
+    # 多进程部署：sandbox 归属其它 worker（绕过 dispatcher 直连了 worker 端口），不能在本进程另建一份状态
+    if sandbox_id and not _owns_sandbox(sandbox_id):
+        return Response(status_code=421, content="misdirected sandbox", media_type="text/plain")
     
     # 先做 IP 限流（sandbox 限流只有在有 sandbox_id 时做）
     rate_limit_response = _check_rate_limit(request, sandbox_id)
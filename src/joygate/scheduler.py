@@ -0,0 +1,244 @@
+# src/joygate/scheduler.py
+"""
+后台调度器：时间驱动的状态推进不再依赖客户端调用。
+
+- 每个周期任务一个 asyncio task：sleep(interval) 后把"遍历所有 sandbox store 执行一次"放到线程里跑
+  （store 的 domain 锁可能被线程池中的同步路由持有，不能在 event loop 上等锁）。
+- 单个 sandbox 出错只记入该任务的 errors / last_error，不影响其他 sandbox 和下一轮。
+- 每个任务记录运行次数与耗时（last/max/avg），供 /v1/scheduler/stats 查看。
+- 进程级任务（add_global_task，如空闲沙盒回收）每轮只调用一次 fn()，不遍历 store。
+- 间隔为 0 的任务不启动；webhook 派发只建 delivery 并入投递引擎队列，不在调度线程里发 HTTP。
+"""
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Callable, Iterable, Optional
+
+from joygate.config import (
+    INCIDENT_SLA_TICK_SECONDS,
+    JOYGATE_STATE_DIR,
+    SCHEDULER_AI_JOBS_MAX_JOBS,
+    SCHEDULER_AI_JOBS_TICK_SECONDS,
+    SCHEDULER_HOLD_EXPIRY_SECONDS,
+    SCHEDULER_RETENTION_SECONDS,
+    SCHEDULER_SANDBOX_REAPER_SECONDS,
+    SCHEDULER_STATE_FLUSH_SECONDS,
+    SCHEDULER_STATE_SNAPSHOT_SECONDS,
+    SCHEDULER_SOFT_RECHECK_SECONDS,
+    SCHEDULER_WEBHOOK_OUTBOX_SECONDS,
+    WEBHOOK_RETRY_BACKOFF_SECONDS,
+    WEBHOOK_RETRY_MAX_ATTEMPTS,
+    WEBHOOK_TIMEOUT_SECONDS,
+)
+from joygate.webhooks_logic import dispatch_webhook_outbox
+
+MAX_LAST_ERROR_LEN = 200
+
+
+def _iso_utc(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class _PeriodicTask:
+    """单个周期任务的定义与统计；统计字段只在持有 Scheduler._stats_lock 时读写。"""
+
+    __slots__ = (
+        "name", "interval", "fn", "per_store",
+        "runs", "errors", "last_started_at", "last_duration_ms", "max_duration_ms", "total_duration_ms", "last_error",
+    )
+
+    def __init__(self, name: str, interval: float, fn: Callable[..., Any], per_store: bool = True) -> None:
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.per_store = per_store
+        self.runs = 0
+        self.errors = 0
+        self.last_started_at: Optional[float] = None
+        self.last_duration_ms: Optional[float] = None
+        self.max_duration_ms = 0.0
+        self.total_duration_ms = 0.0
+        self.last_error: Optional[str] = None
+
+
+class Scheduler:
+    """
+    周期任务调度：add_task 注册，start() 在当前 event loop 上启动，await stop() 取消并等待退出。
+    stores 为可调用对象，每轮返回当前需要维护的 store 列表（通常是 sandbox.list_sandbox_stores）。
+    """
+
+    def __init__(self, stores: Callable[[], Iterable[Any]]) -> None:
+        self._stores = stores
+        self._tasks: list[_PeriodicTask] = []
+        self._running: list[asyncio.Task] = []
+        self._stats_lock = Lock()
+        self._started_at: Optional[float] = None
+
+    def add_task(self, name: str, interval: float, fn: Callable[[Any], Any]) -> None:
+        """注册周期任务：每 interval 秒对每个 store 调用一次 fn(store)。interval<=0 的任务只出现在统计里，不运行。"""
+        self._tasks.append(_PeriodicTask(name, float(interval), fn))
+
+    def add_global_task(self, name: str, interval: float, fn: Callable[[], Any]) -> None:
+        """注册进程级周期任务：每 interval 秒调用一次 fn()（不遍历 store）。"""
+        self._tasks.append(_PeriodicTask(name, float(interval), fn, per_store=False))
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._started_at = time.time()
+        for task in self._tasks:
+            if task.interval > 0:
+                self._running.append(asyncio.create_task(self._loop(task), name=f"joygate-scheduler-{task.name}"))
+
+    async def stop(self) -> None:
+        running, self._running = self._running, []
+        for t in running:
+            t.cancel()
+        for t in running:
+            try:
+                await t
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self, task: _PeriodicTask) -> None:
+        while True:
+            await asyncio.sleep(task.interval)
+            await asyncio.to_thread(self.run_once, task.name)
+
+    def run_once(self, name: str) -> None:
+        """同步执行一轮指定任务（per-store 任务遍历所有 store）；调度循环与测试共用。"""
+        task = next((t for t in self._tasks if t.name == name), None)
+        if task is None:
+            raise KeyError(name)
+        started = time.time()
+        t0 = time.perf_counter()
+        errors = 0
+        last_error: Optional[str] = None
+        if task.per_store:
+            for store in list(self._stores()):
+                try:
+                    task.fn(store)
+                except Exception as e:  # 单个 sandbox 出错不影响其他 sandbox
+                    errors += 1
+                    last_error = f"{type(e).__name__}: {e}"[:MAX_LAST_ERROR_LEN]
+        else:
+            try:
+                task.fn()
+            except Exception as e:
+                errors += 1
+                last_error = f"{type(e).__name__}: {e}"[:MAX_LAST_ERROR_LEN]
+        duration_ms = (time.perf_counter() - t0) * 1000.0
+        with self._stats_lock:
+            task.runs += 1
+            task.errors += errors
+            task.last_started_at = started
+            task.last_duration_ms = duration_ms
+            task.total_duration_ms += duration_ms
+            if duration_ms > task.max_duration_ms:
+                task.max_duration_ms = duration_ms
+            if last_error is not None:
+                task.last_error = last_error
+        if last_error is not None:
+            print(f"WARN: scheduler task {task.name} failed on {errors} sandbox(es): {last_error}", file=sys.stderr)
+
+    def stats(self) -> dict[str, Any]:
+        """返回 {running, started_at, tasks:[{name, interval_seconds, enabled, runs, errors, 耗时...}]}，按注册顺序。"""
+        items: list[dict[str, Any]] = []
+        with self._stats_lock:
+            for t in self._tasks:
+                items.append({
+                    "name": t.name,
+                    "interval_seconds": t.interval,
+                    "enabled": t.interval > 0,
+                    "runs": t.runs,
+                    "errors": t.errors,
+                    "last_started_at": _iso_utc(t.last_started_at) if t.last_started_at is not None else None,
+                    "last_duration_ms": round(t.last_duration_ms, 3) if t.last_duration_ms is not None else None,
+                    "max_duration_ms": round(t.max_duration_ms, 3),
+                    "avg_duration_ms": round(t.total_duration_ms / t.runs, 3) if t.runs else None,
+                    "last_error": t.last_error,
+                })
+        return {
+            "running": bool(self._running),
+            "started_at": _iso_utc(self._started_at) if self._started_at is not None else None,
+            "tasks": items,
+        }
+
+
+def _call_now(fn: Callable[..., Any], *args: Any) -> None:
+    fn(*args)
+
+
+def _dispatch_webhook_outbox(store: Any) -> None:
+    # 熔断已关闭 / 到探测时刻的订阅：先把停放的 delivery 放回引擎
+    store.release_parked_webhook_deliveries()
+    dispatch_webhook_outbox(
+        store,
+        _call_now,
+        WEBHOOK_TIMEOUT_SECONDS,
+        WEBHOOK_RETRY_MAX_ATTEMPTS,
+        WEBHOOK_RETRY_BACKOFF_SECONDS,
+    )
+    # 磁盘 outbox：本轮追加与 ack 落盘（fsync + checkpoint）
+    store.sync_webhook_outbox()
+
+
+def build_default_scheduler(
+    stores: Callable[[], Iterable[Any]],
+    reap_sandboxes: Optional[Callable[[], Any]] = None,
+) -> Scheduler:
+    """按 config 间隔注册 JoyGate 的维护任务；传入 reap_sandboxes 时另注册进程级的空闲沙盒回收。"""
+    scheduler = Scheduler(stores)
+    scheduler.add_task("incident_sla", INCIDENT_SLA_TICK_SECONDS, lambda store: store.tick_incident_sla())
+    scheduler.add_task("soft_recheck", SCHEDULER_SOFT_RECHECK_SECONDS, lambda store: store.run_due_soft_rechecks())
+    scheduler.add_task("hold_expiry", SCHEDULER_HOLD_EXPIRY_SECONDS, lambda store: store.expire_holds())
+    scheduler.add_task("retention", SCHEDULER_RETENTION_SECONDS, lambda store: store.run_retention_cleanup())
+    scheduler.add_task(
+        "ai_jobs_tick",
+        SCHEDULER_AI_JOBS_TICK_SECONDS,
+        lambda store: store.tick_ai_jobs(SCHEDULER_AI_JOBS_MAX_JOBS),
+    )
+    # 放在最后：同一轮里上面各任务产生的事件尽快派发
+    scheduler.add_task("webhook_outbox", SCHEDULER_WEBHOOK_OUTBOX_SECONDS, _dispatch_webhook_outbox)
+    if JOYGATE_STATE_DIR:
+        # 状态持久化：WAL group commit 与快照折叠分开跑，折叠耗时不拖慢 flush
+        scheduler.add_task("state_flush", SCHEDULER_STATE_FLUSH_SECONDS, lambda store: store.flush_state_log())
+        scheduler.add_task("state_snapshot", SCHEDULER_STATE_SNAPSHOT_SECONDS, lambda store: store.compact_state_log())
+    if reap_sandboxes is not None:
+        scheduler.add_global_task("sandbox_reaper", SCHEDULER_SANDBOX_REAPER_SECONDS, reap_sandboxes)
+    return scheduler
+
+
+# 进程级单例：main._lifespan 启停，/v1/scheduler/stats 读取
+_SCHEDULER: Optional[Scheduler] = None
+
+
+def start_scheduler(
+    stores: Callable[[], Iterable[Any]],
+    reap_sandboxes: Optional[Callable[[], Any]] = None,
+) -> Scheduler:
+    global _SCHEDULER
+    if _SCHEDULER is not None:
+        return _SCHEDULER
+    _SCHEDULER = build_default_scheduler(stores, reap_sandboxes)
+    _SCHEDULER.start()
+    return _SCHEDULER
+
+
+async def stop_scheduler() -> None:
+    global _SCHEDULER
+    scheduler, _SCHEDULER = _SCHEDULER, None
+    if scheduler is not None:
+        await scheduler.stop()
+
+
+def get_scheduler_stats() -> dict[str, Any]:
+    """调度器未启动（如直接构造 store 的脚本）时返回 running=false、tasks=[]。"""
+    scheduler = _SCHEDULER
+    if scheduler is None:
+        return {"running": False, "started_at": None, "tasks": []}
+    return scheduler.stats()
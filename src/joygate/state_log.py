@@ -0,0 +1,365 @@
+# src/joygate/state_log.py
+"""
+JoyGateStore 的状态持久化（可选；JOYGATE_STATE_DIR 为空时不启用，store 仍为纯内存）：WAL + 周期快照。
+
+- 记录粒度为"行镜像"：{"lsn", "t": 表, "k": key, "v": 该行当前值}，v=null 表示删除；重放只需按 lsn 顺序覆盖，幂等。
+- 热路径只登记脏 key（touch / put：一次 deque.append，无锁、不序列化、不做 IO）；同一 key 多次修改在 flush 时合并，
+  间隔内新建又删除的 key（created=True 登记）不落盘。
+- group commit：flush() 由后台调度器周期调用，一次取走全部脏 key，回调 store 在 domain 锁内复制当前行，
+  锁外序列化后整批一次 write + fsync。崩溃最多丢失最近一个 flush 间隔内的修改。
+- 快照：compact() 封存当前 segment，在锁外把上一份快照 + 已封存 segment 折叠成新快照（原子替换），再删除这些 segment；
+  不读 store、不持有 store 的任何锁。
+- 启动恢复：recover() 读快照，再按序重放 lsn 大于快照位点的 WAL 记录；最后一个 segment 尾部的半行（崩溃残留）截掉。
+
+touch / put 可在任意 store domain 锁内调用；flush / compact 不得在 store 锁内调用。
+后端接口见 StateLogBase；本模块为文件后端（JOYGATE_STATE_BACKEND=wal，默认），SQLite 后端见 state_sqlite.py。
+store 的热数据始终在内存表里；支持归档的后端（sqlite）另外保留淘汰出内存的 incident / 历史记录 / delivery，
+只在分页读越过内存窗口时读取（见 StateLogBase.archives）。后端不在进程间共享可写状态。
+"""
+from __future__ import annotations
+
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from threading import Lock
+from typing import Any, Callable, Iterator, Optional
+
+WAL_SUFFIX = ".wal"
+SNAPSHOT_FILE = "snapshot.json"
+
+# touch 登记的脏 key：flush 时由 store 回调取当前行
+_LOOKUP = object()
+# 本 flush 间隔内新建的 key（尚未落盘）：flush 时若行已不存在，直接丢弃这条登记，不写删除记录
+_CREATED = object()
+
+# 复用同一个编码器（json.dumps 带参数时每次都新建 JSONEncoder）；flush 在 store 锁外调用
+encode_json = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _segment_name(start_lsn: int) -> str:
+    return f"{start_lsn:016d}{WAL_SUFFIX}"
+
+
+def _write_json_atomic(path: str, obj: Any) -> None:
+    """写临时文件 + fsync + os.replace，崩溃时要么旧快照要么新快照。"""
+    tmp = f"{path}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _apply(tables: dict[str, dict[str, Any]], table: str, key: str, value: Any) -> None:
+    rows = tables.setdefault(table, {})
+    if value is None:
+        rows.pop(key, None)
+    else:
+        rows[key] = value
+
+
+# flush 的回调：resolve({table: keys}) 在各表 domain 锁内取行，返回 {table: {key: 当前行的副本 或 None(已删除)}}；
+# 副本归 state log 所有，序列化在锁外进行
+Resolver = Callable[[dict[str, list[str]]], dict[str, dict[str, Optional[dict[str, Any]]]]]
+
+
+class StateLogBase(ABC):
+    """
+    状态持久化后端接口。热路径登记（touch / put / pending）由本类实现，各后端实现其余方法：
+    - recover()：启动时调用一次，返回 table -> {key: row}；
+    - flush(resolve)：取走全部登记写入持久存储，返回写入的记录数；写失败时登记放回并抛出；
+    - compact(force)：后台低频调用的整理（折叠快照 / checkpoint），返回是否做了整理；
+    - close()、stats()。
+    可选的归档读取（archives=True 的后端实现）：store 淘汰出内存的 incident / 历史记录 / delivery 留在后端，
+    分页读越过内存窗口后由 archived_incidents / history_before / archived_deliveries 续读；默认后端不保留，返回空。
+    """
+
+    # 后端是否保留淘汰出内存的记录（为 False 时 store 只读内存表，也不登记 delivery）
+    archives = False
+
+    def __init__(self) -> None:
+        # 登记队列：(table, key, _LOOKUP / _CREATED 或给定值)；deque.append / popleft 线程安全，热路径不取锁
+        self._dirty: deque[tuple[str, str, Any]] = deque()
+
+    def touch(self, table: str, key: str, created: bool = False) -> None:
+        """
+        登记 (table, key) 已修改；flush 时取其当前行（不存在则记删除）。
+        created=True 表示 key 为新生成（如新 hold_id）：若到 flush 时已被删除（间隔内建了又删），整条登记跳过。
+        """
+        self._dirty.append((table, key, _CREATED if created else _LOOKUP))
+
+    def put(self, table: str, key: str, value: Optional[dict[str, Any]]) -> None:
+        """登记不可变记录（如 ledger decision）的值；None 表示删除。value 须为调用方不再修改的对象。"""
+        self._dirty.append((table, key, value))
+
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def _take_dirty(self) -> dict[tuple[str, str], Any]:
+        """
+        取走当前登记队列并按 (table, key) 合并（后登记的覆盖先登记的，保持首次登记顺序）；
+        _CREATED 不被其后的 touch 覆盖（key 仍是本间隔新建的）。
+        """
+        popleft = self._dirty.popleft
+        entries = [popleft() for _ in range(len(self._dirty))]
+        dirty = {(table, key): value for table, key, value in entries}
+        for table, key, value in entries:
+            if value is _CREATED and dirty[(table, key)] is _LOOKUP:
+                dirty[(table, key)] = _CREATED
+        return dirty
+
+    def _requeue(self, dirty: dict[tuple[str, str], Any]) -> None:
+        """写失败：登记放回队头（其后新登记的仍在后面，合并时覆盖），下次 flush 重试。"""
+        self._dirty.extendleft(reversed([(t, k, v) for (t, k), v in dirty.items()]))
+
+    @staticmethod
+    def _split_lookups(dirty: dict[tuple[str, str], Any]) -> dict[str, list[str]]:
+        lookups: dict[str, list[str]] = {}
+        for (table, key), value in dirty.items():
+            if value is _LOOKUP or value is _CREATED:
+                lookups.setdefault(table, []).append(key)
+        return lookups
+
+    @staticmethod
+    def _rows(
+        dirty: dict[tuple[str, str], Any], resolved: dict[str, dict[str, Any]]
+    ) -> Iterator[tuple[str, str, Optional[dict[str, Any]]]]:
+        """
+        逐条给出 (table, key, 最终行值)（None=删除）：touch 取 resolve 的副本，put 取登记时给定的值；
+        间隔内新建又删除的 key 从未落盘，不产生记录。
+        """
+        for (table, key), value in dirty.items():
+            if value is _LOOKUP or value is _CREATED:
+                row = resolved[table].get(key)
+                if row is None and value is _CREATED:
+                    continue
+                yield table, key, row
+            else:
+                yield table, key, value
+
+    @abstractmethod
+    def recover(self) -> dict[str, dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def flush(self, resolve: Resolver) -> int:
+        ...
+
+    @abstractmethod
+    def compact(self, force: bool = False) -> bool:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict[str, int]:
+        ...
+
+    def archived_incidents(
+        self,
+        limit: int,
+        before: Optional[tuple[float, str]] = None,
+        incident_id: Optional[str] = None,
+        incident_type: Optional[str] = None,
+        incident_status: Optional[str] = None,
+        charger_id: Optional[str] = None,
+        segment_id: Optional[str] = None,
+    ) -> list[dict[str, Any]]:
+        """已淘汰出内存的 incident，按 (created_at, incident_id) 降序取严格小于 before 的前 limit 条。"""
+        return []
+
+    def history_before(self, table: str, key: str, limit: int) -> list[dict[str, Any]]:
+        """只追加历史表中早于 key 这条记录追加的最多 limit 条（新 -> 旧）；key 不在后端时返回空。"""
+        return []
+
+    def archived_deliveries(self, event_id: str, subscription_id: Optional[str], limit: int) -> list[dict[str, Any]]:
+        """按 (event_id, subscription_id) 取已落盘的 delivery（含已过内存保留期的），新 -> 旧。"""
+        return []
+
+
+class StoreStateLog(StateLogBase):
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = 16 * 1024 * 1024,
+        snapshot_min_bytes: int = 32 * 1024 * 1024,
+    ) -> None:
+        super().__init__()
+        self._dir = directory
+        self._segment_max_bytes = max(4096, int(segment_max_bytes))
+        self._snapshot_min_bytes = max(0, int(snapshot_min_bytes))
+        os.makedirs(directory, exist_ok=True)
+        self._io_lock = Lock()  # 串行化 flush 与 segment 封存
+        self._compact_lock = Lock()
+        self._snapshot_lsn = 0  # lsn <= 该值的记录已折叠进快照
+        self._next_lsn = 1
+        self._segments: list[int] = []  # 各 segment 起始 lsn，升序
+        self._writer = None
+        self._writer_bytes = 0
+        self._bytes_since_snapshot = 0
+        self._flushes = 0
+        self._records = 0
+
+    # ---------- 启动恢复 ----------
+
+    def recover(self) -> dict[str, dict[str, Any]]:
+        """读快照并重放 WAL，返回 table -> {key: row}；之后的写入接在最后一个 segment 后面。"""
+        tables: dict[str, dict[str, Any]] = {}
+        try:
+            with open(os.path.join(self._dir, SNAPSHOT_FILE), encoding="utf-8") as f:
+                snap = json.load(f)
+            if isinstance(snap, dict) and isinstance(snap.get("tables"), dict):
+                tables = snap["tables"]
+                self._snapshot_lsn = int(snap.get("lsn") or 0)
+        except (OSError, ValueError, TypeError):
+            pass
+        for name in os.listdir(self._dir):
+            if name.endswith(WAL_SUFFIX) and name[: -len(WAL_SUFFIX)].isdigit():
+                self._segments.append(int(name[: -len(WAL_SUFFIX)]))
+        self._segments.sort()
+        last_lsn = self._snapshot_lsn
+        for i, start in enumerate(self._segments):
+            seg_last, good_bytes = self._replay_segment(start, tables, self._snapshot_lsn)
+            if seg_last is not None:
+                last_lsn = max(last_lsn, seg_last)
+            path = self._segment_path(start)
+            size = os.path.getsize(path)
+            self._bytes_since_snapshot += good_bytes
+            if size != good_bytes and i == len(self._segments) - 1:  # 崩溃留下的半行：截掉
+                with open(path, "r+b") as f:
+                    f.truncate(good_bytes)
+                    os.fsync(f.fileno())
+        self._next_lsn = last_lsn + 1
+        return tables
+
+    def _replay_segment(self, start: int, tables: dict[str, dict[str, Any]], after_lsn: int) -> tuple[Optional[int], int]:
+        """把 segment 中 lsn > after_lsn 的记录应用到 tables；返回 (最后一条完整记录的 lsn, 完整记录字节数)。"""
+        last_lsn: Optional[int] = None
+        good = 0
+        loads = json.loads
+        with open(self._segment_path(start), "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    rec = loads(line)
+                    lsn = int(rec["lsn"])
+                    table, key, value = rec["t"], rec["k"], rec.get("v")
+                except (ValueError, KeyError, TypeError):
+                    break
+                if lsn > after_lsn:
+                    _apply(tables, table, key, value)
+                last_lsn = lsn
+                good += len(line)
+        return last_lsn, good
+
+    def _segment_path(self, start: int) -> str:
+        return os.path.join(self._dir, _segment_name(start))
+
+    # ---------- group commit ----------
+
+    def flush(self, resolve: Resolver) -> int:
+        """取走全部脏 key 写入 WAL 并 fsync，返回写入的记录数。"""
+        with self._io_lock:
+            dirty = self._take_dirty()
+            if not dirty:
+                return 0
+            try:
+                lookups = self._split_lookups(dirty)
+                resolved = resolve(lookups) if lookups else {}
+                lsn = self._next_lsn
+                parts: list[str] = []
+                for table, key, row in self._rows(dirty, resolved):
+                    parts.append(encode_json({"lsn": lsn, "t": table, "k": key, "v": row}))
+                    lsn += 1
+                if not parts:
+                    return 0
+                data = ("\n".join(parts) + "\n").encode("utf-8")
+                if self._writer is None:
+                    self._open_writer()
+                elif self._writer_bytes and self._writer_bytes + len(data) > self._segment_max_bytes:
+                    self._writer.close()
+                    self._new_segment()
+                self._writer.write(data)
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+                self._writer_bytes += len(data)
+                self._bytes_since_snapshot += len(data)
+                self._next_lsn = lsn
+                self._flushes += 1
+                self._records += len(parts)
+                return len(parts)
+            except BaseException:
+                self._requeue(dirty)
+                raise
+
+    def _open_writer(self) -> None:
+        """首次写入：接着写最后一个 segment（重启后续写），没有则新建。"""
+        if self._segments:
+            path = self._segment_path(self._segments[-1])
+            self._writer = open(path, "ab")
+            self._writer_bytes = os.path.getsize(path)
+        else:
+            self._new_segment()
+
+    def _new_segment(self) -> None:
+        self._segments.append(self._next_lsn)
+        self._writer = open(self._segment_path(self._next_lsn), "ab")
+        self._writer_bytes = 0
+
+    # ---------- 快照 ----------
+
+    def compact(self, force: bool = False) -> bool:
+        """
+        WAL 自上次快照累计超过 snapshot_min_bytes（或 force）时：封存现有 segment，锁外折叠成新快照并删除它们。
+        返回是否生成了快照。封存之后的写入进入新 segment，不受折叠影响。
+        """
+        with self._compact_lock:
+            with self._io_lock:
+                if not self._segments or (not force and self._bytes_since_snapshot < self._snapshot_min_bytes):
+                    return False
+                if self._writer is not None:
+                    self._writer.close()
+                    self._writer = None
+                sealed, self._segments = self._segments, []
+                upto = self._next_lsn - 1
+                self._bytes_since_snapshot = 0
+            tables: dict[str, dict[str, Any]] = {}
+            try:
+                with open(os.path.join(self._dir, SNAPSHOT_FILE), encoding="utf-8") as f:
+                    tables = json.load(f).get("tables") or {}
+            except (OSError, ValueError, AttributeError):
+                pass
+            for start in sealed:
+                self._replay_segment(start, tables, self._snapshot_lsn)
+            _write_json_atomic(os.path.join(self._dir, SNAPSHOT_FILE), {"lsn": upto, "tables": tables})
+            self._snapshot_lsn = upto
+            for start in sealed:
+                try:
+                    os.remove(self._segment_path(start))
+                except OSError:
+                    pass
+            return True
+
+    def close(self) -> None:
+        """关闭 segment 文件；调用方应先 flush。"""
+        with self._io_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def stats(self) -> dict[str, int]:
+        pending = len(self._dirty)
+        return {
+            "next_lsn": self._next_lsn,
+            "snapshot_lsn": self._snapshot_lsn,
+            "segments": len(self._segments),
+            "bytes_since_snapshot": self._bytes_since_snapshot,
+            "pending": pending,
+            "flushes": self._flushes,
+            "records": self._records,
+        }
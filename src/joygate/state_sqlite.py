@@ -0,0 +1,401 @@
+# src/joygate/state_sqlite.py
+"""
+JoyGateStore 状态持久化的 SQLite 后端（JOYGATE_STATE_BACKEND=sqlite）：每个 sandbox 一个 state.db，WAL 日志模式。
+热数据仍在所属进程的 store 内存表里（cluster 下每个 sandbox 只由其归属 worker 写）；与文件后端不同的是它同时是归档：
+store 淘汰出内存的 incident / 历史记录 / delivery 留在库里，store 的分页读越过内存窗口后从这里续读（archives=True），
+内存只需保留最近的一段，库的大小由 compact 按 history_max_rows 约束。
+
+- 接口与文件后端相同（见 state_log.StateLogBase）：热路径只登记脏 key，flush() 由后台调度器周期调用，
+  整批在一个事务里写入（synchronous=FULL：提交即 fsync，与文件后端的 group commit 语义一致）。
+- 表结构：
+  incidents(incident_id, incident_type, incident_status, charger_id, segment_id, created_at, archived, v)：
+      按 status / charger（再按 created_at）建索引；store 淘汰（TTL / 硬上限）时把当时的行登记到 incident_archive，
+      写成 archived=1，recover 不载入已归档的；
+  holds(hold_id, charger_id, expires_at, v)：按 expires_at 建索引；
+  history(seq, tbl, k, v)：score_event / decision 等只追加的历史表。内存只保留最近 history_limits 条，
+      store 淘汰出内存的记录在库里保留（compact 时每表最多保留 history_max_rows 行），recover 只载入最近的部分；
+  deliveries(seq, delivery_id, event_id, subscription_id, v)：按 (event_id, subscription_id) 建索引；只写不恢复
+      （重启后未 ack 的 event 由 outbox 重新派发，内存去重表须为空），过了内存保留期的仍可查；
+  rows(tbl, k, v)：其余表（charger / hazard / signal / reputation / vendor）。
+  索引列由 SQLite json_extract 从行 JSON 中取出，flush 不在 Python 里重复解析。
+- WAL 模式下读不阻塞写：归档读取用单独的读连接，不等 flush 的事务；运维 / 排障脚本（可在其它进程）可用
+  connect_readonly() 查询某个 sandbox 已 flush 的状态（最多落后一个 flush 间隔）。库不接受其它进程写入。
+- compact()：WAL 文件超过 checkpoint_min_bytes（或 force）时 checkpoint(TRUNCATE)，并按上限清理最旧的历史行、
+  已归档 incident 与 delivery。
+
+同一 flush 间隔内被追加又被淘汰出内存的历史记录会合并为删除，不会写入库（仅在间隔内追加超过内存上限时发生）。
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from threading import Lock
+from typing import Any, Optional
+
+from joygate.state_log import Resolver, StateLogBase, encode_json
+
+DB_FILE = "state.db"
+# 与 store 的表名一致：这两张表有独立的带索引表，其余进 rows
+INCIDENT_TABLE = "incident"
+INCIDENT_ARCHIVE_TABLE = "incident_archive"
+HOLD_TABLE = "hold"
+DELIVERY_TABLE = "delivery"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    tbl TEXT NOT NULL,
+    k TEXT NOT NULL,
+    v TEXT NOT NULL,
+    PRIMARY KEY (tbl, k)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS incidents (
+    incident_id TEXT PRIMARY KEY,
+    incident_type TEXT,
+    incident_status TEXT,
+    charger_id TEXT,
+    segment_id TEXT,
+    created_at REAL,
+    archived INTEGER NOT NULL DEFAULT 0,
+    v TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS incidents_by_status ON incidents (incident_status, created_at);
+CREATE INDEX IF NOT EXISTS incidents_by_charger ON incidents (charger_id, created_at);
+CREATE INDEX IF NOT EXISTS incidents_by_archived ON incidents (archived, created_at);
+CREATE TABLE IF NOT EXISTS deliveries (
+    seq INTEGER PRIMARY KEY,
+    delivery_id TEXT NOT NULL UNIQUE,
+    event_id TEXT,
+    subscription_id TEXT,
+    v TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deliveries_by_event_subscription ON deliveries (event_id, subscription_id);
+CREATE TABLE IF NOT EXISTS holds (
+    hold_id TEXT PRIMARY KEY,
+    charger_id TEXT,
+    expires_at REAL,
+    v TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS holds_by_expires_at ON holds (expires_at);
+CREATE TABLE IF NOT EXISTS history (
+    seq INTEGER PRIMARY KEY,
+    tbl TEXT NOT NULL,
+    k TEXT NOT NULL,
+    v TEXT NOT NULL,
+    UNIQUE (tbl, k)
+);
+CREATE INDEX IF NOT EXISTS history_by_table ON history (tbl, seq);
+"""
+
+_UPSERT_INCIDENT = (
+    "INSERT INTO incidents (incident_id, incident_type, incident_status, charger_id, segment_id, created_at, archived, v) "
+    "VALUES (?1, json_extract(?2, '$.incident_type'), json_extract(?2, '$.incident_status'), "
+    "json_extract(?2, '$.charger_id'), json_extract(?2, '$.segment_id'), json_extract(?2, '$.created_at'), ?3, ?2) "
+    "ON CONFLICT (incident_id) DO UPDATE SET "
+    "incident_type = excluded.incident_type, incident_status = excluded.incident_status, "
+    "charger_id = excluded.charger_id, segment_id = excluded.segment_id, created_at = excluded.created_at, "
+    "archived = excluded.archived, v = excluded.v"
+)
+_UPSERT_HOLD = (
+    "INSERT INTO holds (hold_id, charger_id, expires_at, v) "
+    "VALUES (?1, json_extract(?2, '$.charger_id'), json_extract(?2, '$.expires_at'), ?2) "
+    "ON CONFLICT (hold_id) DO UPDATE SET charger_id = excluded.charger_id, expires_at = excluded.expires_at, v = excluded.v"
+)
+_UPSERT_ROW = "INSERT INTO rows (tbl, k, v) VALUES (?, ?, ?) ON CONFLICT (tbl, k) DO UPDATE SET v = excluded.v"
+_UPSERT_HISTORY = "INSERT INTO history (tbl, k, v) VALUES (?, ?, ?) ON CONFLICT (tbl, k) DO UPDATE SET v = excluded.v"
+_UPSERT_DELIVERY = (
+    "INSERT INTO deliveries (delivery_id, event_id, subscription_id, v) "
+    "VALUES (?1, json_extract(?2, '$.event_id'), json_extract(?2, '$.subscription_id'), ?2) "
+    "ON CONFLICT (delivery_id) DO UPDATE SET v = excluded.v"
+)
+
+
+def _connect(path: str, readonly: bool = False) -> sqlite3.Connection:
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    return conn
+
+
+class SqliteStateLog(StateLogBase):
+    archives = True
+
+    def __init__(
+        self,
+        directory: str,
+        checkpoint_min_bytes: int = 32 * 1024 * 1024,
+        history_limits: Optional[dict[str, int]] = None,
+        history_max_rows: int = 1_000_000,
+    ) -> None:
+        """history_limits：只追加的历史表 -> 内存保留条数（recover 只载入最近这么多条；删除登记不落库）。"""
+        super().__init__()
+        os.makedirs(directory, exist_ok=True)
+        self._path = os.path.join(directory, DB_FILE)
+        self._checkpoint_min_bytes = max(0, int(checkpoint_min_bytes))
+        self._history_limits = dict(history_limits or {})
+        self._history_max_rows = max(1, int(history_max_rows))
+        self._io_lock = Lock()  # 单连接：串行化 flush / compact / close
+        self._conn: Optional[sqlite3.Connection] = _connect(self._path)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = FULL")
+        self._conn.executescript(_SCHEMA)
+        # 归档读取专用连接：WAL 下与写连接并发，读不等 flush 事务
+        self._read_lock = Lock()
+        self._reader: Optional[sqlite3.Connection] = _connect(self._path)
+        self._flushes = 0
+        self._records = 0
+        self._checkpoints = 0
+
+    def recover(self) -> dict[str, dict[str, Any]]:
+        tables: dict[str, dict[str, Any]] = {}
+        loads = json.loads
+        with self._io_lock:
+            conn = self._conn
+            for tbl, k, v in conn.execute("SELECT tbl, k, v FROM rows"):
+                tables.setdefault(tbl, {})[k] = loads(v)
+            tables[INCIDENT_TABLE] = {
+                k: loads(v) for k, v in conn.execute("SELECT incident_id, v FROM incidents WHERE archived = 0")
+            }
+            tables[HOLD_TABLE] = {k: loads(v) for k, v in conn.execute("SELECT hold_id, v FROM holds")}
+            for tbl in [t for (t,) in conn.execute("SELECT DISTINCT tbl FROM history")]:
+                limit = self._history_limits.get(tbl, -1)
+                rows = conn.execute(
+                    "SELECT k, v FROM history WHERE tbl = ? ORDER BY seq DESC LIMIT ?", (tbl, limit)
+                ).fetchall()
+                tables[tbl] = {k: loads(v) for k, v in reversed(rows)}
+        return tables
+
+    def flush(self, resolve: Resolver) -> int:
+        """取走全部脏 key，在一个事务里写入（提交即 fsync），返回写入的记录数。"""
+        with self._io_lock:
+            dirty = self._take_dirty()
+            if not dirty:
+                return 0
+            try:
+                lookups = self._split_lookups(dirty)
+                resolved = resolve(lookups) if lookups else {}
+                incidents: list[tuple[str, str, int]] = []
+                holds: list[tuple[str, str]] = []
+                rows: list[tuple[str, str, str]] = []
+                history: list[tuple[str, str, str]] = []
+                deliveries: list[tuple[str, str]] = []
+                deleted: dict[str, list[tuple[str, ...]]] = {"holds": [], "rows": []}
+                records = 0
+                for table, key, row in self._rows(dirty, resolved):
+                    records += 1
+                    encoded = None if row is None else encode_json(row)
+                    if table in self._history_limits:
+                        if encoded is not None:  # 淘汰出内存的历史记录在库里保留
+                            history.append((table, key, encoded))
+                    elif table == INCIDENT_TABLE:
+                        if encoded is not None:  # 删除不在这里处理：淘汰的行经 INCIDENT_ARCHIVE_TABLE 写成 archived=1
+                            incidents.append((key, encoded, 0))
+                    elif table == INCIDENT_ARCHIVE_TABLE:
+                        if encoded is not None:
+                            incidents.append((key, encoded, 1))
+                    elif table == DELIVERY_TABLE:
+                        if encoded is not None:  # 过了内存保留期的 delivery 在库里保留
+                            deliveries.append((key, encoded))
+                    elif table == HOLD_TABLE:
+                        if encoded is not None:
+                            holds.append((key, encoded))
+                        else:
+                            deleted["holds"].append((key,))
+                    elif encoded is not None:
+                        rows.append((table, key, encoded))
+                    else:
+                        deleted["rows"].append((table, key))
+                conn = self._conn
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(_UPSERT_INCIDENT, incidents)
+                    conn.executemany(_UPSERT_HOLD, holds)
+                    conn.executemany("DELETE FROM holds WHERE hold_id = ?", deleted["holds"])
+                    conn.executemany(_UPSERT_ROW, rows)
+                    conn.executemany("DELETE FROM rows WHERE tbl = ? AND k = ?", deleted["rows"])
+                    conn.executemany(_UPSERT_HISTORY, history)
+                    conn.executemany(_UPSERT_DELIVERY, deliveries)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                self._flushes += 1
+                self._records += records
+                return records
+            except BaseException:
+                self._requeue(dirty)
+                raise
+
+    def _wal_bytes(self) -> int:
+        try:
+            return os.path.getsize(self._path + "-wal")
+        except OSError:
+            return 0
+
+    def compact(self, force: bool = False) -> bool:
+        """WAL 文件够大（或 force）时 checkpoint 回主库并截断 WAL，同时清理超出上限的历史行 / 已归档 incident / delivery。"""
+        with self._io_lock:
+            if self._conn is None or (not force and self._wal_bytes() < max(1, self._checkpoint_min_bytes)):
+                return False
+            conn = self._conn
+            for tbl in self._history_limits:
+                conn.execute(
+                    "DELETE FROM history WHERE tbl = ?1 AND seq <= "
+                    "(SELECT seq FROM history WHERE tbl = ?1 ORDER BY seq DESC LIMIT 1 OFFSET ?2)",
+                    (tbl, self._history_max_rows),
+                )
+            conn.execute(
+                "DELETE FROM incidents WHERE archived = 1 AND incident_id IN "
+                "(SELECT incident_id FROM incidents WHERE archived = 1 ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self._history_max_rows,),
+            )
+            conn.execute(
+                "DELETE FROM deliveries WHERE seq <= (SELECT seq FROM deliveries ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                (self._history_max_rows,),
+            )
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._checkpoints += 1
+            return True
+
+    def close(self) -> None:
+        """关闭连接；调用方应先 flush。"""
+        with self._io_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def stats(self) -> dict[str, int]:
+        try:
+            db_bytes = os.path.getsize(self._path)
+        except OSError:
+            db_bytes = 0
+        return {
+            "pending": len(self._dirty),
+            "flushes": self._flushes,
+            "records": self._records,
+            "checkpoints": self._checkpoints,
+            "db_bytes": db_bytes,
+            "wal_bytes": self._wal_bytes(),
+        }
+
+    # ---------- 归档读取（store 分页越过内存窗口时调用，不持有 store 锁） ----------
+
+    def _read(self, sql: str, params: list[Any]) -> list[dict[str, Any]]:
+        with self._read_lock:
+            if self._reader is None:
+                return []
+            return [json.loads(v) for (v,) in self._reader.execute(sql, params)]
+
+    def archived_incidents(
+        self,
+        limit: int,
+        before: Optional[tuple[float, str]] = None,
+        incident_id: Optional[str] = None,
+        incident_type: Optional[str] = None,
+        incident_status: Optional[str] = None,
+        charger_id: Optional[str] = None,
+        segment_id: Optional[str] = None,
+    ) -> list[dict[str, Any]]:
+        """archived=1 的 incident，按 (created_at, incident_id) 降序（有 status / charger 条件时走对应索引）。"""
+        if limit <= 0:
+            return []
+        where = ["archived = 1"]
+        params: list[Any] = []
+        for column, value in (
+            ("incident_id", incident_id),
+            ("incident_type", incident_type),
+            ("incident_status", incident_status),
+            ("charger_id", charger_id),
+            ("segment_id", segment_id),
+        ):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if before is not None:
+            where.append("(created_at, incident_id) < (?, ?)")
+            params.extend(before)
+        params.append(int(limit))
+        return self._read(
+            f"SELECT v FROM incidents WHERE {' AND '.join(where)} ORDER BY created_at DESC, incident_id DESC LIMIT ?",
+            params,
+        )
+
+    def history_before(self, table: str, key: str, limit: int) -> list[dict[str, Any]]:
+        if limit <= 0:
+            return []
+        return self._read(
+            "SELECT v FROM history WHERE tbl = ?1 AND seq < (SELECT seq FROM history WHERE tbl = ?1 AND k = ?2) "
+            "ORDER BY seq DESC LIMIT ?3",
+            [table, key, int(limit)],
+        )
+
+    def archived_deliveries(self, event_id: str, subscription_id: Optional[str], limit: int) -> list[dict[str, Any]]:
+        if limit <= 0:
+            return []
+        if subscription_id is None:
+            sql, params = "SELECT v FROM deliveries WHERE event_id = ? ORDER BY seq DESC LIMIT ?", [event_id, int(limit)]
+        else:
+            sql = "SELECT v FROM deliveries WHERE event_id = ? AND subscription_id = ? ORDER BY seq DESC LIMIT ?"
+            params = [event_id, subscription_id, int(limit)]
+        return self._read(sql, params)
+
+
+# ---------- 只读查询（供运维 / 排障脚本使用，服务不调用；走上面建的索引） ----------
+
+
+def connect_readonly(directory: str) -> sqlite3.Connection:
+    """打开某个 sandbox 状态目录下的 state.db（只读；WAL 模式下与写入方并发读到已提交的一致状态）。"""
+    return _connect(os.path.join(directory, DB_FILE), readonly=True)
+
+
+def query_incidents(
+    conn: sqlite3.Connection,
+    status: Optional[str] = None,
+    charger_id: Optional[str] = None,
+    limit: int = 100,
+) -> list[dict[str, Any]]:
+    """按 incident_status / charger_id 过滤 incident（走 incidents_by_status / incidents_by_charger 索引）。"""
+    sql = "SELECT v FROM incidents"
+    where: list[str] = []
+    params: list[Any] = []
+    if status is not None:
+        where.append("incident_status = ?")
+        params.append(status)
+    if charger_id is not None:
+        where.append("charger_id = ?")
+        params.append(charger_id)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " LIMIT ?"
+    params.append(max(0, int(limit)))
+    return [json.loads(v) for (v,) in conn.execute(sql, params)]
+
+
+def holds_expiring_before(conn: sqlite3.Connection, before: float, limit: int = 100) -> list[dict[str, Any]]:
+    """expires_at < before 的 hold，按到期先后（走 holds_by_expires_at 索引）。"""
+    rows = conn.execute(
+        "SELECT hold_id, v FROM holds WHERE expires_at < ? ORDER BY expires_at LIMIT ?", (before, max(0, int(limit)))
+    )
+    return [dict(json.loads(v), hold_id=k) for k, v in rows]
+
+
+def read_history(
+    conn: sqlite3.Connection, table: str, limit: int = 100, before_seq: Optional[int] = None
+) -> list[tuple[int, dict[str, Any]]]:
+    """按追加顺序倒序分页读取历史表（含已淘汰出内存的记录）；返回 [(seq, row)]，下一页传最后一个 seq。"""
+    if before_seq is None:
+        rows = conn.execute(
+            "SELECT seq, v FROM history WHERE tbl = ? ORDER BY seq DESC LIMIT ?", (table, max(0, int(limit)))
+        )
+    else:
+        rows = conn.execute(
+            "SELECT seq, v FROM history WHERE tbl = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (table, int(before_seq), max(0, int(limit))),
+        )
+    return [(seq, json.loads(v)) for seq, v in rows]
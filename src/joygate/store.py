@@ -6,12 +6,15 @@ JoyGate 统一状态仓库：管理 chargers / holds / quota，支持 /v1/snapsh
 from __future__ import annotations
 
 import hashlib
+import heapq
+import json
 import os
 import time
 import uuid
+from collections import deque
 from datetime import datetime, timezone, timedelta
 from threading import Lock
-from typing import Any
+from typing import Any, Callable, Iterable
 
 from joygate.ai_jobs import (
     AI_JOB_TYPE_DISPATCH_EXPLAIN,
@@ -28,9 +31,17 @@ from joygate.ai_jobs import (
 )
 from joygate.incidents_logic import (
     apply_witness_sla_downgrade_locked,
+    build_incident_items,
     build_incidents_snapshot,
+    decode_incident_cursor,
+    encode_incident_cursor,
+    parse_incident_fields,
+    push_witness_sla_deadline,
     cleanup_incidents_locked,
+    expire_resolved_incidents_locked,
     find_incident_by_id,
+    incident_order_key,
+    IncidentTable,
     report_blocked_incident_locked,
 )
 from joygate.witness_logic import witness_respond_locked
@@ -38,6 +49,8 @@ from joygate.dashboard_logic import build_incidents_daily_report
 from joygate.config import (
     AI_BUDGET_DAY_SECONDS,
     AI_JOB_RETENTION_SECONDS,
+    AI_JOB_TIMEOUT_SECONDS,
+    AI_JOB_WORKERS,
     ALLOWED_WITNESS_JOYKEYS,
     DASHBOARD_DAY_MODE,
     DASHBOARD_TZ_OFFSET_HOURS,
@@ -49,6 +62,12 @@ from joygate.config import (
     JOYKEY_TO_VENDOR,
     MAX_INCIDENTS,
     POLICY_CONFIG,
+    SNAPSHOT_CHANGE_LOG_MAX,
+    STATE_BACKEND,
+    STATE_LOG_SEGMENT_BYTES,
+    STATE_SQLITE_HISTORY_MAX_ROWS,
+    STATE_SNAPSHOT_MIN_BYTES,
+    STREAM_MAX_SUBSCRIBERS,
     TTL_RESOLVED_HIGH_PRIORITY_SECONDS,
     TTL_RESOLVED_LOW_PRIORITY_SECONDS,
     WITNESS_CERTIFIED_POINTS_THRESHOLD,
@@ -64,17 +83,39 @@ from joygate.config import (
     WITNESS_VOTES_REQUIRED,
     JOYGATE_WEBHOOK_ALLOW_HTTP,
     JOYGATE_WEBHOOK_ALLOW_LOCALHOST,
+    WEBHOOK_BREAKER_FAILURE_THRESHOLD,
+    WEBHOOK_BREAKER_MAX_OPEN_SECONDS,
+    WEBHOOK_BREAKER_OPEN_SECONDS,
     WEBHOOK_DELIVERY_RETENTION_SECONDS,
+    WEBHOOK_OUTBOX_FSYNC_BATCH,
+    WEBHOOK_OUTBOX_FSYNC_INTERVAL_SECONDS,
+    WEBHOOK_OUTBOX_SEGMENT_BYTES,
 )
 from joygate.sim_render import render_sim_snapshot_png
+from joygate.state_log import StateLogBase, StoreStateLog
+from joygate.state_sqlite import SqliteStateLog
+from joygate.stream_hub import StreamHub, StreamSubscriber
 from joygate.telemetry_logic import (
     ALLOWED_FUTURE_SKEW_SECONDS,
     ALLOWED_TRUTH_INPUT_SOURCES,
     _parse_event_occurred_at,
 )
-from joygate.vision_audit_report_logic import upsert_ai_insight, generate_vision_audit_result
+from joygate.vision_audit_report_logic import (
+    generate_vision_audit_result,
+    get_vision_audit_executor,
+    run_vision_audit_tasks,
+    upsert_ai_insight,
+)
 from joygate.webhook_target_url import validate_webhook_target_url
-from joygate.webhooks_logic import send_webhook_with_retry
+from joygate.webhook_delivery import get_webhook_delivery_engine
+from joygate.webhook_outbox import DurableWebhookOutbox
+from joygate.webhooks_logic import (
+    BREAKER_CLOSED,
+    BREAKER_HALF_OPEN,
+    WebhookCircuitBreaker,
+    WebhookDeliveryTable,
+    serialize_webhook_body,
+)
 # --- 常量（与 FIELD_REGISTRY 一致）---
 SUMMARY_CAP_LEN = 512
 _TRUNCATED_SUFFIX = "...(truncated)"
@@ -151,6 +192,12 @@ LOW_RETENTION_INCIDENT_TYPES = {"NO_SHOW", "OTHER", "OVERSTAY", "NO_PLUG"}
 # M9.4 Outbound Webhooks（内部上限，不进 FIELD_REGISTRY）
 MAX_WEBHOOK_OUTBOX = 1000
 MAX_WEBHOOK_SUBSCRIPTIONS = 50  # 与 dispatch 单次 budget 对齐，enabled 订阅数上限
+# 批量投递：单批 event 数上限、攒批最长等待（毫秒）及开启批量但未给 linger 时的默认值
+MAX_WEBHOOK_BATCH_SIZE = 100
+MAX_WEBHOOK_BATCH_LINGER_MS = 60000
+DEFAULT_WEBHOOK_BATCH_LINGER_MS = 1000
+MAX_WEBHOOK_DELIVERIES_LISTED = 50  # /v1/webhooks/deliveries 单次返回上限
+MAX_WEBHOOK_PARKED_PER_SUBSCRIPTION = 1000  # 熔断期间每订阅停放的 delivery 上限，超出最老的直接 FAILED
 # M10 走通过新鲜度信号（segment_passed）最多保留条数
 MAX_SEGMENT_PASSED = 200
 # M12A-1 每 joykey 保留的轨迹 segment 数量（ring buffer）
@@ -177,6 +224,41 @@ MAX_ROBOT_SCORE = 100
 SUSPICIOUS_SCORE_THRESHOLD = 50
 SCORE_DELTA_WITNESS_VERIFIED = 2
 
+# /v1/snapshot 分段（内部，不进 FIELD_REGISTRY）：每段单独记录 state version，未变更的分段复用缓存
+SNAPSHOT_SECTION_CHARGING = "charging"
+SNAPSHOT_SECTION_HAZARDS = "hazards"
+SNAPSHOT_SECTION_TELEMETRY = "telemetry"
+# change log 中的对象类型 -> 所属分段（/v1/snapshot/changes 按对象 key 返回增量）
+SNAPSHOT_KIND_CHARGER = "charger"
+SNAPSHOT_KIND_HOLD = "hold"
+SNAPSHOT_KIND_HAZARD = "hazard"
+SNAPSHOT_KIND_SIGNAL = "signal"
+_SNAPSHOT_KIND_SECTION = {
+    SNAPSHOT_KIND_CHARGER: SNAPSHOT_SECTION_CHARGING,
+    SNAPSHOT_KIND_HOLD: SNAPSHOT_SECTION_CHARGING,
+    SNAPSHOT_KIND_HAZARD: SNAPSHOT_SECTION_HAZARDS,
+    SNAPSHOT_KIND_SIGNAL: SNAPSHOT_SECTION_TELEMETRY,
+}
+
+# 状态持久化（WAL + 快照）中的表名：charger / hold / hazard / signal 沿用 SNAPSHOT_KIND_*（经 _bump_state_version 登记）
+STATE_TABLE_INCIDENT = "incident"
+STATE_TABLE_REPUTATION = "reputation"
+STATE_TABLE_VENDOR = "vendor"
+STATE_TABLE_SCORE_EVENT = "score_event"
+STATE_TABLE_DECISION = "decision"
+# witness 计票 / 去重状态：incident 计票（集合存为有序 list）随 incident 登记；segment 去重表；segment 证据事件为只追加历史
+STATE_TABLE_WITNESS = "witness"
+STATE_TABLE_SEGMENT_WITNESS = "segment_witness"
+STATE_TABLE_SEGMENT_WITNESS_EVENT = "segment_witness_event"
+# 只在归档后端（sqlite）登记、只写不恢复：淘汰出内存的 incident（带淘汰时的行）与 webhook delivery
+STATE_TABLE_INCIDENT_ARCHIVE = "incident_archive"
+STATE_TABLE_DELIVERY = "delivery"
+# incident 计票里以 set 存放的字段（顶层 / 按 charger_state 分桶）
+_WITNESS_SET_FIELDS = ("seen_points_event_ids", "seen_witness_joykeys")
+_WITNESS_STATE_SET_FIELDS = ("vendors_by_state", "certified_witnesses_by_state")
+# flush 取行时每次持有 domain 锁最多复制的行数；分批释放锁，避免大批量 flush 阻塞请求（序列化在锁外）
+STATE_RESOLVE_BATCH = 64
+
 # webhook_event_type（严格对齐 FIELD_REGISTRY）
 ALLOWED_WEBHOOK_EVENT_TYPES = {
     "INCIDENT_CREATED",
@@ -253,7 +335,7 @@ def _get_vendor_for_joykey(joykey: str) -> str | None:
 
 
 def _list_segment_passed_signals_locked(store: "JoyGateStore", limit: int) -> list[dict[str, Any]]:
-    """在已持 store._lock 时调用，返回按 segment_id 排序的 signal 列表，截断到 limit。"""
+    """在已持 store._telemetry_lock 时调用，返回按 segment_id 排序的 signal 列表，截断到 limit。"""
     out: list[dict[str, Any]] = []
     for sid, rec in sorted(store._segment_passed.items(), key=lambda x: x[0]):
         if not isinstance(rec, dict):
@@ -311,6 +393,91 @@ def _norm_optional_str(name: str, v: Any | None, max_len: int) -> str | None:
     return s
 
 
+def _norm_witness_vote(
+    incident_id: Any,
+    charger_id: Any,
+    charger_state: Any,
+    obstacle_type: Any,
+    evidence_refs: Any,
+    points_event_id: Any,
+) -> tuple[str, str, str, str | None, list[str], str | None]:
+    """M8 单条 witness 桩占用投票的入参规范化（单条与批量共用）；失败 raise ValueError。"""
+    incident_id = _norm_required_str("incident_id", incident_id, MAX_INCIDENT_ID_LEN)
+    charger_id = _norm_required_str("charger_id", charger_id, MAX_CHARGER_ID_LEN)
+    charger_state = _norm_required_str("charger_state", charger_state, MAX_ID_LEN)
+    points_event_id = _norm_optional_str("points_event_id", points_event_id, MAX_POINTS_EVENT_ID_LEN)
+    obstacle_type = _norm_optional_str("obstacle_type", obstacle_type, MAX_ID_LEN)
+    return incident_id, charger_id, charger_state, obstacle_type, _normalize_evidence_refs(evidence_refs), points_event_id
+
+
+def _norm_segment_vote(
+    segment_id: Any,
+    segment_state: Any,
+    points_event_id: Any,
+    evidence_refs: Any,
+    obstacle_type: Any,
+) -> tuple[str, str, str | None, list[str], str | None]:
+    """M14.3 单条 segment witness 的入参规范化（单条与批量共用）；失败 raise ValueError。"""
+    if segment_state not in ALLOWED_SEGMENT_STATES:
+        raise ValueError(f"invalid segment_state: {segment_state!r}")
+    segment_id = _norm_required_str("segment_id", segment_id, MAX_ID_LEN)
+    points_event_id = _norm_optional_str("points_event_id", points_event_id, MAX_POINTS_EVENT_ID_LEN)
+    obstacle_type = _norm_optional_str("obstacle_type", obstacle_type, MAX_ID_LEN)
+    return segment_id, segment_state, points_event_id, _normalize_evidence_refs(evidence_refs), obstacle_type
+
+
+def _copy_state_row(value: Any) -> Any:
+    """flush 在 domain 锁内取行时的副本：dict / list 逐层复制，叶子（str / 数字 / None）共享；锁外再序列化。"""
+    if isinstance(value, dict):
+        return {k: _copy_state_row(v) if isinstance(v, (dict, list, tuple)) else v for k, v in value.items()}
+    return [_copy_state_row(v) if isinstance(v, (dict, list, tuple)) else v for v in value]
+
+
+def _webhook_delivery_out(item: dict[str, Any]) -> dict[str, Any]:
+    """delivery 记录 -> WebhookDeliveryOut 字段（FIELD_REGISTRY WebhookDeliveriesListOK）。"""
+    return {
+        "delivery_id": item.get("delivery_id"),
+        "event_id": item.get("event_id"),
+        "event_type": item.get("event_type"),
+        "subscription_id": item.get("subscription_id"),
+        "target_url": item.get("target_url"),
+        "delivery_status": item.get("delivery_status"),
+        "attempts": item.get("attempts"),
+        "last_status_code": item.get("last_status_code"),
+        "last_error": item.get("last_error"),
+        "created_at": item.get("created_at"),
+        "updated_at": item.get("updated_at"),
+        "delivered_at": item.get("delivered_at"),
+    }
+
+
+def _witness_tally_row(w: dict[str, Any] | None) -> dict[str, Any] | None:
+    """incident 计票 -> 可 JSON 序列化的行（set 转有序 list）；None 原样返回。"""
+    if w is None:
+        return None
+    row = dict(w)
+    for field in _WITNESS_SET_FIELDS:
+        row[field] = sorted(w.get(field) or ())
+    for field in _WITNESS_STATE_SET_FIELDS:
+        row[field] = {state: sorted(members) for state, members in (w.get(field) or {}).items()}
+    return row
+
+
+def _witness_tally_from_row(row: dict[str, Any]) -> dict[str, Any]:
+    """_witness_tally_row 的逆：list 还原为 set。"""
+    w = dict(row)
+    for field in _WITNESS_SET_FIELDS:
+        w[field] = set(row.get(field) or ())
+    for field in _WITNESS_STATE_SET_FIELDS:
+        w[field] = {state: set(members or ()) for state, members in (row.get(field) or {}).items()}
+    return w
+
+
+def _segment_witness_event_key(event: dict[str, Any]) -> str:
+    """segment 证据事件在状态持久化中的 key（事件本身无 id）。"""
+    return f"{event.get('ts') or 0:.6f}:{event.get('segment_id')}:{event.get('witness_joykey')}:{event.get('points_event_id') or ''}"
+
+
 def _today_date_in_tz(tz_name: str) -> str:
     """返回当前在指定时区的日期 YYYY-MM-DD。仅支持 Asia/Taipei（UTC+8），否则 raise ValueError。"""
     if tz_name != "Asia/Taipei":
@@ -333,14 +500,87 @@ def _date_str_with_offset(ts: float, offset_hours: int) -> str:
     return datetime.fromtimestamp(ts, tz=tz).strftime("%Y-%m-%d")
 
 
+def _open_state_log(state_dir: str, backend: str) -> StateLogBase:
+    """
+    按后端名打开状态持久化：sqlite 或 wal（默认）。两者都做崩溃恢复，store 的写与热读始终走内存表；
+    sqlite 同时是归档：score_event / decision / segment 证据事件等只追加历史、淘汰出内存的 incident、delivery 留在库里，
+    /v1/score_events、/v1/incidents 分页与 delivery 查询越过内存窗口后从库里续读。
+    """
+    if backend == "sqlite":
+        return SqliteStateLog(
+            state_dir,
+            checkpoint_min_bytes=STATE_SNAPSHOT_MIN_BYTES,
+            history_limits={
+                STATE_TABLE_SCORE_EVENT: MAX_SCORE_EVENTS,
+                STATE_TABLE_DECISION: MAX_DECISIONS,
+                STATE_TABLE_SEGMENT_WITNESS_EVENT: MAX_SEGMENT_WITNESS_EVENTS,
+            },
+            history_max_rows=STATE_SQLITE_HISTORY_MAX_ROWS,
+        )
+    if backend != "wal":
+        raise ValueError(f"unsupported state backend: {backend!r}")
+    return StoreStateLog(state_dir, STATE_LOG_SEGMENT_BYTES, STATE_SNAPSHOT_MIN_BYTES)
+
+
 class JoyGateStore:
     """
-    管理充电桩槽位、占位、配额；并发安全（单 Lock）；支持过期清理与快照。
+    管理充电桩槽位、占位、配额；并发安全（按 domain 分锁）；支持过期清理与快照。
+
+    分锁（每个 domain 一把 Lock，只保护本 domain 的容器）：
+    - _charging_lock：_slots / _holds / _joykey_to_hold_id / proactive 409 事件
+    - _incidents_lock：_incidents / _witness_by_incident / _incident_sla_heap
+    - _ai_jobs_lock：_ai_jobs / _ai_job_queue / _active_ai_job_by_incident / 每日 AI 调用计数
+    - _hazards_lock：_hazards_by_segment / _soft_recheck_heap / _witness_by_segment / _segment_witness_events
+    - _telemetry_lock：_segment_passed / _robot_tracks
+    - _reputation_lock：_reputation_by_joykey / _witness_points / _vendor_robot_totals / _score_events / _score_event_ids / _vendor_scores
+    - _audit_lock：_audit_status / _decisions / _sidecar_safety_events
+    - _webhooks_lock：_webhook_subscriptions（及其 event_type 倒排索引）/ _webhook_outbox（或 _durable_outbox）/ _webhook_deliveries
+
+    锁顺序（跨 domain 嵌套时只能按此顺序获取，禁止反向）：
+    charging → incidents → ai_jobs → hazards → telemetry → reputation → audit → webhooks。
+    audit / webhooks 为叶子锁：持有时不再获取其他锁（写 ledger、入队 webhook 可在任意 domain 锁内进行）。
+    _stream_hub 内部锁同为叶子锁（推送扇出只做 call_soon_threadsafe，不回调 store）。
+    _slots 的 key 集合在 __init__ 后不变，只读 key 不需要 _charging_lock。
+    可选状态持久化（state_dir；后端 wal / sqlite 见 state_backend）：修改点只向 _state_log 登记脏 key（无锁队列），
+    后台 flush 时再按 domain 锁取行写 WAL；witness 计票与去重随 incident / hazard 持久化，AI jobs、telemetry 轨迹等短期状态不持久化。
+    归档后端（sqlite）另外保留淘汰出内存的记录，分页读越过内存窗口时在锁外读取（见 _open_state_log）。
     """
 
-    def __init__(self, charger_ids: list[str] | None = None, ttl_seconds: int = HOLD_TTL_SECONDS):
+    def __init__(
+        self,
+        charger_ids: list[str] | None = None,
+        ttl_seconds: int = HOLD_TTL_SECONDS,
+        webhook_outbox_dir: str | None = None,
+        state_dir: str | None = None,
+        state_backend: str | None = None,
+    ):
         self._ttl = ttl_seconds
-        self._lock = Lock()
+        self._charging_lock = Lock()
+        self._incidents_lock = Lock()
+        self._ai_jobs_lock = Lock()
+        self._hazards_lock = Lock()
+        self._telemetry_lock = Lock()
+        self._reputation_lock = Lock()
+        self._audit_lock = Lock()
+        self._webhooks_lock = Lock()
+        # snapshot state version（内部，不进 FIELD_REGISTRY）：epoch 区分进程内不同 store 实例；version 单调递增
+        # _state_version_lock 为最内层叶子锁，只在 _bump_state_version 内短暂持有
+        self._state_version_lock = Lock()
+        self._state_epoch = uuid.uuid4().hex[:12]
+        self._state_version = 0
+        self._section_versions: dict[str, int] = {
+            SNAPSHOT_SECTION_CHARGING: 0,
+            SNAPSHOT_SECTION_HAZARDS: 0,
+            SNAPSHOT_SECTION_TELEMETRY: 0,
+        }
+        # 增量同步 change log：(version, kind, key)，有界；_snapshot_changes_floor 为已被淘汰的最大 version
+        self._snapshot_changes: deque[tuple[int, str, str]] = deque(maxlen=SNAPSHOT_CHANGE_LOG_MAX)
+        self._snapshot_changes_floor = 0
+        # 分段缓存：section -> (section_version, 已构建的列表)；序列化缓存：(分段版本元组, JSON 片段 bytes)
+        self._snapshot_section_cache: dict[str, tuple[int, Any]] = {}
+        self._snapshot_json_cache: tuple[tuple[int, int, int], bytes] | None = None
+        # /v1/stream 推送扇出：webhook 事件 + state version 变化通知（hub 自带叶子锁，可在任意 domain 锁内调用）
+        self._stream_hub = StreamHub(STREAM_MAX_SUBSCRIBERS)
         # Demo Clock 基准：store 启动时间（供 dashboard DEMO 日历使用）
         self._boot_ts = time.time()
         ids = charger_ids or DEFAULT_CHARGER_IDS
@@ -353,8 +593,12 @@ class JoyGateStore:
         self._holds: dict[str, dict[str, Any]] = {}
         # joykey -> hold_id（单 joykey 单占位）
         self._joykey_to_hold_id: dict[str, str] = {}
-        # 事件列表（内部项含 created_at，对外 IncidentItem 不暴露 created_at）
-        self._incidents: list[dict[str, Any]] = []
+        # hold 过期小顶堆：(expires_at, hold_id)；stop_charging 释放的 hold 不出堆，purge 时按 _holds 校验惰性丢弃
+        self._hold_expiry_heap: list[tuple[float, str]] = []
+        # 事件表：incident_id -> rec + status/charger/segment 索引（内部项含 created_at，对外 IncidentItem 不暴露 created_at）
+        self._incidents = IncidentTable()
+        # witness SLA 截止小顶堆：(created_at + SLA, incident_id)；到期由 tick_incident_sla 弹出，删除/终态项惰性丢弃
+        self._incident_sla_heap: list[tuple[float, str]] = []
         # M8 witness 投票：incident_id -> {tally, seen_points_event_ids, seen_witness_joykeys, total}（不出 API）
         self._witness_by_incident: dict[str, dict[str, Any]] = {}
         # M9.1 AI Jobs（仅内存态，不出 /v1/snapshot）
@@ -363,10 +607,31 @@ class JoyGateStore:
         self._active_ai_job_by_incident: dict[str, str] = {}
         # M9.4 Outbound Webhooks（内存态）
         self._webhook_subscriptions: dict[str, dict[str, Any]] = {}
+        # event_type -> {subscription_id: target}（仅 enabled 订阅；经 _index_webhook_subscription_locked 维护）
+        self._webhook_targets_by_event: dict[str, dict[str, dict[str, Any]]] = {}
+        self._enabled_webhook_subscription_ids: set[str] = set()
         self._webhook_outbox: list[dict[str, Any]] = []
-        self._webhook_deliveries: list[dict[str, Any]] = []
+        self._webhook_deliveries = WebhookDeliveryTable()
+        # 每订阅熔断状态与熔断期间停放的 delivery（subscription_id -> deque[(delivery_id, target_url, secret, event, ...)]）
+        self._webhook_breakers: dict[str, WebhookCircuitBreaker] = {}
+        self._webhook_parked: dict[str, deque[tuple]] = {}
+        # 可选磁盘 outbox：启用后 event 写盘而不进 _webhook_outbox，订阅表随之持久化并在此恢复
+        self._durable_outbox: DurableWebhookOutbox | None = None
+        if webhook_outbox_dir:
+            self._durable_outbox = DurableWebhookOutbox(
+                webhook_outbox_dir,
+                WEBHOOK_OUTBOX_SEGMENT_BYTES,
+                WEBHOOK_OUTBOX_FSYNC_INTERVAL_SECONDS,
+                WEBHOOK_OUTBOX_FSYNC_BATCH,
+            )
+            for rec in self._durable_outbox.load_subscriptions():
+                if isinstance(rec.get("subscription_id"), str):
+                    self._webhook_subscriptions[rec["subscription_id"]] = rec
+                    self._index_webhook_subscription_locked(rec)
         # M9 Segment witness / Hazards（内存态）
         self._hazards_by_segment: dict[str, dict[str, Any]] = {}
+        # SOFT 复核到期小顶堆：(recheck_due_at 的 unix ts, segment_id)；非 SOFT_BLOCKED 或 due 已改的项在弹出时惰性丢弃
+        self._soft_recheck_heap: list[tuple[float, str]] = []
         self._witness_by_segment: dict[str, dict[str, Any]] = {}
         # M10 走通过新鲜度信号（仅信号，不改 hazard_status）
         self._segment_passed: dict[str, dict[str, Any]] = {}
@@ -392,13 +657,48 @@ class JoyGateStore:
         self._score_events: list[dict[str, Any]] = []
         self._score_event_ids: set[str] = set()
         self._vendor_scores: dict[str, dict[str, Any]] = {}
+        # M16 票权视图：白名单 joykey -> 当前票权（配置 points，有 reputation 记录时为 robot_score）；与 reputation 同步增量维护
+        self._witness_points: dict[str, int] = dict(JOYKEY_TO_POINTS)
+        # M16 厂商 robot_score 聚合：vendor -> [score_sum, robot_count]；计分时只更新受影响厂商，不再每次遍历全部 reputation
+        self._vendor_robot_totals: dict[str, list[int]] = {}
         # M12A-1 每日 AI 调用计数（用于 budget；日期变更时重置）
         self._ai_daily_calls_date: str | None = None
         self._ai_daily_calls_count: int = 0
+        # 可选状态持久化：从快照 + WAL 恢复核心业务表；之后的修改只登记脏 key，由后台调度器 flush / 折叠快照
+        self._state_log: StateLogBase | None = None
+        if state_dir:
+            state_log = _open_state_log(state_dir, state_backend or STATE_BACKEND)
+            self._restore_state_tables(state_log.recover())
+            self._state_log = state_log
+            self._incidents.on_change = self._touch_incident_state
+            if state_log.archives:
+                self._incidents.on_remove = self._archive_incident_state
+                self._webhook_deliveries.on_change = self._touch_delivery_state
+            # 停机期间过了 freshness 窗口的 segment 证据事件：清出内存并登记删除
+            self._trim_segment_witness_events_locked(time.time())
+
+    def _touch_incident_state(self, incident_id: str) -> None:
+        """IncidentTable.on_change：incident 与其 witness 计票一起登记（计票变化都伴随 incident touch；incident 移除时计票随之删除）。"""
+        state_log = self._state_log
+        if state_log is not None:
+            state_log.touch(STATE_TABLE_INCIDENT, incident_id)
+            state_log.touch(STATE_TABLE_WITNESS, incident_id)
+
+    def _archive_incident_state(self, rec: dict[str, Any]) -> None:
+        """IncidentTable.on_remove（仅归档后端，_incidents_lock 内）：淘汰时复制行交给后端，flush 时它已不在内存表里。"""
+        state_log = self._state_log
+        if state_log is not None:
+            state_log.put(STATE_TABLE_INCIDENT_ARCHIVE, rec["incident_id"], _copy_state_row(rec))
+
+    def _touch_delivery_state(self, delivery_id: str) -> None:
+        """WebhookDeliveryTable.on_change（仅归档后端）：delivery 写进归档；不随 recover 恢复，重启后由 outbox 重新派发。"""
+        state_log = self._state_log
+        if state_log is not None:
+            state_log.touch(STATE_TABLE_DELIVERY, delivery_id)
 
     def get_ai_job_by_report_id(self, ai_report_id: str) -> dict[str, Any] | None:
         """M13.1：按 ai_report_id 查找 job（内部用）；不存在返回 None。"""
-        with self._lock:
+        with self._ai_jobs_lock:
             for job in self._ai_jobs.values():
                 if isinstance(job, dict) and job.get("ai_report_id") == ai_report_id:
                     return dict(job)
@@ -406,7 +706,7 @@ class JoyGateStore:
 
     def ledger_has_policy_suggested(self, ai_report_id: str) -> bool:
         """M13.1：ledger 中是否存在该 ai_report_id 的 decision_type=POLICY_SUGGESTED（内部用）。"""
-        with self._lock:
+        with self._audit_lock:
             for d in self._decisions:
                 if isinstance(d, dict) and d.get("decision_type") == "POLICY_SUGGESTED" and d.get("ai_report_id") == ai_report_id:
                     return True
@@ -418,7 +718,7 @@ class JoyGateStore:
 
     def get_audit_ledger(self) -> dict[str, Any]:
         """M11：返回审计账本快照；audit_status 来自 store，不写死。返回副本避免外部修改。"""
-        with self._lock:
+        with self._audit_lock:
             return {
                 "audit_status": dict(self._audit_status),
                 "decisions": [dict(d) for d in self._decisions],
@@ -427,7 +727,7 @@ class JoyGateStore:
 
     def append_sidecar_safety_event(self, payload: dict[str, Any]) -> None:
         """M11：追加一条 sidecar 安全事件；生成 sidecar_event_id；cap 最旧淘汰。"""
-        with self._lock:
+        with self._audit_lock:
             event_id = f"sse_{uuid.uuid4().hex[:12]}"
             rec = {
                 "sidecar_event_id": event_id,
@@ -443,15 +743,59 @@ class JoyGateStore:
             while len(self._sidecar_safety_events) > MAX_SIDECAR_SAFETY_EVENTS:
                 self._sidecar_safety_events.pop(0)
 
+    def _append_decision_locked(self, rec: dict[str, Any]) -> None:
+        """须持有 _audit_lock：追加一条 ledger decision，超过 MAX_DECISIONS 淘汰最旧；启用状态持久化时登记增删。"""
+        self._decisions.append(rec)
+        state_log = self._state_log
+        if state_log is not None:
+            state_log.put(STATE_TABLE_DECISION, rec["decision_id"], rec)
+        while len(self._decisions) > MAX_DECISIONS:
+            old = self._decisions.pop(0)
+            if state_log is not None:
+                state_log.put(STATE_TABLE_DECISION, old["decision_id"], None)
+
+    def _bump_state_version(self, kind: str, key: str, created: bool = False) -> None:
+        """
+        在 kind 所属 domain 锁内调用（写入后）：推进全局 state version，记为该分段最新版本，
+        并把 (version, kind, key) 追加到 change log（满了淘汰最旧项并抬高 floor）。启用状态持久化时同时登记脏 key
+        （created=True：key 为刚生成的新 id，flush 前就被删除时不写删除记录）。
+        """
+        if self._state_log is not None:
+            self._state_log.touch(kind, key, created)
+        with self._state_version_lock:
+            self._state_version += 1
+            version = self._state_version
+            self._section_versions[_SNAPSHOT_KIND_SECTION[kind]] = version
+            log = self._snapshot_changes
+            if len(log) == log.maxlen:
+                self._snapshot_changes_floor = log[0][0]
+            log.append((version, kind, key))
+        self._stream_hub.notify_state_changed()
+
+    def state_version_tag(self) -> str:
+        """当前 "<epoch>.<version>"（与 /v1/snapshot/changes 的 since / state_version 同格式）。"""
+        with self._state_version_lock:
+            return f"{self._state_epoch}.{self._state_version}"
+
+    def open_stream(self, loop: Any) -> StreamSubscriber | None:
+        """/v1/stream：注册订阅者；本 sandbox 连接数已达上限返回 None。"""
+        return self._stream_hub.subscribe(loop)
+
+    def close_stream(self, sub: StreamSubscriber) -> None:
+        self._stream_hub.unsubscribe(sub)
+
     def purge_expired(self) -> None:
-        """清理已过期的 hold，并将对应 charger 置为 FREE。必须在持有 _lock 时调用。"""
+        """
+        清理已过期的 hold，并将对应 charger 置为 FREE。必须在持有 _charging_lock 时调用。
+        只弹出堆顶已到期项，代价 O(expired·log n)；堆项对应的 hold 已释放或 expires_at 不一致则视为失效项跳过。
+        """
         now = time.time()
-        to_remove = [
-            (hid, rec)
-            for hid, rec in self._holds.items()
-            if rec["expires_at"] <= now
-        ]
-        for hold_id, rec in to_remove:
+        heap = self._hold_expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, hold_id = heapq.heappop(heap)
+            rec = self._holds.get(hold_id)
+            if rec is None or rec["expires_at"] != expires_at:
+                continue
             charger_id = rec["charger_id"]
             joykey = rec["joykey"]
             self._holds.pop(hold_id, None)
@@ -462,9 +806,19 @@ class JoyGateStore:
                     "hold_id": None,
                     "joykey": None,
                 }
+            self._bump_state_version(SNAPSHOT_KIND_HOLD, hold_id)
+            self._bump_state_version(SNAPSHOT_KIND_CHARGER, charger_id)
+
+    def _push_hold_expiry_locked(self, expires_at: float, hold_id: str) -> None:
+        """在 _charging_lock 内调用：登记 hold 过期时间；失效项过多（> 2×活跃 hold）时整体重建堆，防止短 hold 高频释放导致堆膨胀。"""
+        heap = self._hold_expiry_heap
+        heapq.heappush(heap, (expires_at, hold_id))
+        if len(heap) > 2 * len(self._holds) + 64:
+            self._hold_expiry_heap = [(rec["expires_at"], hid) for hid, rec in self._holds.items()]
+            heapq.heapify(self._hold_expiry_heap)
 
     def _record_proactive_busy_event_locked(self, charger_id: str, joykey: str, now: float) -> None:
-        """在锁内调用：记录一次 reserve 409（资源忙）；按窗口裁剪并 cap 列表长度。"""
+        """在 _charging_lock 内调用：记录一次 reserve 409（资源忙）；按窗口裁剪并 cap 列表长度。"""
         self._proactive_busy_events.append({"charger_id": charger_id, "joykey": joykey, "ts": now})
         cutoff = now - PROACTIVE_CONGESTION_WINDOW_SECONDS
         while self._proactive_busy_events and self._proactive_busy_events[0].get("ts", 0) < cutoff:
@@ -473,7 +827,7 @@ class JoyGateStore:
             self._proactive_busy_events.pop(0)
 
     def _maybe_emit_proactive_delay_suggestions_locked(self, charger_id: str, now: float) -> None:
-        """在锁内调用：若该 charger 在窗口内 ≥3 个不同 joykey 的 409，则对每个 joykey 去重写入一条 POLICY_SUGGESTED decision。"""
+        """在 _charging_lock 内调用：若该 charger 在窗口内 ≥3 个不同 joykey 的 409，则对每个 joykey 去重写入一条 POLICY_SUGGESTED decision（ledger 写入取叶子锁 _audit_lock）。"""
         cutoff = now - PROACTIVE_CONGESTION_WINDOW_SECONDS
         events_for_charger = [
             e for e in self._proactive_busy_events
@@ -492,23 +846,22 @@ class JoyGateStore:
                 f"charger_id={charger_id}, joykey={joykey}, window_sec={PROACTIVE_CONGESTION_WINDOW_SECONDS}, distinct={len(distinct_joykeys)}"
             )
             decision_id = f"dec_{uuid.uuid4().hex[:12]}"
-            self._decisions.append({
-                "decision_id": decision_id,
-                "decision_type": "POLICY_SUGGESTED",
-                "decision_basis": "POLICY",
-                "incident_id": None,
-                "hold_id": None,
-                "charger_id": charger_id,
-                "segment_id": None,
-                "ai_report_id": None,
-                "evidence_refs": None,
-                "summary": _cap_summary(raw_summary),
-                "prev_bundle_hash": None,
-                "bundle_hash": None,
-                "created_at": now,
-            })
-            while len(self._decisions) > MAX_DECISIONS:
-                self._decisions.pop(0)
+            with self._audit_lock:
+                self._append_decision_locked({
+                    "decision_id": decision_id,
+                    "decision_type": "POLICY_SUGGESTED",
+                    "decision_basis": "POLICY",
+                    "incident_id": None,
+                    "hold_id": None,
+                    "charger_id": charger_id,
+                    "segment_id": None,
+                    "ai_report_id": None,
+                    "evidence_refs": None,
+                    "summary": _cap_summary(raw_summary),
+                    "prev_bundle_hash": None,
+                    "bundle_hash": None,
+                    "created_at": now,
+                })
             self._proactive_suggestion_keys.add(key)
             self._proactive_suggestion_keys_fifo.append(key)
             while len(self._proactive_suggestion_keys_fifo) > MAX_PROACTIVE_SUGGESTION_KEYS:
@@ -524,7 +877,7 @@ class JoyGateStore:
         返回 (status_code, payload)，payload 为 200 的 {hold_id, ttl_seconds}
         或 429/409 的 {error, message}（严格按 FIELD_REGISTRY）。
         """
-        with self._lock:
+        with self._charging_lock:
             self.purge_expired()
 
             if joykey in self._joykey_to_hold_id:
@@ -559,31 +912,35 @@ class JoyGateStore:
                 "joykey": joykey,
                 "expires_at": expires_at,
             }
+            self._push_hold_expiry_locked(expires_at, hold_id)
             self._joykey_to_hold_id[joykey] = hold_id
             self._slots[resource_id] = {
                 "slot_state": SLOT_STATE_HELD,
                 "hold_id": hold_id,
                 "joykey": joykey,
             }
+            self._bump_state_version(SNAPSHOT_KIND_HOLD, hold_id, created=True)
+            self._bump_state_version(SNAPSHOT_KIND_CHARGER, resource_id)
             return 200, {"hold_id": hold_id, "ttl_seconds": self._ttl}
 
     def start_charging(self, hold_id: str, charger_id: str) -> None:
         """
         若 hold 存在且 charger_id 匹配，则将对应槽位设为 CHARGING；否则忽略。
         """
-        with self._lock:
+        with self._charging_lock:
             self.purge_expired()
             rec = self._holds.get(hold_id)
             if not rec or rec["charger_id"] != charger_id:
                 return
             if charger_id in self._slots:
                 self._slots[charger_id]["slot_state"] = SLOT_STATE_CHARGING
+                self._bump_state_version(SNAPSHOT_KIND_CHARGER, charger_id)
 
     def stop_charging(self, hold_id: str, charger_id: str) -> None:
         """
         若 hold 存在且 charger_id 匹配，则释放 hold、槽位回 FREE，并清理 quota；否则忽略。
         """
-        with self._lock:
+        with self._charging_lock:
             self.purge_expired()
             rec = self._holds.get(hold_id)
             if not rec or rec["charger_id"] != charger_id:
@@ -597,6 +954,8 @@ class JoyGateStore:
                     "hold_id": None,
                     "joykey": None,
                 }
+            self._bump_state_version(SNAPSHOT_KIND_HOLD, hold_id)
+            self._bump_state_version(SNAPSHOT_KIND_CHARGER, charger_id)
 
     def snapshot(self) -> dict[str, Any]:
         """
@@ -605,105 +964,311 @@ class JoyGateStore:
         hazards 始终为 list（无数据为 []），项为 HazardSnapshot，字段/枚举与 FIELD_REGISTRY 一致；按 segment_id 排序。
         ChargerSlot: charger_id, slot_state (FREE/HELD/CHARGING), hold_id, joykey
         HoldSnapshot: hold_id, charger_id, joykey, expires_at + 扩展字段（默认 false/null）
+        各分段列表按 state version 缓存并在调用间共享，调用方只读、不得修改。
         """
-        with self._lock:
-            self.purge_expired()
-            now = time.time()
-            self._process_due_soft_rechecks_locked(now)
-            snapshot_at = _iso_utc(now)
-
-            chargers: list[dict[str, Any]] = []
-            for cid, slot in self._slots.items():
-                chargers.append({
-                    "charger_id": cid,
-                    "slot_state": slot["slot_state"],
-                    "hold_id": slot["hold_id"],
-                    "joykey": slot["joykey"],
-                })
-
-            holds: list[dict[str, Any]] = []
-            for hid, rec in self._holds.items():
-                holds.append({
-                    "hold_id": hid,
-                    "charger_id": rec["charger_id"],
-                    "joykey": rec["joykey"],
-                    "expires_at": _iso_utc(rec["expires_at"]),
-                    "is_priority_compensated": False,
-                    "compensation_reason": None,
-                    "queue_position_drift": None,
-                    "incident_id": None,
-                })
-            chargers.sort(key=lambda c: c["charger_id"])
-            holds.sort(key=lambda h: h["hold_id"])
-            segment_passed_signals = _list_segment_passed_signals_locked(self, MAX_SEGMENT_PASSED)
-
-            # M14.2 hazards：FIELD_REGISTRY HazardSnapshot；空为 []；同锁内读取；按 segment_id 排序；防脏值 500
-            def _safe_int(v: Any, default: int) -> int:
-                if v is None:
-                    return default
-                try:
-                    return int(v)
-                except (ValueError, TypeError):
-                    return default
-
-            def _safe_nonempty_str(v: Any) -> str | None:
-                if v is None:
-                    return None
-                if not isinstance(v, str):
-                    return None
-                s = (v or "").strip()
-                return s if s else None
-
-            _recheck_default = _safe_int(POLICY_CONFIG.get("soft_hazard_recheck_interval_minutes"), 5)
-            seg_ids: list[str] = []
-            for k in self._hazards_by_segment.keys():
-                if isinstance(k, str) and (k or "").strip():
-                    seg_ids.append((k or "").strip())
-            hazards_out: list[dict[str, Any]] = []
-            for seg_id in sorted(seg_ids):
-                raw = self._hazards_by_segment.get(seg_id)
-                rec = raw if isinstance(raw, dict) else {}
-                st_val = rec.get("hazard_status")
-                st = (st_val.strip() if isinstance(st_val, str) else "") or ""
-                if st in {"OPEN", "SOFT_BLOCKED", "HARD_BLOCKED"}:
-                    hazard_status = st
-                elif st == "BLOCKED":
-                    hazard_status = "SOFT_BLOCKED"
-                elif st == "CLEAR":
-                    hazard_status = "OPEN"
-                else:
-                    hazard_status = "OPEN"
-                if hazard_status == "OPEN":
-                    hazard_lock_mode = None
-                else:
-                    lm_val = rec.get("hazard_lock_mode")
-                    lm = (lm_val.strip() if isinstance(lm_val, str) else "") or ""
-                    if lm in {"SOFT_RECHECK", "HARD_MANUAL"}:
-                        hazard_lock_mode = lm
-                    else:
-                        hazard_lock_mode = "HARD_MANUAL" if hazard_status == "HARD_BLOCKED" else "SOFT_RECHECK"
-                hazard_id = _safe_nonempty_str(rec.get("hazard_id")) or f"haz_{seg_id}"
-                hazards_out.append({
-                    "hazard_id": hazard_id,
-                    "segment_id": seg_id,
-                    "hazard_status": hazard_status,
-                    "hazard_lock_mode": hazard_lock_mode,
-                    "recheck_due_at": _safe_nonempty_str(rec.get("recheck_due_at")),
-                    "recheck_interval_minutes": _safe_int(rec.get("recheck_interval_minutes"), _recheck_default),
-                    "soft_recheck_consecutive_blocked": _safe_int(rec.get("soft_recheck_consecutive_blocked"), 0),
-                    "incident_id": _safe_nonempty_str(rec.get("incident_id")),
-                    "work_order_id": _safe_nonempty_str(rec.get("work_order_id")),
-                })
-            hazards = hazards_out  # 自审：hazards 为空必 []；hazard_status/hazard_lock_mode 仅合法枚举；无未登记字段
-
+        _, chargers, holds, hazards, segment_passed_signals = self._snapshot_sections()
         return {
-            "snapshot_at": snapshot_at,
+            "snapshot_at": _iso_utc(time.time()),
             "chargers": chargers,
             "holds": holds,
             "hazards": hazards,
             "segment_passed_signals": segment_passed_signals,
         }
 
+    def _snapshot_versions(self) -> tuple[int, int, int]:
+        """有到期项时先做读路径维护（只窥视到期堆顶，不进 domain 锁），再返回 (charging_v, hazards_v, telemetry_v)。"""
+        if self._snapshot_maintenance_due(time.time()):
+            self._run_snapshot_maintenance()
+        with self._state_version_lock:
+            return (
+                self._section_versions[SNAPSHOT_SECTION_CHARGING],
+                self._section_versions[SNAPSHOT_SECTION_HAZARDS],
+                self._section_versions[SNAPSHOT_SECTION_TELEMETRY],
+            )
+
+    def _snapshot_tag(self, versions: tuple[int, int, int]) -> str:
+        return ".".join([self._state_epoch] + [str(v) for v in versions])
+
+    def snapshot_tag(self) -> str:
+        """
+        /v1/snapshot 的 If-None-Match 判定用：只读分段版本号得到当前 state_tag（与 snapshot_json 同格式），
+        不建分段、不拼 body；304 路径只走这里。
+        """
+        return self._snapshot_tag(self._snapshot_versions())
+
+    def snapshot_json(self) -> tuple[str, bytes]:
+        """
+        /v1/snapshot 用：返回 (state_tag, body_bytes)。
+        state_tag = "<epoch>.<charging_v>.<hazards_v>.<telemetry_v>"，任一分段变更即变化，供 ETag / If-None-Match；
+        除 snapshot_at 外的 JSON 片段（去掉开头的 "{"）按 state_tag 缓存，版本号未变时直接复用、不重建分段。
+        """
+        versions = self._snapshot_versions()
+        cached = self._snapshot_json_cache
+        if cached is not None and cached[0] == versions:
+            tail = cached[1]
+        else:
+            versions, chargers, holds, hazards, segment_passed_signals = self._snapshot_sections(maintain=False)
+            tail = json.dumps(
+                {
+                    "chargers": chargers,
+                    "holds": holds,
+                    "hazards": hazards,
+                    "segment_passed_signals": segment_passed_signals,
+                },
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ).encode("utf-8")[1:]
+            self._snapshot_json_cache = (versions, tail)
+        head = json.dumps({"snapshot_at": _iso_utc(time.time())}, separators=(",", ":")).encode("utf-8")
+        return self._snapshot_tag(versions), head[:-1] + b"," + tail
+
+    def snapshot_changes(self, since: str | None) -> dict[str, Any]:
+        """
+        /v1/snapshot/changes：返回 since（上次响应的 state_version，"<epoch>.<version>"）之后新增/修改的
+        chargers / holds / hazards / segment_passed_signals（当前值），以及被移除对象的 key。
+        since 为空、来自其他 store epoch、早于 change log 保留窗口或晚于当前版本 -> is_full_snapshot=true 返回全量。
+        since 格式非法 -> ValueError。增量为至少一次语义：同一对象可能在相邻两次响应中重复出现。
+        """
+        since_version: int | None = None
+        if since is not None and since != "":
+            epoch, sep, raw_version = since.partition(".")
+            if not sep or not epoch or not raw_version.isdigit():
+                raise ValueError("invalid since")
+            if epoch == self._state_epoch:
+                since_version = int(raw_version)
+
+        # 先做到期维护，使本次读到的 version 已包含过期 hold / 到期复核
+        self._run_snapshot_maintenance()
+        changed: dict[str, set[str]] | None = None
+        with self._state_version_lock:
+            current = self._state_version
+            if since_version is not None and self._snapshot_changes_floor <= since_version <= current:
+                changed = {kind: set() for kind in _SNAPSHOT_KIND_SECTION}
+                for version, kind, key in reversed(self._snapshot_changes):
+                    if version <= since_version:
+                        break
+                    changed[kind].add(key)
+        _, chargers, holds, hazards, segment_passed_signals = self._snapshot_sections(maintain=False)
+
+        out: dict[str, Any] = {
+            "snapshot_at": _iso_utc(time.time()),
+            "since": since or None,
+            "state_version": f"{self._state_epoch}.{current}",
+            "is_full_snapshot": changed is None,
+        }
+        if changed is None:
+            out.update({
+                "chargers": chargers,
+                "holds": holds,
+                "hazards": hazards,
+                "segment_passed_signals": segment_passed_signals,
+                "removed_hold_ids": [],
+                "removed_hazard_segment_ids": [],
+                "removed_signal_segment_ids": [],
+            })
+            return out
+
+        def _pick(items: list[dict[str, Any]], id_field: str, keys: set[str]) -> tuple[list[dict[str, Any]], list[str]]:
+            if not keys:
+                return [], []
+            picked = [it for it in items if it.get(id_field) in keys]
+            present = {it.get(id_field) for it in picked}
+            return picked, sorted(k for k in keys if k not in present)
+
+        chargers_out, _ = _pick(chargers, "charger_id", changed[SNAPSHOT_KIND_CHARGER])
+        holds_out, removed_holds = _pick(holds, "hold_id", changed[SNAPSHOT_KIND_HOLD])
+        hazards_out, removed_hazards = _pick(hazards, "segment_id", changed[SNAPSHOT_KIND_HAZARD])
+        signals_out, removed_signals = _pick(segment_passed_signals, "segment_id", changed[SNAPSHOT_KIND_SIGNAL])
+        out.update({
+            "chargers": chargers_out,
+            "holds": holds_out,
+            "hazards": hazards_out,
+            "segment_passed_signals": signals_out,
+            "removed_hold_ids": removed_holds,
+            "removed_hazard_segment_ids": removed_hazards,
+            "removed_signal_segment_ids": removed_signals,
+        })
+        return out
+
+    def _snapshot_maintenance_due(self, now: float) -> bool:
+        """
+        不加锁窥视 hold 过期堆与 SOFT 复核堆的堆顶，判断读路径是否需要做到期维护。
+        与并发 push/pop 竞争时至多误判一次：误报只是多进一次锁，漏报由下一次读或后台调度器补上。
+        """
+        for heap in (self._hold_expiry_heap, self._soft_recheck_heap):
+            try:
+                if heap[0][0] <= now:
+                    return True
+            except IndexError:
+                continue
+        return False
+
+    def _run_snapshot_maintenance(self) -> None:
+        """snapshot 读路径的到期维护：过期 hold 清理（charging 锁）+ 到期 SOFT 复核（hazards 锁），两段不嵌套，均只弹到期堆顶。"""
+        with self._charging_lock:
+            self.purge_expired()
+        with self._hazards_lock:
+            self._process_due_soft_rechecks_locked(time.time())
+
+    def expire_holds(self) -> None:
+        """后台调度用：过期 hold 回收（charging 锁内，只弹出到期堆顶，无到期项时 O(1)）。"""
+        with self._charging_lock:
+            self.purge_expired()
+
+    def run_due_soft_rechecks(self, now: float | None = None) -> None:
+        """后台调度用：到期 SOFT_BLOCKED 复核（hazards 锁内），使状态推进不依赖 /v1/snapshot 被读。"""
+        if now is None:
+            now = time.time()
+        with self._hazards_lock:
+            self._process_due_soft_rechecks_locked(now)
+
+    def run_retention_cleanup(self, now: float | None = None) -> None:
+        """
+        后台调度用：AI jobs / RESOLVED incidents / webhook deliveries 保留期清理。
+        各段在自己的锁内依次执行、不嵌套；incidents 只做 TTL，硬上限仍在写时保证。
+        """
+        if now is None:
+            now = time.time()
+        with self._incidents_lock:
+            expire_resolved_incidents_locked(
+                self._incidents,
+                self._witness_by_incident,
+                now,
+                TTL_RESOLVED_LOW_PRIORITY_SECONDS,
+                TTL_RESOLVED_HIGH_PRIORITY_SECONDS,
+                LOW_RETENTION_INCIDENT_TYPES,
+            )
+        with self._ai_jobs_lock:
+            self._cleanup_ai_jobs_locked(now)
+        with self._webhooks_lock:
+            self._cleanup_webhook_deliveries_locked(now)
+
+    def _snapshot_sections(
+        self,
+        maintain: bool = True,
+    ) -> tuple[tuple[int, int, int], list[dict[str, Any]], list[dict[str, Any]], list[dict[str, Any]], list[dict[str, Any]]]:
+        """
+        依次在各 domain 锁内（不嵌套）取分段（maintain=True 时顺带做到期维护）：charging 段不等 hazards/telemetry 写入，
+        reserve 不被快照拖住。分段版本未变则直接复用缓存列表。
+        返回 ((charging_v, hazards_v, telemetry_v), chargers, holds, hazards, signals)。
+        """
+        cache = self._snapshot_section_cache
+        with self._charging_lock:
+            if maintain:
+                self.purge_expired()
+            v_charging = self._section_versions[SNAPSHOT_SECTION_CHARGING]
+            hit = cache.get(SNAPSHOT_SECTION_CHARGING)
+            if hit is None or hit[0] != v_charging:
+                hit = (v_charging, self._build_charging_section_locked())
+                cache[SNAPSHOT_SECTION_CHARGING] = hit
+            chargers, holds = hit[1]
+
+        with self._hazards_lock:
+            if maintain:
+                self._process_due_soft_rechecks_locked(time.time())
+            v_hazards = self._section_versions[SNAPSHOT_SECTION_HAZARDS]
+            hit = cache.get(SNAPSHOT_SECTION_HAZARDS)
+            if hit is None or hit[0] != v_hazards:
+                hit = (v_hazards, self._build_hazards_section_locked())
+                cache[SNAPSHOT_SECTION_HAZARDS] = hit
+            hazards = hit[1]
+
+        with self._telemetry_lock:
+            v_telemetry = self._section_versions[SNAPSHOT_SECTION_TELEMETRY]
+            hit = cache.get(SNAPSHOT_SECTION_TELEMETRY)
+            if hit is None or hit[0] != v_telemetry:
+                hit = (v_telemetry, _list_segment_passed_signals_locked(self, MAX_SEGMENT_PASSED))
+                cache[SNAPSHOT_SECTION_TELEMETRY] = hit
+            segment_passed_signals = hit[1]
+
+        return (v_charging, v_hazards, v_telemetry), chargers, holds, hazards, segment_passed_signals
+
+    def _build_charging_section_locked(self) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        """在 _charging_lock 内调用：构建 snapshot 的 chargers / holds（按 id 排序）。"""
+        chargers: list[dict[str, Any]] = []
+        for cid, slot in self._slots.items():
+            chargers.append({
+                "charger_id": cid,
+                "slot_state": slot["slot_state"],
+                "hold_id": slot["hold_id"],
+                "joykey": slot["joykey"],
+            })
+        holds: list[dict[str, Any]] = []
+        for hid, rec in self._holds.items():
+            holds.append({
+                "hold_id": hid,
+                "charger_id": rec["charger_id"],
+                "joykey": rec["joykey"],
+                "expires_at": _iso_utc(rec["expires_at"]),
+                "is_priority_compensated": False,
+                "compensation_reason": None,
+                "queue_position_drift": None,
+                "incident_id": None,
+            })
+        chargers.sort(key=lambda c: c["charger_id"])
+        holds.sort(key=lambda h: h["hold_id"])
+        return chargers, holds
+
+    def _build_hazards_section_locked(self) -> list[dict[str, Any]]:
+        """在 _hazards_lock 内调用：M14.2 hazards，FIELD_REGISTRY HazardSnapshot；空为 []；按 segment_id 排序；防脏值 500。"""
+        def _safe_int(v: Any, default: int) -> int:
+            if v is None:
+                return default
+            try:
+                return int(v)
+            except (ValueError, TypeError):
+                return default
+
+        def _safe_nonempty_str(v: Any) -> str | None:
+            if v is None:
+                return None
+            if not isinstance(v, str):
+                return None
+            s = (v or "").strip()
+            return s if s else None
+
+        _recheck_default = _safe_int(POLICY_CONFIG.get("soft_hazard_recheck_interval_minutes"), 5)
+        seg_ids: list[str] = []
+        for k in self._hazards_by_segment.keys():
+            if isinstance(k, str) and (k or "").strip():
+                seg_ids.append((k or "").strip())
+        hazards_out: list[dict[str, Any]] = []
+        for seg_id in sorted(seg_ids):
+            raw = self._hazards_by_segment.get(seg_id)
+            rec = raw if isinstance(raw, dict) else {}
+            st_val = rec.get("hazard_status")
+            st = (st_val.strip() if isinstance(st_val, str) else "") or ""
+            if st in {"OPEN", "SOFT_BLOCKED", "HARD_BLOCKED"}:
+                hazard_status = st
+            elif st == "BLOCKED":
+                hazard_status = "SOFT_BLOCKED"
+            elif st == "CLEAR":
+                hazard_status = "OPEN"
+            else:
+                hazard_status = "OPEN"
+            if hazard_status == "OPEN":
+                hazard_lock_mode = None
+            else:
+                lm_val = rec.get("hazard_lock_mode")
+                lm = (lm_val.strip() if isinstance(lm_val, str) else "") or ""
+                if lm in {"SOFT_RECHECK", "HARD_MANUAL"}:
+                    hazard_lock_mode = lm
+                else:
+                    hazard_lock_mode = "HARD_MANUAL" if hazard_status == "HARD_BLOCKED" else "SOFT_RECHECK"
+            hazard_id = _safe_nonempty_str(rec.get("hazard_id")) or f"haz_{seg_id}"
+            hazards_out.append({
+                "hazard_id": hazard_id,
+                "segment_id": seg_id,
+                "hazard_status": hazard_status,
+                "hazard_lock_mode": hazard_lock_mode,
+                "recheck_due_at": _safe_nonempty_str(rec.get("recheck_due_at")),
+                "recheck_interval_minutes": _safe_int(rec.get("recheck_interval_minutes"), _recheck_default),
+                "soft_recheck_consecutive_blocked": _safe_int(rec.get("soft_recheck_consecutive_blocked"), 0),
+                "incident_id": _safe_nonempty_str(rec.get("incident_id")),
+                "work_order_id": _safe_nonempty_str(rec.get("work_order_id")),
+            })
+        return hazards_out  # 自审：hazards 为空必 []；hazard_status/hazard_lock_mode 仅合法枚举；无未登记字段
+
     def record_segment_passed(
         self,
         segment_id: str,
@@ -713,7 +1278,7 @@ class JoyGateStore:
         fleet_id: str | None = None,
     ) -> None:
         """M10：记录走通过信号。仅当 event_ts >= 已有 last_passed_ts 才更新整条记录；event_ts < old_ts 时直接 return。超 200 条按最旧淘汰。不触碰 hazard_status。"""
-        with self._lock:
+        with self._telemetry_lock:
             rec = self._segment_passed.get(segment_id)
             old_ts = rec.get("last_passed_ts", 0.0) if rec else 0.0
             if event_ts < old_ts:
@@ -742,6 +1307,8 @@ class JoyGateStore:
                 )
                 for sid, _ in by_ts[: len(self._segment_passed) - MAX_SEGMENT_PASSED]:
                     self._segment_passed.pop(sid, None)
+                    self._bump_state_version(SNAPSHOT_KIND_SIGNAL, sid)
+            self._bump_state_version(SNAPSHOT_KIND_SIGNAL, segment_id)
 
     def record_segment_passed_telemetry(
         self,
@@ -781,7 +1348,7 @@ class JoyGateStore:
                 truth_input_source=truth_input_source,
                 fleet_id=fleet_id,
             )
-        with self._lock:
+        with self._telemetry_lock:
             window_min = POLICY_CONFIG.get("segment_freshness_window_minutes", 10)
             if not isinstance(window_min, int) or window_min <= 0:
                 window_min = 10
@@ -789,30 +1356,44 @@ class JoyGateStore:
             to_drop = [sid for sid, rec in self._segment_passed.items() if (rec.get("last_passed_ts") or 0) < cutoff]
             for sid in to_drop:
                 self._segment_passed.pop(sid, None)
+                self._bump_state_version(SNAPSHOT_KIND_SIGNAL, sid)
 
     def list_segment_passed_signals(self, limit: int = 200) -> list[dict[str, Any]]:
         """M10：返回 segment_passed 信号列表，按 segment_id 排序，截断到 limit。"""
-        with self._lock:
+        with self._telemetry_lock:
             return _list_segment_passed_signals_locked(self, limit)
 
     def get_reputation(self, joykey: str) -> dict[str, Any] | None:
         """M16：返回单机器人画像副本；无该 joykey 返回 None（不自动创建）。"""
-        with self._lock:
+        with self._reputation_lock:
             rep = self._reputation_by_joykey.get(joykey)
             if rep is None:
                 return None
             return dict(rep)
 
-    def get_score_events(self, limit: int = 100) -> list[dict[str, Any]]:
-        """M16：返回计分事件列表副本，按时间倒序，截断到 limit（上限 500）。"""
+    def get_score_events(self, limit: int = 100, before: str | None = None) -> list[dict[str, Any]]:
+        """
+        M16：返回计分事件列表副本，按时间倒序，截断到 limit（上限 500）。
+        before 为上一页最后一条的 score_event_id，只返回比它更早的；内存只保留最近 MAX_SCORE_EVENTS 条，
+        归档后端下越过内存窗口的部分在锁外从后端续读（否则到内存最老一条为止）。
+        """
         limit = max(0, min(500, limit))
-        with self._lock:
-            events = list(self._score_events)[::-1][:limit]
-            return [dict(e) for e in events]
+        with self._reputation_lock:
+            events = self._score_events
+            end = len(events)
+            if before is not None:
+                end = next((i for i in range(len(events) - 1, -1, -1) if events[i].get("score_event_id") == before), -1)
+            out = [dict(e) for e in reversed(events[max(0, end - limit) : end])] if end > 0 else []
+            # 内存窗口不够一页：从窗口最老一条（before 已不在内存时从 before）往前接归档
+            boundary = before if end < 0 else (events[0].get("score_event_id") if events and end <= limit else None)
+        state_log = self._state_log
+        if boundary and len(out) < limit and state_log is not None and state_log.archives:
+            out.extend(state_log.history_before(STATE_TABLE_SCORE_EVENT, boundary, limit - len(out)))
+        return out
 
     def get_vendor_scores(self, fleet_id: str | None = None) -> list[dict[str, Any]]:
         """M16：返回厂商分列表副本；fleet_id 非空时只返回该厂商。"""
-        with self._lock:
+        with self._reputation_lock:
             if fleet_id is not None and (fleet_id or "").strip():
                 f = fleet_id.strip()
                 rec = self._vendor_scores.get(f)
@@ -841,49 +1422,19 @@ class JoyGateStore:
             raise ValueError("invalid incident_type")
         if incident_status is not None and incident_status not in ALLOWED_INCIDENT_STATUSES:
             raise ValueError("invalid incident_status")
-        with self._lock:
-            now = time.time()
-            prev_status_by_id = {
-                rec.get("incident_id"): rec.get("incident_status")
-                for rec in self._incidents
-                if rec.get("incident_id")
-            }
-            apply_witness_sla_downgrade_locked(
-                self._incidents,
-                self._witness_by_incident,
-                now,
-                WITNESS_SLA_TIMEOUT_MINUTES,
+        with self._incidents_lock:
+            self._tick_incident_sla_locked(time.time())
+            # 索引取候选 O(k)，只为命中的记录构建快照
+            candidates = self._incidents.select(
+                incident_id=incident_id,
+                incident_status=incident_status,
+                charger_id=charger_id,
+                segment_id=segment_id,
             )
-            for rec in self._incidents:
-                iid = rec.get("incident_id")
-                if not iid:
-                    continue
-                prev = prev_status_by_id.get(iid)
-                curr = rec.get("incident_status")
-                if prev != curr:
-                    data = self._incident_public_view_locked(rec)
-                    self._enqueue_webhook_event_locked(
-                        "INCIDENT_STATUS_CHANGED",
-                        "INCIDENT",
-                        iid,
-                        data,
-                    )
-            snapshot_records = build_incidents_snapshot(self._incidents)
-
-        def match(rec: dict[str, Any]) -> bool:
-            if incident_id is not None and rec.get("incident_id") != incident_id:
-                return False
-            if incident_type is not None and rec.get("incident_type") != incident_type:
-                return False
-            if incident_status is not None and rec.get("incident_status") != incident_status:
-                return False
-            if charger_id is not None and rec.get("charger_id") != charger_id:
-                return False
-            if segment_id is not None and rec.get("segment_id") != segment_id:
-                return False
-            return True
-
-        filtered = [r for r in snapshot_records if match(r)]
+            if incident_type is not None:
+                candidates = [r for r in candidates if r.get("incident_type") == incident_type]
+            filtered = build_incidents_snapshot(candidates)
+
         # 稳定排序：created_at desc，tie-breaker incident_id desc（字符串用 reverse）
         filtered.sort(key=lambda x: (x.get("created_at", 0.0), x.get("incident_id", "")), reverse=True)
 
@@ -893,26 +1444,104 @@ class JoyGateStore:
 
         return filtered
 
-    def _apply_witness_sla_downgrade_locked(self, now: float) -> None:
+    def list_incidents_page(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        fields: str | None = None,
+        incident_id: str | None = None,
+        incident_type: str | None = None,
+        incident_status: str | None = None,
+        charger_id: str | None = None,
+        segment_id: str | None = None,
+    ) -> dict[str, Any]:
         """
-        witness SLA 超时触发降级：
-        - OPEN -> UNDER_OBSERVATION
-        - ESCALATED/UNDER_OBSERVATION 保持
-        - RESOLVED/EVIDENCE_CONFIRMED 不触发
-        同时 upsert ai_insights: VISION_AUDIT_REQUESTED
-        必须在持有 self._lock 时调用。
+        /v1/incidents 分页版：排序同 list_incidents（created_at desc, incident_id desc）；
+        cursor 为上一页返回的 next_cursor（不透明，内含 created_at + incident_id）；fields 为逗号分隔投影。
+        只为本页记录构建输出，内存/延迟随 limit 而非总量增长。返回 {"incidents": [...], "next_cursor": str | None}。
+        非法参数 raise ValueError。
         """
-        apply_witness_sla_downgrade_locked(
+        incident_id = _norm_optional_str("incident_id", incident_id, MAX_INCIDENT_ID_LEN)
+        incident_type = _norm_optional_str("incident_type", incident_type, MAX_INCIDENT_TYPE_LEN)
+        incident_status = _norm_optional_str("incident_status", incident_status, MAX_ID_LEN)
+        charger_id = _norm_optional_str("charger_id", charger_id, MAX_CHARGER_ID_LEN)
+        segment_id = _norm_optional_str("segment_id", segment_id, MAX_ID_LEN)
+        if incident_type is not None and incident_type not in ALLOWED_INCIDENT_TYPES:
+            raise ValueError("invalid incident_type")
+        if incident_status is not None and incident_status not in ALLOWED_INCIDENT_STATUSES:
+            raise ValueError("invalid incident_status")
+        projection = parse_incident_fields(fields)
+        before = decode_incident_cursor(cursor) if cursor is not None else None
+        limit = max(1, int(limit))
+        filters = {
+            "incident_id": incident_id,
+            "incident_type": incident_type,
+            "incident_status": incident_status,
+            "charger_id": charger_id,
+            "segment_id": segment_id,
+        }
+        with self._incidents_lock:
+            self._tick_incident_sla_locked(time.time())
+            # 多取 1 条判断是否还有下一页
+            recs = self._incidents.page(limit + 1, before=before, **filters)
+            page = list(zip(map(incident_order_key, recs), build_incident_items(recs, projection)))
+        # 归档后端：淘汰出内存的 incident 与内存页按同一排序合并（锁外读库）
+        state_log = self._state_log
+        if state_log is not None and state_log.archives:
+            archived = state_log.archived_incidents(limit + 1, before=before, **filters)
+            if archived:
+                page += zip(map(incident_order_key, archived), build_incident_items(archived, projection))
+                page.sort(key=lambda x: x[0], reverse=True)
+                del page[limit + 1 :]
+        next_cursor = None
+        if len(page) > limit:
+            created_at, last_id = page[limit - 1][0]
+            next_cursor = encode_incident_cursor({"created_at": created_at, "incident_id": last_id})
+        return {"incidents": [item for _, item in page[:limit]], "next_cursor": next_cursor}
+
+    def tick_incident_sla(self, now: float | None = None) -> int:
+        """
+        witness SLA 截止调度（后台调度器周期调用，保证没人读 /v1/incidents 时也按时降级）。
+        返回状态发生变化的 incident 数。
+        """
+        if now is None:
+            now = time.time()
+        with self._incidents_lock:
+            return self._tick_incident_sla_locked(now)
+
+    def _tick_incident_sla_locked(self, now: float) -> int:
+        """
+        须持有 _incidents_lock。只弹出已到期的截止项（无到期项时 O(1)）：OPEN -> UNDER_OBSERVATION，
+        upsert VISION_AUDIT_REQUESTED；状态变化的 incident 发 INCIDENT_STATUS_CHANGED。
+        读路径也调用一次，保证读到的状态不落后于截止时间（每条 incident 只处理一次，不再全表扫描）。
+        """
+        heap = self._incident_sla_heap
+        if not heap or heap[0][0] > now:
+            return 0
+        changed = apply_witness_sla_downgrade_locked(
             self._incidents,
             self._witness_by_incident,
+            heap,
             now,
             WITNESS_SLA_TIMEOUT_MINUTES,
         )
+        for rec in changed:
+            iid = rec.get("incident_id")
+            if not iid:
+                continue
+            data = self._incident_public_view_locked(rec)
+            self._enqueue_webhook_event_locked(
+                "INCIDENT_STATUS_CHANGED",
+                "INCIDENT",
+                iid,
+                data,
+            )
+        return len(changed)
 
     def _cleanup_ai_jobs_locked(self, now: float) -> None:
         """
         M9.2.4: 清理已完成/失败的 AI Jobs（仅内存）。
-        必须在持有 self._lock 时调用。
+        必须在持有 self._ai_jobs_lock 时调用。
         """
         cleanup_ai_jobs_locked(
             self._ai_jobs,
@@ -923,7 +1552,7 @@ class JoyGateStore:
         )
 
     def _cleanup_incidents_locked(self, now: float) -> None:
-        """写时清理：必须在持有 self._lock 时调用。阶段1 TTL 清理 RESOLVED；阶段2 硬上限 pop 最老 RESOLVED 或 pop(0)。"""
+        """写时清理：必须在持有 self._incidents_lock 时调用。阶段1 TTL 清理 RESOLVED；阶段2 硬上限 pop 最老 RESOLVED 或 pop(0)。"""
         cleanup_incidents_locked(
             self._incidents,
             self._witness_by_incident,
@@ -942,7 +1571,7 @@ class JoyGateStore:
         evidence_refs: list[str] | None = None,
     ) -> str:
         """
-        创建一条 blocked 类事件并 append 到 _incidents；incident_status 固定 OPEN。
+        创建一条 blocked 类事件并写入 _incidents；incident_status 固定 OPEN。
         incident_type 必须在 ALLOWED_INCIDENT_TYPES，charger_id 必须在 self._slots，否则 raise ValueError。
         写前调用 _cleanup_incidents_locked 做 TTL 与硬上限清理。返回 incident_id。
         """
@@ -952,7 +1581,7 @@ class JoyGateStore:
             raise ValueError("invalid incident_type")
         snapshot_ref = _norm_optional_str("snapshot_ref", snapshot_ref, MAX_SNAPSHOT_REF_LEN)
         evidence_refs = _normalize_evidence_refs(evidence_refs)
-        with self._lock:
+        with self._incidents_lock:
             if charger_id not in self._slots:
                 raise ValueError("invalid charger_id")
             now = time.time()
@@ -973,6 +1602,7 @@ class JoyGateStore:
             )
             rec = find_incident_by_id(self._incidents, incident_id)
             if rec:
+                push_witness_sla_deadline(self._incident_sla_heap, rec, WITNESS_SLA_TIMEOUT_MINUTES)
                 data = self._incident_public_view_locked(rec)
                 self._enqueue_webhook_event_locked(
                     "INCIDENT_CREATED",
@@ -990,7 +1620,7 @@ class JoyGateStore:
         incident_id = _norm_required_str("incident_id", incident_id, MAX_INCIDENT_ID_LEN)
         if new_status not in ALLOWED_INCIDENT_STATUSES:
             raise ValueError(f"invalid incident_status: {new_status}")
-        with self._lock:
+        with self._incidents_lock:
             rec = find_incident_by_id(self._incidents, incident_id)
             if rec is None:
                 raise KeyError(f"incident not found: {incident_id}")
@@ -999,8 +1629,7 @@ class JoyGateStore:
             if new_status not in allowed:
                 raise ValueError(f"invalid status transition: {current} -> {new_status}")
             now = time.time()
-            rec["incident_status"] = new_status
-            rec["status_updated_at"] = now
+            self._incidents.set_status(rec, new_status, now)
             if new_status != current:
                 data = self._incident_public_view_locked(rec)
                 self._enqueue_webhook_event_locked(
@@ -1025,16 +1654,18 @@ class JoyGateStore:
         incident_id = _norm_required_str("incident_id", incident_id, MAX_INCIDENT_ID_LEN)
         snapshot_ref = _norm_optional_str("snapshot_ref", snapshot_ref, MAX_SNAPSHOT_REF_LEN)
         evidence_refs = _normalize_evidence_refs(evidence_refs)
-        with self._lock:
+        chargers_layout = list(self._slots.keys())
+        # 锁顺序 incidents → ai_jobs → telemetry；轨迹先在 telemetry 锁内单独拷贝，不与 incidents 嵌套
+        with self._telemetry_lock:
+            robot_tracks_copy = {
+                k: list(v) for k, v in self._robot_tracks.items()
+            }
+        with self._incidents_lock, self._ai_jobs_lock:
             now = time.time()
             self._cleanup_ai_jobs_locked(now)
             rec = find_incident_by_id(self._incidents, incident_id)
             if rec is None:
                 raise KeyError(f"incident not found: {incident_id}")
-            chargers_layout = list(self._slots.keys())
-            robot_tracks_copy = {
-                k: list(v) for k, v in self._robot_tracks.items()
-            }
             render_snapshot = {
                 "incident_id": incident_id,
                 "charger_id": rec.get("charger_id"),
@@ -1069,7 +1700,7 @@ class JoyGateStore:
         hold_id = _norm_required_str("hold_id", hold_id, MAX_ID_LEN)
         audience = _norm_required_str("audience", audience, MAX_ID_LEN)
         context_ref = _norm_optional_str("context_ref", context_ref, MAX_CONTEXT_REF_LEN)
-        with self._lock:
+        with self._ai_jobs_lock:
             now = time.time()
             self._cleanup_ai_jobs_locked(now)
             return create_dispatch_explain_job_locked(
@@ -1093,7 +1724,7 @@ class JoyGateStore:
         """M13.1：创建 policy_suggest job；evidence_only，不接收 prompt/text/instruction。M13.2: model_tier 存 job。"""
         incident_id = _norm_optional_str("incident_id", incident_id, MAX_INCIDENT_ID_LEN)
         context_ref = _norm_optional_str("context_ref", context_ref, MAX_CONTEXT_REF_LEN)
-        with self._lock:
+        with self._ai_jobs_lock:
             now = time.time()
             self._cleanup_ai_jobs_locked(now)
             return create_policy_suggest_job_locked(
@@ -1107,11 +1738,11 @@ class JoyGateStore:
 
     def apply_policy_suggestion_ledger_only(self, ai_report_id: str) -> dict[str, Any]:
         """M13.1：仅写 ledger 一条 POLICY_APPLIED，不改 incident/hazard/hold。返回 {status}。"""
-        with self._lock:
+        with self._audit_lock:
             now = time.time()
             decision_id = f"dec_{uuid.uuid4().hex[:12]}"
             raw_summary = "admin confirmed apply_policy_suggestion (no state change in demo)"
-            self._decisions.append({
+            self._append_decision_locked({
                 "decision_id": decision_id,
                 "decision_type": "POLICY_APPLIED",
                 "decision_basis": "HUMAN",
@@ -1130,7 +1761,7 @@ class JoyGateStore:
 
     def tick_ai_jobs(self, max_jobs: int) -> dict[str, int]:
         """
-        M9.1 / M12A-1: 两段式推进 AI Jobs。锁内仅收集 tasks；锁外渲染 + provider；锁内回写。
+        M9.1 / M12A-1: 两段式推进 AI Jobs。锁内仅收集 tasks；锁外渲染 + provider（共享线程池并发，单 job 超时记失败）；锁内回写。
         超 budget 不调 provider，写回 skipped due to budget，不升级 EVIDENCE_CONFIRMED。
         返回 {processed, completed}。
         """
@@ -1142,7 +1773,7 @@ class JoyGateStore:
         limit = max_jobs if max_jobs > 0 else 0
         processed = 0
         tasks: list[dict] = []
-        with self._lock:
+        with self._incidents_lock, self._ai_jobs_lock:
             now = time.time()
             self._cleanup_ai_jobs_locked(now)
             elapsed = now - self._boot_ts
@@ -1170,52 +1801,35 @@ class JoyGateStore:
                     t["use_budget"] = False
 
         provider = (os.getenv("JOYGATE_AI_PROVIDER") or "mock").strip().lower() or "mock"
-        completed = 0
+        vision_tasks = [
+            t for t in tasks
+            if t.get("ai_job_type") not in (AI_JOB_TYPE_DISPATCH_EXPLAIN, AI_JOB_TYPE_POLICY_SUGGEST)
+        ]
         results_by_job: dict[str, dict] = {}
-        for t in tasks:
-            if t.get("ai_job_type") in (AI_JOB_TYPE_DISPATCH_EXPLAIN, AI_JOB_TYPE_POLICY_SUGGEST):
-                continue
-            job_id = t.get("job_id")
-            incident_id = t.get("incident_id")
-            ai_report_id = t.get("ai_report_id")
-            render_snapshot = t.get("render_snapshot") or {}
-            incident_rec = t.get("incident_rec") or {}
-            use_budget = t.get("use_budget") is True
-            png_bytes = b""
-            try:
-                png_bytes = render_sim_snapshot_png(render_snapshot)
-            except Exception as e:
-                results_by_job[job_id] = {
-                    "summary": f"render error: {e!s}",
-                    "confidence": None,
-                    "obstacle_type": None,
-                    "sample_index": None,
-                    "_job_failed": True,
-                }
-                completed += 1
-                continue
-            if use_budget:
-                try:
-                    res = generate_vision_audit_result(provider, incident_rec, png_bytes)
-                    results_by_job[job_id] = res
-                except Exception as e:
-                    results_by_job[job_id] = {
-                        "summary": f"provider error: {e!s}",
-                        "confidence": None,
-                        "obstacle_type": None,
-                        "sample_index": None,
-                        "_job_failed": True,
-                    }
-            else:
-                results_by_job[job_id] = {
-                    "summary": "skipped due to budget",
-                    "confidence": None,
-                    "obstacle_type": None,
-                    "sample_index": None,
-                }
-            completed += 1
+        if vision_tasks:
+            # 超时结果与正常结果一样走 lease_until 校验回写：lease 已被重领则丢弃
+            results_by_job = run_vision_audit_tasks(
+                vision_tasks,
+                render_sim_snapshot_png,
+                lambda rec, png: generate_vision_audit_result(provider, rec, png),
+                get_vision_audit_executor(AI_JOB_WORKERS),
+                AI_JOB_TIMEOUT_SECONDS,
+            )
+        completed = len(results_by_job)
+
+        # dispatch_explain 回写需要 hold -> charger_id：先在 _charging_lock 内单独取，回写时不再持有 charging 锁
+        charger_by_hold: dict[str, str | None] = {}
+        dispatch_hold_ids = [
+            t.get("hold_id") for t in tasks
+            if t.get("ai_job_type") == AI_JOB_TYPE_DISPATCH_EXPLAIN and t.get("hold_id")
+        ]
+        if dispatch_hold_ids:
+            with self._charging_lock:
+                for hid in dispatch_hold_ids:
+                    if hid in self._holds:
+                        charger_by_hold[hid] = self._holds[hid].get("charger_id")
 
-        with self._lock:
+        with self._incidents_lock, self._ai_jobs_lock:
             now = time.time()
             for t in tasks:
                 job_id = t.get("job_id")
@@ -1228,15 +1842,12 @@ class JoyGateStore:
                     if t.get("lease_until") is not None and job.get("lease_until") != t.get("lease_until"):
                         continue
                     hold_id = t.get("hold_id") or ""
-                    charger_id = None
-                    if hold_id and hold_id in self._holds:
-                        charger_id = self._holds[hold_id].get("charger_id")
+                    charger_id = charger_by_hold.get(hold_id) if hold_id else None
                     incident_id_from_charger = None
                     if charger_id:
-                        for r in self._incidents:
-                            if r.get("charger_id") == charger_id and r.get("incident_status") == "OPEN":
-                                incident_id_from_charger = r.get("incident_id")
-                                break
+                        r = self._incidents.first_with(charger_id, "OPEN")
+                        if r is not None:
+                            incident_id_from_charger = r.get("incident_id")
                     context_ref = t.get("context_ref")
                     context_ref_hash = ""
                     if isinstance(context_ref, str) and context_ref:
@@ -1255,21 +1866,22 @@ class JoyGateStore:
                         parts.append(f"context_ref_hash={context_ref_hash}")
                     summary = _cap_summary("; ".join(parts))
                     decision_id = f"dec_{uuid.uuid4().hex[:12]}"
-                    self._decisions.append({
-                        "decision_id": decision_id,
-                        "decision_type": "REROUTE_SUGGESTED",
-                        "decision_basis": "POLICY",
-                        "incident_id": incident_id_from_charger,
-                        "hold_id": hold_id,
-                        "charger_id": charger_id,
-                        "segment_id": None,
-                        "ai_report_id": ai_report_id,
-                        "evidence_refs": None,
-                        "summary": summary,
-                        "prev_bundle_hash": None,
-                        "bundle_hash": None,
-                        "created_at": now,
-                    })
+                    with self._audit_lock:
+                        self._append_decision_locked({
+                            "decision_id": decision_id,
+                            "decision_type": "REROUTE_SUGGESTED",
+                            "decision_basis": "POLICY",
+                            "incident_id": incident_id_from_charger,
+                            "hold_id": hold_id,
+                            "charger_id": charger_id,
+                            "segment_id": None,
+                            "ai_report_id": ai_report_id,
+                            "evidence_refs": None,
+                            "summary": summary,
+                            "prev_bundle_hash": None,
+                            "bundle_hash": None,
+                            "created_at": now,
+                        })
                     job["ai_job_status"] = "COMPLETED"
                     job["completed_at"] = now
                     job.pop("lease_until", None)
@@ -1304,21 +1916,22 @@ class JoyGateStore:
                         parts_ps.append(f"incident_status={rec_ps.get('incident_status') or ''}")
                     summary_ps = _cap_summary("; ".join(parts_ps))
                     decision_id_ps = f"dec_{uuid.uuid4().hex[:12]}"
-                    self._decisions.append({
-                        "decision_id": decision_id_ps,
-                        "decision_type": "POLICY_SUGGESTED",
-                        "decision_basis": "POLICY",
-                        "incident_id": incident_id_ps,
-                        "hold_id": None,
-                        "charger_id": rec_ps.get("charger_id") if rec_ps else None,
-                        "segment_id": rec_ps.get("segment_id") if rec_ps else None,
-                        "ai_report_id": ai_report_id,
-                        "evidence_refs": None,
-                        "summary": summary_ps,
-                        "prev_bundle_hash": None,
-                        "bundle_hash": None,
-                        "created_at": now,
-                    })
+                    with self._audit_lock:
+                        self._append_decision_locked({
+                            "decision_id": decision_id_ps,
+                            "decision_type": "POLICY_SUGGESTED",
+                            "decision_basis": "POLICY",
+                            "incident_id": incident_id_ps,
+                            "hold_id": None,
+                            "charger_id": rec_ps.get("charger_id") if rec_ps else None,
+                            "segment_id": rec_ps.get("segment_id") if rec_ps else None,
+                            "ai_report_id": ai_report_id,
+                            "evidence_refs": None,
+                            "summary": summary_ps,
+                            "prev_bundle_hash": None,
+                            "bundle_hash": None,
+                            "created_at": now,
+                        })
                     job["ai_job_status"] = "COMPLETED"
                     job["completed_at"] = now
                     job.pop("lease_until", None)
@@ -1391,12 +2004,12 @@ class JoyGateStore:
                         "ai_report_id": ai_report_id,
                     },
                 )
+                self._incidents.touch(incident_id)
                 conf = result.get("confidence")
                 if conf is not None and rec.get("incident_status") not in ("RESOLVED", "EVIDENCE_CONFIRMED"):
                     allowed = ALLOWED_INCIDENT_STATUS_TRANSITIONS.get(rec.get("incident_status"), set())
                     if "EVIDENCE_CONFIRMED" in allowed:
-                        rec["incident_status"] = "EVIDENCE_CONFIRMED"
-                        rec["status_updated_at"] = now
+                        self._incidents.set_status(rec, "EVIDENCE_CONFIRMED", now)
                         data = self._incident_public_view_locked(rec)
                         self._enqueue_webhook_event_locked(
                             "INCIDENT_STATUS_CHANGED",
@@ -1409,7 +2022,7 @@ class JoyGateStore:
 
     def list_ai_jobs(self) -> list[dict[str, Any]]:
         """M9.1: 返回 AI Jobs 列表（稳定顺序）。"""
-        with self._lock:
+        with self._ai_jobs_lock:
             return list_ai_jobs_locked(self._ai_jobs)
 
     def create_webhook_subscription(
@@ -1418,7 +2031,10 @@ class JoyGateStore:
         event_types: list[str],
         secret: str | None,
         is_enabled: bool | None,
+        batch_max_size: int | None = None,
+        batch_linger_ms: int | None = None,
     ) -> dict[str, Any]:
+        """batch_max_size > 1 开启批量投递（多个 event 合成一个数组 POST）；batch_linger_ms 为攒批最长等待。"""
         target_url = (target_url or "").strip()
         if not target_url:
             raise ValueError("invalid target_url")
@@ -1452,17 +2068,24 @@ class JoyGateStore:
                 secret = None
         elif secret is not None:
             raise ValueError("invalid secret")
+        if batch_max_size is not None:
+            if isinstance(batch_max_size, bool) or not isinstance(batch_max_size, int):
+                raise ValueError("invalid batch_max_size")
+            if batch_max_size < 1 or batch_max_size > MAX_WEBHOOK_BATCH_SIZE:
+                raise ValueError("invalid batch_max_size")
+        if batch_linger_ms is not None:
+            if isinstance(batch_linger_ms, bool) or not isinstance(batch_linger_ms, int):
+                raise ValueError("invalid batch_linger_ms")
+            if batch_linger_ms < 0 or batch_linger_ms > MAX_WEBHOOK_BATCH_LINGER_MS:
+                raise ValueError("invalid batch_linger_ms")
+            if batch_max_size is None or batch_max_size <= 1:
+                raise ValueError("batch_linger_ms requires batch_max_size > 1")
+        if batch_max_size is not None and batch_max_size > 1 and batch_linger_ms is None:
+            batch_linger_ms = DEFAULT_WEBHOOK_BATCH_LINGER_MS
         enabled = True if is_enabled is None else bool(is_enabled)
-        with self._lock:
+        with self._webhooks_lock:
             # 上限：enabled 且 target_url 合法的订阅数 >= 50 则拒绝新建
-            enabled_count = 0
-            for rec in self._webhook_subscriptions.values():
-                if not isinstance(rec, dict) or not rec.get("is_enabled"):
-                    continue
-                u = rec.get("target_url")
-                if isinstance(u, str) and (u or "").strip():
-                    enabled_count += 1
-            if enabled_count >= MAX_WEBHOOK_SUBSCRIPTIONS:
+            if len(self._enabled_webhook_subscription_ids) >= MAX_WEBHOOK_SUBSCRIPTIONS:
                 raise ValueError("too many webhook subscriptions")
             sub_id = f"sub_{uuid.uuid4().hex[:12]}"
             created_at = _iso_utc(time.time())
@@ -1473,60 +2096,79 @@ class JoyGateStore:
                 "is_enabled": enabled,
                 "created_at": created_at,
                 "secret": secret,
+                "batch_max_size": batch_max_size,
+                "batch_linger_ms": batch_linger_ms,
             }
             self._webhook_subscriptions[sub_id] = rec
-            return {
-                "subscription_id": rec.get("subscription_id"),
-                "target_url": rec.get("target_url"),
-                "event_types": list(rec.get("event_types") or []),
-                "is_enabled": rec.get("is_enabled"),
-                "created_at": rec.get("created_at"),
-            }
+            self._index_webhook_subscription_locked(rec)
+            if self._durable_outbox is not None:
+                self._durable_outbox.save_subscriptions(list(self._webhook_subscriptions.values()))
+            return self._webhook_subscription_public_view(rec)
 
     def list_webhook_subscriptions(self) -> list[dict[str, Any]]:
-        with self._lock:
+        with self._webhooks_lock:
             results: list[dict[str, Any]] = []
             for rec in self._webhook_subscriptions.values():
                 if not isinstance(rec, dict):
                     continue
-                results.append(
-                    {
-                        "subscription_id": rec.get("subscription_id"),
-                        "target_url": rec.get("target_url"),
-                        "event_types": list(rec.get("event_types") or []),
-                        "is_enabled": rec.get("is_enabled"),
-                        "created_at": rec.get("created_at"),
-                    }
-                )
+                results.append(self._webhook_subscription_public_view(rec))
             results.sort(key=lambda x: x.get("subscription_id") or "")
             return results
 
+    @staticmethod
+    def _webhook_subscription_public_view(rec: dict[str, Any]) -> dict[str, Any]:
+        """对外视图：不含 secret。"""
+        return {
+            "subscription_id": rec.get("subscription_id"),
+            "target_url": rec.get("target_url"),
+            "event_types": list(rec.get("event_types") or []),
+            "is_enabled": rec.get("is_enabled"),
+            "created_at": rec.get("created_at"),
+            "batch_max_size": rec.get("batch_max_size"),
+            "batch_linger_ms": rec.get("batch_linger_ms"),
+        }
+
+    def _index_webhook_subscription_locked(self, rec: dict[str, Any]) -> None:
+        """
+        须在 _webhooks_lock 内调用：订阅新建或 is_enabled / event_types / target_url 变更后调用，
+        刷新 event_type -> 订阅 倒排索引与 enabled 计数（先摘除旧项再按当前值挂回）。
+        """
+        sub_id = rec.get("subscription_id")
+        if not sub_id:
+            return
+        for event_type in list(self._webhook_targets_by_event):
+            bucket = self._webhook_targets_by_event[event_type]
+            if bucket.pop(sub_id, None) is not None and not bucket:
+                del self._webhook_targets_by_event[event_type]
+        self._enabled_webhook_subscription_ids.discard(sub_id)
+        target_url = rec.get("target_url")
+        if not rec.get("is_enabled") or not isinstance(target_url, str) or not target_url.strip():
+            return
+        self._enabled_webhook_subscription_ids.add(sub_id)
+        target = {"subscription_id": sub_id, "target_url": target_url, "secret": rec.get("secret")}
+        event_types = rec.get("event_types")
+        for event_type in event_types if isinstance(event_types, list) else []:
+            self._webhook_targets_by_event.setdefault(event_type, {})[sub_id] = target
+
     def list_enabled_webhook_targets_for_event(self, event_type: str) -> list[dict[str, Any]]:
         if not isinstance(event_type, str) or not event_type.strip():
             return []
-        with self._lock:
-            targets: list[dict[str, Any]] = []
-            for rec in self._webhook_subscriptions.values():
-                if not isinstance(rec, dict):
-                    continue
-                if not rec.get("is_enabled"):
-                    continue
-                event_types = rec.get("event_types")
-                if not isinstance(event_types, list):
-                    continue
-                if event_type not in event_types:
-                    continue
-                target_url = rec.get("target_url")
-                if not isinstance(target_url, str) or not target_url.strip():
+        return self.resolve_webhook_targets_for_events([event_type]).get(event_type, [])
+
+    def resolve_webhook_targets_for_events(self, event_types: Iterable[str]) -> dict[str, list[dict[str, Any]]]:
+        """
+        一次加锁为一批 event_type 查倒排索引，返回 {event_type: [{subscription_id, target_url, secret}]}
+        （只含 enabled 且 target_url 非空的订阅，按订阅创建序）；没有订阅的 event_type 不出现在结果中。
+        """
+        out: dict[str, list[dict[str, Any]]] = {}
+        with self._webhooks_lock:
+            for event_type in event_types:
+                if event_type in out or not isinstance(event_type, str):
                     continue
-                targets.append(
-                    {
-                        "subscription_id": rec.get("subscription_id"),
-                        "target_url": target_url,
-                        "secret": rec.get("secret"),
-                    }
-                )
-            return targets
+                bucket = self._webhook_targets_by_event.get(event_type)
+                if bucket:
+                    out[event_type] = [dict(t) for t in bucket.values()]
+        return out
 
     def _incident_public_view_locked(self, rec: dict[str, Any]) -> dict[str, Any]:
         evidence_refs = rec.get("evidence_refs")
@@ -1557,6 +2199,7 @@ class JoyGateStore:
         object_id: str,
         data: dict[str, Any],
     ) -> None:
+        """在产生事件的 domain 锁内调用；outbox 写入只取叶子锁 _webhooks_lock（调用方不得已持有它）。"""
         if event_type not in ALLOWED_WEBHOOK_EVENT_TYPES:
             return
         payload = {
@@ -1567,41 +2210,24 @@ class JoyGateStore:
             "object_id": object_id,
             "data": data,
         }
-        self._webhook_outbox.append(payload)
-        if len(self._webhook_outbox) > MAX_WEBHOOK_OUTBOX:
-            overflow = len(self._webhook_outbox) - MAX_WEBHOOK_OUTBOX
-            if overflow > 0:
-                del self._webhook_outbox[:overflow]
+        with self._webhooks_lock:
+            if self._durable_outbox is not None:
+                self._durable_outbox.append(payload)
+            else:
+                self._webhook_outbox.append(payload)
+            if len(self._webhook_outbox) > MAX_WEBHOOK_OUTBOX:
+                overflow = len(self._webhook_outbox) - MAX_WEBHOOK_OUTBOX
+                if overflow > 0:
+                    del self._webhook_outbox[:overflow]
+        self._stream_hub.publish(payload)
 
     def _cleanup_webhook_deliveries_locked(self, now: float) -> None:
-        retention = WEBHOOK_DELIVERY_RETENTION_SECONDS
-        if retention <= 0:
-            return
-        keep: list[dict[str, Any]] = []
-        for item in self._webhook_deliveries:
-            if not isinstance(item, dict):
-                continue
-            base_raw = item.get("updated_at") or item.get("created_at")
-            if not base_raw:
-                keep.append(item)
-                continue
-            try:
-                base_ts = datetime.strptime(base_raw, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp()
-            except (ValueError, TypeError):
-                keep.append(item)
-                continue
-            if (now - float(base_ts)) <= retention:
-                keep.append(item)
-        self._webhook_deliveries = keep
+        """须在 _webhooks_lock 内调用：按最后更新时刻清理超出保留期的 delivery（只弹出队头过期项）。"""
+        self._webhook_deliveries.expire(now, WEBHOOK_DELIVERY_RETENTION_SECONDS)
 
     def _has_webhook_delivery_locked(self, event_id: str, subscription_id: str) -> bool:
-        """仅内部使用，须在锁内调用。若已存在相同 event_id+subscription_id 的 delivery 则返回 True。"""
-        for item in self._webhook_deliveries:
-            if not isinstance(item, dict):
-                continue
-            if item.get("event_id") == event_id and item.get("subscription_id") == subscription_id:
-                return True
-        return False
+        """仅内部使用，须在 _webhooks_lock 内调用。若已存在相同 event_id+subscription_id 的 delivery 则返回 True。"""
+        return self._webhook_deliveries.find(event_id, subscription_id) is not None
 
     def _create_webhook_delivery_locked(self, event: dict[str, Any], subscription_id: str, target_url: str) -> str:
         delivery_id = f"del_{uuid.uuid4().hex[:12]}"
@@ -1620,12 +2246,12 @@ class JoyGateStore:
             "updated_at": _iso_utc(now),
             "delivered_at": None,
         }
-        self._webhook_deliveries.append(rec)
+        self._webhook_deliveries.add(rec, now)
         self._cleanup_webhook_deliveries_locked(now)
         return delivery_id
 
     def create_webhook_delivery(self, event: dict[str, Any], subscription_id: str, target_url: str) -> str:
-        with self._lock:
+        with self._webhooks_lock:
             return self._create_webhook_delivery_locked(event, subscription_id, target_url)
 
     def create_webhook_delivery_if_absent(
@@ -1633,9 +2259,11 @@ class JoyGateStore:
     ) -> str | None:
         """若已存在相同 event_id+subscription_id 的 delivery 则返回 None，否则创建并返回 delivery_id。"""
         event_id = event.get("event_id") if isinstance(event.get("event_id"), str) else None
-        with self._lock:
+        with self._webhooks_lock:
             if event_id and self._has_webhook_delivery_locked(event_id, subscription_id):
                 return None
+            if event_id and self._durable_outbox is not None:
+                self._durable_outbox.add_pending(event_id)
             return self._create_webhook_delivery_locked(event, subscription_id, target_url)
 
     def process_webhook_delivery(
@@ -1647,24 +2275,135 @@ class JoyGateStore:
         timeout: int,
         max_attempts: int,
         backoff: int,
+        body: bytes | None = None,
     ) -> None:
-        result = send_webhook_with_retry(
+        """
+        body 为 event 预先序列化的 bytes（dispatch 每个 event 只序列化一次，各订阅与重试共用）；缺省时在此序列化。
+        交给进程级投递引擎后立即返回；每次尝试的结果经 _record_webhook_attempt 回写（重试期间保持 PENDING）。
+        订阅开启批量时按订阅攒批（batch_key 为 subscription_id）。
+        订阅熔断打开时不提交：停放到该订阅的 parked 队列（delivery 保持 PENDING，last_error=circuit_open），
+        由 release_parked_webhook_deliveries 在探测到期 / 熔断关闭后重新提交；引擎内的重试同样先过熔断。
+        """
+        event_id = event.get("event_id") if isinstance(event.get("event_id"), str) else None
+        attempts = max_attempts if max_attempts >= 1 else 1
+        if body is None:
+            body = serialize_webhook_body(event)
+        batch_key: str | None = None
+        batch_max_size = 1
+        batch_linger_ms = 0
+        with self._webhooks_lock:
+            item = self._webhook_deliveries.get(delivery_id)
+            sub_id = item.get("subscription_id") if item is not None else None
+            sub = self._webhook_subscriptions.get(sub_id) if sub_id else None
+            if sub is not None and (sub.get("batch_max_size") or 1) > 1:
+                batch_key = sub.get("subscription_id")
+                batch_max_size = int(sub.get("batch_max_size"))
+                batch_linger_ms = int(sub.get("batch_linger_ms") or 0)
+            breaker = self._webhook_breakers.get(sub_id) if sub_id else None
+            if breaker is not None and breaker.state != BREAKER_CLOSED and not breaker.probe_due(time.monotonic()):
+                self._park_webhook_delivery_locked(
+                    sub_id, (delivery_id, target_url, secret, event, timeout, attempts, backoff, body), time.time()
+                )
+                return
+
+        def _admit() -> bool:
+            with self._webhooks_lock:
+                return self._webhook_breaker_locked(sub_id).allow(time.monotonic())
+
+        def _park(used_attempts: int) -> None:
+            entry = (delivery_id, target_url, secret, event, timeout, max(1, attempts - used_attempts), backoff, body)
+            with self._webhooks_lock:
+                self._park_webhook_delivery_locked(sub_id, entry, time.time())
+
+        get_webhook_delivery_engine().submit(
             target_url,
             secret,
-            event,
+            body,
             timeout,
-            max_attempts if max_attempts >= 1 else 1,
+            attempts,
             backoff,
-            allow_http=JOYGATE_WEBHOOK_ALLOW_HTTP,
-            allow_localhost=JOYGATE_WEBHOOK_ALLOW_LOCALHOST,
+            lambda result, final: self._record_webhook_attempt(delivery_id, result, final, event_id, sub_id),
+            batch_key=batch_key,
+            batch_max_size=batch_max_size,
+            batch_linger=batch_linger_ms / 1000.0,
+            admit=_admit if sub_id else None,
+            on_park=_park if sub_id else None,
         )
+
+    def _webhook_breaker_locked(self, subscription_id: str) -> WebhookCircuitBreaker:
+        breaker = self._webhook_breakers.get(subscription_id)
+        if breaker is None:
+            breaker = WebhookCircuitBreaker(
+                WEBHOOK_BREAKER_FAILURE_THRESHOLD, WEBHOOK_BREAKER_OPEN_SECONDS, WEBHOOK_BREAKER_MAX_OPEN_SECONDS
+            )
+            self._webhook_breakers[subscription_id] = breaker
+        return breaker
+
+    def _park_webhook_delivery_locked(self, subscription_id: str, entry: tuple, now: float) -> None:
+        """须在 _webhooks_lock 内调用：停放一条 delivery；队列超上限时最老的一条直接 FAILED（circuit_open）。"""
+        queue = self._webhook_parked.setdefault(subscription_id, deque())
+        queue.append(entry)
+        item = self._webhook_deliveries.get(entry[0])
+        if item is not None:
+            item["last_error"] = "circuit_open"
+            item["updated_at"] = _iso_utc(now)
+            self._webhook_deliveries.touch(entry[0], now)
+        while len(queue) > MAX_WEBHOOK_PARKED_PER_SUBSCRIPTION:
+            dropped = queue.popleft()
+            event_id = dropped[3].get("event_id") if isinstance(dropped[3], dict) else None
+            if isinstance(event_id, str) and self._durable_outbox is not None:
+                self._durable_outbox.release(event_id)
+            old = self._webhook_deliveries.get(dropped[0])
+            if old is not None:
+                old["delivery_status"] = "FAILED"
+                old["last_error"] = "circuit_open"
+                old["delivered_at"] = None
+                old["updated_at"] = _iso_utc(now)
+                self._webhook_deliveries.touch(dropped[0], now)
+
+    def release_parked_webhook_deliveries(self) -> int:
+        """
+        熔断已关闭的订阅：停放的 delivery 全部重新提交；熔断冷却到期的订阅：只提交一条作探测。
+        后台调度器每轮派发前调用，探测成功时 _record_webhook_attempt 也会立即调用。返回提交数。
+        """
+        now = time.monotonic()
+        entries: list[tuple] = []
+        with self._webhooks_lock:
+            for sub_id, queue in list(self._webhook_parked.items()):
+                breaker = self._webhook_breakers.get(sub_id)
+                if breaker is None or breaker.state == BREAKER_CLOSED:
+                    entries.extend(queue)
+                    queue.clear()
+                elif breaker.probe_due(now):
+                    entries.append(queue.popleft())
+                if not queue:
+                    del self._webhook_parked[sub_id]
+        for entry in entries:
+            self.process_webhook_delivery(*entry)
+        return len(entries)
+
+    def _record_webhook_attempt(
+        self,
+        delivery_id: str,
+        result: dict[str, Any],
+        final: bool,
+        event_id: str | None = None,
+        subscription_id: str | None = None,
+    ) -> None:
         now = time.time()
-        with self._lock:
-            for item in self._webhook_deliveries:
-                if not isinstance(item, dict):
-                    continue
-                if item.get("delivery_id") != delivery_id:
-                    continue
+        recovered = False
+        with self._webhooks_lock:
+            if subscription_id and not result.get("batch_member"):
+                breaker = self._webhook_breaker_locked(subscription_id)
+                was_half_open = breaker.state == BREAKER_HALF_OPEN
+                breaker.record(
+                    bool(result.get("delivered")), result.get("latency_ms"), time.monotonic(), result.get("last_error")
+                )
+                recovered = was_half_open and breaker.state == BREAKER_CLOSED
+            if final and event_id and self._durable_outbox is not None:
+                self._durable_outbox.release(event_id)
+            item = self._webhook_deliveries.get(delivery_id)
+            if item is not None:
                 item["attempts"] = result.get("attempts")
                 item["last_status_code"] = result.get("last_status_code")
                 item["last_error"] = result.get("last_error")
@@ -1672,42 +2411,65 @@ class JoyGateStore:
                 if result.get("delivered"):
                     item["delivery_status"] = "DELIVERED"
                     item["delivered_at"] = item.get("delivered_at") or _iso_utc(now)
-                else:
+                elif final:
                     item["delivery_status"] = "FAILED"
                     item["delivered_at"] = None
-                break
+                self._webhook_deliveries.touch(delivery_id, now)
             self._cleanup_webhook_deliveries_locked(now)
+        if recovered:
+            self.release_parked_webhook_deliveries()
+
+    def webhook_stats(self) -> dict[str, Any]:
+        """每个订阅的熔断状态 / 成功失败数 / 耗时 EWMA / 停放数，以及 outbox 积压（供 /v1/webhooks/stats）。"""
+        now = time.monotonic()
+        with self._webhooks_lock:
+            items: list[dict[str, Any]] = []
+            for sub_id, rec in self._webhook_subscriptions.items():
+                breaker = self._webhook_breakers.get(sub_id)
+                health = (breaker or WebhookCircuitBreaker(1, 0.0, 0.0)).snapshot(now)
+                parked = self._webhook_parked.get(sub_id)
+                items.append({
+                    "subscription_id": sub_id,
+                    "target_url": rec.get("target_url"),
+                    "is_enabled": rec.get("is_enabled"),
+                    **health,
+                    "parked": len(parked) if parked else 0,
+                })
+            items.sort(key=lambda x: x["subscription_id"])
+            backlog = self._durable_outbox.backlog() if self._durable_outbox is not None else len(self._webhook_outbox)
+            return {
+                "subscriptions": items,
+                "parked_total": sum(len(q) for q in self._webhook_parked.values()),
+                "outbox_backlog": backlog,
+            }
 
-    def list_webhook_deliveries(self) -> list[dict[str, Any]]:
-        with self._lock:
+    def list_webhook_deliveries(
+        self, event_id: str | None = None, subscription_id: str | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        最近 50 条 delivery；给定 event_id（可再加 subscription_id）时只返回该 event 的。
+        归档后端下按 event 查询还会合并库里的记录（含已过内存保留期的），同一 delivery 以内存中的为准。
+        """
+        with self._webhooks_lock:
             now = time.time()
             self._cleanup_webhook_deliveries_locked(now)
-            items = list(self._webhook_deliveries)
-            items.sort(key=lambda x: x.get("created_at") or "", reverse=True)
-            results: list[dict[str, Any]] = []
-            for item in items[:50]:
-                if not isinstance(item, dict):
-                    continue
-                results.append(
-                    {
-                        "delivery_id": item.get("delivery_id"),
-                        "event_id": item.get("event_id"),
-                        "event_type": item.get("event_type"),
-                        "subscription_id": item.get("subscription_id"),
-                        "target_url": item.get("target_url"),
-                        "delivery_status": item.get("delivery_status"),
-                        "attempts": item.get("attempts"),
-                        "last_status_code": item.get("last_status_code"),
-                        "last_error": item.get("last_error"),
-                        "created_at": item.get("created_at"),
-                        "updated_at": item.get("updated_at"),
-                        "delivered_at": item.get("delivered_at"),
-                    }
-                )
-            return results
+            if event_id is None:
+                items = self._webhook_deliveries.latest(MAX_WEBHOOK_DELIVERIES_LISTED)
+            else:
+                items = self._webhook_deliveries.for_event(event_id, subscription_id)[:MAX_WEBHOOK_DELIVERIES_LISTED]
+            results = [_webhook_delivery_out(item) for item in items]
+        state_log = self._state_log
+        if event_id is not None and len(results) < MAX_WEBHOOK_DELIVERIES_LISTED and state_log is not None and state_log.archives:
+            seen = {r["delivery_id"] for r in results}
+            for item in state_log.archived_deliveries(event_id, subscription_id, MAX_WEBHOOK_DELIVERIES_LISTED):
+                if item.get("delivery_id") not in seen and len(results) < MAX_WEBHOOK_DELIVERIES_LISTED:
+                    results.append(_webhook_delivery_out(item))
+        return results
 
     def drain_webhook_outbox(self) -> list[dict[str, Any]]:
-        with self._lock:
+        with self._webhooks_lock:
+            if self._durable_outbox is not None:
+                return self._durable_outbox.read(MAX_WEBHOOK_OUTBOX)
             items = list(self._webhook_outbox)
             self._webhook_outbox.clear()
             return items
@@ -1716,13 +2478,150 @@ class JoyGateStore:
         """塞回未派发的 event，保持顺序（下次 drain 先取到）。内部用，不进 FIELD_REGISTRY。"""
         if not isinstance(events, list) or not events:
             return
-        with self._lock:
+        with self._webhooks_lock:
+            if self._durable_outbox is not None:
+                self._durable_outbox.rewind(events)
+                return
             self._webhook_outbox = list(events) + self._webhook_outbox
             if len(self._webhook_outbox) > MAX_WEBHOOK_OUTBOX:
                 self._webhook_outbox = self._webhook_outbox[:MAX_WEBHOOK_OUTBOX]
 
+    def mark_webhook_event_dispatched(self, event_id: str | None) -> None:
+        """event 的 delivery 都已建好（或无订阅）后调用；磁盘 outbox 据此在 delivery 全部终态后推进消费位点。内存模式无操作。"""
+        if not isinstance(event_id, str) or self._durable_outbox is None:
+            return
+        with self._webhooks_lock:
+            self._durable_outbox.mark_dispatched(event_id)
+
+    def sync_webhook_outbox(self) -> None:
+        """磁盘 outbox：fsync 未落盘的追加并写 checkpoint（后台调度器每轮派发后调用）。"""
+        if self._durable_outbox is None:
+            return
+        with self._webhooks_lock:
+            self._durable_outbox.sync()
+
+    def close_webhook_outbox(self) -> None:
+        """进程退出 / sandbox 回收时调用：落盘并关闭 segment 文件。"""
+        if self._durable_outbox is None:
+            return
+        with self._webhooks_lock:
+            self._durable_outbox.close()
+
+    def webhook_outbox_backlog(self) -> int:
+        """尚未投递完的 event 数（内存模式为 outbox 长度）。"""
+        with self._webhooks_lock:
+            if self._durable_outbox is not None:
+                return self._durable_outbox.backlog()
+            return len(self._webhook_outbox)
+
+    # ---------- 状态持久化（WAL + 快照；未启用时以下方法为空操作） ----------
+
+    def _state_sources(self) -> list[tuple[Any, dict[str, Callable[[str], Any]]]]:
+        """(domain 锁, {表名: 取行函数})；同一把锁下的表在一次加锁内取，charger 与 hold 互相一致。"""
+        return [
+            (self._charging_lock, {SNAPSHOT_KIND_CHARGER: self._slots.get, SNAPSHOT_KIND_HOLD: self._holds.get}),
+            (
+                self._incidents_lock,
+                {
+                    STATE_TABLE_INCIDENT: self._incidents.get,
+                    STATE_TABLE_WITNESS: lambda incident_id: _witness_tally_row(self._witness_by_incident.get(incident_id)),
+                },
+            ),
+            (
+                self._hazards_lock,
+                {
+                    SNAPSHOT_KIND_HAZARD: self._hazards_by_segment.get,
+                    STATE_TABLE_SEGMENT_WITNESS: self._witness_by_segment.get,
+                },
+            ),
+            (self._telemetry_lock, {SNAPSHOT_KIND_SIGNAL: self._segment_passed.get}),
+            (
+                self._reputation_lock,
+                {STATE_TABLE_REPUTATION: self._reputation_by_joykey.get, STATE_TABLE_VENDOR: self._vendor_scores.get},
+            ),
+            (self._webhooks_lock, {STATE_TABLE_DELIVERY: self._webhook_deliveries.get}),
+        ]
+
+    def _resolve_state_rows(self, lookups: dict[str, list[str]]) -> dict[str, dict[str, Any]]:
+        """
+        state log flush 回调：在各 domain 锁内复制脏 key 的当前行（不存在为 None），序列化由 state log 在锁外完成，
+        reserve 等请求不等 JSON 编码。每批最多 STATE_RESOLVE_BATCH 行后释放锁；批间可能有新修改，其 key 已重新登记，
+        由下一次 flush 覆盖。
+        """
+        out: dict[str, dict[str, Any]] = {}
+        for lock, getters in self._state_sources():
+            items = [(table, key) for table in getters if table in lookups for key in lookups[table]]
+            for start in range(0, len(items), STATE_RESOLVE_BATCH):
+                with lock:
+                    for table, key in items[start : start + STATE_RESOLVE_BATCH]:
+                        row = getters[table](key)
+                        out.setdefault(table, {})[key] = None if row is None else _copy_state_row(row)
+        return out
+
+    def _restore_state_tables(self, tables: dict[str, dict[str, Any]]) -> None:
+        """
+        __init__ 内调用（尚未对外可见，不加锁）：用恢复出的表重建内存结构与派生索引（hold 过期堆、incident 索引与 SLA 堆、SOFT 复核堆）；
+        witness 计票与去重表一并恢复，重启后同一 witness / points_event_id 的重放仍按已投处理。
+        """
+        for charger_id, slot in tables.get(SNAPSHOT_KIND_CHARGER, {}).items():
+            if charger_id in self._slots and isinstance(slot, dict):
+                self._slots[charger_id] = slot
+        for hold_id, rec in tables.get(SNAPSHOT_KIND_HOLD, {}).items():
+            slot = self._slots.get(rec.get("charger_id"))
+            if slot is None or slot.get("hold_id") != hold_id:  # 崩溃时 charger / hold 不在同一批：以槽位为准
+                continue
+            self._holds[hold_id] = rec
+            self._joykey_to_hold_id[rec["joykey"]] = hold_id
+            self._push_hold_expiry_locked(rec["expires_at"], hold_id)
+        for charger_id, slot in self._slots.items():
+            if slot.get("hold_id") is not None and slot["hold_id"] not in self._holds:
+                self._slots[charger_id] = {"slot_state": SLOT_STATE_FREE, "hold_id": None, "joykey": None}
+        for rec in tables.get(STATE_TABLE_INCIDENT, {}).values():
+            self._incidents.add(rec)
+            if rec.get("incident_status") == "OPEN":
+                push_witness_sla_deadline(self._incident_sla_heap, rec, WITNESS_SLA_TIMEOUT_MINUTES)
+        for incident_id, row in tables.get(STATE_TABLE_WITNESS, {}).items():
+            if self._incidents.get(incident_id) is not None:
+                self._witness_by_incident[incident_id] = _witness_tally_from_row(row)
+        self._hazards_by_segment.update(tables.get(SNAPSHOT_KIND_HAZARD, {}))
+        self._rebuild_soft_recheck_heap_locked()
+        self._witness_by_segment.update(tables.get(STATE_TABLE_SEGMENT_WITNESS, {}))
+        self._segment_witness_events = sorted(
+            tables.get(STATE_TABLE_SEGMENT_WITNESS_EVENT, {}).values(), key=lambda e: e.get("ts") or 0
+        )
+        self._segment_passed.update(tables.get(SNAPSHOT_KIND_SIGNAL, {}))
+        self._reputation_by_joykey.update(tables.get(STATE_TABLE_REPUTATION, {}))
+        self._vendor_scores.update(tables.get(STATE_TABLE_VENDOR, {}))
+        for jk, rep in self._reputation_by_joykey.items():
+            self._index_rep_score_locked(jk, rep, None)
+        self._score_events = list(tables.get(STATE_TABLE_SCORE_EVENT, {}).values())[-MAX_SCORE_EVENTS:]
+        self._score_event_ids = {e.get("score_event_id") or "" for e in self._score_events}
+        self._decisions = list(tables.get(STATE_TABLE_DECISION, {}).values())[-MAX_DECISIONS:]
+
+    def flush_state_log(self) -> int:
+        """group commit：把已登记的修改写入 WAL 并 fsync（后台调度器周期调用），返回写入记录数。"""
+        if self._state_log is None:
+            return 0
+        return self._state_log.flush(self._resolve_state_rows)
+
+    def compact_state_log(self, force: bool = False) -> bool:
+        """WAL 累计够多（或 force）时折叠成新快照并删除旧 segment；不持有 store 锁。"""
+        if self._state_log is None:
+            return False
+        return self._state_log.compact(force)
+
+    def close_state_log(self) -> None:
+        """进程退出 / sandbox 回收时调用：flush 剩余修改并关闭 segment 文件。"""
+        if self._state_log is None:
+            return
+        self._state_log.flush(self._resolve_state_rows)
+        self._state_log.close()
+
+    def state_log_stats(self) -> dict[str, int] | None:
+        return self._state_log.stats() if self._state_log is not None else None
+
     def _ensure_rep_locked(self, joykey: str, now: float) -> dict[str, Any]:
-        """M16：在 _lock 内确保 joykey 存在 reputation 记录，不存在则创建默认（robot_score=60, tier, vote_weight, risk_flag=NONE）。"""
+        """M16：在 _reputation_lock 内确保 joykey 存在 reputation 记录，不存在则创建默认（robot_score=60, tier, vote_weight, risk_flag=NONE）。"""
         if joykey not in self._reputation_by_joykey:
             vendor = _get_vendor_for_joykey(joykey)
             self._reputation_by_joykey[joykey] = {
@@ -1733,8 +2632,26 @@ class JoyGateStore:
                 "robot_score_updated_at": _iso_utc(now),
                 "vendor": vendor,
             }
+            self._index_rep_score_locked(joykey, self._reputation_by_joykey[joykey], None)
         return self._reputation_by_joykey[joykey]
 
+    def _index_rep_score_locked(self, joykey: str, rep: dict[str, Any], before: Any) -> str:
+        """
+        M16：在 _reputation_lock 内把 rep 当前 robot_score 同步到票权视图与厂商聚合；before 为变更前 robot_score（新记录传 None）。
+        返回该 rep 所属厂商。
+        """
+        vendor = rep.get("vendor") or _get_vendor_for_joykey(joykey) or "unknown"
+        score = _int_or_default(rep.get("robot_score"), NEUTRAL_ROBOT_SCORE)
+        totals = self._vendor_robot_totals.setdefault(vendor, [0, 0])
+        if before is None:
+            totals[0] += score
+            totals[1] += 1
+        else:
+            totals[0] += score - _int_or_default(before, NEUTRAL_ROBOT_SCORE)
+        if joykey in JOYKEY_TO_POINTS:
+            self._witness_points[joykey] = score
+        return vendor
+
     def _apply_score_event_locked(
         self,
         score_event_id: str,
@@ -1746,7 +2663,7 @@ class JoyGateStore:
         evidence_refs: list[str] | None,
         now: float,
     ) -> None:
-        """M16：在 _lock 内应用一条计分事件（幂等；已存在 score_event_id 则 return）。"""
+        """M16：在 _reputation_lock 内应用一条计分事件（幂等；已存在 score_event_id 则 return）。"""
         if score_event_id in self._score_event_ids:
             return
         self._score_event_ids.add(score_event_id)
@@ -1756,6 +2673,7 @@ class JoyGateStore:
         before_score = _clamp_score(before_score)
         after_score = _clamp_score(before_score + float(delta_points))
         rep["robot_score"] = after_score
+        vendor = self._index_rep_score_locked(joykey, rep, raw)
         rep["robot_tier"] = _tier_for_score(after_score)
         rep["vote_weight"] = after_score / 100.0
         rep["robot_score_updated_at"] = _iso_utc(now)
@@ -1770,30 +2688,30 @@ class JoyGateStore:
             "occurred_at": _iso_utc(now),
         }
         self._score_events.append(event_record)
+        state_log = self._state_log
+        if state_log is not None:
+            state_log.touch(STATE_TABLE_REPUTATION, joykey)
+            state_log.put(STATE_TABLE_SCORE_EVENT, score_event_id, event_record)
         while len(self._score_events) > MAX_SCORE_EVENTS:
             old = self._score_events.pop(0)
             self._score_event_ids.discard(old.get("score_event_id") or "")
-        vendor_robot_scores: dict[str, list[int]] = {}
-        for jk, r in self._reputation_by_joykey.items():
-            v = r.get("vendor") or _get_vendor_for_joykey(jk)
-            if v is None:
-                v = "unknown"
-            if v not in vendor_robot_scores:
-                vendor_robot_scores[v] = []
-            vendor_robot_scores[v].append(_int_or_default(r.get("robot_score"), NEUTRAL_ROBOT_SCORE))
-        for v, scores in vendor_robot_scores.items():
-            avg = round(sum(scores) / len(scores)) if scores else NEUTRAL_ROBOT_SCORE
-            ops = 60
-            if v in self._vendor_scores and isinstance(self._vendor_scores[v].get("vendor_score_ops"), (int, float)):
-                ops = int(self._vendor_scores[v]["vendor_score_ops"])
-            total = round(0.5 * avg + 0.5 * ops)
-            self._vendor_scores[v] = {
-                "fleet_id": v,
-                "vendor_score_robot_mapped": _clamp_score(avg),
-                "vendor_score_ops": ops,
-                "vendor_score_total": _clamp_score(total),
-                "updated_at": _iso_utc(now),
-            }
+            if state_log is not None:
+                state_log.put(STATE_TABLE_SCORE_EVENT, old.get("score_event_id") or "", None)
+        score_sum, robot_count = self._vendor_robot_totals[vendor]
+        avg = round(score_sum / robot_count) if robot_count else NEUTRAL_ROBOT_SCORE
+        ops = 60
+        if vendor in self._vendor_scores and isinstance(self._vendor_scores[vendor].get("vendor_score_ops"), (int, float)):
+            ops = int(self._vendor_scores[vendor]["vendor_score_ops"])
+        total = round(0.5 * avg + 0.5 * ops)
+        self._vendor_scores[vendor] = {
+            "fleet_id": vendor,
+            "vendor_score_robot_mapped": _clamp_score(avg),
+            "vendor_score_ops": ops,
+            "vendor_score_total": _clamp_score(total),
+            "updated_at": _iso_utc(now),
+        }
+        if state_log is not None:
+            state_log.touch(STATE_TABLE_VENDOR, vendor)
 
     def witness_respond(
         self,
@@ -1807,93 +2725,146 @@ class JoyGateStore:
     ) -> None:
         """
         M8 witness 桩占用投票：同一 witness_joykey 对同一 incident 只能投一次；points_event_id 仅用于网络重放幂等。
-        在 _lock 内：charger_state 校验、先按 witness_joykey 去重再按 points_event_id 去重，计票后合并 evidence_refs，
+        在 _incidents_lock 内：charger_state 校验、先按 witness_joykey 去重再按 points_event_id 去重，计票后合并 evidence_refs，
         upsert ai_insights WITNESS_TALLY，达阈值将 incident_status 推进为 EVIDENCE_CONFIRMED。
-        M16：用 _reputation_by_joykey 的 robot_score 覆盖票权（joykey_to_points_runtime）；非 EVIDENCE_CONFIRMED→EVIDENCE_CONFIRMED 时记分。
+        M16：票权取自增量维护的 _witness_points（有 reputation 记录时即 robot_score）；非 EVIDENCE_CONFIRMED→EVIDENCE_CONFIRMED 时记分。
+        票权在 _reputation_lock 内只读本 witness 一项（与车队/incident 规模无关）；记分在 _incidents_lock 内嵌套 _reputation_lock（符合锁顺序）。
         找不到 incident -> KeyError；charger_id 不一致或 charger_state 非法 -> ValueError；非白名单机器人 -> PermissionError。
         """
-        incident_id = _norm_required_str("incident_id", incident_id, MAX_INCIDENT_ID_LEN)
-        charger_id = _norm_required_str("charger_id", charger_id, MAX_CHARGER_ID_LEN)
-        charger_state = _norm_required_str("charger_state", charger_state, MAX_ID_LEN)
-        points_event_id = _norm_optional_str("points_event_id", points_event_id, MAX_POINTS_EVENT_ID_LEN)
-        obstacle_type = _norm_optional_str("obstacle_type", obstacle_type, MAX_ID_LEN)
-        evidence_refs = _normalize_evidence_refs(evidence_refs)
+        vote = _norm_witness_vote(incident_id, charger_id, charger_state, obstacle_type, evidence_refs, points_event_id)
+        witness_joykey = self._norm_witness_joykey(witness_joykey)
+        with self._reputation_lock:
+            witness_points = self._witness_points.get(witness_joykey, 0)
+        with self._incidents_lock:
+            self._witness_vote_locked(witness_joykey, witness_points, *vote)
+
+    def witness_respond_batch(self, witness_joykey: str, votes: list[dict[str, Any]]) -> list[Exception | None]:
+        """
+        批量 witness 桩占用投票（同一 witness_joykey 的多条观察）：逐条语义与 witness_respond 相同、按顺序应用，整批只取一次 _incidents_lock。
+        votes 每项含 incident_id / charger_id / charger_state / obstacle_type / evidence_refs / points_event_id。
+        返回与 votes 等长的逐条结果：None 为成功，否则为该条的 KeyError / ValueError（不影响其余条目）；非白名单机器人 -> PermissionError（整批拒绝）。
+        """
+        witness_joykey = self._norm_witness_joykey(witness_joykey)
+        results: list[Exception | None] = [None] * len(votes)
+        normalized: list[tuple[int, tuple[str, str, str, str | None, list[str], str | None]]] = []
+        for i, v in enumerate(votes):
+            try:
+                normalized.append((
+                    i,
+                    _norm_witness_vote(
+                        v.get("incident_id"),
+                        v.get("charger_id"),
+                        v.get("charger_state"),
+                        v.get("obstacle_type"),
+                        v.get("evidence_refs"),
+                        v.get("points_event_id"),
+                    ),
+                ))
+            except ValueError as e:
+                results[i] = e
+        with self._reputation_lock:
+            witness_points = self._witness_points.get(witness_joykey, 0)
+        with self._incidents_lock:
+            for i, vote in normalized:
+                try:
+                    if self._witness_vote_locked(witness_joykey, witness_points, *vote):
+                        # 本批前面的条目触发了记分，后续条目按更新后的票权计（与逐条调用一致）
+                        with self._reputation_lock:
+                            witness_points = self._witness_points.get(witness_joykey, 0)
+                except (KeyError, ValueError) as e:
+                    results[i] = e
+        return results
+
+    @staticmethod
+    def _norm_witness_joykey(witness_joykey: str | None) -> str:
+        """M8：witness 身份校验；非白名单机器人 -> PermissionError。"""
         witness_joykey = (witness_joykey or "").strip()
         if not witness_joykey or witness_joykey not in ALLOWED_WITNESS_JOYKEYS:
             raise PermissionError("witness not allowed")
+        return witness_joykey
 
-        with self._lock:
-            rec_before = find_incident_by_id(self._incidents, incident_id)
-            if rec_before is None:
-                raise KeyError(f"incident not found: {incident_id}")
-            prev_status = rec_before.get("incident_status")
-            joykey_to_points_runtime = dict(JOYKEY_TO_POINTS)
-            for jk, rep in self._reputation_by_joykey.items():
-                if isinstance(rep, dict) and jk in joykey_to_points_runtime:
-                    joykey_to_points_runtime[jk] = _int_or_default(rep.get("robot_score"), NEUTRAL_ROBOT_SCORE)
-            witness_respond_locked(
-                self._incidents,
-                self._witness_by_incident,
-                incident_id,
-                charger_id,
-                charger_state,
-                obstacle_type,
-                evidence_refs,
-                points_event_id,
-                witness_joykey,
-                {"FREE", "OCCUPIED", "UNKNOWN_OCCUPANCY"},
-                JOYKEY_TO_VENDOR,
-                joykey_to_points_runtime,
-                WITNESS_VENDOR_DECAY_GAMMA,
-                WITNESS_MIN_DISTINCT_VENDORS,
-                WITNESS_SCORE_REQUIRED,
-                WITNESS_SCORE_REQUIRED_SINGLE_VENDOR,
-                WITNESS_MIN_DISTINCT_VENDORS_RISKY,
-                WITNESS_SCORE_REQUIRED_RISKY,
-                WITNESS_MIN_MARGIN_RISKY,
-                WITNESS_CERTIFIED_POINTS_THRESHOLD,
-                WITNESS_MIN_CERTIFIED_SUPPORT_RISKY,
-            )
-            rec_after = find_incident_by_id(self._incidents, incident_id)
-            if rec_after is None:
-                raise KeyError(f"incident not found: {incident_id}")
-            new_status = rec_after.get("incident_status")
-            now2 = time.time()
-            if prev_status != "EVIDENCE_CONFIRMED" and new_status == "EVIDENCE_CONFIRMED":
-                w = self._witness_by_incident.get(incident_id)
-                seen = w.get("seen_witness_joykeys") if isinstance(w, dict) else None
-                if isinstance(seen, set):
-                    joykeys_to_score = list(seen)
-                elif isinstance(seen, dict):
-                    joykeys_to_score = list(seen.keys())
-                elif isinstance(seen, list):
-                    joykeys_to_score = list(seen)
-                else:
-                    joykeys_to_score = [witness_joykey]
-                snapshot_ref = (rec_after.get("snapshot_ref") or "").strip() or None
-                ev_refs_raw = rec_after.get("evidence_refs")
-                ev_refs = _normalize_evidence_refs(ev_refs_raw if isinstance(ev_refs_raw, list) else None)
-                for jk in joykeys_to_score:
-                    if not jk or not isinstance(jk, str):
-                        continue
-                    if jk not in ALLOWED_WITNESS_JOYKEYS:
-                        continue
-                    raw = hashlib.sha256(f"m16:witness_verified:{incident_id}:{jk}".encode()).hexdigest()[:12]
-                    score_event_id = f"se_{raw}"
-                    self._apply_score_event_locked(
-                        score_event_id,
-                        "WITNESS_VOTE_VERIFIED",
-                        jk,
-                        SCORE_DELTA_WITNESS_VERIFIED,
-                        incident_id,
-                        snapshot_ref,
-                        ev_refs,
-                        now2,
-                    )
+    def _witness_vote_locked(
+        self,
+        witness_joykey: str,
+        witness_points: int,
+        incident_id: str,
+        charger_id: str,
+        charger_state: str,
+        obstacle_type: str | None,
+        evidence_refs: list[str],
+        points_event_id: str | None,
+    ) -> bool:
+        """在 _incidents_lock 内应用一条已规范化的 witness 投票；本票使 incident 进入 EVIDENCE_CONFIRMED 并记分时返回 True。"""
+        rec_before = find_incident_by_id(self._incidents, incident_id)
+        if rec_before is None:
+            raise KeyError(f"incident not found: {incident_id}")
+        prev_status = rec_before.get("incident_status")
+        witness_respond_locked(
+            self._incidents,
+            self._witness_by_incident,
+            incident_id,
+            charger_id,
+            charger_state,
+            obstacle_type,
+            evidence_refs,
+            points_event_id,
+            witness_joykey,
+            {"FREE", "OCCUPIED", "UNKNOWN_OCCUPANCY"},
+            JOYKEY_TO_VENDOR,
+            witness_points,
+            WITNESS_VENDOR_DECAY_GAMMA,
+            WITNESS_MIN_DISTINCT_VENDORS,
+            WITNESS_SCORE_REQUIRED,
+            WITNESS_SCORE_REQUIRED_SINGLE_VENDOR,
+            WITNESS_MIN_DISTINCT_VENDORS_RISKY,
+            WITNESS_SCORE_REQUIRED_RISKY,
+            WITNESS_MIN_MARGIN_RISKY,
+            WITNESS_CERTIFIED_POINTS_THRESHOLD,
+            WITNESS_MIN_CERTIFIED_SUPPORT_RISKY,
+        )
+        rec_after = find_incident_by_id(self._incidents, incident_id)
+        if rec_after is None:
+            raise KeyError(f"incident not found: {incident_id}")
+        new_status = rec_after.get("incident_status")
+        if prev_status == "EVIDENCE_CONFIRMED" or new_status != "EVIDENCE_CONFIRMED":
+            return False
+        now2 = time.time()
+        w = self._witness_by_incident.get(incident_id)
+        seen = w.get("seen_witness_joykeys") if isinstance(w, dict) else None
+        if isinstance(seen, set):
+            joykeys_to_score = list(seen)
+        elif isinstance(seen, dict):
+            joykeys_to_score = list(seen.keys())
+        elif isinstance(seen, list):
+            joykeys_to_score = list(seen)
+        else:
+            joykeys_to_score = [witness_joykey]
+        snapshot_ref = (rec_after.get("snapshot_ref") or "").strip() or None
+        ev_refs_raw = rec_after.get("evidence_refs")
+        ev_refs = _normalize_evidence_refs(ev_refs_raw if isinstance(ev_refs_raw, list) else None)
+        with self._reputation_lock:
+            for jk in joykeys_to_score:
+                if not jk or not isinstance(jk, str):
+                    continue
+                if jk not in ALLOWED_WITNESS_JOYKEYS:
+                    continue
+                raw = hashlib.sha256(f"m16:witness_verified:{incident_id}:{jk}".encode()).hexdigest()[:12]
+                score_event_id = f"se_{raw}"
+                self._apply_score_event_locked(
+                    score_event_id,
+                    "WITNESS_VOTE_VERIFIED",
+                    jk,
+                    SCORE_DELTA_WITNESS_VERIFIED,
+                    incident_id,
+                    snapshot_ref,
+                    ev_refs,
+                    now2,
+                )
+        return True
 
     def _ensure_soft_hazard_locked(self, segment_id: str, now: float) -> dict[str, Any]:
         """
-        M14.4 在 self._lock 内调用：将 segment 的 hazard 制度化為 SOFT（OPEN/overlay/BLOCKED/CLEAR/None → SOFT）；
+        M14.4 在 self._hazards_lock 内调用：将 segment 的 hazard 制度化為 SOFT（OPEN/overlay/BLOCKED/CLEAR/None → SOFT）；
         HARD_BLOCKED 不改动直接 return rec。原地更新 rec，不整段覆盖。
         """
         raw = POLICY_CONFIG.get("soft_hazard_recheck_interval_minutes", 5)
@@ -1904,7 +2875,6 @@ class JoyGateStore:
         if interval <= 0:
             interval = 5
         due_ts = now + minute_to_seconds(interval)
-        recheck_due_at = _iso_utc(due_ts)
 
         rec = self._hazards_by_segment.get(segment_id)
         if not isinstance(rec, dict):
@@ -1912,25 +2882,52 @@ class JoyGateStore:
         if rec.get("hazard_status") == "HARD_BLOCKED":
             return rec
         # SOFT_BLOCKED 已存在且 recheck_due_at 有效时，不往后顺延，避免刷票拖延复核
+        keep_due = False
         if rec.get("hazard_status") == "SOFT_BLOCKED" and rec.get("hazard_lock_mode") == "SOFT_RECHECK":
             existing_due = rec.get("recheck_due_at")
-            if _parse_recheck_due_at(existing_due if isinstance(existing_due, str) else "") is not None:
-                recheck_due_at = existing_due
+            keep_due = _parse_recheck_due_at(existing_due if isinstance(existing_due, str) else "") is not None
         rec["segment_id"] = segment_id
         rec["hazard_status"] = "SOFT_BLOCKED"
         rec["hazard_lock_mode"] = "SOFT_RECHECK"
-        rec["recheck_due_at"] = recheck_due_at
+        if not keep_due:
+            self._set_soft_recheck_due_locked(segment_id, rec, due_ts)
         rec["recheck_interval_minutes"] = interval
         rec.setdefault("soft_recheck_consecutive_blocked", 0)
         rec.setdefault("incident_id", None)
         rec.setdefault("work_order_id", None)
         rec.setdefault("hazard_id", f"haz_{uuid.uuid4().hex[:12]}")
         self._hazards_by_segment[segment_id] = rec
+        self._bump_state_version(SNAPSHOT_KIND_HAZARD, segment_id)
         return rec
 
+    def _set_soft_recheck_due_locked(self, segment_id: str, hazard: dict[str, Any], due_ts: float) -> None:
+        """
+        在 self._hazards_lock 内调用：写 hazard 的 recheck_due_at 并登记到 _soft_recheck_heap（堆里存解析回的秒级 ts，
+        弹出时与当前 recheck_due_at 比对即可识别失效项）。失效项过多（> 2×hazard 数）时按当前 SOFT_BLOCKED 重建堆。
+        """
+        recheck_due_at = _iso_utc(due_ts)
+        hazard["recheck_due_at"] = recheck_due_at
+        heap = self._soft_recheck_heap
+        heapq.heappush(heap, (_parse_recheck_due_at(recheck_due_at) or due_ts, segment_id))
+        if len(heap) > 2 * len(self._hazards_by_segment) + 64:
+            self._rebuild_soft_recheck_heap_locked()
+
+    def _rebuild_soft_recheck_heap_locked(self) -> None:
+        """在 self._hazards_lock 内（或 __init__ 恢复时）调用：按当前 SOFT_BLOCKED 且 recheck_due_at 合法的 hazard 重建到期堆。"""
+        heap: list[tuple[float, str]] = []
+        for segment_id, hazard in self._hazards_by_segment.items():
+            if not isinstance(hazard, dict) or hazard.get("hazard_status") != "SOFT_BLOCKED":
+                continue
+            recheck_due_at = hazard.get("recheck_due_at")
+            due_ts = _parse_recheck_due_at(recheck_due_at if isinstance(recheck_due_at, str) else "")
+            if due_ts is not None:
+                heap.append((due_ts, segment_id))
+        heapq.heapify(heap)
+        self._soft_recheck_heap = heap
+
     def _recheck_verdict(self, segment_id: str, now: float) -> str:
         """
-        在 self._lock 内调用：复核判定三态。
+        在 self._hazards_lock 内调用（telemetry 证据在嵌套的 _telemetry_lock 内读取）：复核判定三态。
         返回 "PASSABLE" | "BLOCKED" | "INCONCLUSIVE"。
         Telemetry PASSABLE 优先：last_passed_ts 在 segment_freshness_window_minutes 内 => PASSABLE。
         否则 Witness 投票（ts 在 segment_witness_sla_timeout_minutes 内）：
@@ -1943,11 +2940,11 @@ class JoyGateStore:
             window_min = 10
         telemetry_cutoff = now - minute_to_seconds(window_min)
 
-        telemetry = self._segment_passed.get(segment_id)
-        if isinstance(telemetry, dict):
-            last_passed_ts = telemetry.get("last_passed_ts") or 0
-            if last_passed_ts >= telemetry_cutoff:
-                return "PASSABLE"
+        with self._telemetry_lock:
+            telemetry = self._segment_passed.get(segment_id)
+            last_passed_ts = (telemetry.get("last_passed_ts") or 0) if isinstance(telemetry, dict) else 0
+        if isinstance(telemetry, dict) and last_passed_ts >= telemetry_cutoff:
+            return "PASSABLE"
 
         witness_window_min = POLICY_CONFIG.get("segment_witness_sla_timeout_minutes", 1)
         if not isinstance(witness_window_min, (int, float)) or witness_window_min <= 0:
@@ -1981,8 +2978,9 @@ class JoyGateStore:
 
     def _process_due_soft_rechecks_locked(self, now: float) -> None:
         """
-        在 self._lock 内调用：只处理 hazard_status==SOFT_BLOCKED 且 recheck_due_at 合法且 due_ts<=now 的 hazard。
+        在 self._hazards_lock 内调用：只处理 hazard_status==SOFT_BLOCKED 且 recheck_due_at 合法且 due_ts<=now 的 hazard。
         M14.6：三态判定（PASSABLE/INCONCLUSIVE/BLOCKED）；INCONCLUSIVE 不增加 consecutive；BLOCKED 达阈值升级 HARD。
+        只弹出 _soft_recheck_heap 堆顶已到期项，代价 O(due·log n)，无到期项时 O(1)（读路径与调度器都可调用）。
         """
         raw_threshold = POLICY_CONFIG.get("soft_hazard_escalate_after_rechecks", 2)
         try:
@@ -1992,12 +2990,14 @@ class JoyGateStore:
         if threshold <= 0:
             threshold = 2
 
-        for segment_id, hazard in list(self._hazards_by_segment.items()):
+        # 重排 due 时 _set_soft_recheck_due_locked 可能整体重建堆，故每轮都取 self._soft_recheck_heap
+        while self._soft_recheck_heap and self._soft_recheck_heap[0][0] <= now:
+            due_ts, segment_id = heapq.heappop(self._soft_recheck_heap)
+            hazard = self._hazards_by_segment.get(segment_id)
             if not isinstance(hazard, dict) or hazard.get("hazard_status") != "SOFT_BLOCKED":
                 continue
             recheck_due_at = hazard.get("recheck_due_at")
-            due_ts = _parse_recheck_due_at(recheck_due_at if isinstance(recheck_due_at, str) else "")
-            if due_ts is None or due_ts > now:
+            if _parse_recheck_due_at(recheck_due_at if isinstance(recheck_due_at, str) else "") != due_ts:
                 continue
 
             verdict = self._recheck_verdict(segment_id, now)
@@ -2013,7 +3013,7 @@ class JoyGateStore:
                 hazard["recheck_due_at"] = None
                 hazard["soft_recheck_consecutive_blocked"] = 0
             elif verdict == "INCONCLUSIVE":
-                hazard["recheck_due_at"] = _iso_utc(now + interval_sec)
+                self._set_soft_recheck_due_locked(segment_id, hazard, now + interval_sec)
                 # 状态仍 SOFT_BLOCKED，不增加 soft_recheck_consecutive_blocked，不升级 HARD
             else:
                 # BLOCKED
@@ -2027,7 +3027,7 @@ class JoyGateStore:
                 consecutive += 1
                 hazard["soft_recheck_consecutive_blocked"] = consecutive
                 if consecutive < threshold:
-                    hazard["recheck_due_at"] = _iso_utc(now + interval_sec)
+                    self._set_soft_recheck_due_locked(segment_id, hazard, now + interval_sec)
                 else:
                     hazard["hazard_status"] = "HARD_BLOCKED"
                     hazard["hazard_lock_mode"] = "HARD_MANUAL"
@@ -2038,6 +3038,7 @@ class JoyGateStore:
                         hazard["work_order_id"] = f"wo_{uuid.uuid4().hex[:12]}"
 
             self._hazards_by_segment[segment_id] = hazard
+            self._bump_state_version(SNAPSHOT_KIND_HAZARD, segment_id)
             if old_status != hazard.get("hazard_status"):
                 self._enqueue_webhook_event_locked(
                     "HAZARD_STATUS_CHANGED",
@@ -2056,7 +3057,7 @@ class JoyGateStore:
         遍历所有 SOFT_BLOCKED 的 hazards，检查是否到期复核；
         根据 witness 和 telemetry 证据更新 hazard 状态（OPEN 或保持 SOFT_BLOCKED 并重排 due）。
         """
-        with self._lock:
+        with self._hazards_lock:
             self._process_due_soft_rechecks_locked(now)
 
     def record_segment_witness(
@@ -2074,59 +3075,122 @@ class JoyGateStore:
         witness_joykey = _norm_required_str("witness_joykey", witness_joykey, MAX_ID_LEN)
         if witness_joykey not in ALLOWED_WITNESS_JOYKEYS:
             raise PermissionError("witness not allowed")
-        if segment_state not in ALLOWED_SEGMENT_STATES:
-            raise ValueError(f"invalid segment_state: {segment_state!r}")
-        segment_id = _norm_required_str("segment_id", segment_id, MAX_ID_LEN)
-        points_event_id = _norm_optional_str("points_event_id", points_event_id, MAX_POINTS_EVENT_ID_LEN)
-        obstacle_type = _norm_optional_str("obstacle_type", obstacle_type, MAX_ID_LEN)
-        refs = _normalize_evidence_refs(evidence_refs)
-
-        with self._lock:
-            if segment_id not in self._witness_by_segment:
-                self._witness_by_segment[segment_id] = {"seen_points_event_ids": {}}
-            w = self._witness_by_segment[segment_id]
-            if not isinstance(w.get("seen_points_event_ids"), dict):
-                w["seen_points_event_ids"] = {}
+        vote = _norm_segment_vote(segment_id, segment_state, points_event_id, evidence_refs, obstacle_type)
+
+        with self._hazards_lock:
             now = time.time()
-            updated_at = _iso_utc(now)
-            if points_event_id and points_event_id in w["seen_points_event_ids"]:
-                if segment_state == "BLOCKED":
-                    rec = self._hazards_by_segment.get(segment_id) or {}
-                    recheck_due_at_val = rec.get("recheck_due_at")
-                    if not (recheck_due_at_val and isinstance(recheck_due_at_val, str) and (recheck_due_at_val or "").strip()):
-                        rec = self._ensure_soft_hazard_locked(segment_id, now)
-                        rec["updated_at"] = updated_at
-                        self._hazards_by_segment[segment_id] = rec
-                return
-            if points_event_id:
-                w["seen_points_event_ids"][points_event_id] = now
-            window_min = POLICY_CONFIG.get("segment_freshness_window_minutes", 10)
-            if not isinstance(window_min, int) or window_min <= 0:
-                window_min = 10
-            cutoff = now - minute_to_seconds(window_min)
-            w["seen_points_event_ids"] = {eid: ts for eid, ts in w["seen_points_event_ids"].items() if ts >= cutoff}
-            if len(w["seen_points_event_ids"]) > MAX_POINTS_EVENT_IDS_PER_SEGMENT:
-                by_ts = sorted(w["seen_points_event_ids"].items(), key=lambda x: x[1])
-                for eid, _ in by_ts[: len(w["seen_points_event_ids"]) - MAX_POINTS_EVENT_IDS_PER_SEGMENT]:
-                    w["seen_points_event_ids"].pop(eid, None)
-            old_rec = self._hazards_by_segment.get(segment_id) or {}
-            old_status = old_rec.get("hazard_status")
+            old_status_by_segment: dict[str, Any] = {}
+            self._segment_vote_locked(witness_joykey, *vote, now, old_status_by_segment)
+            self._enqueue_hazard_status_changes_locked(old_status_by_segment)
+            self._trim_segment_witness_events_locked(now)
+
+    def record_segment_witness_batch(self, witness_joykey: str, votes: list[dict[str, Any]]) -> list[Exception | None]:
+        """
+        批量 segment witness（同一 witness_joykey 的多条观察）：逐条语义与 record_segment_witness 相同、按顺序应用，整批只取一次 _hazards_lock。
+        votes 每项含 segment_id / segment_state（或 M9 兼容 hazard_status：BLOCKED→BLOCKED、CLEAR→PASSABLE）/ points_event_id / evidence_refs / obstacle_type。
+        HAZARD_STATUS_CHANGED 按 segment 合并：整批结束后每个 segment 至多一条（批前状态 != 批后状态时）；事件窗口清理整批一次。
+        返回与 votes 等长的逐条结果：None 为成功，否则为该条的 ValueError；非白名单机器人 -> PermissionError（整批拒绝）。
+        """
+        witness_joykey = _norm_required_str("witness_joykey", witness_joykey, MAX_ID_LEN)
+        if witness_joykey not in ALLOWED_WITNESS_JOYKEYS:
+            raise PermissionError("witness not allowed")
+        results: list[Exception | None] = [None] * len(votes)
+        normalized: list[tuple[int, tuple[str, str, str | None, list[str], str | None]]] = []
+        for i, v in enumerate(votes):
+            segment_state = v.get("segment_state")
+            if segment_state is None:
+                hazard_status = v.get("hazard_status")
+                if hazard_status not in ALLOWED_HAZARD_STATUSES:
+                    results[i] = ValueError(f"invalid hazard_status: {hazard_status!r}")
+                    continue
+                segment_state = "BLOCKED" if hazard_status == "BLOCKED" else "PASSABLE"
+            try:
+                normalized.append((
+                    i,
+                    _norm_segment_vote(
+                        v.get("segment_id"),
+                        segment_state,
+                        v.get("points_event_id"),
+                        v.get("evidence_refs"),
+                        v.get("obstacle_type"),
+                    ),
+                ))
+            except ValueError as e:
+                results[i] = e
+        if not normalized:
+            return results
+        with self._hazards_lock:
+            old_status_by_segment: dict[str, Any] = {}
+            for _, vote in normalized:
+                now = time.time()
+                self._segment_vote_locked(witness_joykey, *vote, now, old_status_by_segment)
+            self._enqueue_hazard_status_changes_locked(old_status_by_segment)
+            self._trim_segment_witness_events_locked(now)
+        return results
 
+    def _segment_vote_locked(
+        self,
+        witness_joykey: str,
+        segment_id: str,
+        segment_state: str,
+        points_event_id: str | None,
+        refs: list[str],
+        obstacle_type: str | None,
+        now: float,
+        old_status_by_segment: dict[str, Any],
+    ) -> None:
+        """
+        在 _hazards_lock 内应用一条已规范化的 segment witness；首次触及的 segment 把变更前 hazard_status 记入 old_status_by_segment，
+        由调用方统一 _enqueue_hazard_status_changes_locked（批量时每 segment 只发一条 HAZARD_STATUS_CHANGED）。
+        """
+        if segment_id not in self._witness_by_segment:
+            self._witness_by_segment[segment_id] = {"seen_points_event_ids": {}}
+        w = self._witness_by_segment[segment_id]
+        if not isinstance(w.get("seen_points_event_ids"), dict):
+            w["seen_points_event_ids"] = {}
+        updated_at = _iso_utc(now)
+        if points_event_id and points_event_id in w["seen_points_event_ids"]:
             if segment_state == "BLOCKED":
-                rec = self._ensure_soft_hazard_locked(segment_id, now)
-                rec["obstacle_type"] = obstacle_type
-                rec["evidence_refs"] = refs if refs else None
-                rec["updated_at"] = updated_at
-                self._hazards_by_segment[segment_id] = rec
-            elif segment_state == "PASSABLE":
-                if segment_id in self._hazards_by_segment:
-                    rec = self._hazards_by_segment[segment_id]
-                    # M15：HARD_BLOCKED 永不因 witness PASSABLE 解封；仅更新证据/时间，可写审计提醒
-                    if rec.get("hazard_status") == "HARD_BLOCKED":
-                        rec["obstacle_type"] = obstacle_type
-                        rec["evidence_refs"] = refs if refs else None
-                        rec["updated_at"] = updated_at
-                        self._decisions.append({
+                rec = self._hazards_by_segment.get(segment_id) or {}
+                recheck_due_at_val = rec.get("recheck_due_at")
+                if not (recheck_due_at_val and isinstance(recheck_due_at_val, str) and (recheck_due_at_val or "").strip()):
+                    rec = self._ensure_soft_hazard_locked(segment_id, now)
+                    rec["updated_at"] = updated_at
+                    self._hazards_by_segment[segment_id] = rec
+            return
+        if points_event_id:
+            w["seen_points_event_ids"][points_event_id] = now
+        state_log = self._state_log
+        if state_log is not None:
+            state_log.touch(STATE_TABLE_SEGMENT_WITNESS, segment_id)
+        window_min = POLICY_CONFIG.get("segment_freshness_window_minutes", 10)
+        if not isinstance(window_min, int) or window_min <= 0:
+            window_min = 10
+        cutoff = now - minute_to_seconds(window_min)
+        w["seen_points_event_ids"] = {eid: ts for eid, ts in w["seen_points_event_ids"].items() if ts >= cutoff}
+        if len(w["seen_points_event_ids"]) > MAX_POINTS_EVENT_IDS_PER_SEGMENT:
+            by_ts = sorted(w["seen_points_event_ids"].items(), key=lambda x: x[1])
+            for eid, _ in by_ts[: len(w["seen_points_event_ids"]) - MAX_POINTS_EVENT_IDS_PER_SEGMENT]:
+                w["seen_points_event_ids"].pop(eid, None)
+        old_rec = self._hazards_by_segment.get(segment_id) or {}
+        old_status_by_segment.setdefault(segment_id, old_rec.get("hazard_status"))
+
+        if segment_state == "BLOCKED":
+            rec = self._ensure_soft_hazard_locked(segment_id, now)
+            rec["obstacle_type"] = obstacle_type
+            rec["evidence_refs"] = refs if refs else None
+            rec["updated_at"] = updated_at
+            self._hazards_by_segment[segment_id] = rec
+        elif segment_state == "PASSABLE":
+            if segment_id in self._hazards_by_segment:
+                rec = self._hazards_by_segment[segment_id]
+                # M15：HARD_BLOCKED 永不因 witness PASSABLE 解封；仅更新证据/时间，可写审计提醒
+                if rec.get("hazard_status") == "HARD_BLOCKED":
+                    rec["obstacle_type"] = obstacle_type
+                    rec["evidence_refs"] = refs if refs else None
+                    rec["updated_at"] = updated_at
+                    with self._audit_lock:
+                        self._append_decision_locked({
                             "decision_id": f"dec_{uuid.uuid4().hex[:12]}",
                             "decision_type": "WITNESS_RECHECK_REQUESTED",
                             "decision_basis": "WITNESS",
@@ -2141,46 +3205,62 @@ class JoyGateStore:
                             "bundle_hash": None,
                             "created_at": now,
                         })
-                    else:
-                        rec["obstacle_type"] = obstacle_type
-                        rec["evidence_refs"] = refs if refs else None
-                        rec["updated_at"] = updated_at
-                # 不存在 hazard 则不创建，只写 _segment_witness_events
-            else:
-                # UNKNOWN: 不写 hazard_status，只写 _segment_witness_events
-                pass
-
-            new_status = self._hazards_by_segment.get(segment_id, {}).get("hazard_status")
-            if old_status != new_status:
+                else:
+                    rec["obstacle_type"] = obstacle_type
+                    rec["evidence_refs"] = refs if refs else None
+                    rec["updated_at"] = updated_at
+                self._bump_state_version(SNAPSHOT_KIND_HAZARD, segment_id)
+            # 不存在 hazard 则不创建，只写 _segment_witness_events
+        else:
+            # UNKNOWN: 不写 hazard_status，只写 _segment_witness_events
+            pass
+
+        event = {
+            "segment_id": segment_id,
+            "segment_state": segment_state,
+            "witness_joykey": witness_joykey,
+            "points_event_id": points_event_id,
+            "evidence_refs": refs if refs else None,
+            "ts": now,
+        }
+        self._segment_witness_events.append(event)
+        if state_log is not None:
+            state_log.put(STATE_TABLE_SEGMENT_WITNESS_EVENT, _segment_witness_event_key(event), event)
+
+    def _enqueue_hazard_status_changes_locked(self, old_status_by_segment: dict[str, Any]) -> None:
+        """在 _hazards_lock 内：对 hazard_status 相对 old_status_by_segment 发生变化的 segment 各发一条 HAZARD_STATUS_CHANGED。"""
+        for segment_id, old_status in old_status_by_segment.items():
+            rec = self._hazards_by_segment.get(segment_id, {})
+            if old_status != rec.get("hazard_status"):
                 self._enqueue_webhook_event_locked(
                     "HAZARD_STATUS_CHANGED",
                     "HAZARD",
                     segment_id,
                     {
                         "segment_id": segment_id,
-                        "hazard_status": new_status,
-                        "obstacle_type": self._hazards_by_segment.get(segment_id, {}).get("obstacle_type"),
-                        "evidence_refs": self._hazards_by_segment.get(segment_id, {}).get("evidence_refs"),
+                        "hazard_status": rec.get("hazard_status"),
+                        "obstacle_type": rec.get("obstacle_type"),
+                        "evidence_refs": rec.get("evidence_refs"),
                     },
                 )
 
-            self._segment_witness_events.append({
-                "segment_id": segment_id,
-                "segment_state": segment_state,
-                "witness_joykey": witness_joykey,
-                "points_event_id": points_event_id,
-                "evidence_refs": refs if refs else None,
-                "ts": now,
-            })
-            # 按 segment_freshness_window_minutes 清理过旧项
-            window_min = POLICY_CONFIG.get("segment_freshness_window_minutes", 10)
-            if not isinstance(window_min, int) or window_min <= 0:
-                window_min = 10
-            cutoff = now - minute_to_seconds(window_min)
+    def _trim_segment_witness_events_locked(self, now: float) -> None:
+        """在 _hazards_lock 内：_segment_witness_events 按 segment_freshness_window_minutes 清理过旧项并按上限裁剪。"""
+        window_min = POLICY_CONFIG.get("segment_freshness_window_minutes", 10)
+        if not isinstance(window_min, int) or window_min <= 0:
+            window_min = 10
+        cutoff = now - minute_to_seconds(window_min)
+        dropped = [e for e in self._segment_witness_events if (e.get("ts") or 0) < cutoff]
+        if dropped:
             self._segment_witness_events[:] = [e for e in self._segment_witness_events if (e.get("ts") or 0) >= cutoff]
-            if len(self._segment_witness_events) > MAX_SEGMENT_WITNESS_EVENTS:
-                self._segment_witness_events.sort(key=lambda e: e.get("ts") or 0)
-                self._segment_witness_events[:] = self._segment_witness_events[-MAX_SEGMENT_WITNESS_EVENTS:]
+        if len(self._segment_witness_events) > MAX_SEGMENT_WITNESS_EVENTS:
+            self._segment_witness_events.sort(key=lambda e: e.get("ts") or 0)
+            dropped.extend(self._segment_witness_events[:-MAX_SEGMENT_WITNESS_EVENTS])
+            self._segment_witness_events[:] = self._segment_witness_events[-MAX_SEGMENT_WITNESS_EVENTS:]
+        state_log = self._state_log
+        if state_log is not None:
+            for e in dropped:
+                state_log.put(STATE_TABLE_SEGMENT_WITNESS_EVENT, _segment_witness_event_key(e), None)
 
     def segment_witness_respond(
         self,
@@ -2233,7 +3313,7 @@ class JoyGateStore:
         if event_ts > now_wo + ALLOWED_FUTURE_SKEW_SECONDS:
             raise ValueError("event_occurred_at too far in future")
 
-        with self._lock:
+        with self._hazards_lock:
             if work_order_status != "DONE":
                 return
             if not segment_id:
@@ -2252,6 +3332,7 @@ class JoyGateStore:
             hazard["work_order_id"] = None
             hazard["soft_recheck_consecutive_blocked"] = 0
             self._hazards_by_segment[seg] = hazard
+            self._bump_state_version(SNAPSHOT_KIND_HAZARD, seg)
             if old_status != hazard.get("hazard_status"):
                 self._enqueue_webhook_event_locked(
                     "HAZARD_STATUS_CHANGED",
@@ -2267,7 +3348,7 @@ class JoyGateStore:
 
     def list_hazards(self) -> list[dict[str, Any]]:
         """只读：返回 hazards 列表，按 segment_id 排序；hazard_status 为系统正式值 OPEN | SOFT_BLOCKED | HARD_BLOCKED（与 FIELD_REGISTRY /v1/hazards 一致）。"""
-        with self._lock:
+        with self._hazards_lock:
             items: list[dict[str, Any]] = []
             for seg_id, rec in self._hazards_by_segment.items():
                 if not isinstance(rec, dict):
@@ -2313,7 +3394,7 @@ class JoyGateStore:
         stale_unresolved：unresolved 中 base_ts=status_updated_at/created_at 超过 INCIDENT_STALE_MINUTES*60 的数量（真实分钟，不随 DEMO 缩放）。
         口径对照：incident_type/incident_status 与 FIELD_REGISTRY 一致；/v1.incidents 仍 8 字段，不泄露 created_at/status_updated_at。
         """
-        with self._lock:
+        with self._incidents_lock:
             copy_list: list[dict[str, Any]] = []
             for rec in self._incidents:
                 copy_list.append({
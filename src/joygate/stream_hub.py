@@ -0,0 +1,119 @@
+# src/joygate/stream_hub.py
+"""
+/v1/stream 推送扇出（内存态，每个 sandbox store 一个 hub）。
+
+- 生产方（store 内任意线程、可在 domain 锁内）：publish() 推送事件，notify_state_changed() 标记 state version 变化。
+- 消费方（event loop 上的 SSE 连接）：subscribe() 取得 StreamSubscriber，await wait() 后 drain()。
+- 每个订阅者的队列 / 标志只在其 event loop 线程上改写（经 call_soon_threadsafe 投递），不需要额外锁；
+  hub 只用一把叶子锁保护订阅者集合。无订阅者时 publish / notify 为空操作。
+- 事件 JSON 只序列化一次，所有订阅者共享同一字符串。
+- 队列有界：消费过慢时丢弃积压并置 overflowed，由 SSE 层发 resync 让客户端全量拉取。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import deque
+from threading import Lock
+from typing import Any
+
+STREAM_QUEUE_MAX = 256
+
+
+class StreamSubscriber:
+    """单个 SSE 连接的待发送状态；除 state_pending 置位外，字段只在 loop 线程上访问。"""
+
+    __slots__ = ("loop", "queue", "wakeup", "state_pending", "overflowed")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.queue: deque[tuple[str, str, str]] = deque()
+        self.wakeup = asyncio.Event()
+        self.state_pending = False
+        self.overflowed = False
+
+    def _push(self, item: tuple[str, str, str]) -> None:
+        """loop 线程内调用：入队；满了清空积压并标记 overflowed。"""
+        if len(self.queue) >= STREAM_QUEUE_MAX:
+            self.queue.clear()
+            self.overflowed = True
+        else:
+            self.queue.append(item)
+        self.wakeup.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """等待新事件；超时返回 False（供 SSE 层发心跳）。"""
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def drain(self) -> tuple[bool, bool, list[tuple[str, str, str]]]:
+        """loop 线程内调用：取出 (overflowed, state_pending, [(event_type, event_id, data_json)]) 并复位。"""
+        self.wakeup.clear()
+        overflowed = self.overflowed
+        # 先清 state_pending 再由调用方读取 state version：清位之后的变化会重新置位并唤醒
+        state_pending = self.state_pending
+        self.overflowed = False
+        self.state_pending = False
+        items = list(self.queue)
+        self.queue.clear()
+        return overflowed, state_pending, items
+
+
+class StreamHub:
+    def __init__(self, max_subscribers: int) -> None:
+        self._lock = Lock()
+        self._subscribers: set[StreamSubscriber] = set()
+        self._max_subscribers = max_subscribers
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> StreamSubscriber | None:
+        """新建订阅者；已达上限返回 None。"""
+        with self._lock:
+            if len(self._subscribers) >= self._max_subscribers:
+                return None
+            sub = StreamSubscriber(loop)
+            self._subscribers.add(sub)
+            return sub
+
+    def unsubscribe(self, sub: StreamSubscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _snapshot_subscribers(self) -> tuple[StreamSubscriber, ...]:
+        with self._lock:
+            return tuple(self._subscribers)
+
+    def publish(self, event: dict[str, Any]) -> None:
+        """线程安全：把 webhook 事件（event_type/event_id/...）扇出给所有订阅者。"""
+        subs = self._snapshot_subscribers()
+        if not subs:
+            return
+        item = (
+            str(event.get("event_type") or "message"),
+            str(event.get("event_id") or ""),
+            json.dumps(event, ensure_ascii=False, separators=(",", ":")),
+        )
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub._push, item)
+            except RuntimeError:
+                # loop 已关闭：连接即将清理，丢弃
+                continue
+
+    def notify_state_changed(self) -> None:
+        """线程安全：标记 state version 已变化；同一订阅者未消费前只唤醒一次（合并突发写入）。"""
+        subs = self._snapshot_subscribers()
+        for sub in subs:
+            if sub.state_pending:
+                continue
+            sub.state_pending = True
+            try:
+                sub.loop.call_soon_threadsafe(sub.wakeup.set)
+            except RuntimeError:
+                continue
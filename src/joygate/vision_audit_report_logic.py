@@ -1,6 +1,10 @@
 from __future__ import annotations
 
 import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Callable
 
 ALLOWED_AI_INSIGHT_KEYS = {
     "insight_type",
@@ -129,3 +133,86 @@ def generate_vision_audit_result(
         "obstacle_type": obstacle_type,
         "sample_index": sample_index,
     }
+
+
+# 视觉审计线程池（进程级共享，所有 sandbox 共用同一上限；首次使用时创建）
+_VISION_AUDIT_EXECUTOR: ThreadPoolExecutor | None = None
+_VISION_AUDIT_EXECUTOR_LOCK = Lock()
+# 等待结果时的轮询粒度（秒）：用于检查"已开始执行但超时"的 job
+_VISION_AUDIT_POLL_SECONDS = 0.05
+
+
+def get_vision_audit_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _VISION_AUDIT_EXECUTOR
+    with _VISION_AUDIT_EXECUTOR_LOCK:
+        if _VISION_AUDIT_EXECUTOR is None:
+            _VISION_AUDIT_EXECUTOR = ThreadPoolExecutor(
+                max_workers=max(1, int(max_workers)),
+                thread_name_prefix="joygate-vision-audit",
+            )
+        return _VISION_AUDIT_EXECUTOR
+
+
+def _failed_result(summary: str) -> dict:
+    return {
+        "summary": summary,
+        "confidence": None,
+        "obstacle_type": None,
+        "sample_index": None,
+        "_job_failed": True,
+    }
+
+
+def run_vision_audit_tasks(
+    tasks: list[dict],
+    render_png: Callable[[dict], bytes],
+    audit: Callable[[dict, bytes], dict],
+    executor: ThreadPoolExecutor,
+    timeout_seconds: float,
+) -> dict[str, dict]:
+    """
+    锁外并发执行视觉审计：每个 task 在 executor 上渲染 PNG，use_budget 时再调 audit(incident_rec, png)。
+    返回 {job_id: result}；render/provider 异常 -> _job_failed，超 budget -> skipped due to budget。
+    单 job 超时从其开始执行计起（排队时间不算）；超时的 job 直接记 provider timeout（_job_failed），
+    其线程在后台自然结束、结果丢弃。调用方据此回写，lease_until 校验不变。
+    """
+    started_at: dict[str, float] = {}
+
+    def _run(t: dict) -> dict:
+        job_id = t.get("job_id")
+        started_at[job_id] = time.monotonic()
+        try:
+            png_bytes = render_png(t.get("render_snapshot") or {})
+        except Exception as e:
+            return _failed_result(f"render error: {e!s}")
+        if t.get("use_budget") is not True:
+            return {
+                "summary": "skipped due to budget",
+                "confidence": None,
+                "obstacle_type": None,
+                "sample_index": None,
+            }
+        try:
+            return audit(t.get("incident_rec") or {}, png_bytes)
+        except Exception as e:
+            return _failed_result(f"provider error: {e!s}")
+
+    results: dict[str, dict] = {}
+    pending: dict[Future, str] = {}
+    for t in tasks:
+        pending[executor.submit(_run, t)] = t.get("job_id")
+    while pending:
+        done, _ = wait(list(pending), timeout=_VISION_AUDIT_POLL_SECONDS, return_when=FIRST_COMPLETED)
+        for fut in done:
+            job_id = pending.pop(fut)
+            try:
+                results[job_id] = fut.result()
+            except Exception as e:
+                results[job_id] = _failed_result(f"provider error: {e!s}")
+        now = time.monotonic()
+        for fut, job_id in list(pending.items()):
+            began = started_at.get(job_id)
+            if began is not None and now - began > timeout_seconds:
+                del pending[fut]
+                results[job_id] = _failed_result("provider timeout")
+    return results
@@ -0,0 +1,388 @@
+# src/joygate/webhook_delivery.py
+"""
+Outbound webhook 投递引擎（进程级，所有 sandbox 共用）。
+
+- 投递在引擎自己的线程池上执行，请求线程 / BackgroundTasks 只负责入队，慢接收方不再占用请求线程。
+- 每个 worker 线程持有一个长连接 requests.Session（按 host keep-alive 复用连接；连接固定到校验通过的 IP）。
+- 每个 target（scheme://host:port）同时在途的投递数有上限；超出的排在该 target 的等待队列，不占 worker。
+- 失败重试不在 worker 里 sleep：按 webhook_retry_delay（指数退避 + 抖动）放进延迟队列，由计时线程到期后再派发。
+- 每次尝试后调用 on_attempt(result, final)：result 含 delivered/attempts/last_status_code/last_error，
+  final=True 表示该 delivery 已结束（成功或用尽重试）。
+- 熔断：submit 可带 admit()/on_park(attempts)；每次尝试（含重试）前先问 admit()，不放行则不发请求、
+  回调 on_park 由调用方停放，job 从引擎移除。
+- 自适应并发：每个 target 的在途上限按结果调整（AIMD）——失败或耗时超过 slow_latency 减半（最低 1），
+  快速成功每次加 1/上限，回到 per_target_limit 后不再单独记录。结果里带 latency_ms。
+- 批量模式（订阅开启 batch_max_size > 1）：同一 batch_key 的 event 先进缓冲，攒满 batch_max_size 或等满 linger
+  秒后合成一个 JSON 数组 POST（签名覆盖整个数组 body）；整批共享一次尝试结果，逐个回调各 event 的 on_attempt。
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from joygate.config import (
+    JOYGATE_WEBHOOK_ALLOW_HTTP,
+    JOYGATE_WEBHOOK_ALLOW_LOCALHOST,
+    WEBHOOK_PER_TARGET_CONCURRENCY,
+    WEBHOOK_RETRY_MAX_DELAY_SECONDS,
+    WEBHOOK_SLOW_LATENCY_SECONDS,
+    WEBHOOK_WORKERS,
+)
+from joygate.webhooks_logic import new_webhook_session, send_webhook_once, webhook_retry_delay
+
+
+class _DeliveryJob:
+    __slots__ = (
+        "target_url", "target_key", "secret", "payload", "timeout", "max_attempts", "backoff", "attempts", "on_attempt",
+        "admit", "on_park",
+    )
+
+    def __init__(
+        self,
+        target_url: str,
+        secret: Optional[str],
+        payload: dict | bytes | list[dict | bytes],
+        timeout: int,
+        max_attempts: int,
+        backoff: int,
+        on_attempt: Callable[[dict, bool], Any],
+        admit: Optional[Callable[[], bool]] = None,
+        on_park: Optional[Callable[[int], Any]] = None,
+    ) -> None:
+        self.target_url = target_url
+        self.target_key = _target_key(target_url)
+        self.admit = admit
+        self.on_park = on_park
+        self.secret = secret
+        self.payload = payload
+        self.timeout = timeout
+        self.max_attempts = max_attempts if max_attempts >= 1 else 1
+        self.backoff = backoff
+        self.attempts = 0
+        self.on_attempt = on_attempt
+
+
+class _PendingBatch:
+    """某个 batch_key 正在攒的一批：首个 event 决定 target/secret/重试参数，deadline 到期或攒满即发出。"""
+
+    __slots__ = (
+        "key", "target_url", "secret", "timeout", "max_attempts", "backoff", "max_size", "payloads", "callbacks",
+        "admit", "parks",
+    )
+
+    def __init__(
+        self,
+        key: str,
+        target_url: str,
+        secret: Optional[str],
+        timeout: int,
+        max_attempts: int,
+        backoff: int,
+        max_size: int,
+        admit: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        self.key = key
+        self.admit = admit
+        self.parks: list[Callable[[int], Any]] = []
+        self.target_url = target_url
+        self.secret = secret
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_size = max_size
+        self.payloads: list[dict | bytes] = []
+        self.callbacks: list[Callable[[dict, bool], Any]] = []
+
+    def to_job(self) -> _DeliveryJob:
+        callbacks = list(self.callbacks)
+        parks = list(self.parks)
+
+        def _fan_out(result: dict, final: bool) -> None:
+            # 整批只算一次尝试：除第一个外标记 batch_member，调用方据此只统计一次（如熔断计数）
+            for i, cb in enumerate(callbacks):
+                try:
+                    cb(result if i == 0 else {**result, "batch_member": True}, final)
+                except Exception as e:
+                    print(f"WARN: webhook on_attempt callback failed: {e}", file=sys.stderr)
+
+        def _park_all(attempts: int) -> None:
+            for park in parks:
+                park(attempts)
+
+        return _DeliveryJob(
+            self.target_url, self.secret, list(self.payloads), self.timeout, self.max_attempts, self.backoff, _fan_out,
+            self.admit, _park_all if parks else None,
+        )
+
+
+def _target_key(target_url: str) -> str:
+    try:
+        parsed = urlparse(target_url)
+        scheme = (parsed.scheme or "").lower()
+        port = parsed.port or (443 if scheme == "https" else 80)
+        return f"{scheme}://{(parsed.hostname or '').lower()}:{port}"
+    except ValueError:
+        return target_url
+
+
+class WebhookDeliveryEngine:
+    """submit() 线程安全、非阻塞；shutdown() 后未执行的投递丢弃（delivery 保持 PENDING）。"""
+
+    def __init__(
+        self,
+        workers: int,
+        per_target_limit: int,
+        max_retry_delay: float,
+        send: Callable[..., dict] = send_webhook_once,
+        slow_latency: float = 2.0,
+    ) -> None:
+        self._workers = max(1, int(workers))
+        self._per_target_limit = max(1, int(per_target_limit))
+        self._slow_latency = float(slow_latency)
+        self._max_retry_delay = max_retry_delay
+        self._send = send
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="joygate-webhook")
+        self._local = threading.local()
+        self._sessions: list[requests.Session] = []
+        # 以下字段只在持有 _cond 时读写
+        self._cond = threading.Condition()
+        # 延迟队列：(到期时刻, 序号, 待重试的 job 或待发出的 batch)
+        self._delayed: list[tuple[float, int, _DeliveryJob | _PendingBatch]] = []
+        self._batches: dict[str, _PendingBatch] = {}
+        self._seq = itertools.count()
+        self._inflight: dict[str, int] = {}
+        # 自适应在途上限（只记录低于 per_target_limit 的 target）
+        self._limits: dict[str, float] = {}
+        self._waiting: dict[str, deque[_DeliveryJob]] = {}
+        self._closed = False
+        self._timer = threading.Thread(target=self._timer_loop, name="joygate-webhook-timer", daemon=True)
+        self._timer.start()
+
+    def submit(
+        self,
+        target_url: str,
+        secret: Optional[str],
+        payload: dict | bytes,
+        timeout: int,
+        max_attempts: int,
+        backoff: int,
+        on_attempt: Callable[[dict, bool], Any],
+        batch_key: Optional[str] = None,
+        batch_max_size: int = 1,
+        batch_linger: float = 0.0,
+        admit: Optional[Callable[[], bool]] = None,
+        on_park: Optional[Callable[[int], Any]] = None,
+    ) -> None:
+        """batch_key 非空且 batch_max_size > 1 时走批量缓冲，否则单个 event 一个 POST。"""
+        with self._cond:
+            if self._closed:
+                return
+            if batch_key is None or batch_max_size <= 1:
+                self._dispatch_locked(
+                    _DeliveryJob(target_url, secret, payload, timeout, max_attempts, backoff, on_attempt, admit, on_park)
+                )
+                return
+            batch = self._batches.get(batch_key)
+            if batch is None:
+                batch = _PendingBatch(batch_key, target_url, secret, timeout, max_attempts, backoff, batch_max_size, admit)
+                self._batches[batch_key] = batch
+                if batch_linger > 0:
+                    heapq.heappush(self._delayed, (time.monotonic() + batch_linger, next(self._seq), batch))
+                    self._cond.notify()
+            batch.payloads.append(payload)
+            batch.callbacks.append(on_attempt)
+            if on_park is not None:
+                batch.parks.append(on_park)
+            if len(batch.payloads) >= batch.max_size or batch_linger <= 0:
+                self._flush_batch_locked(batch)
+
+    def _flush_batch_locked(self, batch: _PendingBatch) -> None:
+        """持有 _cond：把缓冲中的 batch 作为一个 job 派发（同一 batch 只发一次；延迟队列里的旧条目到期时忽略）。"""
+        if self._batches.get(batch.key) is not batch:
+            return
+        del self._batches[batch.key]
+        self._dispatch_locked(batch.to_job())
+
+    def stats(self) -> dict[str, int]:
+        with self._cond:
+            return {
+                "inflight": sum(self._inflight.values()),
+                "waiting": sum(len(q) for q in self._waiting.values()),
+                "delayed": sum(1 for _, _, item in self._delayed if isinstance(item, _DeliveryJob)),
+                "batching": sum(len(b.payloads) for b in self._batches.values()),
+                "throttled_targets": len(self._limits),
+            }
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._delayed.clear()
+            self._waiting.clear()
+            self._batches.clear()
+            self._cond.notify_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for session in list(self._sessions):
+            try:
+                session.close()
+            except Exception:
+                pass
+
+    def _dispatch_locked(self, job: _DeliveryJob) -> None:
+        """持有 _cond：target 未满则交给 worker，否则排入该 target 的等待队列。"""
+        key = job.target_key
+        if self._inflight.get(key, 0) >= self._target_limit_locked(key):
+            self._waiting.setdefault(key, deque()).append(job)
+            return
+        self._inflight[key] = self._inflight.get(key, 0) + 1
+        try:
+            self._executor.submit(self._run, job)
+        except RuntimeError:  # executor 已关闭
+            self._inflight[key] -= 1
+
+    def _target_limit_locked(self, key: str) -> int:
+        limit = self._limits.get(key)
+        return self._per_target_limit if limit is None else max(1, int(limit))
+
+    def _adapt_limit_locked(self, key: str, ok: bool, latency: float) -> None:
+        """AIMD：失败或慢 -> 减半；快速成功 -> +1/limit，回到上限即删除记录。"""
+        limit = self._limits.get(key, float(self._per_target_limit))
+        if not ok or latency > self._slow_latency:
+            self._limits[key] = max(1.0, limit / 2)
+            return
+        if key not in self._limits:
+            return
+        limit += 1.0 / limit
+        if limit >= self._per_target_limit:
+            del self._limits[key]
+        else:
+            self._limits[key] = limit
+
+    def _release_locked(self, key: str) -> None:
+        n = self._inflight.get(key, 0) - 1
+        if n > 0:
+            self._inflight[key] = n
+        else:
+            self._inflight.pop(key, None)
+        # 上限可能刚被调高：能放几个放几个
+        queue = self._waiting.get(key)
+        while queue and self._inflight.get(key, 0) < self._target_limit_locked(key):
+            nxt = queue.popleft()
+            if not queue:
+                del self._waiting[key]
+            self._dispatch_locked(nxt)
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = new_webhook_session(pool_connections=self._workers, pool_maxsize=self._per_target_limit)
+            self._local.session = session
+            with self._cond:
+                self._sessions.append(session)
+        return session
+
+    def _run(self, job: _DeliveryJob) -> None:
+        if job.admit is not None and job.on_park is not None:
+            try:
+                admitted = bool(job.admit())
+            except Exception:
+                admitted = True
+            if not admitted:
+                with self._cond:
+                    self._release_locked(job.target_key)
+                try:
+                    job.on_park(job.attempts)
+                except Exception as e:
+                    print(f"WARN: webhook on_park callback failed: {e}", file=sys.stderr)
+                return
+        t0 = time.monotonic()
+        try:
+            result = self._send(
+                self._session(),
+                job.target_url,
+                job.secret,
+                job.payload,
+                job.timeout,
+                allow_http=JOYGATE_WEBHOOK_ALLOW_HTTP,
+                allow_localhost=JOYGATE_WEBHOOK_ALLOW_LOCALHOST,
+            )
+        except Exception as e:
+            result = {"delivered": False, "last_status_code": None, "last_error": "connection_error"}
+            print(f"WARN: webhook send raised {type(e).__name__}", file=sys.stderr)
+        latency = time.monotonic() - t0
+        result = {**result, "latency_ms": round(latency * 1000.0, 3)}
+        if result.get("last_error") != "invalid_target_url":
+            job.attempts += 1
+        final = bool(result.get("delivered")) or result.get("last_error") == "invalid_target_url" or job.attempts >= job.max_attempts
+        # 先回写再排重试：同一 delivery 的回写按尝试顺序发生
+        try:
+            job.on_attempt({**result, "attempts": job.attempts}, final)
+        except Exception as e:
+            print(f"WARN: webhook on_attempt callback failed: {e}", file=sys.stderr)
+        delay = 0.0 if final else webhook_retry_delay(job.backoff, job.attempts, self._max_retry_delay)
+        with self._cond:
+            if result.get("last_error") != "invalid_target_url":
+                self._adapt_limit_locked(job.target_key, bool(result.get("delivered")), latency)
+            self._release_locked(job.target_key)
+            if not final and not self._closed:
+                heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), job))
+                self._cond.notify()
+
+    def _timer_loop(self) -> None:
+        with self._cond:
+            while not self._closed:
+                if not self._delayed:
+                    self._cond.wait()
+                    continue
+                wait_s = self._delayed[0][0] - time.monotonic()
+                if wait_s > 0:
+                    self._cond.wait(wait_s)
+                    continue
+                _, _, item = heapq.heappop(self._delayed)
+                if isinstance(item, _PendingBatch):
+                    self._flush_batch_locked(item)
+                else:
+                    self._dispatch_locked(item)
+
+
+_ENGINE: Optional[WebhookDeliveryEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_webhook_delivery_engine() -> WebhookDeliveryEngine:
+    """进程级单例，首次投递时创建。"""
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            _ENGINE = WebhookDeliveryEngine(
+                WEBHOOK_WORKERS,
+                WEBHOOK_PER_TARGET_CONCURRENCY,
+                WEBHOOK_RETRY_MAX_DELAY_SECONDS,
+                slow_latency=WEBHOOK_SLOW_LATENCY_SECONDS,
+            )
+        return _ENGINE
+
+
+def get_webhook_delivery_stats() -> dict[str, int]:
+    """引擎未创建时返回全 0（不为查询而创建线程池）。"""
+    with _ENGINE_LOCK:
+        engine = _ENGINE
+    if engine is None:
+        return {"inflight": 0, "waiting": 0, "delayed": 0, "batching": 0, "throttled_targets": 0}
+    return engine.stats()
+
+
+def shutdown_webhook_delivery_engine() -> None:
+    global _ENGINE
+    with _ENGINE_LOCK:
+        engine, _ENGINE = _ENGINE, None
+    if engine is not None:
+        engine.shutdown()
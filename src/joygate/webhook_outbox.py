@@ -0,0 +1,298 @@
+# src/joygate/webhook_outbox.py
+"""
+Webhook outbox 的磁盘持久化（可选；JOYGATE_WEBHOOK_OUTBOX_DIR 为空时不启用，store 仍用内存 list）。
+
+- 追加写：每个 event 一行 JSON（{"seq", "event"}），写入当前 segment 文件；超过 segment 大小上限滚动新文件。
+- fsync 按批：累计 fsync_batch 条或距上次 fsync 超过 fsync_interval 秒才 fsync，sync() 强制落盘。
+- 消费位点：checkpoint 文件记录 committed 序号（其之前的 event 都已投递结束），原子替换写入；
+  完全落在 committed 之前的 segment 删除。
+- at-least-once：按 event_id 跟踪——event 已派发（mark_dispatched）且其所有 delivery 都到终态（release）才 ack；
+  重启后从 committed 重放，未 ack 的 event 会再投一次（接收方按 event_id 去重）。
+- 读取按 read(limit) 从磁盘游标顺序取，内存里只留已读未 ack 的 event 位置，不随积压增长。
+- 订阅表另存 subscriptions.json（重启后重放 event 需要订阅才能找到 target）。
+
+本类不自带锁：所有方法须在 store._webhooks_lock 内调用。
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Any, Optional
+
+SEGMENT_SUFFIX = ".seg"
+CHECKPOINT_FILE = "checkpoint.json"
+SUBSCRIPTIONS_FILE = "subscriptions.json"
+
+
+def _segment_name(start_seq: int) -> str:
+    return f"{start_seq:016d}{SEGMENT_SUFFIX}"
+
+
+def _write_json_atomic(path: str, obj: Any) -> None:
+    """写临时文件 + fsync + os.replace，崩溃时要么旧内容要么新内容。"""
+    tmp = f"{path}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class DurableWebhookOutbox:
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = 4 * 1024 * 1024,
+        fsync_interval: float = 0.2,
+        fsync_batch: int = 64,
+    ) -> None:
+        self._dir = directory
+        self._segment_max_bytes = max(1024, int(segment_max_bytes))
+        self._fsync_interval = max(0.0, float(fsync_interval))
+        self._fsync_batch = max(1, int(fsync_batch))
+        os.makedirs(directory, exist_ok=True)
+        self._committed = 0  # seq < committed 的 event 都已 ack
+        self._checkpointed = 0  # 已写入 checkpoint 文件的 committed
+        self._segments: list[int] = []  # 各 segment 的起始 seq，升序
+        self._next_seq = 0
+        self._writer = None
+        self._writer_bytes = 0
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+        # 读游标：下一条要读的 (segment 起始 seq, 字节偏移)
+        self._read_segment = 0
+        self._read_offset = 0
+        # 已读未 ack：event_id -> (seq, segment, offset)；pending delivery 计数；已派发集合；乱序 ack 的 seq
+        self._positions: dict[str, tuple[int, int, int]] = {}
+        self._pending: dict[str, int] = {}
+        self._dispatched: set[str] = set()
+        self._acked: set[int] = set()
+        self._recover()
+
+    # ---------- 启动恢复 ----------
+
+    def _recover(self) -> None:
+        try:
+            with open(os.path.join(self._dir, CHECKPOINT_FILE), encoding="utf-8") as f:
+                committed = json.load(f).get("committed")
+            if isinstance(committed, int) and committed >= 0:
+                self._committed = self._checkpointed = committed
+        except (OSError, ValueError, AttributeError):
+            pass
+        for name in os.listdir(self._dir):
+            if name.endswith(SEGMENT_SUFFIX) and name[: -len(SEGMENT_SUFFIX)].isdigit():
+                self._segments.append(int(name[: -len(SEGMENT_SUFFIX)]))
+        self._segments.sort()
+        self._next_seq = self._committed
+        if self._segments:
+            last = self._segments[-1]
+            last_seq, good_bytes = self._scan_tail(last)
+            self._next_seq = max(self._next_seq, last_seq + 1 if last_seq is not None else last)
+            path = self._segment_path(last)
+            if os.path.getsize(path) != good_bytes:  # 崩溃留下的半行：截掉
+                with open(path, "r+b") as f:
+                    f.truncate(good_bytes)
+                    os.fsync(f.fileno())
+        self._seek_to(self._committed)
+        self._drop_committed_segments()
+
+    def _scan_tail(self, start: int) -> tuple[Optional[int], int]:
+        """返回 segment 内最后一条完整记录的 seq 与完整记录的字节长度。"""
+        last_seq: Optional[int] = None
+        good = 0
+        with open(self._segment_path(start), "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    last_seq = int(json.loads(line)["seq"])
+                except (ValueError, KeyError, TypeError):
+                    break
+                good += len(line)
+        return last_seq, good
+
+    def _seek_to(self, seq: int) -> None:
+        """把读游标放到第一条 seq >= 给定值的记录。"""
+        candidates = [s for s in self._segments if s <= seq]
+        start = candidates[-1] if candidates else (self._segments[0] if self._segments else self._next_seq)
+        self._read_segment, self._read_offset = start, 0
+        if not self._segments:
+            return
+        with open(self._segment_path(start), "rb") as f:
+            offset = 0
+            for line in f:
+                try:
+                    if int(json.loads(line)["seq"]) >= seq:
+                        break
+                except (ValueError, KeyError, TypeError):
+                    break
+                offset += len(line)
+        self._read_offset = offset
+
+    def _segment_path(self, start: int) -> str:
+        return os.path.join(self._dir, _segment_name(start))
+
+    # ---------- 写 ----------
+
+    def append(self, event: dict[str, Any]) -> None:
+        line = (json.dumps({"seq": self._next_seq, "event": event}, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        if self._writer is None:
+            self._open_writer()
+        if self._writer_bytes and self._writer_bytes + len(line) > self._segment_max_bytes:
+            self._fsync()
+            self._writer.close()
+            self._new_segment()
+        self._writer.write(line)
+        self._writer_bytes += len(line)
+        self._next_seq += 1
+        self._unsynced += 1
+        if self._unsynced >= self._fsync_batch or time.monotonic() - self._last_fsync >= self._fsync_interval:
+            self._fsync()
+
+    def _open_writer(self) -> None:
+        """首次写入：接着写最后一个 segment（重启后续写），没有则新建。"""
+        if self._segments:
+            path = self._segment_path(self._segments[-1])
+            self._writer = open(path, "ab")
+            self._writer_bytes = os.path.getsize(path)
+        else:
+            self._new_segment()
+
+    def _new_segment(self) -> None:
+        self._segments.append(self._next_seq)
+        self._writer = open(self._segment_path(self._next_seq), "ab")
+        self._writer_bytes = 0
+
+    def _fsync(self) -> None:
+        if self._writer is not None and self._unsynced:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    # ---------- 读 / 回退 ----------
+
+    def read(self, limit: int) -> list[dict[str, Any]]:
+        """从读游标顺序取最多 limit 条 event 并前移游标（未 ack 前重启会重放）。"""
+        if self._writer is not None:
+            self._writer.flush()
+        out: list[dict[str, Any]] = []
+        while len(out) < limit and self._read_segment in self._segments:
+            idx = self._segments.index(self._read_segment)
+            with open(self._segment_path(self._read_segment), "rb") as f:
+                f.seek(self._read_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    rec = json.loads(line)
+                    event = rec.get("event")
+                    if isinstance(event, dict) and isinstance(event.get("event_id"), str):
+                        self._positions[event["event_id"]] = (int(rec["seq"]), self._read_segment, self._read_offset)
+                        out.append(event)
+                    else:  # 无 event_id 无法跟踪投递，直接视为已完成，不阻塞位点
+                        self._ack_seq(int(rec["seq"]))
+                    self._read_offset += len(line)
+                    if len(out) >= limit:
+                        break
+            if len(out) >= limit or idx + 1 >= len(self._segments):
+                break
+            self._read_segment, self._read_offset = self._segments[idx + 1], 0
+        return out
+
+    def rewind(self, events: list[dict[str, Any]]) -> None:
+        """把读游标退回到这批 event 中最早一条（put_back 语义）。"""
+        earliest: Optional[tuple[int, int, int]] = None
+        for e in events:
+            pos = self._positions.get(e.get("event_id")) if isinstance(e, dict) else None
+            if pos is not None and (earliest is None or pos[0] < earliest[0]):
+                earliest = pos
+        if earliest is not None and (earliest[1], earliest[2]) < (self._read_segment, self._read_offset):
+            self._read_segment, self._read_offset = earliest[1], earliest[2]
+
+    # ---------- ack ----------
+
+    def add_pending(self, event_id: str) -> None:
+        self._pending[event_id] = self._pending.get(event_id, 0) + 1
+
+    def release(self, event_id: str) -> None:
+        n = self._pending.get(event_id, 0) - 1
+        if n > 0:
+            self._pending[event_id] = n
+            return
+        self._pending.pop(event_id, None)
+        if event_id in self._dispatched:
+            self._ack(event_id)
+
+    def mark_dispatched(self, event_id: str) -> None:
+        if event_id not in self._positions:
+            return
+        self._dispatched.add(event_id)
+        if not self._pending.get(event_id):
+            self._ack(event_id)
+
+    def _ack(self, event_id: str) -> None:
+        pos = self._positions.pop(event_id, None)
+        self._dispatched.discard(event_id)
+        if pos is not None:
+            self._ack_seq(pos[0])
+
+    def _ack_seq(self, seq: int) -> None:
+        if seq < self._committed:
+            return
+        self._acked.add(seq)
+        while self._committed in self._acked:
+            self._acked.discard(self._committed)
+            self._committed += 1
+
+    # ---------- 落盘 / 统计 ----------
+
+    def sync(self) -> None:
+        """fsync 未落盘的追加，写 checkpoint，删除已完全提交的 segment。"""
+        self._fsync()
+        if self._committed != self._checkpointed:
+            _write_json_atomic(os.path.join(self._dir, CHECKPOINT_FILE), {"committed": self._committed})
+            self._checkpointed = self._committed
+            self._drop_committed_segments()
+
+    def _drop_committed_segments(self) -> None:
+        # 只有下一个 segment 的起点 <= checkpointed 时，前一个 segment 才完全提交；当前写入的 segment 永远保留
+        while len(self._segments) >= 2 and self._segments[1] <= self._checkpointed and self._read_segment != self._segments[0]:
+            try:
+                os.remove(self._segment_path(self._segments[0]))
+            except OSError:
+                break
+            self._segments.pop(0)
+
+    def close(self) -> None:
+        self.sync()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def backlog(self) -> int:
+        """尚未 ack 的 event 数（含已读在途的）。"""
+        return self._next_seq - self._committed - len(self._acked)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "next_seq": self._next_seq,
+            "committed": self._committed,
+            "backlog": self.backlog(),
+            "in_flight": len(self._positions),
+            "segments": len(self._segments),
+        }
+
+    # ---------- 订阅表 ----------
+
+    def save_subscriptions(self, subscriptions: list[dict[str, Any]]) -> None:
+        _write_json_atomic(os.path.join(self._dir, SUBSCRIPTIONS_FILE), subscriptions)
+
+    def load_subscriptions(self) -> list[dict[str, Any]]:
+        try:
+            with open(os.path.join(self._dir, SUBSCRIPTIONS_FILE), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return [r for r in data if isinstance(r, dict)] if isinstance(data, list) else []
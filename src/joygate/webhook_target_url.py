@@ -1,15 +1,68 @@
 """
 Webhook target_url 校验：单点复用，订阅创建与投递前均调用。
 禁止内网/保留网段、userinfo、非 http(s) scheme；可选允许 http 与 localhost（本地 demo）。
+DNS 结果按 (host, port) 带 TTL 缓存（含解析失败的负缓存）；SSRF 判定每次都对缓存地址重跑，
+投递时连接固定到校验通过的 IP（见 webhooks_logic.PinnedIPAdapter），校验与连接之间不再二次解析。
 """
 from __future__ import annotations
 
 import ipaddress
 import socket
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import NamedTuple
 from urllib.parse import urlparse
 
 # 长度上限（与 config.WEBHOOK_TARGET_URL_MAX_LEN 一致，此处避免循环依赖）
 TARGET_URL_MAX_LEN = 2048
+# DNS 缓存：成功结果 TTL、解析失败负缓存 TTL（秒）、条目上限（LRU 淘汰）
+DNS_CACHE_TTL_SECONDS = 60.0
+DNS_NEGATIVE_TTL_SECONDS = 10.0
+DNS_CACHE_MAX_ENTRIES = 1024
+
+# (host, port) -> (expires_at_monotonic, ip 列表；None 表示解析失败)
+_DNS_CACHE: "OrderedDict[tuple[str, int], tuple[float, tuple[str, ...] | None]]" = OrderedDict()
+_DNS_CACHE_LOCK = Lock()
+
+
+class ResolvedTarget(NamedTuple):
+    """校验通过的投递目标：host 为 URL 中的主机名（小写），ip 为固定连接用的地址。"""
+    scheme: str
+    host: str
+    port: int
+    ip: str
+
+
+def _resolve_cached(host: str, port: int) -> tuple[str, ...] | None:
+    """getaddrinfo 结果按 (host, port) 缓存；解析失败返回 None（同样缓存 DNS_NEGATIVE_TTL_SECONDS）。"""
+    key = (host, port)
+    now = time.monotonic()
+    with _DNS_CACHE_LOCK:
+        hit = _DNS_CACHE.get(key)
+        if hit is not None and hit[0] > now:
+            _DNS_CACHE.move_to_end(key)
+            return hit[1]
+    # 锁外解析：慢 DNS 不阻塞其他 host；并发未命中同一 key 时各自解析，后写覆盖
+    try:
+        infos = socket.getaddrinfo(host, port, socket.AF_UNSPEC, socket.SOCK_STREAM)
+        ips: tuple[str, ...] | None = tuple(
+            dict.fromkeys(sockaddr[0] for (_f, _t, _p, _c, sockaddr) in infos if sockaddr)
+        ) or None
+    except Exception:
+        ips = None
+    ttl = DNS_CACHE_TTL_SECONDS if ips is not None else DNS_NEGATIVE_TTL_SECONDS
+    with _DNS_CACHE_LOCK:
+        _DNS_CACHE[key] = (time.monotonic() + ttl, ips)
+        _DNS_CACHE.move_to_end(key)
+        while len(_DNS_CACHE) > DNS_CACHE_MAX_ENTRIES:
+            _DNS_CACHE.popitem(last=False)
+    return ips
+
+
+def clear_dns_cache() -> None:
+    with _DNS_CACHE_LOCK:
+        _DNS_CACHE.clear()
 
 
 def _is_blocked_ip(ip_str: str, allow_localhost: bool) -> bool:
@@ -50,63 +103,69 @@ def validate_webhook_target_url(
     统一校验 target_url。返回 (ok, last_error)。
     ok=True 时 last_error 为 None；ok=False 时 last_error 为 invalid_target_url（delivery 用，不暴露细节）。
     """
+    target, err = resolve_webhook_target(target_url, allow_http=allow_http, allow_localhost=allow_localhost)
+    return target is not None, err
+
+
+def resolve_webhook_target(
+    target_url: str,
+    allow_http: bool = False,
+    allow_localhost: bool = False,
+) -> tuple[ResolvedTarget | None, str | None]:
+    """
+    同 validate_webhook_target_url，通过时额外返回 ResolvedTarget（含固定连接用的 IP）。
+    解析出的任一地址落在禁止范围即拒绝；失败返回 (None, "invalid_target_url")。
+    """
     if not isinstance(target_url, str):
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
     s = target_url.strip()
     if not s:
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
     if any(ord(c) < 32 or ord(c) == 127 for c in s):
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
     if "\\" in s:
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
     if len(s) > TARGET_URL_MAX_LEN:
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
 
     try:
         parsed = urlparse(s)
     except Exception:
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
 
     scheme = (parsed.scheme or "").lower()
     if scheme not in ("https", "http"):
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
     if scheme == "http" and not allow_http:
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
 
     if not parsed.netloc:
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
     if parsed.username is not None or parsed.password is not None:
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
     if "@" in parsed.netloc:
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
 
     host = parsed.hostname
     if not host:
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
 
     host_lower = host.lower()
     if host_lower in ("0.0.0.0", "169.254.169.254"):
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
 
     try:
         port = parsed.port
         if port is None:
             port = 443 if scheme == "https" else 80
     except ValueError:
-        return False, "invalid_target_url"
-
-    try:
-        infos = socket.getaddrinfo(host, port, socket.AF_UNSPEC, socket.SOCK_STREAM)
-    except socket.gaierror:
-        return False, "invalid_target_url"
-    except Exception:
-        return False, "invalid_target_url"
+        return None, "invalid_target_url"
 
-    for (_family, _type, _proto, _canon, sockaddr) in infos:
-        if not sockaddr:
-            continue
-        ip_str = sockaddr[0]
+    ips = _resolve_cached(host_lower, port)
+    if not ips:
+        return None, "invalid_target_url"
+    for ip_str in ips:
         if _is_blocked_ip(ip_str, allow_localhost):
-            return False, "invalid_target_url"
+            return None, "invalid_target_url"
 
-    return True, None
+    return ResolvedTarget(scheme, host_lower, port, ips[0].split("%", 1)[0]), None
@@ -3,25 +3,327 @@ from __future__ import annotations
 import hashlib
 import hmac
 import json
+import random
 import time
-from typing import Any
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from joygate.webhook_target_url import validate_webhook_target_url
+from joygate.webhook_target_url import ResolvedTarget, resolve_webhook_target
 
+MAX_DELIVERIES_PER_DISPATCH = 50  # 单次派发 delivery 上限，内部常量
+MAX_EVENTS_SCAN_PER_DISPATCH = 200  # 单次扫描事件数上限，超出部分 put_back 下一轮
+WEBHOOK_RETRY_JITTER_RATIO = 0.2  # 重试间隔随机抖动 ±20%
 
-def serialize_webhook_body(payload: dict) -> bytes:
+
+# 当前线程正在发送的请求应连接的已校验目标（send_webhook_once 设置，PinnedIPAdapter 读取）
+_PINNED_TARGET: ContextVar[ResolvedTarget | None] = ContextVar("joygate_webhook_pinned_target", default=None)
+
+
+class PinnedIPAdapter(HTTPAdapter):
+    """
+    连接固定到校验时解析出的 IP，防 DNS rebinding：URL / Host 头保持原主机名，
+    https 的 SNI 与证书主机名校验仍按原主机名（server_hostname / assert_hostname）。
+    连接池按 (ip, port, 主机名) 区分，keep-alive 照常复用。
+    """
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        pinned = _PINNED_TARGET.get()
+        if pinned is not None and (host_params.get("host") or "").lower() == pinned.host:
+            host_params = {**host_params, "host": pinned.ip}
+            if host_params.get("scheme") == "https":
+                pool_kwargs = {**pool_kwargs, "server_hostname": pinned.host, "assert_hostname": pinned.host}
+        return host_params, pool_kwargs
+
+
+def new_webhook_session(pool_connections: int = 10, pool_maxsize: int = 10) -> requests.Session:
+    """投递用 Session：不读环境代理，http/https 均走 PinnedIPAdapter。"""
+    session = requests.Session()
+    session.trust_env = False
+    adapter = PinnedIPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class WebhookDeliveryTable:
+    """
+    webhook delivery 内存表：delivery_id -> rec（dict 插入序即创建序）。调用方须持有 _webhooks_lock。
+    - (event_id, subscription_id) 唯一索引：去重 O(1)；
+    - 保留期按数值时间戳（最后更新时刻）管理：_retention 为按时间追加的 (ts, delivery_id) 队列，
+      touch 只追加新项，旧项在出队时与 _updated_ts 比对后作为失效项跳过，清理摊还 O(1)；
+    - on_change(delivery_id)：add / touch / remove 后回调（store 把 delivery 登记进归档后端）。
+    """
+
+    def __init__(self, on_change: Callable[[str], None] | None = None) -> None:
+        self.on_change = on_change
+        self._by_id: dict[str, dict[str, Any]] = {}
+        self._by_key: dict[tuple[str, str], str] = {}
+        self._updated_ts: dict[str, float] = {}
+        self._retention: deque[tuple[float, str]] = deque()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def get(self, delivery_id: str | None) -> dict[str, Any] | None:
+        if not delivery_id:
+            return None
+        return self._by_id.get(delivery_id)
+
+    def find(self, event_id: str, subscription_id: str) -> dict[str, Any] | None:
+        delivery_id = self._by_key.get((event_id, subscription_id))
+        return self._by_id.get(delivery_id) if delivery_id else None
+
+    def for_event(self, event_id: str, subscription_id: str | None = None) -> list[dict[str, Any]]:
+        """某 event 的 delivery（给定 subscription_id 时走唯一索引，否则扫全表），新 -> 旧。"""
+        if subscription_id is not None:
+            rec = self.find(event_id, subscription_id)
+            return [rec] if rec is not None else []
+        return [rec for rec in reversed(self._by_id.values()) if rec.get("event_id") == event_id]
+
+    def add(self, rec: dict[str, Any], now: float) -> None:
+        delivery_id = rec["delivery_id"]
+        self._by_id[delivery_id] = rec
+        event_id = rec.get("event_id")
+        subscription_id = rec.get("subscription_id")
+        if event_id and subscription_id:
+            self._by_key[(event_id, subscription_id)] = delivery_id
+        self.touch(delivery_id, now)
+
+    def touch(self, delivery_id: str, now: float) -> None:
+        """记录最后更新时刻（保留期从此刻重新计）。"""
+        if delivery_id not in self._by_id:
+            return
+        self._updated_ts[delivery_id] = now
+        self._retention.append((now, delivery_id))
+        if self.on_change is not None:
+            self.on_change(delivery_id)
+
+    def remove(self, delivery_id: str) -> dict[str, Any] | None:
+        rec = self._by_id.pop(delivery_id, None)
+        if rec is None:
+            return None
+        self._updated_ts.pop(delivery_id, None)
+        event_id = rec.get("event_id")
+        subscription_id = rec.get("subscription_id")
+        if event_id and subscription_id and self._by_key.get((event_id, subscription_id)) == delivery_id:
+            del self._by_key[(event_id, subscription_id)]
+        if self.on_change is not None:
+            self.on_change(delivery_id)
+        return rec
+
+    def expire(self, now: float, retention_seconds: float) -> int:
+        """移除最后更新早于 now - retention_seconds 的 delivery，返回移除数；retention<=0 表示不清理。"""
+        if retention_seconds <= 0:
+            return 0
+        cutoff = now - retention_seconds
+        removed = 0
+        queue = self._retention
+        while queue and queue[0][0] < cutoff:
+            ts, delivery_id = queue.popleft()
+            if self._updated_ts.get(delivery_id) != ts:
+                continue  # 已 touch 过或已删除：失效项
+            self.remove(delivery_id)
+            removed += 1
+        # 频繁 touch 时失效项堆积：超过存活数 2 倍就重建
+        if len(queue) > 2 * len(self._by_id) + 64:
+            self._retention = deque(sorted((ts, did) for did, ts in self._updated_ts.items()))
+        return removed
+
+    def latest(self, limit: int) -> list[dict[str, Any]]:
+        """按创建时间倒序取最近 limit 条。"""
+        out: list[dict[str, Any]] = []
+        for rec in reversed(self._by_id.values()):
+            if len(out) >= limit:
+                break
+            out.append(rec)
+        return out
+
+
+BREAKER_CLOSED = "CLOSED"
+BREAKER_OPEN = "OPEN"
+BREAKER_HALF_OPEN = "HALF_OPEN"
+LATENCY_EWMA_ALPHA = 0.2
+
+
+class WebhookCircuitBreaker:
+    """
+    单个订阅的熔断状态机（调用方须持有 _webhooks_lock）：
+    - CLOSED：正常投递；连续失败 failure_threshold 次 -> OPEN。
+    - OPEN：冷却 open_seconds 内不投递；到期后 allow() 放行一次探测 -> HALF_OPEN。
+    - HALF_OPEN：只有探测在途；探测成功 -> CLOSED（冷却复位），失败 -> OPEN 且冷却翻倍（不超过 max_open_seconds）。
+    同时记录成功/失败次数与耗时 EWMA，供 /v1/webhooks/stats 查看。
+    """
+
+    def __init__(self, failure_threshold: int, open_seconds: float, max_open_seconds: float) -> None:
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_open_seconds = float(open_seconds)
+        self.max_open_seconds = max(float(max_open_seconds), self.base_open_seconds)
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.open_seconds = self.base_open_seconds
+        self.opened_at: float | None = None
+        self.open_until = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.latency_ewma_ms: float | None = None
+        self.last_error: str | None = None
+
+    def probe_due(self, now: float) -> bool:
+        return self.state == BREAKER_OPEN and now >= self.open_until
+
+    def allow(self, now: float) -> bool:
+        """是否可以发起一次尝试；OPEN 冷却到期时放行一次并转入 HALF_OPEN。"""
+        if self.state == BREAKER_CLOSED:
+            return True
+        if self.probe_due(now):
+            self.state = BREAKER_HALF_OPEN
+            return True
+        return False
+
+    def record(self, delivered: bool, latency_ms: float | None, now: float, error: str | None = None) -> None:
+        if latency_ms is not None:
+            if self.latency_ewma_ms is None:
+                self.latency_ewma_ms = float(latency_ms)
+            else:
+                self.latency_ewma_ms += LATENCY_EWMA_ALPHA * (float(latency_ms) - self.latency_ewma_ms)
+        if delivered:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self.state == BREAKER_HALF_OPEN:
+                self.state = BREAKER_CLOSED
+                self.open_seconds = self.base_open_seconds
+                self.opened_at = None
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.state == BREAKER_HALF_OPEN:
+            self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+            self._open(now)
+        elif self.state == BREAKER_CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = BREAKER_OPEN
+        self.opened_at = now
+        self.open_until = now + self.open_seconds
+
+    def snapshot(self, now: float) -> dict[str, Any]:
+        return {
+            "breaker_state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "open_seconds_remaining": round(max(0.0, self.open_until - now), 3) if self.state == BREAKER_OPEN else 0.0,
+            "successes": self.successes,
+            "failures": self.failures,
+            "avg_latency_ms": round(self.latency_ewma_ms, 3) if self.latency_ewma_ms is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+def serialize_webhook_body(payload: dict | list[dict | bytes] | bytes) -> bytes:
+    """
+    规范化 body（紧凑分隔、sort_keys）。bytes 视为已序列化的单个 event 原样返回；
+    list 为批量 body，元素可以是已序列化的 bytes，拼接结果与整体 json.dumps 一致。
+    """
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, list):
+        return b"[" + b",".join(serialize_webhook_body(item) for item in payload) + b"]"
     return json.dumps(payload, separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode("utf-8")
 
 
+@lru_cache(maxsize=256)
+def _hmac_for_secret(secret: str) -> "hmac.HMAC":
+    """每个 secret 只做一次 key 预处理；签名时 copy() 后再 update，避免每次重建 HMAC 内外层 pad。"""
+    return hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+
 def build_signature(secret: str | None, ts: str, body: bytes) -> str | None:
     if secret is None or (isinstance(secret, str) and not secret.strip()):
         return None
-    key = secret.encode("utf-8")
-    msg = ts.encode("utf-8") + b"." + body
-    digest = hmac.new(key, msg=msg, digestmod=hashlib.sha256).hexdigest()
-    return f"sha256={digest}"
+    mac = _hmac_for_secret(secret).copy()
+    mac.update(ts.encode("utf-8") + b"." + body)
+    return f"sha256={mac.hexdigest()}"
+
+
+def send_webhook_once(
+    session: requests.Session,
+    target_url: str,
+    secret: str | None,
+    payload: dict | list[dict | bytes] | bytes,
+    timeout: int,
+    allow_http: bool = False,
+    allow_localhost: bool = False,
+) -> dict:
+    """
+    单次投递（不重试、不 sleep）。每次发送前都重新校验 target_url（DNS 走 TTL 缓存），
+    并把连接固定到本次校验通过的 IP；session 须用 new_webhook_session 创建。
+    payload 可为 event dict 或 serialize_webhook_body 预先序列化的 bytes（每次尝试只重算带时间戳的签名）；
+    为 list 时是批量投递：body 为 event 数组（各自带 event_id），签名覆盖整个数组，另带 X-JoyGate-Batch-Size。
+    返回 {delivered, last_status_code, last_error}；last_error ∈ invalid_target_url/non_2xx_status/timeout/connection_error。
+    """
+    target, _ = resolve_webhook_target(target_url, allow_http=allow_http, allow_localhost=allow_localhost)
+    if target is None:
+        return {"delivered": False, "last_status_code": None, "last_error": "invalid_target_url"}
+    timeout_sec = int(timeout or 0)
+    if timeout_sec <= 0:
+        timeout_sec = 10
+    ts = str(int(time.time()))
+    body = serialize_webhook_body(payload)
+    headers: dict[str, str] = {
+        "Content-Type": "application/json",
+        "X-JoyGate-Timestamp": ts,
+    }
+    sig = build_signature(secret, ts, body)
+    if sig is not None:
+        headers["X-JoyGate-Signature"] = sig
+    if isinstance(payload, list):
+        headers["X-JoyGate-Batch-Size"] = str(len(payload))
+    default_port = 443 if target.scheme == "https" else 80
+    host_header = target.host if ":" not in target.host else f"[{target.host}]"
+    headers["Host"] = host_header if target.port == default_port else f"{host_header}:{target.port}"
+    token = _PINNED_TARGET.set(target)
+    try:
+        resp = session.post(
+            target_url,
+            data=body,
+            headers=headers,
+            timeout=timeout_sec,
+            allow_redirects=False,
+        )
+        try:
+            if 200 <= resp.status_code < 300:
+                return {"delivered": True, "last_status_code": resp.status_code, "last_error": None}
+            return {"delivered": False, "last_status_code": resp.status_code, "last_error": "non_2xx_status"}
+        finally:
+            resp.close()
+    except requests.Timeout:
+        return {"delivered": False, "last_status_code": None, "last_error": "timeout"}
+    except requests.RequestException:
+        return {"delivered": False, "last_status_code": None, "last_error": "connection_error"}
+    finally:
+        _PINNED_TARGET.reset(token)
+
+
+def webhook_retry_delay(backoff: float, attempt: int, max_delay: float, rng: random.Random | None = None) -> float:
+    """
+    第 attempt 次（从 1 计）失败后到下一次重试的等待秒数：backoff * 2^(attempt-1)，封顶 max_delay，
+    再乘 [1-J, 1+J] 的随机抖动（避免同一接收方的重试同时到达）。backoff<=0 表示立即重试。
+    """
+    if backoff <= 0:
+        return 0.0
+    base = min(float(max_delay), float(backoff) * (2 ** max(0, attempt - 1)))
+    r = rng if rng is not None else random
+    return base * r.uniform(1.0 - WEBHOOK_RETRY_JITTER_RATIO, 1.0 + WEBHOOK_RETRY_JITTER_RATIO)
 
 
 def send_webhook_with_retry(
@@ -34,85 +336,102 @@ def send_webhook_with_retry(
     allow_http: bool = False,
     allow_localhost: bool = False,
 ) -> dict:
-    """投递前再次校验 target_url；不合法则不发请求，返回 last_error=invalid_target_url。"""
-    ok, err = validate_webhook_target_url(target_url, allow_http=allow_http, allow_localhost=allow_localhost)
-    if not ok:
-        return {
-            "delivered": False,
-            "attempts": 0,
-            "last_status_code": None,
-            "last_error": err or "invalid_target_url",
-        }
-
+    """
+    同步投递 + 背靠背重试（不 sleep，backoff 不生效）；服务内投递走 webhook_delivery 引擎，此函数供脚本/排障直接调用。
+    投递前再次校验 target_url；不合法则不发请求，返回 last_error=invalid_target_url。
+    """
     attempts = int(max_attempts or 0)
     if attempts <= 0:
         attempts = 1
-    timeout_sec = int(timeout or 0)
-    if timeout_sec <= 0:
-        timeout_sec = 10
-    backoff_sec = int(backoff or 0)
-    if backoff_sec < 0:
-        backoff_sec = 0
-    last_status_code = None
-    last_error: str | None = None
-    session = requests.Session()
-    session.trust_env = False
-    try:
+    result: dict = {"delivered": False, "last_status_code": None, "last_error": None}
+    body = serialize_webhook_body(payload)
+    with new_webhook_session() as session:
         for attempt in range(1, attempts + 1):
-            ok, err = validate_webhook_target_url(target_url, allow_http=allow_http, allow_localhost=allow_localhost)
-            if not ok:
-                return {
-                    "delivered": False,
-                    "attempts": attempt - 1,
-                    "last_status_code": None,
-                    "last_error": "invalid_target_url",
-                }
-            ts = str(int(time.time()))
-            body = serialize_webhook_body(payload)
-            headers: dict[str, str] = {
-                "Content-Type": "application/json",
-                "X-JoyGate-Timestamp": ts,
-            }
-            sig = build_signature(secret, ts, body)
-            if sig is not None:
-                headers["X-JoyGate-Signature"] = sig
-            try:
-                resp = session.post(
+            result = send_webhook_once(
+                session, target_url, secret, body, timeout,
+                allow_http=allow_http, allow_localhost=allow_localhost,
+            )
+            if result.get("delivered"):
+                return {**result, "attempts": attempt}
+            if result.get("last_error") == "invalid_target_url":
+                return {**result, "attempts": attempt - 1}
+    return {**result, "attempts": attempts}
+
+
+def dispatch_webhook_outbox(
+    store: Any,
+    submit: Callable[..., Any],
+    timeout: int,
+    max_attempts: int,
+    backoff: int,
+) -> int:
+    """
+    取出 store 的 webhook outbox，按订阅创建 delivery 并经 submit(fn, *args) 调 store.process_webhook_delivery
+    （只入投递引擎队列、立即返回；路由用 BackgroundTasks.add_task，后台调度器直接调用）。返回本轮新建的 delivery 数。
+    一个 event 要么全派发要么不派发；超出扫描/投递上限或出错的 event 原序 put_back，下一轮再派。
+    每个 event 派发完（含无订阅）调 store.mark_webhook_event_dispatched，磁盘 outbox 据此推进消费位点。
+    每个 event 只序列化一次，body bytes 由该 event 的所有订阅及其重试共用。
+    """
+    events = store.drain_webhook_outbox()
+    if not events:
+        return 0
+    to_scan = events[:MAX_EVENTS_SCAN_PER_DISPATCH]
+    rest = events[MAX_EVENTS_SCAN_PER_DISPATCH:]
+    added_deliveries = 0
+    # 整批 event_type 一次加锁查订阅倒排索引，而不是每个 event 各取一次 _webhooks_lock
+    try:
+        targets_by_type = store.resolve_webhook_targets_for_events(
+            e.get("event_type") for e in to_scan if isinstance(e, dict)
+        )
+    except Exception:
+        store.put_back_webhook_outbox(events)
+        return 0
+    for i, event in enumerate(to_scan):
+        try:
+            event_type = event.get("event_type")
+            if not isinstance(event_type, str) or not event_type.strip():
+                store.mark_webhook_event_dispatched(event.get("event_id"))
+                continue
+            targets = targets_by_type.get(event_type, [])
+            valid_targets = [
+                t
+                for t in targets
+                if t.get("subscription_id")
+                and isinstance(t.get("target_url"), str)
+                and (t.get("target_url") or "").strip()
+            ]
+            if not valid_targets:
+                store.mark_webhook_event_dispatched(event.get("event_id"))
+                continue
+            remaining_budget = MAX_DELIVERIES_PER_DISPATCH - added_deliveries
+            # budget 不足则整包延后，此分支不创建任何 delivery（避免重复派发）
+            if remaining_budget <= 0 or added_deliveries + len(valid_targets) > MAX_DELIVERIES_PER_DISPATCH:
+                store.put_back_webhook_outbox([event] + to_scan[i + 1 :] + rest)
+                return added_deliveries
+            body = serialize_webhook_body(event)
+            for target in valid_targets:
+                subscription_id = target.get("subscription_id")
+                target_url = (target.get("target_url") or "").strip()
+                secret = target.get("secret")
+                delivery_id = store.create_webhook_delivery_if_absent(event, subscription_id, target_url)
+                if delivery_id is None:
+                    continue  # 已存在相同 event_id+subscription_id，不重复发送
+                submit(
+                    store.process_webhook_delivery,
+                    delivery_id,
                     target_url,
-                    data=body,
-                    headers=headers,
-                    timeout=timeout_sec,
-                    allow_redirects=False,
+                    secret,
+                    event,
+                    timeout,
+                    max_attempts,
+                    backoff,
+                    body,
                 )
-                try:
-                    if 200 <= resp.status_code < 300:
-                        out = {
-                            "delivered": True,
-                            "attempts": attempt,
-                            "last_status_code": resp.status_code,
-                            "last_error": None,
-                        }
-                        return out
-                    last_status_code = resp.status_code
-                    last_error = "non_2xx_status"
-                finally:
-                    resp.close()
-            except requests.Timeout:
-                last_error = "timeout"
-                last_status_code = None
-            except requests.ConnectionError:
-                last_error = "connection_error"
-                last_status_code = None
-            except requests.RequestException:
-                last_error = "connection_error"
-                last_status_code = None
-            # 不阻塞 worker：不 sleep，重试交给 outbox 下一轮
-    finally:
-        session.close()
-
-    return {
-        "delivered": False,
-        "attempts": attempts,
-        "last_status_code": last_status_code,
-        "last_error": last_error,
-    }
+                added_deliveries += 1
+            store.mark_webhook_event_dispatched(event.get("event_id"))
+        except Exception:
+            store.put_back_webhook_outbox([event] + to_scan[i + 1 :] + rest)
+            return added_deliveries
+    if rest:
+        store.put_back_webhook_outbox(rest)
+    return added_deliveries
@@ -3,6 +3,8 @@ from __future__ import annotations
 import time
 from typing import Any
 
+from joygate.incidents_logic import IncidentTable
+
 # evidence_refs 防污染：最多 5 条，每项 str、strip 非空、长度<=120
 EVIDENCE_REFS_MAX = 5
 EVIDENCE_REF_MAX_LEN = 120
@@ -25,7 +27,7 @@ def _normalize_evidence_refs(refs: list[str] | None) -> list[str]:
 
 
 def witness_respond_locked(
-    incidents: list[dict[str, Any]],
+    incidents: IncidentTable,
     witness_by_incident: dict[str, dict[str, Any]],
     incident_id: str,
     charger_id: str,
@@ -36,7 +38,7 @@ def witness_respond_locked(
     witness_joykey: str,
     allowed_states: set[str],
     joykey_to_vendor: dict[str, str],
-    joykey_to_points: dict[str, int],
+    witness_points: int,
     witness_vendor_decay_gamma: float,
     witness_min_distinct_vendors: int,
     witness_score_required: float,
@@ -47,11 +49,7 @@ def witness_respond_locked(
     witness_certified_points_threshold: int,
     witness_min_certified_support_risky: int,
 ) -> None:
-    rec = None
-    for r in incidents:
-        if r.get("incident_id") == incident_id:
-            rec = r
-            break
+    rec = incidents.get(incident_id)
     if rec is None:
         raise KeyError(f"incident not found: {incident_id}")
     inc_charger_id = rec.get("charger_id")
@@ -109,8 +107,7 @@ def witness_respond_locked(
     vendor_counts[vendor] = vendor_count + 1
     w["vendor_vote_counts"] = vendor_counts
     w["vendors_by_state"][charger_state].add(vendor)
-    points = joykey_to_points.get(witness_joykey, 0)
-    if points >= witness_certified_points_threshold:
+    if witness_points >= witness_certified_points_threshold:
         w["certified_witnesses_by_state"][charger_state].add(witness_joykey)
     w["tally"][charger_state] = w["tally"].get(charger_state, 0) + 1
     w["tally_weighted"][charger_state] = w["tally_weighted"].get(charger_state, 0.0) + weight
@@ -165,6 +162,7 @@ def witness_respond_locked(
     if not replaced:
         ai_insights.append(insight)
     rec["ai_insights"] = ai_insights
+    incidents.touch(incident_id)
 
     if lead_state == "UNKNOWN_OCCUPANCY":
         certified_support = len(w.get("certified_witnesses_by_state", {}).get("UNKNOWN_OCCUPANCY") or set())
@@ -184,6 +182,5 @@ def witness_respond_locked(
     if reach_confirm:
         current_status = rec.get("incident_status")
         if current_status not in ("EVIDENCE_CONFIRMED", "RESOLVED"):
-            rec["incident_status"] = "EVIDENCE_CONFIRMED"
-            rec["status_updated_at"] = time.time()
+            incidents.set_status(rec, "EVIDENCE_CONFIRMED", time.time())
         # 如果已经是 EVIDENCE_CONFIRMED 或 RESOLVED：保持 status_updated_at 不变，不重复刷新